@@ -0,0 +1,133 @@
+import bisect
+import threading
+import time
+
+
+class AccountCodeAllocator:
+    """
+    In-memory allocator for account.account codes of a single company.
+
+    All existing codes are loaded once with a single search_read and kept in
+    a sorted list, so checking whether a code is taken is a bisect lookup
+    instead of an Odoo round trip. Codes handed out are reserved immediately,
+    which keeps concurrent imports in the same worker from picking the same
+    code before Odoo has seen the create.
+    """
+
+    def __init__(self, company_id, max_age_seconds=300):
+        self.company_id = company_id
+        self.max_age_seconds = max_age_seconds
+        self._codes = []
+        self._reserved = set()
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    def is_stale(self):
+        return self._loaded_at is None or (time.time() - self._loaded_at) > self.max_age_seconds
+
+    def load(self, models, db, uid, password, context):
+        """Load every existing account code for the company in one query"""
+        accounts = models.execute_kw(
+            db, uid, password,
+            'account.account', 'search_read',
+            [[]],
+            {'fields': ['code'], 'context': context}
+        )
+
+        codes = sorted({str(acc['code']) for acc in accounts if acc.get('code')})
+
+        with self._lock:
+            # Keep reservations that Odoo has not confirmed yet
+            merged = set(codes) | self._reserved
+            self._codes = sorted(merged)
+            self._loaded_at = time.time()
+
+        print(f"✅ Loaded {len(codes)} account codes for company {self.company_id}")
+        return len(codes)
+
+    def ensure_loaded(self, models, db, uid, password, context):
+        if self.is_stale():
+            self.load(models, db, uid, password, context)
+
+    def _contains(self, code):
+        index = bisect.bisect_left(self._codes, code)
+        return index < len(self._codes) and self._codes[index] == code
+
+    def is_taken(self, code):
+        with self._lock:
+            return self._contains(code)
+
+    def allocate(self, prefix, suffix, width=4):
+        """
+        Reserve the first free code at or after prefix+suffix.
+
+        The suffix is incremented (wrapping within the width) until a free
+        code is found. Returns None if every code for the prefix is taken.
+        """
+        start = int(suffix) if str(suffix).isdigit() else 0
+        capacity = 10 ** width
+
+        with self._lock:
+            for offset in range(capacity):
+                candidate = f"{prefix}{str((start + offset) % capacity).zfill(width)}"
+                if not self._contains(candidate):
+                    bisect.insort(self._codes, candidate)
+                    self._reserved.add(candidate)
+                    return candidate
+
+        return None
+
+    def confirm(self, code):
+        """Mark a reserved code as created in Odoo"""
+        with self._lock:
+            self._reserved.discard(code)
+
+    def release(self, code):
+        """Give back a reserved code whose create failed for another reason"""
+        with self._lock:
+            if code in self._reserved:
+                self._reserved.discard(code)
+                index = bisect.bisect_left(self._codes, code)
+                if index < len(self._codes) and self._codes[index] == code:
+                    del self._codes[index]
+
+    def resync(self, models, db, uid, password, context, conflicting_code=None):
+        """
+        Reload codes from Odoo after a uniqueness conflict.
+
+        The conflicting code is dropped from the reservation set first so the
+        reload treats it as a real, existing code.
+        """
+        with self._lock:
+            if conflicting_code:
+                self._reserved.discard(conflicting_code)
+            self._loaded_at = None
+        self.load(models, db, uid, password, context)
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(db, company_id):
+    """Return the shared allocator for a database/company pair"""
+    key = (db, company_id)
+    with _allocators_lock:
+        allocator = _allocators.get(key)
+        if allocator is None:
+            allocator = AccountCodeAllocator(company_id)
+            _allocators[key] = allocator
+        return allocator
+
+
+def company_id_from_context(context):
+    allowed = (context or {}).get('allowed_company_ids') or [None]
+    return allowed[0]
+
+
+def is_uniqueness_conflict(error):
+    """Detect Odoo's duplicate-code errors on account.account create"""
+    message = str(error).lower()
+    return any(marker in message for marker in [
+        'unique', 'already exists', 'duplicate', 'must be unique'
+    ])
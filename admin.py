@@ -1,5 +1,5 @@
 #admin.py
-import boto3
+import aws_clients
 import json
 from datetime import datetime
 from botocore.exceptions import ClientError
@@ -17,8 +17,8 @@ AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
 
 # AWS clients with consistent region configuration
-s3_client = boto3.client('s3', region_name=AWS_REGION)
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+s3_client = aws_clients.client('s3', region_name=AWS_REGION)
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
 onboarding_table = dynamodb.Table('onboarding_submissions')
 
 def generate_presigned_url(s3_key, expiration=3600):
@@ -414,7 +414,7 @@ def approve_company(submission_id, approved_by_username, admin_email):
         # Step 3: Update onboarding submission status to manual_approved
         onboarding_table.update_item(
             Key={'submission_id': submission_id},
-            UpdateExpression='SET #status = :status, approved_at = :approved_at, approved_by = :approved_by, username = :username, business_company_id = :business_company_id',
+            UpdateExpression='SET #status = :status, approved_at = :approved_at, approved_by = :approved_by, username = :username, business_company_id = :business_company_id, provisioning_timings = :provisioning_timings',
             ExpressionAttributeNames={
                 '#status': 'status'
             },
@@ -423,7 +423,9 @@ def approve_company(submission_id, approved_by_username, admin_email):
                 ':approved_at': datetime.utcnow().isoformat(),
                 ':approved_by': approved_by_username,
                 ':username': username,
-                ':business_company_id': business_company_id
+                ':business_company_id': business_company_id,
+                # Per-step Odoo provisioning durations, kept for onboarding diagnostics
+                ':provisioning_timings': business_company_result.get('provisioning_timings', {})
             }
         )
         
@@ -439,7 +441,8 @@ def approve_company(submission_id, approved_by_username, admin_email):
             "email_sent": True,
             "user_account_created": True,
             "business_company_created": True,
-            "business_company_id": business_company_id
+            "business_company_id": business_company_id,
+            "provisioning_timings": business_company_result.get('provisioning_timings', {})
         }
         
     except ClientError as e:
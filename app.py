@@ -2,33 +2,34 @@ from flask import Flask, request, jsonify, make_response
 import os
 import json
 from flask_cors import CORS
-
-# Import all your modules
-try:
-    import createbill
-    import createBillCompanywise
-    import createcompany
-    import createCreditNotes
-    import createCusomterPayments
-    import createCustomer
-    import createInvoice
-    import createproduct
-    import createrefund
-    import createvendor
-    import createVendorPayments
-    import deletebill
-    import deletecompany
-    import deletevendor
-    import modifybill
-    import modifyvendor
-    import createjournal
-    import createtransaction
-    import getDetailsByCompany
-    import updateAuditStatus
-    
-    
-except ImportError as e:
-    print(f"Warning: Could not import some modules: {e}")
+from werkzeug.middleware.proxy_fix import ProxyFix
+from lazy_modules import lazy_import
+import lazy_modules
+import route_pools
+import llm_cassettes
+import metrics
+
+# Import all your modules (loaded on first use, see lazy_modules.py)
+createbill = lazy_import('createbill', optional=True)
+createBillCompanywise = lazy_import('createBillCompanywise', optional=True)
+createcompany = lazy_import('createcompany', optional=True)
+createCreditNotes = lazy_import('createCreditNotes', optional=True)
+createCusomterPayments = lazy_import('createCusomterPayments', optional=True)
+createCustomer = lazy_import('createCustomer', optional=True)
+createInvoice = lazy_import('createInvoice', optional=True)
+createproduct = lazy_import('createproduct', optional=True)
+createrefund = lazy_import('createrefund', optional=True)
+createvendor = lazy_import('createvendor', optional=True)
+createVendorPayments = lazy_import('createVendorPayments', optional=True)
+deletebill = lazy_import('deletebill', optional=True)
+deletecompany = lazy_import('deletecompany', optional=True)
+deletevendor = lazy_import('deletevendor', optional=True)
+modifybill = lazy_import('modifybill', optional=True)
+modifyvendor = lazy_import('modifyvendor', optional=True)
+createjournal = lazy_import('createjournal', optional=True)
+createtransaction = lazy_import('createtransaction', optional=True)
+getDetailsByCompany = lazy_import('getDetailsByCompany', optional=True)
+updateAuditStatus = lazy_import('updateAuditStatus', optional=True)
 
 import base64
 import logging
@@ -40,41 +41,51 @@ logger = logging.getLogger(__name__)
 
 # PDF extraction availability (set based on your setup)
 PDF_EXTRACTION_AVAILABLE = False  # Change to True if you have PDF processing modules
-import upload
-import onboarding
-import auth
-import admin
+upload = lazy_import('upload')
+onboarding = lazy_import('onboarding')
+auth = lazy_import('auth')
+admin = lazy_import('admin')
+company_template = lazy_import('company_template')
+from login_throttle import login_throttle
 from middleware import jwt_required, admin_required, get_current_user
 from flask import g
-import validatecompany
-import batchupdate
-import classifydocument
-import splitinvoice
-import matchingworkflow
-import processtransaction
-import process_bill
-import process_invoice
-import createsharetransaction
-import process_share_documents
-import processonboardingdoc
-import update_transactions_table as transactions
-import update_bills_table as bills
-import update_invoices_table as invoices
-import update_share_transactions_table as share_transactions
-import update_payroll_transactions_table as payroll_transactions
-import reports
-import process_payroll
-import dashboard
-import company_profile
-import bank_reconciliation
-import compliance
-import create_payroll_transaction as createpayrolltransaction
-import dynamodb_data_extractor
-import matchingworkflow
-import reconcile_transactions
-import update_dynamo_reconciled as reconciled_updater
+validatecompany = lazy_import('validatecompany')
+batchupdate = lazy_import('batchupdate')
+classifydocument = lazy_import('classifydocument')
+splitinvoice = lazy_import('splitinvoice')
+matchingworkflow = lazy_import('matchingworkflow')
+processtransaction = lazy_import('processtransaction')
+process_bill = lazy_import('process_bill')
+process_invoice = lazy_import('process_invoice')
+createsharetransaction = lazy_import('createsharetransaction')
+process_share_documents = lazy_import('process_share_documents')
+processonboardingdoc = lazy_import('processonboardingdoc')
+transactions = lazy_import('update_transactions_table')
+bills = lazy_import('update_bills_table')
+invoices = lazy_import('update_invoices_table')
+share_transactions = lazy_import('update_share_transactions_table')
+payroll_transactions = lazy_import('update_payroll_transactions_table')
+reports = lazy_import('reports')
+process_payroll = lazy_import('process_payroll')
+dashboard = lazy_import('dashboard')
+company_profile = lazy_import('company_profile')
+bank_reconciliation = lazy_import('bank_reconciliation')
+compliance = lazy_import('compliance')
+createpayrolltransaction = lazy_import('create_payroll_transaction')
+dynamodb_data_extractor = lazy_import('dynamodb_data_extractor')
+reconcile_transactions = lazy_import('reconcile_transactions')
+reconciled_updater = lazy_import('update_dynamo_reconciled')
 
 app = Flask(__name__)
+
+# Behind the load balancer remote_addr is the proxy. ProxyFix takes the
+# client address from the X-Forwarded-For entries added by this many
+# trusted hops, counted from the right; anything further left was sent
+# by the client and can't be trusted. Set to 0 when serving directly.
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '1'))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
 CORS(app, resources={
     r"/api/*": {
         "origins": ["*"],
@@ -84,6 +95,27 @@ CORS(app, resources={
     }
 })
 
+# Route latency, Odoo/DynamoDB/Anthropic instrumentation and GET /metrics
+# (installed first so rejected requests are timed too)
+metrics.init_app(app)
+
+# LLM_CASSETTE_MODE=record/replay/auto: serve Anthropic calls from local cassettes
+llm_cassettes.install()
+
+# Cap concurrent long-running (LLM / registry) requests per worker
+route_pools.init_app(app)
+
+# Pre-launch the registry validation browsers so onboarding doesn't pay Chrome startup
+if os.getenv('BROWSER_POOL_PREWARM', 'false').lower() == 'true':
+    validatecompany.warm_browser_pool()
+
+# Load every feature module up front instead of on first use
+if lazy_modules.EAGER_IMPORTS:
+    failed_imports = lazy_modules.load_all()
+    if failed_imports:
+        print(f"Warning: Could not import some modules: {', '.join(failed_imports)}")
+    print(f"📦 Imported {len(lazy_modules.import_report()['loaded'])} modules up front")
+
 # Home endpoint with comprehensive API documentation
 
 @app.route('/')
@@ -510,9 +542,12 @@ def get_details_of_company():
     
 @app.route('/api/markAsPaid', methods=['POST'])
 def mark_as_paid():
-    """Mark journal entry as paid"""
+    """Mark journal entry as paid (a list of entries is handled in bulk)"""
     try:
         data = request.json or {}
+        if isinstance(data, list):
+            results = updateAuditStatus.mark_entries_as_paid_bulk(data)
+            return jsonify({"success": all(r.get("success") for r in results), "results": results})
         result = updateAuditStatus.mark_entry_as_paid(data)
         return jsonify(result)
     except Exception as e:
@@ -520,9 +555,12 @@ def mark_as_paid():
     
 @app.route('/api/createSuspenseAccount', methods=['POST'])
 def create_suspense_account():
-    """Create suspense account for unallocated payments"""
+    """Create suspense account for unallocated payments (a list of entries is handled in bulk)"""
     try:
         data = request.json or {}
+        if isinstance(data, list):
+            results = updateAuditStatus.handle_bank_suspense_transactions_bulk(data)
+            return jsonify({"success": all(r.get("success", True) for r in results), "results": results})
         result = updateAuditStatus.handle_bank_suspense_transaction(data)
         return jsonify(result)
     except Exception as e:
@@ -972,25 +1010,8 @@ def update_audit_status():
 
         updates = data if isinstance(data, list) else [data]
 
-        results = []
-        for item in updates:
-            transaction_id = item.get("transaction_id")
-            audit_status = item.get("audit_status")
-
-            if not transaction_id or not audit_status:
-                results.append({
-                    "success": False,
-                    "error": "Missing transaction_id or audit_status",
-                    "data": item
-                })
-                continue
-
-            success, result = updateAuditStatus.update_audit_status_in_odoo(transaction_id, audit_status)
-            results.append({
-                "transaction_id": transaction_id,
-                "audit_status": audit_status,
-                **result
-            })
+        # One connection and one write per target status for the whole list
+        results = updateAuditStatus.update_audit_status_bulk(updates)
 
         return jsonify({
             "success": all(r.get("success") for r in results),
@@ -1032,10 +1053,29 @@ def login():
         username = data['username'].strip()
         password = data['password']
         
+        # Throttle per username and per client IP before spending any bcrypt time
+        retry_after = login_throttle.attempt(username, request.remote_addr)
+        if retry_after:
+            response = make_response(jsonify({
+                "success": False,
+                "error": "Too many login attempts, please try again later"
+            }), 429)
+            response.headers['Retry-After'] = str(int(retry_after) + 1)
+            return response
+        
         # Authenticate user
         result = auth.authenticate_user(username, password)
         
+        if result.get("busy"):
+            response = make_response(jsonify({
+                "success": False,
+                "error": result["error"]
+            }), 503)
+            response.headers['Retry-After'] = '1'
+            return response
+        
         if result["success"]:
+            login_throttle.succeeded(username)
             return jsonify({
                 "success": True,
                 "token": result["token"],
@@ -1725,6 +1765,58 @@ def get_company_documents_endpoint(submission_id):
             "success": False,
             "error": "Failed to retrieve documents"
         }), 500
+
+@app.route("/api/admin/company-template", methods=["POST"])
+@jwt_required
+@admin_required
+def snapshot_company_template_endpoint():
+    """Snapshot a configured reference company into the onboarding template"""
+    try:
+        data = request.get_json() or {}
+        reference_company_id = data.get("reference_company_id")
+        
+        if not reference_company_id:
+            return jsonify({
+                "success": False,
+                "error": "reference_company_id is required"
+            }), 400
+        
+        # Always written to the configured COMPANY_TEMPLATE_PATH
+        result = company_template.snapshot_company(int(reference_company_id))
+        
+        if result["success"]:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 500
+            
+    except Exception as e:
+        print(f"❌ Company template snapshot error: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Failed to snapshot company template"
+        }), 500
+
+@app.route("/api/admin/import-report", methods=["GET"])
+@jwt_required
+@admin_required
+def import_report_endpoint():
+    """Feature modules loaded by this worker, their import times and peak RSS"""
+    return jsonify({
+        "success": True,
+        "pid": os.getpid(),
+        "report": lazy_modules.import_report()
+    }), 200
+
+@app.route("/api/admin/route-pools", methods=["GET"])
+@jwt_required
+@admin_required
+def route_pools_endpoint():
+    """In-flight, queued and rejected requests per route class in this worker"""
+    return jsonify({
+        "success": True,
+        "pid": os.getpid(),
+        "pools": route_pools.stats()
+    }), 200
     
 
     
@@ -4849,7 +4941,11 @@ def matching_workflow_endpoint():
             print(f"❌ Workflow failed: {error_msg}")
             
             # Determine status code based on error type
-            if "validation" in error_msg.lower() or "invalid" in error_msg.lower() or "Missing required field" in error_msg:
+            if result.get("conflict"):
+                status_code = 409  # run_id already used for a different request
+            elif result.get("invalid_request"):
+                status_code = 422  # malformed run_id
+            elif "validation" in error_msg.lower() or "invalid" in error_msg.lower() or "Missing required field" in error_msg:
                 status_code = 422
             else:
                 status_code = 500
@@ -4873,6 +4969,50 @@ def matching_workflow_endpoint():
         }), 500
 
 
+@app.route('/api/matching-workflow/resume', methods=['POST'])
+def matching_workflow_resume_endpoint():
+    """
+    Resume a checkpointed matching run after a crash or timeout.
+    
+    Completed agent calls are answered from the run's checkpoint, so only the
+    remaining batches go to the LLM. A run that already finished returns its
+    stored results.
+    
+    Expected JSON body:
+    {
+        "run_id": "run_20250101120000_0123456789ab"
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        run_id = data.get('run_id')
+        if not run_id:
+            return jsonify({
+                "success": False,
+                "error": "Missing required field: run_id"
+            }), 400
+        
+        print(f"♻️  Resuming matching run {run_id}...")
+        result = matchingworkflow.resume_matching(run_id)
+        
+        if result.get("success"):
+            summary = result.get("summary", {})
+            print(f"✅ Matched: {summary.get('matched', 0)}, Rate: {summary.get('match_rate', '0%')}")
+            return jsonify(result), 200 if result.get("workflow_completed") else 207
+        
+        error_msg = result.get("error") or "Workflow execution failed"
+        print(f"❌ Resume failed: {error_msg}")
+        return jsonify(result), 404 if error_msg.startswith("No checkpoint") else 500
+    
+    except Exception as e:
+        print(f"❌ Resume endpoint error: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "details": str(e)
+        }), 500
+
+
 # ================================
 # RECONCILIATION ENDPOINT
 # ================================
@@ -5119,6 +5259,7 @@ def bad_request(error):
     return jsonify({'success': False, 'error': 'Bad request - check your JSON format'}), 400
 
 if __name__ == '__main__':
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py app:app`
     port = int(os.environ.get('PORT', 8080))
     debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     app.run(host='0.0.0.0', port=port, debug=debug, use_reloader=True)
\ No newline at end of file
@@ -1,12 +1,12 @@
-import boto3
-import bcrypt
+import aws_clients
 import jwt
 import json
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 from decimal import Decimal
 import os
-import createcompany
+import user_cache
+import password_hashing
 
 # JWT Configuration
 JWT_SECRET = os.getenv('JWT_SECRET', 'your-super-secret-jwt-key-change-this-in-production')
@@ -14,7 +14,7 @@ JWT_ALGORITHM = 'HS256'
 JWT_EXPIRY_MINUTES = 30
 
 # DynamoDB setup
-dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')  # Change region as needed
+dynamodb = aws_clients.resource('dynamodb', region_name='eu-north-1')  # Change region as needed
 users_table = dynamodb.Table('users')
 
 def convert_decimal(obj):
@@ -33,14 +33,12 @@ def convert_decimal(obj):
         return obj
 
 def hash_password(password):
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Hash a password using bcrypt (runs in the password process pool)"""
+    return password_hashing.hash_password(password)
 
 def verify_password(password, hashed):
-    """Verify a password against its hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    """Verify a password against its hash (runs in the password process pool)"""
+    return password_hashing.verify_password(password, hashed)
 
 def generate_jwt(user_data):
     """Generate JWT token for authenticated user"""
@@ -107,13 +105,24 @@ def authenticate_user(username, password):
                 "error": "Invalid username or password"
             }
         
-        # Update last login
+        # Pick up profile/status changes made since the last login
+        user_cache.invalidate_user(username)
+        
+        # Update last login, upgrading the hash if the bcrypt cost changed
+        update_expression = 'SET last_login = :timestamp'
+        expression_values = {':timestamp': datetime.utcnow().isoformat()}
+        if password_hashing.needs_rehash(user['password_hash']):
+            try:
+                expression_values[':password_hash'] = hash_password(password)
+                update_expression += ', password_hash = :password_hash'
+                print(f"🔐 Rehashing password for {username} at cost {password_hashing.BCRYPT_ROUNDS}")
+            except password_hashing.PasswordPoolBusy:
+                # Not worth failing the login over; retried on the next one
+                pass
         users_table.update_item(
             Key={'username': username},
-            UpdateExpression='SET last_login = :timestamp',
-            ExpressionAttributeValues={
-                ':timestamp': datetime.utcnow().isoformat()
-            }
+            UpdateExpression=update_expression,
+            ExpressionAttributeValues=expression_values
         )
         
         # Generate JWT
@@ -140,6 +149,13 @@ def authenticate_user(username, password):
             "expires_in": JWT_EXPIRY_MINUTES * 60  # seconds
         }
         
+    except password_hashing.PasswordPoolBusy as e:
+        print(f"Authentication busy: {e}")
+        return {
+            "success": False,
+            "error": "Too many login attempts in progress, please retry",
+            "busy": True
+        }
     except ClientError as e:
         print(f"DynamoDB error: {e}")
         return {
@@ -190,6 +206,7 @@ def create_user_account(user_data):
         
         # Save to DynamoDB
         users_table.put_item(Item=user_item)
+        user_cache.invalidate_user(user_data['username'])
         
         print(f"User account created: {user_data['username']}")
         print(f"  - Company: {user_data['company_name']}")
@@ -0,0 +1,50 @@
+import boto3
+import metrics
+import os
+import threading
+
+# Configuration
+AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
+
+_session = None
+_resources = {}
+_clients = {}
+_lock = threading.Lock()
+
+
+def _session_locked():
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+        metrics.instrument_boto3_session(_session)
+    return _session
+
+
+def get_session():
+    """One boto3 session per process; credentials come from the usual env/instance chain"""
+    with _lock:
+        return _session_locked()
+
+
+def resource(service_name, region_name=None):
+    """
+    Shared boto3 resource for a service/region.
+
+    Building a resource loads the service model from disk, which costs
+    tens of milliseconds and a few MB each time. Modules that used to
+    call boto3.resource at import now share one instance instead.
+    """
+    key = (service_name, region_name or AWS_REGION)
+    with _lock:
+        if key not in _resources:
+            _resources[key] = _session_locked().resource(service_name, region_name=key[1])
+        return _resources[key]
+
+
+def client(service_name, region_name=None):
+    """Shared (thread-safe) boto3 client for a service/region"""
+    key = (service_name, region_name or AWS_REGION)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = _session_locked().client(service_name, region_name=key[1])
+        return _clients[key]
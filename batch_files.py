@@ -0,0 +1,42 @@
+"""
+Helpers for the `files` attribute of batch_processing items.
+
+Batches store their files as a map keyed by file_id so a single file can
+be updated with a targeted `SET files.#fid.status` expression. Older
+batches still hold a list; readers go through files_as_list so both
+layouts look the same to API consumers.
+"""
+
+
+def files_to_map(files_list):
+    """List of file dicts -> {file_id: file} with the upload order preserved"""
+    files_map = {}
+    for position, file_item in enumerate(files_list):
+        files_map[file_item['file_id']] = dict(file_item, position=position)
+    return files_map
+
+
+def files_as_list(files):
+    """Return the files of a batch as a list in upload order, whatever the layout"""
+    if not files:
+        return []
+    if isinstance(files, dict):
+        ordered = sorted(files.values(), key=lambda f: int(f.get('position', 0)))
+        return [{k: v for k, v in f.items() if k != 'position'} for f in ordered]
+    return list(files)
+
+
+def status_counts(files):
+    """Number of files per status"""
+    counts = {}
+    for file_item in files_as_list(files):
+        status = file_item.get('status', 'uploaded')
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def with_files_as_list(batch):
+    """Copy of a batch item with `files` normalised to a list"""
+    if 'files' not in batch:
+        return batch
+    return dict(batch, files=files_as_list(batch['files']))
@@ -1,15 +1,134 @@
-import boto3
+import aws_clients
 from datetime import datetime
 from botocore.exceptions import ClientError
 import os
+import batch_files
+import dashboard_counters
 
 # Configuration from environment variables
 AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
 
 # AWS clients with consistent region configuration
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
 batch_table = dynamodb.Table('batch_processing')
 
+
+MAX_UPDATE_ATTEMPTS = 5
+
+
+def apply_file_update(batch_id, file_id, current_file, file_status_data):
+    """
+    Update one file of a batch in place and adjust the batch counters.
+
+    The write only succeeds if the file still has the status that was
+    read, so concurrent updates to the same file can't be lost; updates to
+    different files never conflict. Raises ClientError with
+    ConditionalCheckFailedException when the file changed in between.
+    Returns the updated attributes.
+    """
+    old_status = current_file.get('status', 'uploaded')
+    new_status = file_status_data.get('status', old_status)
+    
+    set_parts = ['files.#fid.processed_at = :processed_at', 'updated_at = :updated_at']
+    add_parts = []
+    names = {'#fid': file_id}
+    values = {
+        ':processed_at': datetime.utcnow().isoformat(),
+        ':updated_at': datetime.utcnow().isoformat(),
+        ':old_status': old_status
+    }
+    
+    if 'status' in file_status_data:
+        set_parts.append('files.#fid.#status = :new_status')
+        names['#status'] = 'status'
+        values[':new_status'] = new_status
+    
+    if 'document_type' in file_status_data:
+        set_parts.append('files.#fid.document_type = :document_type')
+        values[':document_type'] = file_status_data['document_type']
+    
+    if new_status != old_status:
+        add_parts += ['status_counts.#old_status :minus_one', 'status_counts.#new_status :one']
+        names['#old_status'] = old_status
+        names['#new_status'] = new_status
+        values[':one'] = 1
+        values[':minus_one'] = -1
+        if 'complete' in (old_status, new_status):
+            add_parts.append('completed_documents :completed_delta')
+            values[':completed_delta'] = 1 if new_status == 'complete' else -1
+        if 'error' in (old_status, new_status):
+            add_parts.append('failed_documents :failed_delta')
+            values[':failed_delta'] = 1 if new_status == 'error' else -1
+    
+    update_expression = 'SET ' + ', '.join(set_parts)
+    if add_parts:
+        update_expression += ' ADD ' + ', '.join(add_parts)
+    
+    names.setdefault('#status', 'status')
+    response = batch_table.update_item(
+        Key={'batch_id': batch_id},
+        UpdateExpression=update_expression,
+        ConditionExpression='attribute_exists(files.#fid) AND '
+                            '(files.#fid.#status = :old_status OR attribute_not_exists(files.#fid.#status))',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues='UPDATED_NEW'
+    )
+    return response.get('Attributes', {})
+
+
+def mark_batch_ai_complete(batch_id, current_stage):
+    """Move a fully processed batch to ai_complete unless it is already further along"""
+    try:
+        batch_table.update_item(
+            Key={'batch_id': batch_id},
+            UpdateExpression='SET processing_stage = :stage',
+            ConditionExpression='processing_stage IN (:uploaded, :processing) OR attribute_not_exists(processing_stage)',
+            ExpressionAttributeValues={
+                ':stage': 'ai_complete',
+                ':uploaded': 'uploaded',
+                ':processing': 'processing'
+            }
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        return current_stage
+    return 'ai_complete'
+
+
+def migrate_batch_files(batch_id):
+    """
+    Convert a batch that still stores `files` as a list to the map layout.
+
+    Conditional on the attribute still being a list, so concurrent
+    migrations of the same batch are harmless.
+    """
+    item = batch_table.get_item(Key={'batch_id': batch_id}).get('Item', {})
+    files = item.get('files', [])
+    if isinstance(files, dict) and 'status_counts' in item:
+        return
+    
+    files_list = batch_files.files_as_list(files)
+    counts = batch_files.status_counts(files_list)
+    try:
+        batch_table.update_item(
+            Key={'batch_id': batch_id},
+            UpdateExpression='SET files = :files, status_counts = :counts, completed_documents = :completed, '
+                             'total_documents = if_not_exists(total_documents, :total)',
+            ConditionExpression='attribute_not_exists(status_counts)',
+            ExpressionAttributeValues={
+                ':files': batch_files.files_to_map(files_list),
+                ':counts': counts,
+                ':completed': counts.get('complete', 0),
+                ':total': len(files_list)
+            }
+        )
+        print(f"✅ Migrated batch {batch_id} files to map layout")
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
 def update_batch_status(batch_id, status_data, username=None, company_name=None):
     """Update batch processing status - specifically for n8n workflow updates
     
@@ -33,9 +152,11 @@ def update_batch_status(batch_id, status_data, username=None, company_name=None)
                 "error": "status_data must be a non-empty dictionary"
             }
         
-        # Validate that batch exists and belongs to the correct company/user
+        # Validate that batch exists and belongs to the correct company/user.
+        # Only the attributes needed here are read, not the files
         response = batch_table.get_item(
-            Key={'batch_id': batch_id}
+            Key={'batch_id': batch_id},
+            ProjectionExpression='batch_id, username, company_name, completed_documents, failed_documents'
         )
         
         if 'Item' not in response:
@@ -97,6 +218,12 @@ def update_batch_status(batch_id, status_data, username=None, company_name=None)
             ExpressionAttributeValues=expression_values
         )
         
+        dashboard_counters.record_batch_progress(
+            batch_item,
+            completed_documents=status_data.get('completed_documents'),
+            failed_documents=status_data.get('failed_documents')
+        )
+        
         print(f"✅ Updated batch {batch_id} with status: {status_data.get('processing_stage', 'N/A')}")
         
         return {
@@ -149,101 +276,86 @@ def update_file_status(batch_id, file_id, file_status_data, username=None, compa
                 "error": "file_status_data must be a non-empty dictionary"
             }
         
-        # Get the current batch
-        response = batch_table.get_item(
-            Key={'batch_id': batch_id}
-        )
-        
-        if 'Item' not in response:
-            return {
-                "success": False,
-                "error": "Batch not found"
-            }
-        
-        batch_item = response['Item']
-        
-        # Verify company/user ownership if provided
-        if username and batch_item.get('username') != username:
+        for attempt in range(MAX_UPDATE_ATTEMPTS):
+            # Read only the target file and the batch counters
+            response = batch_table.get_item(
+                Key={'batch_id': batch_id},
+                ProjectionExpression='batch_id, username, company_name, created_at, processing_stage, '
+                                     'total_documents, completed_documents, failed_documents, status_counts, files.#fid',
+                ExpressionAttributeNames={'#fid': file_id}
+            )
+            
+            if 'Item' not in response:
+                return {
+                    "success": False,
+                    "error": "Batch not found"
+                }
+            
+            batch_item = response['Item']
+            
+            # Verify company/user ownership if provided
+            if username and batch_item.get('username') != username:
+                return {
+                    "success": False,
+                    "error": "Batch does not belong to this user"
+                }
+            
+            if company_name and batch_item.get('company_name') != company_name:
+                return {
+                    "success": False,
+                    "error": "Batch does not belong to this company"
+                }
+            
+            files = batch_item.get('files')
+            if 'status_counts' not in batch_item or not isinstance(files, dict):
+                # Batch written before files were keyed by file_id (the
+                # projection returns no map then); convert it once and retry
+                migrate_batch_files(batch_id)
+                continue
+            
+            current_file = files.get(file_id)
+            if current_file is None:
+                return {
+                    "success": False,
+                    "error": f"File with file_id {file_id} not found in batch"
+                }
+            
+            try:
+                updated = apply_file_update(batch_id, file_id, current_file, file_status_data)
+                break
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+                # Another writer changed this file first - re-read and re-apply
+                print(f"⚠️  Concurrent update on file {file_id} in batch {batch_id}, retrying")
+        else:
             return {
                 "success": False,
-                "error": "Batch does not belong to this user"
-            }
-        
-        if company_name and batch_item.get('company_name') != company_name:
-            return {
-                "success": False,
-                "error": "Batch does not belong to this company"
+                "error": "File update conflicted with concurrent updates, please retry"
             }
-        files_list = batch_item.get('files', [])
         
-        # Find the file to update
-        file_found = False
-        updated_files = []
-        
-        for file_item in files_list:
-            if file_item.get('file_id') == file_id:
-                file_found = True
-                # Update the file with new status data
-                updated_file = dict(file_item)  # Create a copy
-                
-                # Update allowed fields
-                if 'status' in file_status_data:
-                    updated_file['status'] = file_status_data['status']
-                
-                if 'document_type' in file_status_data:
-                    updated_file['document_type'] = file_status_data['document_type']
-                
-                # Add processing timestamp for this file
-                updated_file['processed_at'] = datetime.utcnow().isoformat()
-                
-                updated_files.append(updated_file)
-            else:
-                updated_files.append(file_item)
-        
-        if not file_found:
-            return {
-                "success": False,
-                "error": f"File with file_id {file_id} not found in batch"
-            }
-        
-        # Calculate progress based on file statuses
-        completed_files = len([f for f in updated_files if f.get('status') == 'complete'])
-        pending_files = len([f for f in updated_files if f.get('status') == 'pending'])
-        
-        # Determine batch processing stage based on file statuses
-        batch_stage = batch_item.get('processing_stage', 'uploaded')
+        total_files = int(batch_item.get('total_documents', 0))
+        completed_files = int(updated.get('completed_documents', batch_item.get('completed_documents', 0)))
+        counts = dict(batch_item.get('status_counts', {}), **updated.get('status_counts', {}))
+        pending_files = int(counts.get('pending', 0))
         
         # If all files are complete, mark batch as ready for next stage
-        if completed_files == len(updated_files):
-            # You can customize this logic based on your workflow
-            if batch_stage in ['uploaded', 'processing', 'ai_complete']:
-                batch_stage = 'ai_complete'  # Files processed, ready for data extraction
-        
-        # Update the batch with new files list and progress
-        update_expression = '''
-            SET files = :files, 
-                completed_documents = :completed, 
-                updated_at = :updated_at,
-                processing_stage = :stage
-        '''
-        
-        expression_values = {
-            ':files': updated_files,
-            ':completed': completed_files,
-            ':updated_at': datetime.utcnow().isoformat(),
-            ':stage': batch_stage
-        }
-        
-        batch_table.update_item(
-            Key={'batch_id': batch_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values
+        batch_stage = batch_item.get('processing_stage', 'uploaded')
+        if total_files and completed_files == total_files and batch_stage in ['uploaded', 'processing', 'ai_complete']:
+            batch_stage = mark_batch_ai_complete(batch_id, batch_stage)
+        
+        updated_file = dict(current_file, **updated.get('files', {}).get(file_id, {}))
+        dashboard_counters.record_file_transition(
+            batch_item,
+            current_file.get('status', 'uploaded'),
+            file_status_data.get('status', current_file.get('status', 'uploaded')),
+            recent_updates=[dashboard_counters.document_entry(dict(batch_item, processing_stage=batch_stage), updated_file)]
         )
         
         print(f"✅ Updated file {file_id} in batch {batch_id}")
         print(f"   Status: {file_status_data.get('status', 'N/A')}")
         print(f"   Document Type: {file_status_data.get('document_type', 'N/A')}")
-        print(f"   Batch Progress: {completed_files}/{len(updated_files)} files completed")
+        print(f"   Batch Progress: {completed_files}/{total_files} files completed")
         
         return {
             "success": True,
@@ -253,7 +365,7 @@ def update_file_status(batch_id, file_id, file_status_data, username=None, compa
             "updated_fields": list(file_status_data.keys()),
             "batch_progress": {
                 "completed_files": completed_files,
-                "total_files": len(updated_files),
+                "total_files": total_files,
                 "pending_files": pending_files
             }
         }
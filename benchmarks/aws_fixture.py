@@ -0,0 +1,54 @@
+"""
+Local DynamoDB for the benchmarks (moto, `pip install -r benchmarks/requirements.txt`).
+
+mock_dynamodb() must be entered before any feature module is imported:
+the modules create their tables through aws_clients at import time, and
+they have to bind to the mock rather than to real AWS.
+"""
+import contextlib
+import os
+
+AWS_REGION = 'eu-north-1'
+
+# table name -> partition key, for every table the benchmarked modules touch
+TABLES = {
+    'users': 'username',
+    'transactions': 'transaction_id',
+    'bills': 'bill_id',
+    'invoices': 'invoice_id',
+    'payroll_transactions': 'payroll_transaction_id',
+    'share_transactions': 'share_transaction_id',
+}
+
+
+@contextlib.contextmanager
+def mock_dynamodb(company_name):
+    """Mocked AWS with the app's tables created and one company user seeded"""
+    from moto import mock_aws
+
+    for name, value in [('AWS_ACCESS_KEY_ID', 'bench'), ('AWS_SECRET_ACCESS_KEY', 'bench'),
+                        ('AWS_SESSION_TOKEN', 'bench'), ('AWS_REGION', AWS_REGION),
+                        ('AWS_DEFAULT_REGION', AWS_REGION)]:
+        os.environ[name] = value
+
+    with mock_aws():
+        import aws_clients
+
+        dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
+        for table_name, key in TABLES.items():
+            dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+        dynamodb.Table('users').put_item(Item={
+            'username': 'bench',
+            'company_name': company_name,
+            'is_vat_registered': 'yes',
+            'primary_industry': 'Professional services',
+            'business_description': 'Consulting',
+            'banking_information': {'primary_bank': 'Bench Bank', 'primary_currency': 'EUR'},
+            'payroll_information': {'num_employees': 5, 'payroll_frequency': 'monthly'}
+        })
+        yield dynamodb
@@ -0,0 +1,233 @@
+"""
+Deterministic stand-in for the Anthropic Messages API.
+
+FakeAnthropic serves POST /v1/messages on a local port. Point the SDK at
+it with ANTHROPIC_BASE_URL and the real client, retries and metrics
+wrapping all run as in production. Only the model is replaced.
+
+Replies are computed from the request, so the same input always gets
+the same answer:
+
+- The matching agents (recognised from the "You are the ... Agent"
+  line of the system prompt) pair each transaction with the first
+  candidate document of the same amount, and report everything else
+  unmatched.
+- Validation and confidence scoring approve whatever they are sent.
+- Any other caller gets an empty JSON object.
+
+When the request forces a tool (structured output), the reply comes back
+as that tool's input. Otherwise it is a fenced JSON text block.
+
+Latency is `latency` seconds per call plus `per_output_token` seconds
+for each output token. Token usage is estimated at 4 characters per
+token.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AGENT_PATTERN = re.compile(r'You are the ([A-Za-z ]+?) Agent')
+
+
+def _json_payloads(text):
+    """Every top-level JSON array/object embedded in a prompt, in order"""
+    decoder = json.JSONDecoder()
+    payloads = []
+    index = 0
+    while index < len(text):
+        if text[index] in '[{' and (index == 0 or text[index - 1] == '\n'):
+            try:
+                value, end = decoder.raw_decode(text, index)
+                payloads.append(value)
+                index = end
+                continue
+            except json.JSONDecodeError:
+                pass
+        index += 1
+    return payloads
+
+
+def _amount(value):
+    try:
+        return round(abs(float(value)), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def _match_by_amount(batch, match_type):
+    matched = []
+    unmatched = []
+    used = set()
+    for item in batch:
+        transaction = item.get('transaction', {})
+        transaction_id = str(transaction.get('transaction_id'))
+        wanted = _amount(transaction.get('amount'))
+        found = None
+        for doc_type, docs in (item.get('candidates') or {}).items():
+            for doc in docs:
+                if doc.get('id') and doc['id'] not in used and _amount(doc.get('amount')) == wanted:
+                    found = (doc_type, doc)
+                    break
+            if found:
+                break
+        if found is None:
+            unmatched.append(transaction_id)
+            continue
+        doc_type, doc = found
+        used.add(doc['id'])
+        matched.append({
+            'transaction_id': transaction_id,
+            'document_id': doc['id'],
+            'document_type': doc_type.rstrip('s') if doc_type.endswith('s') else doc_type,
+            'match_type': match_type,
+            'confidence': 'HIGH',
+            'match_details': {'reasoning': 'Same amount'}
+        })
+    return {'matched': matched, 'unmatched_transaction_ids': unmatched}
+
+
+def agent_reply(agent, user_message):
+    """The JSON object a well-behaved agent would return for this prompt"""
+    payloads = _json_payloads(user_message)
+    first = payloads[0] if payloads else []
+
+    if agent == 'Duplicate Detection':
+        return {'duplicate_pairs': [],
+                'non_duplicate_transaction_ids': [str(t.get('transaction_id')) for t in first]}
+    if agent in ('Exact Match', 'Partner Resolution', 'Suspense Resolution'):
+        match_type = {'Exact Match': 'exact', 'Partner Resolution': 'fuzzy'}.get(agent, 'suspense_single')
+        return _match_by_amount(first, match_type)
+    if agent == 'Combination Match':
+        return {'matched': [],
+                'unmatched_transaction_ids': [str(i.get('transaction', {}).get('transaction_id')) for i in first]}
+    if agent == 'Context Analysis':
+        return {'context_analysis': [{'transaction_id': str(t.get('transaction_id')), 'date_range_days': 60}
+                                     for t in first]}
+    if agent == 'Validation':
+        return {'validated_matches': first, 'rejected_matches': []}
+    if agent == 'Confidence Scoring':
+        scored = []
+        for match in first:
+            entry = {'confidence_level': 'HIGH', 'confidence_score': 95.0, 'recommendation': 'AUTO_RECONCILE'}
+            for key in ('transaction_id', 'transaction_ids'):
+                if key in match:
+                    entry[key] = match[key]
+            scored.append(entry)
+        return {'scored_matches': scored}
+    return {}
+
+
+def _system_text(system):
+    if isinstance(system, list):
+        return '\n'.join(block.get('text', '') for block in system if isinstance(block, dict))
+    return system or ''
+
+
+def _user_text(messages):
+    parts = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content or [] if isinstance(block, dict))
+    return '\n'.join(parts)
+
+
+class FakeAnthropic:
+    """Serve deterministic /v1/messages replies; use as a context manager or start()/stop()"""
+
+    def __init__(self, latency=0.0, per_output_token=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.per_output_token = per_output_token
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._counter = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not self.path.startswith('/v1/messages'):
+                    self._send(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+                    return
+                self._send(200, fake.reply(body))
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def reply(self, body):
+        system = _system_text(body.get('system'))
+        user = _user_text(body.get('messages', []))
+        match = AGENT_PATTERN.search(system)
+        agent = match.group(1) if match else 'other'
+
+        reply = agent_reply(agent, user)
+        text = json.dumps(reply)
+        tool_choice = body.get('tool_choice') or {}
+        if tool_choice.get('type') == 'tool':
+            content = [{'type': 'tool_use', 'id': 'toolu_bench', 'name': tool_choice['name'], 'input': reply}]
+            stop_reason = 'tool_use'
+        else:
+            text = '```json\n' + text + '\n```'
+            content = [{'type': 'text', 'text': text}]
+            stop_reason = 'end_turn'
+        input_tokens = (len(system) + len(user)) // 4
+        output_tokens = max(1, len(text) // 4)
+        time.sleep(self.latency + self.per_output_token * output_tokens)
+
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+            self.calls[agent] = self.calls.get(agent, 0) + 1
+        return {
+            'id': f'msg_bench_{counter:06d}',
+            'type': 'message',
+            'role': 'assistant',
+            'model': body.get('model', 'unknown'),
+            'content': content,
+            'stop_reason': stop_reason,
+            'stop_sequence': None,
+            'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens}
+        }
+
+    def reset_calls(self):
+        with self._lock:
+            calls, self.calls = self.calls, {}
+        return calls
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-anthropic', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,656 @@
+"""
+In-memory Odoo served over XML-RPC for the benchmarks.
+
+build_ledger(size) generates a deterministic company ledger: a chart of
+accounts, journals, taxes, partners, `size` posted vendor bills and
+customer invoices, and bank entries paying most of them. OdooStub serves
+it on /xmlrpc/2/common and /xmlrpc/2/object with enough of the ORM
+(domains, search_read, read, create/write with x2many commands,
+action_post, reconcile) for the report, bill and reconciliation code to
+run unchanged against it.
+
+Every execute_kw is counted per model/method so a scenario can report
+how many round trips it made, and `latency` adds a fixed delay per call
+to stand in for the network.
+"""
+import random
+import threading
+import time
+from datetime import date, timedelta
+from socketserver import ThreadingMixIn
+from xmlrpc.server import MultiPathXMLRPCServer, SimpleXMLRPCDispatcher, SimpleXMLRPCRequestHandler
+
+COMPANY_ID = 1
+COMPANY_NAME = 'Bench Holdings Ltd'
+UID = 2
+
+# field -> comodel for many2one fields, per model
+MANY2ONE = {
+    'res.company': {'currency_id': 'res.currency', 'country_id': 'res.country'},
+    'res.users': {'company_id': 'res.company'},
+    'res.partner': {'company_id': 'res.company'},
+    'account.account': {},
+    'account.journal': {'company_id': 'res.company', 'default_account_id': 'account.account'},
+    'account.tax': {'company_id': 'res.company'},
+    'account.account.tag': {},
+    'account.move': {'partner_id': 'res.partner', 'journal_id': 'account.journal',
+                     'company_id': 'res.company', 'currency_id': 'res.currency'},
+    'account.move.line': {'move_id': 'account.move', 'account_id': 'account.account',
+                          'partner_id': 'res.partner', 'journal_id': 'account.journal',
+                          'company_id': 'res.company', 'tax_line_id': 'account.tax',
+                          'product_id': 'product.product', 'currency_id': 'res.currency',
+                          'full_reconcile_id': 'account.full.reconcile'},
+    'account.payment': {'partner_id': 'res.partner', 'journal_id': 'account.journal',
+                        'company_id': 'res.company', 'move_id': 'account.move'},
+}
+X2MANY = {
+    'account.account': {'company_ids': 'res.company', 'tag_ids': 'account.account.tag'},
+    'account.move': {'line_ids': 'account.move.line', 'invoice_line_ids': 'account.move.line'},
+    'account.move.line': {'tax_ids': 'account.tax', 'tax_tag_ids': 'account.account.tag'},
+}
+
+ACCOUNTS = [
+    ('1000', 'Bank', 'asset_cash'),
+    ('1010', 'Cash', 'asset_cash'),
+    ('1100', 'Accounts Receivable', 'asset_receivable'),
+    ('1200', 'Prepayments', 'asset_prepayments'),
+    ('1500', 'Office Equipment', 'asset_fixed'),
+    ('1999', 'Bank Suspense Account', 'asset_current'),
+    ('2000', 'Accounts Payable', 'liability_payable'),
+    ('2100', 'VAT Payable', 'liability_current'),
+    ('2200', 'VAT Receivable', 'asset_current'),
+    ('2300', 'Credit Card', 'liability_credit_card'),
+    ('3000', 'Share Capital', 'equity'),
+    ('3100', 'Retained Earnings', 'equity_unaffected'),
+    ('4000', 'Sales', 'income'),
+    ('4100', 'Consulting Income', 'income'),
+    ('4900', 'Other Income', 'income_other'),
+    ('5000', 'Cost of Sales', 'expense_direct_cost'),
+    ('6000', 'Rent', 'expense'),
+    ('6100', 'Utilities', 'expense'),
+    ('6200', 'Consultancy Fees', 'expense'),
+    ('6300', 'Software Subscriptions', 'expense'),
+    ('6400', 'Travel', 'expense'),
+    ('6500', 'Office Supplies', 'expense'),
+    ('6600', 'Bank Charges', 'expense'),
+    ('6900', 'Depreciation', 'expense_depreciation'),
+]
+EXPENSE_CODES = ['5000', '6000', '6100', '6200', '6300', '6400', '6500']
+INCOME_CODES = ['4000', '4100']
+
+
+class OdooFault(Exception):
+    pass
+
+
+# =============================================================================
+# Ledger
+# =============================================================================
+
+class Ledger:
+    def __init__(self):
+        self.records = {}
+        self._next_id = {}
+        self.lock = threading.RLock()
+
+    def table(self, model):
+        return self.records.setdefault(model, {})
+
+    def insert(self, model, values):
+        record_id = self._next_id.get(model, 1)
+        self._next_id[model] = record_id + 1
+        record = dict(values, id=record_id)
+        self.table(model)[record_id] = record
+        return record_id
+
+    def get(self, model, record_id):
+        return self.table(model).get(record_id)
+
+    def display_name(self, model, record_id):
+        record = self.get(model, record_id)
+        if record is None:
+            return str(record_id)
+        if model == 'account.account':
+            return f"{record.get('code')} {record.get('name')}"
+        return record.get('name') or f'{model},{record_id}'
+
+    # -- account.move helpers ------------------------------------------------
+
+    def add_move(self, values, lines):
+        move_id = self.insert('account.move', dict(values, line_ids=[]))
+        for line in lines:
+            self.add_line(move_id, line)
+        self.recompute_move(move_id)
+        return move_id
+
+    def add_line(self, move_id, values):
+        move = self.get('account.move', move_id)
+        line = {
+            'name': False, 'debit': 0.0, 'credit': 0.0, 'quantity': 1.0, 'price_unit': 0.0,
+            'tax_ids': [], 'tax_tag_ids': [], 'tax_line_id': False, 'reconciled': False,
+            'full_reconcile_id': False, 'display_type': 'product', 'product_id': False,
+            'partner_id': move.get('partner_id', False), 'date_maturity': move.get('invoice_date_due', False),
+        }
+        line.update(values)
+        line.update(move_id=move_id, date=move['date'], journal_id=move.get('journal_id', False),
+                    company_id=move['company_id'], parent_state=move['state'],
+                    currency_id=move.get('currency_id', 1))
+        line['balance'] = round(line['debit'] - line['credit'], 2)
+        line['amount_residual'] = line['balance']
+        line_id = self.insert('account.move.line', line)
+        move['line_ids'].append(line_id)
+        return line_id
+
+    def recompute_move(self, move_id):
+        move = self.get('account.move', move_id)
+        lines = [self.get('account.move.line', line_id) for line_id in move['line_ids']]
+        for line in lines:
+            line['balance'] = round(line['debit'] - line['credit'], 2)
+            line['parent_state'] = move['state']
+            line['date'] = move['date']
+        move['invoice_line_ids'] = [line['id'] for line in lines if line['display_type'] == 'product']
+        untaxed = sum(abs(line['balance']) for line in lines if line['display_type'] == 'product')
+        tax = sum(abs(line['balance']) for line in lines if line['display_type'] == 'tax')
+        move['amount_untaxed'] = round(untaxed, 2)
+        move['amount_tax'] = round(tax, 2)
+        move['amount_total'] = round(untaxed + tax, 2)
+        if 'amount_residual' not in move or move.get('payment_state') == 'not_paid':
+            move['amount_residual'] = move['amount_total']
+
+
+def _account_ids(ledger):
+    return {record['code']: record_id for record_id, record in ledger.table('account.account').items()}
+
+
+def build_ledger(size=200, seed=7, today=None):
+    """Deterministic ledger with `size` bills and `size` invoices, most of them paid"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    ledger = Ledger()
+
+    ledger.insert('res.currency', {'name': 'EUR'})
+    ledger.insert('res.country', {'name': 'Ireland'})
+    ledger.insert('res.company', {'name': COMPANY_NAME, 'currency_id': 1, 'country_id': 1,
+                                  'email': 'accounts@bench.example', 'phone': '+353 1 000 0000',
+                                  'website': 'https://bench.example'})
+    ledger.insert('res.users', {'name': 'Bench API', 'login': 'bench', 'company_id': COMPANY_ID})
+    ledger.insert('res.users', {'name': 'Bench API', 'login': 'bench', 'company_id': COMPANY_ID})
+
+    for code, name, account_type in ACCOUNTS:
+        ledger.insert('account.account', {'code': code, 'name': name, 'account_type': account_type,
+                                          'company_ids': [COMPANY_ID], 'active': True,
+                                          'reconcile': account_type in ('asset_receivable', 'liability_payable'),
+                                          'deprecated': False, 'tag_ids': []})
+    accounts = _account_ids(ledger)
+
+    journals = {}
+    for code, name, journal_type, account in [('BNK1', 'Bank', 'bank', '1000'), ('BILL', 'Vendor Bills', 'purchase', '6200'),
+                                              ('INV', 'Customer Invoices', 'sale', '4000'), ('MISC', 'Miscellaneous', 'general', '3000')]:
+        journals[journal_type] = ledger.insert('account.journal', {
+            'name': name, 'code': code, 'type': journal_type,
+            'company_id': COMPANY_ID, 'default_account_id': accounts[account]})
+
+    taxes = {}
+    for name, amount, type_tax_use in [('23% Purchase', 23.0, 'purchase'), ('13.5% Purchase', 13.5, 'purchase'),
+                                       ('0% Purchase', 0.0, 'purchase'), ('23% Sales', 23.0, 'sale')]:
+        taxes[name] = ledger.insert('account.tax', {'name': name, 'amount': amount, 'amount_type': 'percent',
+                                                    'type_tax_use': type_tax_use, 'company_id': COMPANY_ID,
+                                                    'active': True})
+    for name in ['+T1', '-T2', '+ES1', 'T4']:
+        ledger.insert('account.account.tag', {'name': name, 'applicability': 'taxes', 'country_id': 1})
+
+    vendor_count = max(5, size // 10)
+    vendors = [ledger.insert('res.partner', {'name': f'Vendor {i:04d} Ltd', 'supplier_rank': 1, 'customer_rank': 0,
+                                             'company_id': COMPANY_ID, 'email': f'ap{i}@vendor.example',
+                                             'active': True})
+               for i in range(vendor_count)]
+    customers = [ledger.insert('res.partner', {'name': f'Customer {i:04d} GmbH', 'supplier_rank': 0, 'customer_rank': 1,
+                                               'company_id': COMPANY_ID, 'email': f'ar{i}@customer.example',
+                                               'active': True})
+                 for i in range(vendor_count)]
+
+    def document(move_type, index):
+        partners, journal, codes, prefix = (
+            (vendors, journals['purchase'], EXPENSE_CODES, 'BILL') if move_type == 'in_invoice'
+            else (customers, journals['sale'], INCOME_CODES, 'INV')
+        )
+        invoice_date = today - timedelta(days=rng.randint(1, 360))
+        untaxed = round(rng.uniform(40, 4000), 2)
+        tax = round(untaxed * 0.23, 2)
+        total = round(untaxed + tax, 2)
+        partner_id = rng.choice(partners)
+        values = {
+            'name': f'{prefix}/{invoice_date.year}/{index:05d}', 'move_type': move_type, 'state': 'posted',
+            'date': invoice_date.isoformat(), 'invoice_date': invoice_date.isoformat(),
+            'invoice_date_due': (invoice_date + timedelta(days=30)).isoformat(),
+            'partner_id': partner_id, 'journal_id': journal, 'company_id': COMPANY_ID, 'currency_id': 1,
+            'ref': f'{prefix[0]}REF-{index:05d}', 'payment_reference': f'{prefix}-{index:05d}',
+            'payment_state': 'not_paid', 'narration': False, 'write_date': f'{invoice_date.isoformat()} 09:00:00',
+        }
+        expense = accounts[rng.choice(codes)]
+        if move_type == 'in_invoice':
+            lines = [
+                {'name': 'Services', 'account_id': expense, 'debit': untaxed, 'quantity': 1.0, 'price_unit': untaxed,
+                 'price_subtotal': untaxed, 'price_total': total, 'tax_ids': [taxes['23% Purchase']]},
+                {'name': '23% Purchase', 'account_id': accounts['2200'], 'debit': tax, 'display_type': 'tax',
+                 'tax_line_id': taxes['23% Purchase']},
+                {'name': values['ref'], 'account_id': accounts['2000'], 'credit': total, 'display_type': 'payment_term'},
+            ]
+        else:
+            lines = [
+                {'name': 'Consulting', 'account_id': expense, 'credit': untaxed, 'quantity': 1.0, 'price_unit': untaxed,
+                 'price_subtotal': untaxed, 'price_total': total, 'tax_ids': [taxes['23% Sales']]},
+                {'name': '23% Sales', 'account_id': accounts['2100'], 'credit': tax, 'display_type': 'tax',
+                 'tax_line_id': taxes['23% Sales']},
+                {'name': values['ref'], 'account_id': accounts['1100'], 'debit': total, 'display_type': 'payment_term'},
+            ]
+        return ledger.add_move(values, lines)
+
+    bills = [document('in_invoice', i) for i in range(size)]
+    invoices = [document('out_invoice', i) for i in range(size)]
+
+    # Bank entries settle ~70% of documents a few days after they are issued
+    for index, move_id in enumerate(bills + invoices):
+        if rng.random() > 0.7:
+            continue
+        move = ledger.get('account.move', move_id)
+        paid_on = min(today, date.fromisoformat(move['invoice_date']) + timedelta(days=rng.randint(1, 20)))
+        amount = move['amount_total']
+        is_bill = move['move_type'] == 'in_invoice'
+        counterpart = accounts['2000'] if is_bill else accounts['1100']
+        ledger.add_move({
+            'name': f'BNK1/{paid_on.year}/{index:05d}', 'move_type': 'entry', 'state': 'posted',
+            'date': paid_on.isoformat(), 'partner_id': move['partner_id'], 'journal_id': journals['bank'],
+            'company_id': COMPANY_ID, 'currency_id': 1, 'ref': move['ref'], 'payment_state': False,
+            'write_date': f'{paid_on.isoformat()} 09:00:00',
+        }, [
+            {'name': move['ref'], 'account_id': accounts['1000'], 'credit' if is_bill else 'debit': amount},
+            {'name': move['ref'], 'account_id': counterpart, 'debit' if is_bill else 'credit': amount},
+        ])
+
+    ledger.bills = bills
+    ledger.invoices = invoices
+    ledger.journals = journals
+    ledger.accounts = accounts
+    return ledger
+
+
+# =============================================================================
+# ORM
+# =============================================================================
+
+def _field_value(ledger, model, record, path):
+    """Value of a (possibly dotted) field, many2one as a bare id"""
+    head, _, rest = path.partition('.')
+    value = record.get(head, False)
+    if head == 'display_name':
+        value = ledger.display_name(model, record['id'])
+    if not rest:
+        return value
+    comodel = MANY2ONE.get(model, {}).get(head)
+    target = ledger.get(comodel, value) if comodel and value else None
+    return _field_value(ledger, comodel, target, rest) if target else False
+
+
+def _compare(value, operator, operand):
+    if isinstance(value, list):
+        if operator in ('in', '='):
+            wanted = operand if isinstance(operand, (list, tuple)) else [operand]
+            return bool(set(value) & set(wanted))
+        if operator in ('not in', '!='):
+            wanted = operand if isinstance(operand, (list, tuple)) else [operand]
+            return not set(value) & set(wanted)
+    if operator == '=':
+        return value == operand or (operand is False and not value)
+    if operator == '!=':
+        return not (value == operand or (operand is False and not value))
+    if operator in ('in', 'child_of'):
+        return value in (operand if isinstance(operand, (list, tuple)) else [operand])
+    if operator == 'not in':
+        return value not in operand
+    if operator in ('ilike', 'like', '=ilike', '=like', 'not ilike'):
+        text = str(value or '')
+        pattern = str(operand or '')
+        if operator.startswith('=') or operator == 'ilike' or operator == 'not ilike':
+            text, pattern = text.lower(), pattern.lower()
+        if operator.startswith('='):
+            matched = text == pattern.replace('%', '')
+        else:
+            matched = pattern.replace('%', '') in text
+        return not matched if operator == 'not ilike' else matched
+    if value is False or value is None:
+        return False
+    if operator == '<':
+        return value < operand
+    if operator == '<=':
+        return value <= operand
+    if operator == '>':
+        return value > operand
+    if operator == '>=':
+        return value >= operand
+    raise OdooFault(f'Unsupported domain operator {operator!r}')
+
+
+def _evaluate(ledger, model, record, domain):
+    """Evaluate a prefix-notation domain against one record"""
+    def term(index):
+        item = domain[index]
+        if item == '!':
+            value, index = term(index + 1)
+            return not value, index
+        if item in ('&', '|'):
+            left, index = term(index + 1)
+            right, index = term(index)
+            return (left and right) if item == '&' else (left or right), index
+        if item in (True, 1):
+            return True, index + 1
+        field, operator, operand = item
+        return _compare(_field_value(ledger, model, record, field), operator, operand), index + 1
+
+    index = 0
+    while index < len(domain):
+        value, index = term(index)
+        if not value:
+            return False
+    return True
+
+
+def _sort(ledger, model, records, order):
+    for part in reversed([p.strip() for p in (order or 'id').split(',') if p.strip()]):
+        field, _, direction = part.partition(' ')
+        records.sort(key=lambda r: (_field_value(ledger, model, r, field) is False,
+                                    _field_value(ledger, model, r, field) or 0),
+                     reverse=direction.strip().lower() == 'desc')
+    return records
+
+
+def _export(ledger, model, record, fields):
+    fields = fields or [name for name in record if name != 'id']
+    result = {'id': record['id']}
+    for name in fields:
+        value = record.get(name, False)
+        comodel = MANY2ONE.get(model, {}).get(name)
+        if name == 'display_name':
+            value = ledger.display_name(model, record['id'])
+        elif comodel:
+            value = [value, ledger.display_name(comodel, value)] if value else False
+        elif value is None:
+            value = False
+        result[name] = value
+    return result
+
+
+class ORM:
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def _ids(self, ids):
+        if isinstance(ids, int):
+            return [ids]
+        return [i for i in ids if isinstance(i, int)]
+
+    def search(self, model, domain, offset=0, limit=None, order=None, count=False):
+        records = [r for r in self.ledger.table(model).values() if _evaluate(self.ledger, model, r, domain)]
+        if count:
+            return len(records)
+        records = _sort(self.ledger, model, records, order)[offset or 0:]
+        if limit:
+            records = records[:limit]
+        return records
+
+    def search_read(self, model, domain=(), fields=None, offset=0, limit=None, order=None):
+        return [_export(self.ledger, model, r, fields)
+                for r in self.search(model, list(domain), offset, limit, order)]
+
+    def read(self, model, ids, fields=None):
+        table = self.ledger.table(model)
+        return [_export(self.ledger, model, table[i], fields) for i in self._ids(ids) if i in table]
+
+    def _apply_x2many(self, model, record_id, field, commands):
+        comodel = X2MANY[model][field]
+        if model == 'account.move':
+            for command in commands:
+                if command[0] == 0:
+                    self._create_move_line(record_id, command[2])
+                elif command[0] == 1:
+                    self.write('account.move.line', [command[1]], command[2])
+            self.ledger.recompute_move(record_id)
+            return
+        record = self.ledger.get(model, record_id)
+        ids = list(record.get(field) or [])
+        for command in commands:
+            if command[0] == 6:
+                ids = list(command[2])
+            elif command[0] == 4:
+                ids.append(command[1])
+            elif command[0] == 3:
+                ids = [i for i in ids if i != command[1]]
+            elif command[0] == 5:
+                ids = []
+            elif command[0] == 0:
+                ids.append(self.ledger.insert(comodel, command[2]))
+        record[field] = ids
+
+    def _create_move_line(self, move_id, values):
+        move = self.ledger.get('account.move', move_id)
+        values = dict(values)
+        x2many = {k: values.pop(k) for k in list(values) if k in X2MANY['account.move.line']}
+        if 'debit' not in values and 'credit' not in values:
+            amount = round(float(values.get('quantity', 1.0)) * float(values.get('price_unit', 0.0)), 2)
+            values['debit' if move.get('move_type') in ('in_invoice', 'out_refund') else 'credit'] = amount
+            values.setdefault('price_subtotal', amount)
+            values.setdefault('price_total', amount)
+        line_id = self.ledger.add_line(move_id, values)
+        for field, commands in x2many.items():
+            self._apply_x2many('account.move.line', line_id, field, commands)
+        return line_id
+
+    def _balance_invoice(self, move_id):
+        """Add the payable/receivable line Odoo computes for invoices"""
+        move = self.ledger.get('account.move', move_id)
+        if move.get('move_type') not in ('in_invoice', 'out_invoice', 'in_refund', 'out_refund'):
+            return
+        lines = [self.ledger.get('account.move.line', i) for i in move['line_ids']]
+        lines = [line for line in lines if line['display_type'] != 'payment_term']
+        total = round(sum(line['debit'] - line['credit'] for line in lines), 2)
+        move['line_ids'] = [line['id'] for line in lines]
+        code = '2000' if move['move_type'] in ('in_invoice', 'in_refund') else '1100'
+        account_id = next(i for i, a in self.ledger.table('account.account').items() if a['code'] == code)
+        self.ledger.add_line(move_id, {'name': move.get('ref') or move.get('name') or '/', 'account_id': account_id,
+                                       'display_type': 'payment_term',
+                                       'credit' if total > 0 else 'debit': abs(total)})
+        self.ledger.recompute_move(move_id)
+
+    def create(self, model, values):
+        if isinstance(values, list):
+            return [self.create(model, v) for v in values]
+        values = dict(values)
+        x2many = {k: values.pop(k) for k in list(values) if k in X2MANY.get(model, {})}
+        if model == 'account.move':
+            move_date = values.get('date') or values.get('invoice_date') or date.today().isoformat()
+            values.setdefault('date', move_date)
+            values.setdefault('state', 'draft')
+            values.setdefault('company_id', COMPANY_ID)
+            values.setdefault('name', '/')
+            values.setdefault('payment_state', 'not_paid')
+            values.setdefault('write_date', f'{date.today().isoformat()} 00:00:00')
+            record_id = self.ledger.add_move(values, [])
+        else:
+            record_id = self.ledger.insert(model, values)
+        for field, commands in x2many.items():
+            self._apply_x2many(model, record_id, field, commands)
+        if model == 'account.move':
+            self._balance_invoice(record_id)
+        return record_id
+
+    def write(self, model, ids, values):
+        values = dict(values)
+        x2many = {k: values.pop(k) for k in list(values) if k in X2MANY.get(model, {})}
+        for record_id in self._ids(ids):
+            record = self.ledger.get(model, record_id)
+            if record is None:
+                raise OdooFault(f'Record {model}({record_id}) does not exist')
+            record.update(values)
+            for field, commands in x2many.items():
+                self._apply_x2many(model, record_id, field, commands)
+            if model == 'account.move.line':
+                self.ledger.recompute_move(record['move_id'])
+            elif model == 'account.move':
+                self.ledger.recompute_move(record_id)
+        return True
+
+    def unlink(self, model, ids):
+        table = self.ledger.table(model)
+        for record_id in self._ids(ids):
+            table.pop(record_id, None)
+        return True
+
+    def fields_get(self, model, *args, **kwargs):
+        sample = next(iter(self.ledger.table(model).values()), {})
+        fields = set(sample) | set(MANY2ONE.get(model, {})) | set(X2MANY.get(model, {}))
+        return {name: {'string': name.replace('_', ' ').title(),
+                       'type': 'many2one' if name in MANY2ONE.get(model, {}) else
+                               'one2many' if name in X2MANY.get(model, {}) else 'char'}
+                for name in sorted(fields)}
+
+    def action_post(self, model, ids):
+        for move_id in self._ids(ids):
+            move = self.ledger.get('account.move', move_id)
+            move['state'] = 'posted'
+            if move.get('name') in (None, False, '/'):
+                move['name'] = f"{'BILL' if move.get('move_type') == 'in_invoice' else 'MISC'}/{move['date'][:4]}/{move_id:05d}"
+            self.ledger.recompute_move(move_id)
+        return True
+
+    def button_draft(self, model, ids):
+        for move_id in self._ids(ids):
+            self.ledger.get('account.move', move_id)['state'] = 'draft'
+            self.ledger.recompute_move(move_id)
+        return True
+
+    def button_cancel(self, model, ids):
+        for move_id in self._ids(ids):
+            self.ledger.get('account.move', move_id)['state'] = 'cancel'
+            self.ledger.recompute_move(move_id)
+        return True
+
+    def reconcile(self, model, ids):
+        lines = [self.ledger.get('account.move.line', i) for i in self._ids(ids)]
+        if round(sum(line['balance'] for line in lines), 2) != 0:
+            residual = 'partial'
+        else:
+            residual = 'paid'
+        reconcile_id = self.ledger.insert('account.full.reconcile', {'name': f'R{len(lines)}'})
+        for line in lines:
+            line['reconciled'] = residual == 'paid'
+            line['full_reconcile_id'] = reconcile_id if residual == 'paid' else False
+            line['amount_residual'] = 0.0 if residual == 'paid' else line['amount_residual']
+            move = self.ledger.get('account.move', line['move_id'])
+            if move.get('move_type') != 'entry':
+                move['payment_state'] = residual
+                move['amount_residual'] = 0.0 if residual == 'paid' else move['amount_residual']
+        return True
+
+    def execute(self, model, method, args, kwargs):
+        if method in ('search', 'search_count'):
+            domain = args[0] if args else kwargs.pop('domain', [])
+            records = self.search(model, domain, kwargs.get('offset', 0), kwargs.get('limit'),
+                                  kwargs.get('order'), count=method == 'search_count')
+            return records if method == 'search_count' else [r['id'] for r in records]
+        if method == 'search_read':
+            domain = args[0] if args else kwargs.pop('domain', [])
+            fields = args[1] if len(args) > 1 else kwargs.get('fields')
+            return self.search_read(model, domain, fields, kwargs.get('offset', 0),
+                                    kwargs.get('limit'), kwargs.get('order'))
+        if method == 'read':
+            fields = args[1] if len(args) > 1 else kwargs.get('fields')
+            return self.read(model, args[0], fields)
+        if method == 'name_get':
+            return [[i, self.ledger.display_name(model, i)] for i in self._ids(args[0])]
+        handler = getattr(self, method, None)
+        if handler is None or method.startswith('_') or method == 'execute':
+            return True
+        return handler(model, *args)
+
+
+# =============================================================================
+# XML-RPC server
+# =============================================================================
+
+class _Server(ThreadingMixIn, MultiPathXMLRPCServer):
+    daemon_threads = True
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/xmlrpc/2/common', '/xmlrpc/2/object')
+
+
+class OdooStub:
+    """Serve a Ledger over XML-RPC; use as a context manager or start()/stop()"""
+
+    def __init__(self, ledger, latency=0.0, host='127.0.0.1', port=0):
+        self.ledger = ledger
+        self.latency = latency
+        self.orm = ORM(ledger)
+        self.calls = {}
+        self._calls_lock = threading.Lock()
+        self._server = _Server((host, port), requestHandler=_RequestHandler,
+                               logRequests=False, allow_none=True)
+
+        common = SimpleXMLRPCDispatcher(allow_none=True)
+        common.register_function(self._authenticate, 'authenticate')
+        common.register_function(self._authenticate, 'login')
+        common.register_function(lambda: {'server_version': '17.0', 'server_serie': '17.0'}, 'version')
+        self._server.add_dispatcher('/xmlrpc/2/common', common)
+
+        objects = SimpleXMLRPCDispatcher(allow_none=True)
+        objects.register_function(self._execute_kw, 'execute_kw')
+        self._server.add_dispatcher('/xmlrpc/2/object', objects)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _record(self, key):
+        with self._calls_lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _authenticate(self, db, username, password, *args):
+        if self.latency:
+            time.sleep(self.latency)
+        self._record('common.authenticate')
+        return UID
+
+    def _execute_kw(self, db, uid, password, model, method, args=None, kwargs=None):
+        if self.latency:
+            time.sleep(self.latency)
+        self._record(f'{model}.{method}')
+        with self.ledger.lock:
+            try:
+                return self.orm.execute(model, method, list(args or []), dict(kwargs or {}))
+            except OdooFault:
+                raise
+            except Exception as e:
+                raise OdooFault(f'{model}.{method}: {type(e).__name__}: {e}')
+
+    def reset_calls(self):
+        with self._calls_lock:
+            calls, self.calls = self.calls, {}
+        return calls
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='odoo-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
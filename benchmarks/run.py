@@ -0,0 +1,229 @@
+"""
+Offline benchmark runner.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --output benchmarks/results/latest.json
+    python -m benchmarks.run --baseline benchmarks/results/main.json   # exits 1 on regression
+
+Starts a local Odoo stub, a fake Anthropic API and a moto DynamoDB, then
+points the app modules at them through the same environment variables
+production uses (ODOO_URL, ANTHROPIC_BASE_URL, AWS credentials). Nothing
+leaves the machine. Each scenario runs --iterations times across
+--concurrency threads. Its throughput, p50/p95/max latency, Odoo
+round trips per operation and LLM calls per operation are written to
+JSON.
+
+With --baseline, a scenario counts as a regression when its p95 or its
+Odoo calls per operation grow by more than --max-regression (default
+25%) over the baseline file. Call counts are deterministic, so they
+catch N+1 patterns even on a noisy machine.
+
+To profile against recorded real model responses instead of the fake
+API, record once with LLM_CASSETTE_MODE=record and re-run with
+LLM_CASSETTE_MODE=replay (see llm_cassettes.py).
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import scenarios as scenario_builders  # noqa: E402
+from benchmarks.aws_fixture import mock_dynamodb  # noqa: E402
+from benchmarks.fake_anthropic import FakeAnthropic  # noqa: E402
+from benchmarks.odoo_stub import COMPANY_NAME, OdooStub, build_ledger  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _failed(result):
+    if isinstance(result, dict):
+        return result.get('success') is False
+    if isinstance(result, tuple):
+        return not result or result[0] is None
+    return result is None
+
+
+def measure(scenario, concurrency, odoo, anthropic):
+    """Run every payload of a scenario and summarise the timings"""
+    odoo.reset_calls()
+    anthropic.reset_calls()
+    errors = []
+
+    def timed(payload):
+        started = time.perf_counter()
+        try:
+            result = scenario.call(payload)
+            if _failed(result):
+                errors.append(str(result.get('error') if isinstance(result, dict) else result)[:200])
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}'[:200])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, scenario.payloads))
+    elapsed = time.perf_counter() - started
+
+    operations = len(latencies) or 1
+    odoo_calls = odoo.reset_calls()
+    llm_calls = anthropic.reset_calls()
+    return {
+        'iterations': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': round(elapsed, 3),
+        'throughput_per_s': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'mean_ms': round(sum(latencies) / operations * 1000, 2),
+        'odoo_calls_per_op': round(sum(odoo_calls.values()) / operations, 2),
+        'llm_calls_per_op': round(sum(llm_calls.values()) / operations, 2),
+        'odoo_calls_by_method': dict(sorted(odoo_calls.items())),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Scenario regressions against a baseline result file"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for key in ('p95_ms', 'odoo_calls_per_op'):
+            before, after = previous.get(key) or 0, current.get(key) or 0
+            if before and after > before * (1 + max_regression):
+                regressions.append(f'{name}: {key} {before} -> {after} (+{(after / before - 1) * 100:.0f}%)')
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_scenarios(args, ledger):
+    wanted = args.scenario or ['']
+
+    def selected(group):
+        return any(w.startswith(group) or group.startswith(w) for w in wanted)
+
+    built = []
+    if selected('reports'):
+        built += scenario_builders.report_scenarios(ledger, args.iterations)
+    if selected('matchingworkflow'):
+        built += scenario_builders.matching_scenarios(ledger, args.iterations, args.matching_transactions)
+    if selected('reconcile_transactions'):
+        built += scenario_builders.reconcile_scenarios(ledger, args.iterations)
+    if selected('createbill'):
+        built += scenario_builders.createbill_scenarios(ledger, args.iterations)
+    if selected('update_'):
+        built += scenario_builders.table_update_scenarios(ledger, args.iterations)
+    return [s for s in built if any(s.name.startswith(w) for w in wanted)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite')
+    parser.add_argument('--scenario', action='append',
+                        help='Only run scenarios whose name starts with this (repeatable), e.g. reports.get_profit')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--ledger-size', type=int, default=200, help='Bills and invoices in the synthetic ledger')
+    parser.add_argument('--matching-transactions', type=int, default=20,
+                        help='Bank transactions per orchestrate_matching run')
+    parser.add_argument('--odoo-latency-ms', type=float, default=2.0, help='Added to every Odoo XML-RPC call')
+    parser.add_argument('--llm-latency-ms', type=float, default=200.0, help='Added to every Anthropic call')
+    parser.add_argument('--llm-ms-per-token', type=float, default=0.0, help='Added per output token')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help='Earlier result file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25)
+    parser.add_argument('--verbose', action='store_true', help="Keep the modules' own print/log output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print(f"🏗️  Building ledger with {args.ledger_size} bills and {args.ledger_size} invoices...")
+    ledger = build_ledger(args.ledger_size, args.seed)
+
+    with OdooStub(ledger, latency=args.odoo_latency_ms / 1000) as odoo, \
+            FakeAnthropic(args.llm_latency_ms / 1000, args.llm_ms_per_token / 1000) as anthropic, \
+            mock_dynamodb(COMPANY_NAME):
+        os.environ.update({
+            'ODOO_URL': odoo.url, 'ODOO_DB': 'bench', 'ODOO_USERNAME': 'bench', 'ODOO_API_KEY': 'bench',
+            'ANTHROPIC_BASE_URL': anthropic.base_url, 'ANTHROPIC_API_KEY': 'bench',
+        })
+        # The AWS mock has no checkpoint bucket, even if the environment names one
+        os.environ.setdefault('MATCHING_CHECKPOINT_STORE', 'off')
+
+        import metrics
+        metrics.install()
+
+        scenarios = build_scenarios(args, ledger)
+        results = {
+            'generated_at': datetime.utcnow().isoformat() + 'Z',
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'settings': {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'baseline', 'verbose')},
+            'scenarios': {}
+        }
+
+        if not args.verbose:
+            logging.disable(logging.CRITICAL)
+        for scenario in scenarios:
+            print(f"⏱️  {scenario.name} ({len(scenario.payloads)} iterations)...", flush=True)
+            with open(os.devnull, 'w') as devnull, contextlib.ExitStack() as quiet:
+                if not args.verbose:
+                    quiet.enter_context(contextlib.redirect_stdout(devnull))
+                    quiet.enter_context(contextlib.redirect_stderr(devnull))
+                stats = measure(scenario, args.concurrency, odoo, anthropic)
+            results['scenarios'][scenario.name] = stats
+            flag = f" ❌ {stats['errors']} errors: {stats['first_error']}" if stats['errors'] else ''
+            print(f"   p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, {stats['throughput_per_s']}/s,"
+                  f" {stats['odoo_calls_per_op']} Odoo calls/op{flag}")
+        logging.disable(logging.NOTSET)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"📊 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
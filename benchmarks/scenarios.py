@@ -0,0 +1,249 @@
+"""
+Benchmark scenarios.
+
+Each scenario is built from the synthetic ledger and returns a
+Scenario: a callable under test plus one payload per iteration. Payloads
+are generated up front, so only the code under test is timed.
+Scenarios that change the ledger (bill creation, reconciliation) give
+each iteration its own documents, which keeps later iterations from
+taking a cheaper "already exists" path.
+"""
+from datetime import date, timedelta
+
+from benchmarks.odoo_stub import COMPANY_ID, COMPANY_NAME
+
+
+class Scenario:
+    def __init__(self, name, call, payloads):
+        self.name = name
+        self.call = call
+        self.payloads = payloads
+
+
+def _window(days=365):
+    today = date.today()
+    return {'company_id': COMPANY_ID, 'date_from': (today - timedelta(days=days)).isoformat(),
+            'date_to': today.isoformat()}
+
+
+def _bank_entries(ledger):
+    moves = ledger.table('account.move')
+    return [move for move in moves.values()
+            if move.get('move_type') == 'entry' and move.get('journal_id') == ledger.journals['bank']]
+
+
+def _documents_by_ref(ledger):
+    return {move['ref']: move for move in ledger.table('account.move').values()
+            if move.get('move_type') in ('in_invoice', 'out_invoice')}
+
+
+def _partner_name(ledger, move):
+    return ledger.display_name('res.partner', move.get('partner_id'))
+
+
+# =============================================================================
+# reports.*
+# =============================================================================
+
+def report_scenarios(ledger, iterations):
+    import reports
+
+    # Reports that need more than a company and a date window
+    extra = {'get_bank_reconciliation_report': {'journal_id': ledger.journals['bank']}}
+
+    names = sorted(name for name in dir(reports) if name.startswith('get_') and name.endswith('_report'))
+    return [Scenario(f'reports.{name}', getattr(reports, name),
+                     [dict(_window(), **extra.get(name, {})) for _ in range(iterations)])
+            for name in names]
+
+
+# =============================================================================
+# matchingworkflow.orchestrate_matching
+# =============================================================================
+
+def matching_input(ledger, transactions, offset=0):
+    """orchestrate_matching input: `transactions` bank lines plus every open document"""
+    by_ref = _documents_by_ref(ledger)
+    bank_transactions = []
+    for move in _bank_entries(ledger)[offset:offset + transactions]:
+        document = by_ref.get(move['ref'])
+        is_bill = document is not None and document['move_type'] == 'in_invoice'
+        amount = sum(ledger.get('account.move.line', i)['debit'] for i in move['line_ids'])
+        bank_transactions.append({
+            'transaction_id': f"TXN_{move['id']}",
+            'odoo_id': move['id'],
+            'date': move['date'],
+            'amount': amount,
+            'partner_name': _partner_name(ledger, move),
+            'description': f"{'Payment to' if is_bill else 'Receipt from'} {_partner_name(ledger, move)} {move['ref']}",
+            'reference': move['ref'],
+            'line_items': [{'account': 'Bank', 'label': move['ref']},
+                           {'account': 'Accounts Payable' if is_bill else 'Accounts Receivable', 'label': move['ref']}]
+        })
+
+    def documents(move_type, id_field):
+        return [{
+            id_field: f"{id_field.split('_')[0].upper()}_{move['id']}",
+            'odoo_id': move['id'],
+            'date': move['invoice_date'],
+            'amount': move['amount_total'],
+            'partner_name': _partner_name(ledger, move),
+            'vendor_ref' if move_type == 'in_invoice' else 'invoice_ref': move['ref']
+        } for move in ledger.table('account.move').values() if move.get('move_type') == move_type]
+
+    return {
+        'company_name': COMPANY_NAME,
+        'bank_transactions': bank_transactions,
+        'bills': documents('in_invoice', 'bill_id'),
+        'invoices': documents('out_invoice', 'invoice_id'),
+        'payroll_transactions': [],
+        'share_transactions': []
+    }
+
+
+def matching_scenarios(ledger, iterations, transactions):
+    import matchingworkflow
+
+    payload = matching_input(ledger, transactions)
+    return [Scenario('matchingworkflow.orchestrate_matching', matchingworkflow.orchestrate_matching,
+                     [dict(payload) for _ in range(iterations)])]
+
+
+# =============================================================================
+# reconcile_transactions.main
+# =============================================================================
+
+def reconcile_scenarios(ledger, iterations, per_run=5):
+    import reconcile_transactions
+
+    by_ref = _documents_by_ref(ledger)
+    pairs = []
+    for move in _bank_entries(ledger):
+        document = by_ref.get(move['ref'])
+        if document is None or document['move_type'] != 'in_invoice':
+            continue
+        amount = document['amount_total']
+        pairs.append({
+            'document_id': f"BILL_{document['id']}",
+            'match_type': 'exact',
+            'transaction_details': [{'transaction_id': f"TXN_{move['id']}", 'odoo_id': move['id'],
+                                     'amount': amount, 'date': move['date'], 'reference': move['ref']}],
+            'document_details': {'bill_id': f"BILL_{document['id']}", 'odoo_bill_id': document['id'],
+                                 'partners': _partner_name(ledger, document), 'amount': amount,
+                                 'date': document['invoice_date'], 'reference': document['ref'],
+                                 'odoo_bill_number': document['name']}
+        })
+
+    runs = min(iterations, len(pairs) // per_run)
+    if runs < iterations:
+        print(f"⚠️  Ledger only has {len(pairs)} paid bills; reconcile runs {runs} iterations"
+              f" (raise --ledger-size for more)")
+    payloads = [{'matched_transactions': pairs[i * per_run:(i + 1) * per_run]} for i in range(runs)]
+    return [Scenario('reconcile_transactions.main', reconcile_transactions.main, payloads)]
+
+
+# =============================================================================
+# createbill.main
+# =============================================================================
+
+def createbill_scenarios(ledger, iterations):
+    import createbill
+
+    vendors = [p['name'] for p in ledger.table('res.partner').values() if p.get('supplier_rank')]
+    today = date.today()
+    payloads = []
+    for i in range(iterations):
+        price = 100.0 + i
+        payloads.append({
+            'vendor_name': vendors[i % len(vendors)],
+            'company_id': COMPANY_ID,
+            'company_vat_status': 'yes',
+            'invoice_date': today.isoformat(),
+            'due_date': (today + timedelta(days=30)).isoformat(),
+            'vendor_ref': f'BENCH-{i:05d}',
+            'subtotal': price,
+            'tax_amount': round(price * 0.23, 2),
+            'total_amount': round(price * 1.23, 2),
+            'line_items': [{'description': 'Consulting services', 'quantity': 1, 'price_unit': price,
+                            'account_name': 'Consultancy Fees', 'account_code': '6200',
+                            'tax_name': '23% Purchase'}]
+        })
+    return [Scenario('createbill.main', createbill.main, payloads)]
+
+
+# =============================================================================
+# *-table update endpoints
+# =============================================================================
+
+def table_update_scenarios(ledger, iterations, batch=25):
+    import update_bills_table
+    import update_invoices_table
+    import update_payroll_transactions_table
+    import update_share_transactions_table
+    import update_transactions_table
+
+    moves = list(ledger.table('account.move').values())
+
+    def line_items(move):
+        return [{'label': line['name'] or move['ref'], 'account': ledger.display_name('account.account', line['account_id']),
+                 'debit': line['debit'], 'credit': line['credit']}
+                for line in (ledger.get('account.move.line', i) for i in move['line_ids'])]
+
+    def document(move, kind):
+        partner = {'id': move['partner_id'], 'name': _partner_name(ledger, move)}
+        return {
+            f'{kind}_id': move['id'], f'{kind}_number': move['name'],
+            'company': {'id': COMPANY_ID, 'name': COMPANY_NAME},
+            'journal': {'id': move['journal_id'], 'name': ledger.display_name('account.journal', move['journal_id'])},
+            'vendor' if kind == 'bill' else 'customer': partner,
+            'invoice_date': move['invoice_date'], 'due_date': move['invoice_date_due'],
+            'total_amount': move['amount_total'], 'subtotal': move['amount_untaxed'], 'tax_amount': move['amount_tax'],
+            'payment_reference': move['payment_reference'], 'vendor_reference': move['ref'],
+            'line_items': line_items(move)
+        }
+
+    def entry(move, kind):
+        return {
+            'entry_id' if kind == 'payroll' else 'transaction_id': move['id'],
+            'company': {'id': COMPANY_ID, 'name': COMPANY_NAME},
+            'journal': {'id': move['journal_id'], 'name': 'Miscellaneous'},
+            'partner': _partner_name(ledger, move), 'reference': move['ref'], 'ref': move['ref'],
+            'date': move['date'], 'transaction_date': move['date'], 'total_amount': move['amount_total'],
+            'period': move['date'][:7], 'year': move['date'][:4], 'narration': 'Benchmark entry',
+            'line_items': line_items(move)
+        }
+
+    bills = [m for m in moves if m.get('move_type') == 'in_invoice']
+    invoices = [m for m in moves if m.get('move_type') == 'out_invoice']
+    bank = _bank_entries(ledger)
+
+    def transactions(i):
+        return [{'amount': sum(ledger.get('account.move.line', l)['debit'] for l in m['line_ids']),
+                 'company_name': COMPANY_NAME, 'reference': m['ref'], 'date': m['date'],
+                 'transaction_partner': _partner_name(ledger, m), 'journal_entry_id': m['id'],
+                 'line_items': line_items(m), 'journal': {'id': m['journal_id'], 'name': 'Bank'}}
+                for m in (bank[(i * batch + j) % len(bank)] for j in range(batch))]
+
+    def each(process):
+        def run(batch_items):
+            results = [process(item) for item in batch_items]
+            return {'success': all(r.get('success') for r in results), 'results': len(results)}
+        return run
+
+    def cycle(items, kind, make, i):
+        return [make(items[(i * batch + j) % len(items)], kind) for j in range(batch)]
+
+    return [
+        Scenario('update_transactions_table.process_transactions', update_transactions_table.process_transactions,
+                 [transactions(i) for i in range(iterations)]),
+        Scenario('update_bills_table.process_bill', each(update_bills_table.process_bill),
+                 [cycle(bills, 'bill', document, i) for i in range(iterations)]),
+        Scenario('update_invoices_table.process_invoice', each(update_invoices_table.process_invoice),
+                 [cycle(invoices, 'invoice', document, i) for i in range(iterations)]),
+        Scenario('update_payroll_transactions_table.process_payroll_transaction',
+                 each(update_payroll_transactions_table.process_payroll_transaction),
+                 [cycle(bank, 'payroll', entry, i) for i in range(iterations)]),
+        Scenario('update_share_transactions_table.process_share_transaction',
+                 each(update_share_transactions_table.process_share_transaction),
+                 [cycle(bank, 'share', entry, i) for i in range(iterations)]),
+    ]
@@ -0,0 +1,197 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BrowserPoolExhausted(Exception):
+    """Raised when no browser session becomes free within the acquire timeout"""
+
+
+class PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+        self.broken = False
+
+
+class BrowserPool:
+    """
+    Bounded pool of reusable Selenium WebDriver sessions.
+
+    Launching Chrome costs seconds and a few hundred MB per call, so
+    sessions are created once (optionally pre-launched), handed out one
+    request at a time and returned afterwards. At most max_size browsers
+    exist at any time; extra callers wait up to acquire_timeout. Sessions
+    are health-checked on checkout, reset between uses and recycled after
+    max_uses checkouts or max_age_seconds, or as soon as they error.
+    """
+
+    def __init__(self, create_driver, max_size=2, acquire_timeout=60, max_uses=50, max_age_seconds=1800):
+        self.create_driver = create_driver
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_uses = max_uses
+        self.max_age_seconds = max_age_seconds
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+
+    # ---- lifecycle -----------------------------------------------------
+
+    def _launch(self):
+        started = time.time()
+        browser = PooledBrowser(self.create_driver())
+        with self._lock:
+            self._live += 1
+        print(f"🌐 Launched pooled browser in {time.time() - started:.1f}s ({self._live}/{self.max_size} live)")
+        return browser
+
+    def _discard(self, browser):
+        with self._lock:
+            self._live -= 1
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            print(f"⚠️  Error closing pooled browser: {e}")
+
+    def _is_healthy(self, browser):
+        if browser.broken:
+            return False
+        if browser.uses >= self.max_uses or time.time() - browser.created_at > self.max_age_seconds:
+            return False
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _reset(self, browser):
+        """Drop state left behind by the previous request"""
+        driver = browser.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def warm(self, count=None):
+        """Pre-launch browsers up to count (default: pool size) in the background"""
+        count = min(count or self.max_size, self.max_size)
+
+        def launch_all():
+            for _ in range(count):
+                if not self._slots.acquire(blocking=False):
+                    break
+                try:
+                    self._idle.put(self._launch())
+                except Exception as e:
+                    print(f"⚠️  Could not pre-launch browser: {e}")
+                finally:
+                    self._slots.release()
+
+        thread = threading.Thread(target=launch_all, name='browser-pool-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(browser)
+
+    # ---- checkout ------------------------------------------------------
+
+    def acquire(self):
+        if self._closed:
+            raise BrowserPoolExhausted('Browser pool is closed')
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise BrowserPoolExhausted(
+                f'No browser session available within {self.acquire_timeout}s ({self.max_size} in use)'
+            )
+
+        try:
+            while True:
+                try:
+                    browser = self._idle.get_nowait()
+                except queue.Empty:
+                    browser = self._launch()
+                    break
+                if self._is_healthy(browser):
+                    break
+                print("♻️  Recycling pooled browser")
+                self._discard(browser)
+        except Exception:
+            self._slots.release()
+            raise
+
+        browser.uses += 1
+        return browser
+
+    def release(self, browser):
+        try:
+            if self._closed or not self._is_healthy(browser):
+                self._discard(browser)
+                return
+            try:
+                self._reset(browser)
+                self._idle.put(browser)
+            except Exception as e:
+                print(f"⚠️  Pooled browser reset failed, discarding: {e}")
+                self._discard(browser)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self):
+        """Check out a driver for the duration of a with-block"""
+        browser = self.acquire()
+        try:
+            yield browser.driver
+        except Exception:
+            # The driver may be left on an unknown page or be dead altogether
+            browser.broken = True
+            raise
+        finally:
+            self.release(browser)
+
+    def stats(self):
+        return {
+            'max_size': self.max_size,
+            'live': self._live,
+            'idle': self._idle.qsize()
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool(create_driver):
+    """Return the process-wide pool, sized from BROWSER_POOL_SIZE"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                create_driver,
+                max_size=int(os.getenv('BROWSER_POOL_SIZE', '2')),
+                acquire_timeout=int(os.getenv('BROWSER_POOL_ACQUIRE_TIMEOUT', '60')),
+                max_uses=int(os.getenv('BROWSER_POOL_MAX_USES', '50')),
+            )
+        return _pool
+
+
+def shutdown_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -1,6 +1,8 @@
-import boto3
+import aws_clients
 import base64
 import anthropic
+import structured_output
+from structured_output import number, obj, string
 import os
 import json
 import re
@@ -678,19 +680,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -700,6 +691,16 @@ def download_from_s3(s3_key, bucket_name=None):
     except Exception as e:
         raise Exception(f"Error downloading from S3: {str(e)}")
 
+# Structured output: Claude returns the classification through this tool instead of free-text JSON
+CLASSIFICATION_TOOL = structured_output.output_tool("document_classification", obj({
+    "document_type": string(),
+    "category": string(),
+    "company_name": string(),
+    "total_amount": number(nullable=True),
+    "confidence_score": number(),
+    "reasoning": string()
+}, required=["document_type", "category", "company_name", "reasoning"]), "Return the document classification.")
+
 def process_document_with_claude(pdf_content, company_name):
     """Process document with Claude and return classification"""
     try:
@@ -738,17 +739,20 @@ def process_document_with_claude(pdf_content, company_name):
                         }
                     ]
                 }
-            ]
+            ],
+            **CLASSIFICATION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "document_classification")
+        response_text = structured_output.response_text(message).strip()
         
         print(f"Token usage - Input: {message.usage.input_tokens}, Output: {message.usage.output_tokens}")
         
         return {
             "success": True,
             "classification": response_text,
+            "parsed": parsed,
             "token_usage": {
                 "input_tokens": message.usage.input_tokens,
                 "output_tokens": message.usage.output_tokens
@@ -811,15 +815,19 @@ def main(data):
         
         if result["success"]:
             try:
-                # Parse Claude's JSON response with robust cleaning
-                cleaned_response = clean_json_response(result["classification"])
-                
-                print(f"Cleaned response: {cleaned_response[:200]}...")  # Debug log
-                
-                # Validate structure before parsing
-                validate_json_structure(cleaned_response)
-                
-                classification_data = json.loads(cleaned_response)
+                if result["parsed"] is not None:
+                    # Structured output is already parsed and has the required fields
+                    classification_data = result["parsed"]
+                else:
+                    # Parse Claude's JSON response with robust cleaning
+                    cleaned_response = clean_json_response(result["classification"])
+                    
+                    print(f"Cleaned response: {cleaned_response[:200]}...")  # Debug log
+                    
+                    # Validate structure before parsing
+                    validate_json_structure(cleaned_response)
+                    
+                    classification_data = json.loads(cleaned_response)
                 
                 # CRITICAL: Post-processing validation and auto-correction
                 validation_result = validate_and_correct_classification(
@@ -0,0 +1,205 @@
+import aws_clients
+import copy
+import os
+import threading
+import time
+
+# Configuration
+AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
+
+# DynamoDB setup
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
+users_table = dynamodb.Table('users')
+
+# Profile edits invalidate explicitly; the TTL only bounds staleness across workers
+COMPANY_CONTEXT_TTL = int(os.getenv('COMPANY_CONTEXT_TTL', '300'))
+# Unknown companies are re-checked sooner so a new signup isn't ignored for long
+MISSING_CONTEXT_TTL = int(os.getenv('MISSING_CONTEXT_TTL', '30'))
+MAX_ENTRIES = 1000
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def build_company_context(company_data):
+    """Prompt-facing company context from a users-table item"""
+    context = {
+        'company_name': company_data.get('company_name', ''),
+        'is_vat_registered': company_data.get('is_vat_registered', 'unknown'),
+        'primary_industry': company_data.get('primary_industry', ''),
+        'business_description': company_data.get('business_description', ''),
+        'business_model': company_data.get('business_model', ''),
+        'main_products': company_data.get('main_products', ''),
+        'business_address': company_data.get('business_address', ''),
+        'registration_no': company_data.get('registration_no', ''),
+        'vat_no': company_data.get('vat_no', ''),
+        'tax_registration_no': company_data.get('tax_registration_no', ''),
+        'trading_name': company_data.get('trading_name', '')
+    }
+
+    # Extract tax information
+    tax_info = company_data.get('tax_information', {})
+    context['tax_information'] = {
+        'reverse_charge': tax_info.get('reverse_charge', []),
+        'reverse_charge_other': tax_info.get('reverse_charge_other', ''),
+        'vat_exemptions': tax_info.get('vat_exemptions', ''),
+        'vat_period_category': tax_info.get('vat_period_category', ''),
+        'vat_rates': tax_info.get('vat_rates', [])
+    }
+
+    # Extract payroll information
+    payroll_info = company_data.get('payroll_information', {})
+    context['payroll_information'] = {
+        'num_employees': payroll_info.get('num_employees', 0),
+        'payroll_frequency': payroll_info.get('payroll_frequency', ''),
+        'social_insurance': payroll_info.get('social_insurance', ''),
+        'uses_ghs': payroll_info.get('uses_ghs', False)
+    }
+
+    # Extract business operations
+    business_ops = company_data.get('business_operations', {})
+    context['business_operations'] = {
+        'international': business_ops.get('international', False),
+        'inventory_management': business_ops.get('inventory_management', ''),
+        'multi_location': business_ops.get('multi_location', False),
+        'seasonal_business': business_ops.get('seasonal_business', False),
+        'peak_seasons': business_ops.get('peak_seasons', '')
+    }
+
+    # Extract special circumstances
+    special_circumstances = company_data.get('special_circumstances', {})
+    context['special_circumstances'] = {}
+
+    # Construction circumstances
+    construction = special_circumstances.get('construction', {})
+    if construction.get('enabled', False):
+        context['special_circumstances']['construction'] = {
+            'enabled': True,
+            'project_duration': construction.get('project_duration', '')
+        }
+
+    # Retail/E-commerce circumstances
+    retail_ecommerce = special_circumstances.get('retail_ecommerce', {})
+    if retail_ecommerce.get('enabled', False):
+        context['special_circumstances']['retail_ecommerce'] = {
+            'enabled': True,
+            'platform_type': retail_ecommerce.get('platform_type', '')
+        }
+
+    # Banking information
+    banking_info = company_data.get('banking_information', {})
+    context['banking_information'] = {
+        'primary_bank': banking_info.get('primary_bank', ''),
+        'primary_currency': banking_info.get('primary_currency', ''),
+        'multi_currency': banking_info.get('multi_currency', False),
+        'currencies_list': banking_info.get('currencies_list', [])
+    }
+
+    # Extract metadata
+    metadata = company_data.get('metadata', {})
+    context['metadata'] = {
+        'rep_name': metadata.get('rep_name', ''),
+        'rep_email': metadata.get('rep_email', ''),
+        'vat_no': metadata.get('vat_no', '')
+    }
+
+    return context
+
+
+def _find_company(company_name):
+    """First users-table item for company_name (case-sensitive exact match)"""
+    kwargs = {
+        'FilterExpression': 'company_name = :name',
+        'ExpressionAttributeValues': {':name': company_name}
+    }
+    while True:
+        response = users_table.scan(**kwargs)
+        if response.get('Items'):
+            return response['Items'][0]
+        if 'LastEvaluatedKey' not in response:
+            return None
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _load(company_name):
+    company_data = _find_company(company_name)
+    if company_data is None:
+        print(f"⚠️  No company context found for: {company_name}")
+        return None
+
+    context = build_company_context(company_data)
+    print(f"✅ Company context loaded for: {company_name}")
+    print(f"   VAT Registered: {context['is_vat_registered']}")
+    print(f"   Industry: {context['primary_industry']}")
+    print(f"   Number of Employees: {context['payroll_information']['num_employees']}")
+    print(f"   Payroll Frequency: {context['payroll_information']['payroll_frequency']}")
+    print(f"   Primary Bank: {context['banking_information']['primary_bank']}")
+    return context
+
+
+def _entry(company_name):
+    now = time.time()
+    with _lock:
+        entry = _entries.get(company_name)
+    if entry and entry['expires_at'] > now:
+        return entry
+
+    context = _load(company_name)
+    ttl = COMPANY_CONTEXT_TTL if context is not None else MISSING_CONTEXT_TTL
+    entry = {'expires_at': now + ttl, 'context': context, 'sections': {}}
+    with _lock:
+        if len(_entries) >= MAX_ENTRIES:
+            for key in [key for key, cached in _entries.items() if cached['expires_at'] <= now] or list(_entries)[:1]:
+                del _entries[key]
+        _entries[company_name] = entry
+    return entry
+
+
+def get_company_context(company_name):
+    """
+    Company context for document-processing prompts, or None if not found.
+
+    One users-table scan per company per COMPANY_CONTEXT_TTL instead of
+    one per document. Callers get their own copy.
+    """
+    if not company_name:
+        return None
+    try:
+        return copy.deepcopy(_entry(company_name)['context'])
+    except Exception as e:
+        print(f"❌ Error fetching company context: {e}")
+        return None
+
+
+def rendered_section(company_context, render):
+    """
+    render(company_context), memoized per company and renderer.
+
+    The prompt sections built from a company's context are identical for
+    every document in a batch, so each one is rendered once and reused
+    until the context is invalidated or expires.
+    """
+    if not company_context or not company_context.get('company_name'):
+        return render(company_context)
+
+    with _lock:
+        entry = _entries.get(company_context['company_name'])
+    if entry is None or entry['context'] != company_context:
+        return render(company_context)
+
+    key = f"{render.__module__}.{render.__qualname__}"
+    with _lock:
+        section = entry['sections'].get(key)
+    if section is None:
+        section = render(company_context)
+        with _lock:
+            entry['sections'][key] = section
+    return section
+
+
+def invalidate_company_context(*company_names):
+    """Drop cached context and rendered sections after a profile change"""
+    with _lock:
+        for company_name in company_names:
+            if company_name:
+                _entries.pop(company_name, None)
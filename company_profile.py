@@ -1,15 +1,17 @@
 # company profile
-import boto3
+import aws_clients
 from datetime import datetime
 from botocore.exceptions import ClientError
 from decimal import Decimal
 import os
+import user_cache
+import company_contexts
 
 # Configuration
 AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
 
 # DynamoDB setup
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
 users_table = dynamodb.Table('users')
 
 def convert_decimal(obj):
@@ -30,17 +32,15 @@ def get_company_profile(company_id, username):
     """Get company profile information from users table"""
     try:
         # Get user data which contains all company profile information
-        user_response = users_table.get_item(
-            Key={'username': username}
-        )
+        user = user_cache.get_user(username)
         
-        if 'Item' not in user_response:
+        if user is None:
             return {
                 "success": False,
                 "error": "User not found"
             }
         
-        user = convert_decimal(user_response['Item'])
+        user = convert_decimal(user)
         
         # Build profile from user data (users table has all the fields)
         profile = {
@@ -93,17 +93,15 @@ def update_company_profile(company_id, username, profile_data):
     """Update company profile information in users table"""
     try:
         # Validate that user has permission to update this company
-        user_response = users_table.get_item(
-            Key={'username': username}
-        )
+        user = user_cache.get_user(username)
         
-        if 'Item' not in user_response:
+        if user is None:
             return {
                 "success": False,
                 "error": "User not found"
             }
         
-        user = convert_decimal(user_response['Item'])
+        user = convert_decimal(user)
         
         # Check if user's company_id matches the profile being updated
         if user.get('company_id') != company_id and user.get('role') != 'admin':
@@ -162,6 +160,8 @@ def update_company_profile(company_id, username, profile_data):
             UpdateExpression=update_expression,
             ExpressionAttributeValues=expression_values
         )
+        user_cache.invalidate_user(username)
+        company_contexts.invalidate_company_context(user.get('company_name'), profile_data.get('company_name'))
         
         print(f"✅ Company profile updated for {company_id} by {username}")
         
@@ -0,0 +1,157 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+
+def poll_until(check, max_wait_time=120, initial_interval=0.5, max_interval=5.0, backoff=1.6, label='condition'):
+    """
+    Poll `check` with exponential backoff until it returns a truthy value.
+
+    Fresh Odoo installs often finish in a couple of seconds, so polling
+    starts fast and slows down towards max_interval instead of sleeping a
+    fixed 5 seconds between checks. Returns (result, elapsed_seconds,
+    attempts); result is the last value returned by check (falsy on
+    timeout).
+    """
+    start_time = time.time()
+    interval = initial_interval
+    attempts = 0
+    result = None
+
+    while True:
+        attempts += 1
+        try:
+            result = check()
+        except Exception as e:
+            print(f"Error while waiting for {label}: {str(e)}")
+            result = None
+
+        elapsed = time.time() - start_time
+        if result:
+            return result, elapsed, attempts
+
+        remaining = max_wait_time - elapsed
+        if remaining <= 0:
+            return result, elapsed, attempts
+
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+class ProvisioningStep:
+    def __init__(self, name, func, depends_on=None, required=False):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.required = required
+
+
+class ProvisioningPipeline:
+    """
+    Runs company provisioning steps as a dependency graph.
+
+    Each step is a function taking (models, results) where results holds
+    the return values of finished steps. Steps whose dependencies are done
+    run concurrently on a small thread pool; every worker thread gets its
+    own XML-RPC proxy from `connect` because ServerProxy is not
+    thread-safe. Start/finish times and durations are recorded per step.
+    """
+
+    def __init__(self, connect, max_workers=4):
+        self.connect = connect
+        self.max_workers = max_workers
+        self.steps = {}
+        self.results = {}
+        self.timings = {}
+        self._local = threading.local()
+
+    def add_step(self, name, func, depends_on=None, required=False):
+        for dependency in depends_on or []:
+            if dependency not in self.steps:
+                raise ValueError(f"Step '{name}' depends on unknown step '{dependency}'")
+        self.steps[name] = ProvisioningStep(name, func, depends_on, required)
+        return self
+
+    def _models(self):
+        models = getattr(self._local, 'models', None)
+        if models is None:
+            models = self.connect()
+            self._local.models = models
+        return models
+
+    def _run_step(self, step):
+        started_at = datetime.utcnow()
+        start = time.time()
+        status = 'success'
+        try:
+            result = step.func(self._models(), self.results)
+            if isinstance(result, dict) and result.get('success') is False:
+                status = 'failed'
+        except Exception as e:
+            print(f"✗ Provisioning step '{step.name}' raised: {str(e)}")
+            result = {'success': False, 'error': str(e)}
+            status = 'error'
+
+        self.timings[step.name] = {
+            'started_at': started_at.isoformat(),
+            'duration_ms': int((time.time() - start) * 1000),
+            'status': status
+        }
+        print(f"⏱  Step '{step.name}' {status} in {self.timings[step.name]['duration_ms']} ms")
+        return result
+
+    def run(self):
+        """Run every step, respecting dependencies. Returns (results, timings)."""
+        pending = dict(self.steps)
+        running = {}
+        pipeline_started_at = datetime.utcnow()
+        pipeline_start = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Keep scheduling until no more steps are ready; a skipped
+                # step can unblock its dependents in the same pass
+                while True:
+                    ready = [
+                        step for step in pending.values()
+                        if all(dep in self.results for dep in step.depends_on)
+                    ]
+                    if not ready:
+                        break
+
+                    for step in ready:
+                        failed_required = [
+                            dep for dep in step.depends_on
+                            if self.steps[dep].required and self.timings.get(dep, {}).get('status') != 'success'
+                        ]
+                        del pending[step.name]
+                        if failed_required:
+                            self.results[step.name] = {
+                                'success': False,
+                                'error': f"Skipped because required step(s) failed: {', '.join(failed_required)}"
+                            }
+                            self.timings[step.name] = {'started_at': None, 'duration_ms': 0, 'status': 'skipped'}
+                            continue
+                        running[executor.submit(self._run_step, step)] = step
+
+                if not running:
+                    if pending:
+                        # Nothing can make progress - dependency cycle
+                        for name in list(pending):
+                            self.results[name] = {'success': False, 'error': 'Unresolvable step dependencies'}
+                            self.timings[name] = {'started_at': None, 'duration_ms': 0, 'status': 'skipped'}
+                        pending.clear()
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    self.results[step.name] = future.result()
+
+        self.timings['total'] = {
+            'started_at': pipeline_started_at.isoformat(),
+            'duration_ms': int((time.time() - pipeline_start) * 1000),
+            'status': 'success'
+        }
+        return self.results, self.timings
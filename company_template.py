@@ -0,0 +1,559 @@
+import hashlib
+import json
+import os
+import time
+import xmlrpc.client
+from datetime import datetime
+
+# Load .env only in development (when .env file exists)
+if os.path.exists('.env'):
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass  # dotenv not installed, use system env vars
+
+# Bump when the snapshot layout changes; older files are rejected on load
+TEMPLATE_VERSION = 1
+
+DEFAULT_TEMPLATE_PATH = os.getenv('COMPANY_TEMPLATE_PATH', 'company_templates/cyprus_company_template.json')
+
+ACCOUNT_FIELDS = ['code', 'name', 'account_type', 'reconcile', 'tag_ids']
+TAX_FIELDS = [
+    'name', 'description', 'amount', 'amount_type', 'type_tax_use', 'price_include',
+    'include_base_amount', 'is_base_affected', 'sequence', 'active', 'tax_group_id',
+    'children_tax_ids', 'country_id', 'invoice_repartition_line_ids', 'refund_repartition_line_ids'
+]
+REPARTITION_FIELDS = ['factor_percent', 'repartition_type', 'account_id', 'tag_ids', 'use_in_tax_closing', 'sequence']
+JOURNAL_FIELDS = ['name', 'code', 'type', 'sequence', 'default_account_id', 'suspense_account_id', 'currency_id']
+
+
+def get_odoo_connection():
+    url = os.getenv("ODOO_URL")
+    db = os.getenv("ODOO_DB")
+    username = os.getenv("ODOO_USERNAME")
+    password = os.getenv("ODOO_API_KEY")
+
+    if not all([url, db, username, password]):
+        raise Exception('Missing Odoo connection environment variables')
+
+    common = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/common')
+    models = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/object')
+    uid = common.authenticate(db, username, password, {})
+    if not uid:
+        raise Exception('Odoo authentication failed')
+
+    return models, db, uid, password
+
+
+def _many2one_id(value):
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value or None
+
+
+def _account_company_domain(has_company_ids, company_id):
+    if has_company_ids:
+        return [('company_ids', 'in', [company_id])]
+    return [('company_id', '=', company_id)]
+
+
+def _has_field(models, db, uid, password, model, field):
+    fields_info = models.execute_kw(
+        db, uid, password,
+        model, 'fields_get',
+        [[]], {'attributes': ['type']}
+    )
+    return field in fields_info, fields_info
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+
+def snapshot_company(reference_company_id, output_path=None, models=None, db=None, uid=None, password=None):
+    """
+    Snapshot a fully configured reference company into a local template file.
+
+    Captures the chart of accounts, tax groups, taxes (with repartition
+    lines, tax-grid tags and group children), journals and the company's
+    default account settings. Records are stored by code/name rather than
+    by id so they can be recreated in any company of the database.
+    """
+    try:
+        if models is None:
+            models, db, uid, password = get_odoo_connection()
+
+        output_path = output_path or DEFAULT_TEMPLATE_PATH
+        context = {'allowed_company_ids': [reference_company_id], 'active_test': False}
+
+        has_company_ids, _ = _has_field(models, db, uid, password, 'account.account', 'company_ids')
+
+        print(f"📸 Snapshotting reference company {reference_company_id}...")
+
+        # Accounts
+        accounts = models.execute_kw(
+            db, uid, password,
+            'account.account', 'search_read',
+            [_account_company_domain(has_company_ids, reference_company_id)],
+            {'fields': ['id'] + ACCOUNT_FIELDS, 'context': context}
+        )
+        account_code_by_id = {acc['id']: acc['code'] for acc in accounts}
+
+        # Tags used by accounts and tax repartition lines
+        tag_ids = {tag_id for acc in accounts for tag_id in acc.get('tag_ids', [])}
+
+        # Taxes and their repartition lines
+        taxes = models.execute_kw(
+            db, uid, password,
+            'account.tax', 'search_read',
+            [[('company_id', '=', reference_company_id)]],
+            {'fields': ['id'] + TAX_FIELDS, 'context': context}
+        )
+        repartition_ids = [
+            line_id for tax in taxes
+            for line_id in tax.get('invoice_repartition_line_ids', []) + tax.get('refund_repartition_line_ids', [])
+        ]
+        repartition_lines = {}
+        if repartition_ids:
+            for line in models.execute_kw(
+                db, uid, password,
+                'account.tax.repartition.line', 'read',
+                [repartition_ids],
+                {'fields': ['id'] + REPARTITION_FIELDS, 'context': context}
+            ):
+                repartition_lines[line['id']] = line
+                tag_ids.update(line.get('tag_ids', []))
+
+        tag_names = {}
+        if tag_ids:
+            for tag in models.execute_kw(
+                db, uid, password,
+                'account.account.tag', 'read',
+                [list(tag_ids)],
+                {'fields': ['id', 'name', 'applicability']}
+            ):
+                tag_names[tag['id']] = {'name': tag['name'], 'applicability': tag['applicability']}
+
+        tax_name_by_id = {tax['id']: (tax['name'], tax['type_tax_use']) for tax in taxes}
+
+        # Tax groups referenced by the taxes
+        tax_group_ids = list({_many2one_id(tax.get('tax_group_id')) for tax in taxes if tax.get('tax_group_id')})
+        tax_groups = []
+        if tax_group_ids:
+            tax_groups = models.execute_kw(
+                db, uid, password,
+                'account.tax.group', 'read',
+                [tax_group_ids],
+                {'fields': ['id', 'name', 'sequence'], 'context': context}
+            )
+        tax_group_name_by_id = {group['id']: group['name'] for group in tax_groups}
+
+        # Journals
+        journals = models.execute_kw(
+            db, uid, password,
+            'account.journal', 'search_read',
+            [[('company_id', '=', reference_company_id)]],
+            {'fields': JOURNAL_FIELDS, 'context': context}
+        )
+
+        # Company-level default accounts (exchange difference, suspense, transfer, ...)
+        _, company_fields = _has_field(models, db, uid, password, 'res.company', 'id')
+        account_default_fields = [
+            name for name, info in company_fields.items()
+            if info.get('type') == 'many2one' and info.get('relation') == 'account.account'
+        ]
+        company_defaults = {}
+        if account_default_fields:
+            company = models.execute_kw(
+                db, uid, password,
+                'res.company', 'read',
+                [[reference_company_id]],
+                {'fields': account_default_fields + (['chart_template'] if 'chart_template' in company_fields else [])}
+            )[0]
+            for field in account_default_fields:
+                account_id = _many2one_id(company.get(field))
+                if account_id in account_code_by_id:
+                    company_defaults[field] = account_code_by_id[account_id]
+            if company.get('chart_template'):
+                company_defaults['chart_template'] = company['chart_template']
+
+        def serialize_repartition(line_ids):
+            serialized = []
+            for line_id in line_ids:
+                line = repartition_lines.get(line_id)
+                if not line:
+                    continue
+                serialized.append({
+                    'factor_percent': line.get('factor_percent', 100),
+                    'repartition_type': line.get('repartition_type'),
+                    'account_code': account_code_by_id.get(_many2one_id(line.get('account_id'))),
+                    'tags': [tag_names[tag_id]['name'] for tag_id in line.get('tag_ids', []) if tag_id in tag_names],
+                    'use_in_tax_closing': line.get('use_in_tax_closing', False),
+                    'sequence': line.get('sequence', 1),
+                })
+            return serialized
+
+        template = {
+            'version': TEMPLATE_VERSION,
+            'created_at': datetime.utcnow().isoformat(),
+            'reference_company_id': reference_company_id,
+            'accounts': [
+                {
+                    'code': acc['code'],
+                    'name': acc['name'],
+                    'account_type': acc['account_type'],
+                    'reconcile': acc.get('reconcile', False),
+                    'tags': [tag_names[t]['name'] for t in acc.get('tag_ids', []) if t in tag_names],
+                }
+                for acc in sorted(accounts, key=lambda a: a['code'])
+            ],
+            'tax_groups': [
+                {'name': group['name'], 'sequence': group.get('sequence', 10)}
+                for group in tax_groups
+            ],
+            'taxes': [
+                {
+                    'name': tax['name'],
+                    'description': tax.get('description') or False,
+                    'amount': tax['amount'],
+                    'amount_type': tax['amount_type'],
+                    'type_tax_use': tax['type_tax_use'],
+                    'price_include': tax.get('price_include', False),
+                    'include_base_amount': tax.get('include_base_amount', False),
+                    'is_base_affected': tax.get('is_base_affected', True),
+                    'sequence': tax.get('sequence', 1),
+                    'active': tax.get('active', True),
+                    'tax_group': tax_group_name_by_id.get(_many2one_id(tax.get('tax_group_id'))),
+                    'country_id': _many2one_id(tax.get('country_id')),
+                    'children': [
+                        list(tax_name_by_id[child_id]) for child_id in tax.get('children_tax_ids', [])
+                        if child_id in tax_name_by_id
+                    ],
+                    'invoice_repartition': serialize_repartition(tax.get('invoice_repartition_line_ids', [])),
+                    'refund_repartition': serialize_repartition(tax.get('refund_repartition_line_ids', [])),
+                }
+                for tax in sorted(taxes, key=lambda t: (t.get('sequence', 1), t['id']))
+            ],
+            'journals': [
+                {
+                    'name': journal['name'],
+                    'code': journal['code'],
+                    'type': journal['type'],
+                    'sequence': journal.get('sequence', 10),
+                    'default_account_code': account_code_by_id.get(_many2one_id(journal.get('default_account_id'))),
+                    'suspense_account_code': account_code_by_id.get(_many2one_id(journal.get('suspense_account_id'))),
+                    'currency_id': _many2one_id(journal.get('currency_id')),
+                }
+                for journal in journals
+            ],
+            'company_defaults': company_defaults,
+        }
+
+        payload = json.dumps(template, sort_keys=True, indent=2, default=str)
+        template['checksum'] = hashlib.sha256(payload.encode()).hexdigest()
+
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(template, f, indent=2, default=str)
+        os.replace(tmp_path, output_path)
+
+        print(f"✅ Template written to {output_path}: {len(template['accounts'])} accounts, "
+              f"{len(template['taxes'])} taxes, {len(template['journals'])} journals")
+
+        return {
+            'success': True,
+            'path': output_path,
+            'version': TEMPLATE_VERSION,
+            'checksum': template['checksum'],
+            'accounts': len(template['accounts']),
+            'taxes': len(template['taxes']),
+            'journals': len(template['journals'])
+        }
+
+    except Exception as e:
+        print(f"❌ Error creating company template: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+def load_template(path=None):
+    """Load and validate a template file. Returns None if it is missing or outdated."""
+    path = path or DEFAULT_TEMPLATE_PATH
+    if not path or not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        template = json.load(f)
+
+    if template.get('version') != TEMPLATE_VERSION:
+        print(f"⚠️  Ignoring company template {path}: version {template.get('version')} != {TEMPLATE_VERSION}")
+        return None
+
+    checksum = template.pop('checksum', None)
+    payload = json.dumps(template, sort_keys=True, indent=2, default=str)
+    if checksum and hashlib.sha256(payload.encode()).hexdigest() != checksum:
+        print(f"⚠️  Ignoring company template {path}: checksum mismatch")
+        return None
+
+    template['checksum'] = checksum
+    return template
+
+
+# ---------------------------------------------------------------------------
+# Provisioning
+# ---------------------------------------------------------------------------
+
+def _create_many(models, db, uid, password, model, vals_list, context=None):
+    """Create many records with one XML-RPC call"""
+    if not vals_list:
+        return []
+    ids = models.execute_kw(
+        db, uid, password,
+        model, 'create',
+        [vals_list],
+        {'context': context or {}}
+    )
+    return ids if isinstance(ids, list) else [ids]
+
+
+def _rollback(models, db, uid, password, created, context):
+    """Unlink what a failed provisioning created, newest first. True if everything went."""
+    clean = True
+    for model, ids in reversed(created):
+        try:
+            models.execute_kw(db, uid, password, model, 'unlink', [ids], {'context': context})
+        except Exception as e:
+            print(f"❌ Could not roll back {len(ids)} {model} records: {str(e)}")
+            clean = False
+    return clean
+
+
+def provision_from_template(models, db, uid, password, company_id, template, currency_id=None):
+    """
+    Provision a new company from a template with batched creates.
+
+    Each model is handled with one read of what already exists plus one
+    multi-record create for what is missing, so a full chart of accounts,
+    tax setup and journals take a handful of round trips. On failure the
+    records created so far are unlinked again; rolled_back in the result
+    says whether the company is back where it started.
+    """
+    started = time.time()
+    context = {'allowed_company_ids': [company_id]}
+    summary = {'accounts_created': 0, 'taxes_created': 0, 'tax_groups_created': 0, 'journals_created': 0}
+    created = []
+
+    try:
+        has_company_ids, _ = _has_field(models, db, uid, password, 'account.account', 'company_ids')
+
+        # 1. Tags (shared across companies) resolved by name in one query
+        tag_names = {
+            tag for acc in template['accounts'] for tag in acc.get('tags', [])
+        } | {
+            tag for tax in template['taxes']
+            for line in tax.get('invoice_repartition', []) + tax.get('refund_repartition', [])
+            for tag in line.get('tags', [])
+        }
+        tag_ids = {}
+        if tag_names:
+            for tag in models.execute_kw(
+                db, uid, password,
+                'account.account.tag', 'search_read',
+                [[('name', 'in', list(tag_names))]],
+                {'fields': ['id', 'name']}
+            ):
+                tag_ids.setdefault(tag['name'], tag['id'])
+
+        # 2. Accounts
+        existing_accounts = models.execute_kw(
+            db, uid, password,
+            'account.account', 'search_read',
+            [_account_company_domain(has_company_ids, company_id)],
+            {'fields': ['id', 'code'], 'context': context}
+        )
+        account_ids = {acc['code']: acc['id'] for acc in existing_accounts}
+
+        new_accounts = []
+        for acc in template['accounts']:
+            if acc['code'] in account_ids:
+                continue
+            vals = {
+                'code': acc['code'],
+                'name': acc['name'],
+                'account_type': acc['account_type'],
+                'reconcile': acc.get('reconcile', False),
+                'tag_ids': [(6, 0, [tag_ids[t] for t in acc.get('tags', []) if t in tag_ids])],
+            }
+            if has_company_ids:
+                vals['company_ids'] = [(6, 0, [company_id])]
+            else:
+                vals['company_id'] = company_id
+            new_accounts.append(vals)
+
+        created_ids = _create_many(models, db, uid, password, 'account.account', new_accounts, context)
+        created.append(('account.account', created_ids))
+        for vals, account_id in zip(new_accounts, created_ids):
+            account_ids[vals['code']] = account_id
+        summary['accounts_created'] = len(created_ids)
+        print(f"✓ Accounts: {len(created_ids)} created, {len(existing_accounts)} already present")
+
+        # 3. Tax groups
+        existing_groups = models.execute_kw(
+            db, uid, password,
+            'account.tax.group', 'search_read',
+            [[('company_id', 'in', [company_id, False])]],
+            {'fields': ['id', 'name', 'company_id'], 'context': context}
+        )
+        group_ids = {}
+        for group in existing_groups:
+            # Prefer the company's own group over a shared one
+            if group['name'] not in group_ids or _many2one_id(group.get('company_id')) == company_id:
+                group_ids[group['name']] = group['id']
+
+        new_groups = [
+            {'name': group['name'], 'sequence': group.get('sequence', 10), 'company_id': company_id}
+            for group in template.get('tax_groups', []) if group['name'] not in group_ids
+        ]
+        created_groups = _create_many(models, db, uid, password, 'account.tax.group', new_groups, context)
+        created.append(('account.tax.group', created_groups))
+        for vals, group_id in zip(new_groups, created_groups):
+            group_ids[vals['name']] = group_id
+        summary['tax_groups_created'] = len(new_groups)
+
+        # 4. Taxes: plain taxes first, then groups whose children now exist
+        existing_taxes = models.execute_kw(
+            db, uid, password,
+            'account.tax', 'search_read',
+            [[('company_id', '=', company_id)]],
+            {'fields': ['id', 'name', 'type_tax_use'], 'context': dict(context, active_test=False)}
+        )
+        tax_ids = {(tax['name'], tax['type_tax_use']): tax['id'] for tax in existing_taxes}
+
+        def repartition_commands(lines):
+            return [
+                (0, 0, {
+                    'factor_percent': line.get('factor_percent', 100),
+                    'repartition_type': line['repartition_type'],
+                    'account_id': account_ids.get(line.get('account_code')) or False,
+                    'tag_ids': [(6, 0, [tag_ids[t] for t in line.get('tags', []) if t in tag_ids])],
+                    'use_in_tax_closing': line.get('use_in_tax_closing', False),
+                    'sequence': line.get('sequence', 1),
+                })
+                for line in lines
+            ]
+
+        def tax_vals(tax):
+            vals = {
+                'name': tax['name'],
+                'description': tax.get('description') or False,
+                'amount': tax['amount'],
+                'amount_type': tax['amount_type'],
+                'type_tax_use': tax['type_tax_use'],
+                'price_include': tax.get('price_include', False),
+                'include_base_amount': tax.get('include_base_amount', False),
+                'is_base_affected': tax.get('is_base_affected', True),
+                'sequence': tax.get('sequence', 1),
+                'active': tax.get('active', True),
+                'company_id': company_id,
+            }
+            if tax.get('tax_group') in group_ids:
+                vals['tax_group_id'] = group_ids[tax['tax_group']]
+            if tax.get('country_id'):
+                vals['country_id'] = tax['country_id']
+            if tax['amount_type'] == 'group':
+                vals['children_tax_ids'] = [(6, 0, [
+                    tax_ids[tuple(child)] for child in tax.get('children', []) if tuple(child) in tax_ids
+                ])]
+            else:
+                vals['invoice_repartition_line_ids'] = repartition_commands(tax.get('invoice_repartition', []))
+                vals['refund_repartition_line_ids'] = repartition_commands(tax.get('refund_repartition', []))
+            return vals
+
+        for wants_group in (False, True):
+            batch = [
+                tax for tax in template['taxes']
+                if (tax['amount_type'] == 'group') == wants_group and (tax['name'], tax['type_tax_use']) not in tax_ids
+            ]
+            vals_list = [tax_vals(tax) for tax in batch]
+            created_taxes = _create_many(models, db, uid, password, 'account.tax', vals_list, context)
+            created.append(('account.tax', created_taxes))
+            for tax, tax_id in zip(batch, created_taxes):
+                tax_ids[(tax['name'], tax['type_tax_use'])] = tax_id
+            summary['taxes_created'] += len(vals_list)
+        print(f"✓ Taxes: {summary['taxes_created']} created, {len(existing_taxes)} already present")
+
+        # 5. Journals
+        existing_journals = models.execute_kw(
+            db, uid, password,
+            'account.journal', 'search_read',
+            [[('company_id', '=', company_id)]],
+            {'fields': ['id', 'code'], 'context': context}
+        )
+        existing_codes = {journal['code'] for journal in existing_journals}
+
+        new_journals = []
+        for journal in template['journals']:
+            if journal['code'] in existing_codes:
+                continue
+            vals = {
+                'name': journal['name'],
+                'code': journal['code'],
+                'type': journal['type'],
+                'sequence': journal.get('sequence', 10),
+                'company_id': company_id,
+                'alias_id': False,
+            }
+            if account_ids.get(journal.get('default_account_code')):
+                vals['default_account_id'] = account_ids[journal['default_account_code']]
+            if account_ids.get(journal.get('suspense_account_code')):
+                vals['suspense_account_id'] = account_ids[journal['suspense_account_code']]
+            if currency_id and journal['type'] in ['bank', 'cash']:
+                vals['currency_id'] = currency_id
+            new_journals.append(vals)
+
+        created_journals = _create_many(models, db, uid, password, 'account.journal', new_journals, context)
+        created.append(('account.journal', created_journals))
+        summary['journals_created'] = len(created_journals)
+        summary['journals'] = [
+            {'id': journal_id, 'name': vals['name'], 'code': vals['code'], 'type': vals['type']}
+            for vals, journal_id in zip(new_journals, created_journals)
+        ]
+        print(f"✓ Journals: {len(created_journals)} created, {len(existing_journals)} already present")
+
+        # 6. Company default accounts in a single write
+        company_vals = {
+            field: account_ids[code]
+            for field, code in template.get('company_defaults', {}).items()
+            if field != 'chart_template' and code in account_ids
+        }
+        if template.get('company_defaults', {}).get('chart_template'):
+            company_vals['chart_template'] = template['company_defaults']['chart_template']
+        if company_vals:
+            models.execute_kw(
+                db, uid, password,
+                'res.company', 'write',
+                [[company_id], company_vals]
+            )
+
+        elapsed = round(time.time() - started, 2)
+        print(f"✅ Company {company_id} provisioned from template in {elapsed}s")
+        return dict(summary, success=True, elapsed_seconds=elapsed, template_checksum=template.get('checksum'))
+
+    except Exception as e:
+        print(f"❌ Template provisioning failed: {str(e)}")
+        rolled_back = _rollback(models, db, uid, password, [(model, ids) for model, ids in created if ids], context)
+        return dict(summary, success=False, error=str(e), rolled_back=rolled_back)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python company_template.py <reference_company_id> [output_path]")
+        sys.exit(1)
+
+    result = snapshot_company(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+    print(json.dumps(result, indent=2))
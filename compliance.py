@@ -1,6 +1,9 @@
 # compliance.py
 import xmlrpc.client
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
@@ -8,6 +11,19 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Authentication is done once per process; XML-RPC proxies are per thread
+# because ServerProxy is not thread-safe
+_connection = {}
+_connection_lock = threading.Lock()
+_thread_local = threading.local()
+
+COMPLIANCE_CACHE_TTL = int(os.getenv('COMPLIANCE_CACHE_TTL', '60'))
+COMPLIANCE_MAX_WORKERS = int(os.getenv('COMPLIANCE_MAX_WORKERS', '5'))
+
+_items_cache = {}
+_items_cache_lock = threading.Lock()
+
+
 def get_odoo_connection():
     """Establish connection to Odoo"""
     try:
@@ -19,12 +35,21 @@ def get_odoo_connection():
         if not all([url, db, username, password]):
             raise Exception("Missing Odoo connection configuration")
 
-        common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
-        models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
-        
-        uid = common.authenticate(db, username, password, {})
-        if not uid:
-            raise Exception("Authentication with Odoo failed")
+        with _connection_lock:
+            if _connection.get('key') != (url, db, username):
+                common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
+                uid = common.authenticate(db, username, password, {})
+                if not uid:
+                    raise Exception("Authentication with Odoo failed")
+                _connection.clear()
+                _connection.update({'key': (url, db, username), 'uid': uid})
+            uid = _connection['uid']
+
+        models = getattr(_thread_local, 'models', None)
+        if models is None or getattr(_thread_local, 'url', None) != url:
+            models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
+            _thread_local.models = models
+            _thread_local.url = url
 
         return models, uid, db, password
         
@@ -36,185 +61,195 @@ def get_odoo_connection():
 # COMPLIANCE ITEMS FROM ODOO
 # ============================================================================
 
-def get_compliance_items(business_company_id, status=None):
+def _search_read(model, domain, fields, limit=None):
+    models, uid, db, password = get_odoo_connection()
+    options = {'fields': fields}
+    if limit:
+        options['limit'] = limit
+    return models.execute_kw(db, uid, password, model, 'search_read', [domain], options)
+
+
+def _collect_vat_returns(company_id):
+    """1. VAT RETURNS - Check for unpaid/unfiled VAT"""
+    vat_entries = _search_read('account.move', [
+        ('company_id', '=', company_id),
+        ('move_type', '=', 'entry'),
+        ('state', '=', 'draft'),
+        ('ref', 'ilike', 'VAT')
+    ], ['name', 'date', 'ref'], limit=10)
+    
+    return [{
+        'id': f"vat_{entry['id']}",
+        'title': f"VAT Return - {entry.get('ref', entry['name'])}",
+        'description': f"VAT return filing required",
+        'category': 'vat_returns',
+        'status': 'pending',
+        'priority': 'high',
+        'dueDate': entry.get('date', ''),
+        'source': 'odoo',
+        'odoo_id': entry['id']
+    } for entry in vat_entries]
+
+
+def _collect_tax_filings(company_id):
+    """2. TAX FILINGS - Check for tax-related pending items"""
+    tax_lines = _search_read('account.move.line', [
+        ('company_id', '=', company_id),
+        ('tax_line_id', '!=', False),
+        ('parent_state', '=', 'draft')
+    ], ['move_id', 'date', 'tax_line_id'], limit=10)
+    
+    return [{
+        'id': f"tax_{line['id']}",
+        'title': f"Tax Filing - {line['tax_line_id'][1] if line.get('tax_line_id') else 'Unknown'}",
+        'description': 'Tax filing pending approval',
+        'category': 'tax_filings',
+        'status': 'pending',
+        'priority': 'high',
+        'dueDate': line.get('date', ''),
+        'source': 'odoo',
+        'odoo_id': line['move_id'][0] if line.get('move_id') else None
+    } for line in tax_lines]
+
+
+def _collect_payroll(company_id):
+    """3. PAYROLL - Check for draft entries in payroll journals"""
+    # Filtering on the journal through the relation avoids a separate journal lookup
+    payroll_entries = _search_read('account.move', [
+        ('company_id', '=', company_id),
+        ('journal_id.type', '=', 'general'),
+        ('journal_id.name', 'ilike', 'payroll'),
+        ('state', '=', 'draft')
+    ], ['name', 'date'], limit=10)
+    
+    return [{
+        'id': f"payroll_{entry['id']}",
+        'title': f"Payroll Entry - {entry['name']}",
+        'description': 'Payroll entry pending posting',
+        'category': 'payroll',
+        'status': 'pending',
+        'priority': 'medium',
+        'dueDate': entry.get('date', ''),
+        'source': 'odoo',
+        'odoo_id': entry['id']
+    } for entry in payroll_entries]
+
+
+def _collect_financial_statements(company_id):
+    """4. FINANCIAL STATEMENTS - Check for unposted journal entries"""
+    unposted_moves = _search_read('account.move', [
+        ('company_id', '=', company_id),
+        ('state', '=', 'draft'),
+        ('move_type', 'in', ['entry', 'out_invoice', 'in_invoice'])
+    ], ['name', 'date', 'move_type'], limit=10)
+    
+    move_type_map = {
+        'entry': 'Journal Entry',
+        'out_invoice': 'Customer Invoice',
+        'in_invoice': 'Vendor Bill'
+    }
+    return [{
+        'id': f"fs_{move['id']}",
+        'title': f"Unposted {move_type_map.get(move['move_type'], 'Entry')} - {move['name']}",
+        'description': 'Document pending posting for financial statements',
+        'category': 'financial_statements',
+        'status': 'pending',
+        'priority': 'medium',
+        'dueDate': move.get('date', ''),
+        'source': 'odoo',
+        'odoo_id': move['id']
+    } for move in unposted_moves]
+
+
+def _collect_bank_reconciliation(company_id):
+    """5. BANK RECONCILIATION - Check for unreconciled items"""
+    unreconciled_lines = _search_read('account.move.line', [
+        ('company_id', '=', company_id),
+        ('account_type', 'in', ['asset_cash', 'liability_credit_card']),
+        ('parent_state', '=', 'posted'),
+        ('full_reconcile_id', '=', False)
+    ], ['date', 'name', 'debit', 'credit'], limit=5)
+    
+    if not unreconciled_lines:
+        return []
+    
+    return [{
+        'id': f"bank_recon_{company_id}",
+        'title': f"Bank Reconciliation Required",
+        'description': f"{len(unreconciled_lines)}+ unreconciled bank transactions",
+        'category': 'bank_reconciliation',
+        'status': 'pending',
+        'priority': 'high',
+        'dueDate': datetime.now().strftime('%Y-%m-%d'),
+        'source': 'odoo'
+    }]
+
+
+COMPLIANCE_COLLECTORS = [
+    ('VAT entries', _collect_vat_returns),
+    ('tax entries', _collect_tax_filings),
+    ('payroll entries', _collect_payroll),
+    ('unposted moves', _collect_financial_statements),
+    ('unreconciled items', _collect_bank_reconciliation),
+]
+
+
+def _collect_compliance_items(company_id):
+    """Run every category query concurrently; a failing category is skipped"""
+    # Fail fast on configuration/authentication problems before fanning out
+    get_odoo_connection()
+    
+    compliance_items = []
+    with ThreadPoolExecutor(max_workers=COMPLIANCE_MAX_WORKERS) as executor:
+        futures = [
+            (label, executor.submit(collector, company_id))
+            for label, collector in COMPLIANCE_COLLECTORS
+        ]
+        for label, future in futures:
+            try:
+                compliance_items.extend(future.result())
+            except Exception as e:
+                logger.warning(f"Could not fetch {label}: {e}")
+    
+    # Sort by priority and due date
+    priority_order = {'high': 0, 'medium': 1, 'low': 2}
+    compliance_items.sort(key=lambda x: (
+        priority_order.get(x.get('priority', 'low'), 3),
+        x.get('dueDate', '')
+    ))
+    return compliance_items
+
+
+def invalidate_compliance_cache(business_company_id=None):
+    """Drop cached items for one company, or for all companies"""
+    with _items_cache_lock:
+        if business_company_id is None:
+            _items_cache.clear()
+        else:
+            _items_cache.pop(int(business_company_id), None)
+
+
+def get_compliance_items(business_company_id, status=None, use_cache=True):
     """Get compliance items from Odoo for a specific company"""
     try:
         company_id = int(business_company_id) if business_company_id else None
         if not company_id:
             return {'success': False, 'error': 'Invalid company_id'}
         
-        models, uid, db, password = get_odoo_connection()
-        
-        compliance_items = []
-        
-        # 1. VAT RETURNS - Check for unpaid/unfiled VAT
-        try:
-            vat_domain = [
-                ('company_id', '=', company_id),
-                ('move_type', '=', 'entry'),
-                ('state', '=', 'draft'),
-                ('ref', 'ilike', 'VAT')
-            ]
-            vat_entries = models.execute_kw(
-                db, uid, password,
-                'account.move', 'search_read',
-                [vat_domain],
-                {'fields': ['name', 'date', 'ref'], 'limit': 10}
-            )
-            
-            for entry in vat_entries:
-                compliance_items.append({
-                    'id': f"vat_{entry['id']}",
-                    'title': f"VAT Return - {entry.get('ref', entry['name'])}",
-                    'description': f"VAT return filing required",
-                    'category': 'vat_returns',
-                    'status': 'pending',
-                    'priority': 'high',
-                    'dueDate': entry.get('date', ''),
-                    'source': 'odoo',
-                    'odoo_id': entry['id']
-                })
-        except Exception as e:
-            logger.warning(f"Could not fetch VAT entries: {e}")
-        
-        # 2. TAX FILINGS - Check for tax-related pending items
-        try:
-            tax_domain = [
-                ('company_id', '=', company_id),
-                ('tax_line_id', '!=', False),
-                ('parent_state', '=', 'draft')
-            ]
-            tax_lines = models.execute_kw(
-                db, uid, password,
-                'account.move.line', 'search_read',
-                [tax_domain],
-                {'fields': ['move_id', 'date', 'tax_line_id'], 'limit': 10}
-            )
-            
-            for line in tax_lines:
-                compliance_items.append({
-                    'id': f"tax_{line['id']}",
-                    'title': f"Tax Filing - {line['tax_line_id'][1] if line.get('tax_line_id') else 'Unknown'}",
-                    'description': 'Tax filing pending approval',
-                    'category': 'tax_filings',
-                    'status': 'pending',
-                    'priority': 'high',
-                    'dueDate': line.get('date', ''),
-                    'source': 'odoo',
-                    'odoo_id': line['move_id'][0] if line.get('move_id') else None
-                })
-        except Exception as e:
-            logger.warning(f"Could not fetch tax entries: {e}")
-        
-        # 3. PAYROLL - Check for draft payroll entries
-        try:
-            # Check for draft journal entries in payroll journals
-            payroll_journals = models.execute_kw(
-                db, uid, password,
-                'account.journal', 'search_read',
-                [[('company_id', '=', company_id), ('type', '=', 'general'), ('name', 'ilike', 'payroll')]],
-                {'fields': ['id', 'name']}
-            )
-            
-            if payroll_journals:
-                journal_ids = [j['id'] for j in payroll_journals]
-                payroll_domain = [
-                    ('company_id', '=', company_id),
-                    ('journal_id', 'in', journal_ids),
-                    ('state', '=', 'draft')
-                ]
-                payroll_entries = models.execute_kw(
-                    db, uid, password,
-                    'account.move', 'search_read',
-                    [payroll_domain],
-                    {'fields': ['name', 'date'], 'limit': 10}
-                )
-                
-                for entry in payroll_entries:
-                    compliance_items.append({
-                        'id': f"payroll_{entry['id']}",
-                        'title': f"Payroll Entry - {entry['name']}",
-                        'description': 'Payroll entry pending posting',
-                        'category': 'payroll',
-                        'status': 'pending',
-                        'priority': 'medium',
-                        'dueDate': entry.get('date', ''),
-                        'source': 'odoo',
-                        'odoo_id': entry['id']
-                    })
-        except Exception as e:
-            logger.warning(f"Could not fetch payroll entries: {e}")
-        
-        # 4. FINANCIAL STATEMENTS - Check for unposted journal entries
-        try:
-            unposted_domain = [
-                ('company_id', '=', company_id),
-                ('state', '=', 'draft'),
-                ('move_type', 'in', ['entry', 'out_invoice', 'in_invoice'])
-            ]
-            unposted_moves = models.execute_kw(
-                db, uid, password,
-                'account.move', 'search_read',
-                [unposted_domain],
-                {'fields': ['name', 'date', 'move_type'], 'limit': 10}
-            )
-            
-            for move in unposted_moves:
-                move_type_map = {
-                    'entry': 'Journal Entry',
-                    'out_invoice': 'Customer Invoice',
-                    'in_invoice': 'Vendor Bill'
-                }
-                compliance_items.append({
-                    'id': f"fs_{move['id']}",
-                    'title': f"Unposted {move_type_map.get(move['move_type'], 'Entry')} - {move['name']}",
-                    'description': 'Document pending posting for financial statements',
-                    'category': 'financial_statements',
-                    'status': 'pending',
-                    'priority': 'medium',
-                    'dueDate': move.get('date', ''),
-                    'source': 'odoo',
-                    'odoo_id': move['id']
-                })
-        except Exception as e:
-            logger.warning(f"Could not fetch unposted moves: {e}")
-        
-        # 5. BANK RECONCILIATION - Check for unreconciled items
-        try:
-            unreconciled_domain = [
-                ('company_id', '=', company_id),
-                ('account_type', 'in', ['asset_cash', 'liability_credit_card']),
-                ('parent_state', '=', 'posted'),
-                ('full_reconcile_id', '=', False)
-            ]
-            unreconciled_lines = models.execute_kw(
-                db, uid, password,
-                'account.move.line', 'search_read',
-                [unreconciled_domain],
-                {'fields': ['date', 'name', 'debit', 'credit'], 'limit': 5}
-            )
-            
-            if unreconciled_lines:
-                total_unreconciled = len(unreconciled_lines)
-                compliance_items.append({
-                    'id': f"bank_recon_{company_id}",
-                    'title': f"Bank Reconciliation Required",
-                    'description': f"{total_unreconciled}+ unreconciled bank transactions",
-                    'category': 'bank_reconciliation',
-                    'status': 'pending',
-                    'priority': 'high',
-                    'dueDate': datetime.now().strftime('%Y-%m-%d'),
-                    'source': 'odoo'
-                })
-        except Exception as e:
-            logger.warning(f"Could not fetch unreconciled items: {e}")
+        now = time.time()
+        cached = None
+        if use_cache:
+            with _items_cache_lock:
+                cached = _items_cache.get(company_id)
+            if cached and now - cached[0] > COMPLIANCE_CACHE_TTL:
+                cached = None
         
-        # Sort by priority and due date
-        priority_order = {'high': 0, 'medium': 1, 'low': 2}
-        compliance_items.sort(key=lambda x: (
-            priority_order.get(x.get('priority', 'low'), 3),
-            x.get('dueDate', '')
-        ))
+        if cached:
+            compliance_items = cached[1]
+        else:
+            compliance_items = _collect_compliance_items(company_id)
+            with _items_cache_lock:
+                _items_cache[company_id] = (now, compliance_items)
         
         # Filter by status if requested
         if status:
@@ -222,8 +257,9 @@ def get_compliance_items(business_company_id, status=None):
         
         return {
             "success": True,
-            "items": compliance_items,
-            "total_count": len(compliance_items)
+            "items": [dict(item) for item in compliance_items],
+            "total_count": len(compliance_items),
+            "cached": bool(cached)
         }
         
     except Exception as e:
@@ -250,6 +286,8 @@ def update_compliance_item(compliance_id, business_company_id, update_data, upda
         # If updating status to 'completed', we could post the draft entry in Odoo
         # For now, return success (items auto-update when Odoo state changes)
         logger.info(f"Compliance item {compliance_id} status update requested by {updated_by}")
+        if business_company_id:
+            invalidate_compliance_cache(business_company_id)
         
         return {
             "success": True,
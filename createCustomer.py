@@ -1,6 +1,7 @@
 import xmlrpc.client
 import os
 from difflib import SequenceMatcher
+import partner_index
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -59,13 +60,13 @@ def check_customer_exists_comprehensive(models, db, uid, password, data, company
     """
     Comprehensive check if customer already exists using multiple criteria including fuzzy matching
     Returns customer_id if found, None otherwise
+    
+    Lookups go through the shared per-company partner index, so only the
+    trigram candidates are scored instead of every customer of the company.
     """
     try:
-        # First, get all existing customers for the company
-        existing_customers = get_customers_for_company(models, db, uid, password, company_id)
-        
-        if not existing_customers:
-            return None
+        index = partner_index.get_partner_index(models, db, uid, password, company_id)
+        lookup = {'role': 'customer', 'strict_company': bool(company_id)}
         
         input_name = data.get('name', '').strip()
         input_email = data.get('email', '').strip().lower() if data.get('email') else None
@@ -74,78 +75,36 @@ def check_customer_exists_comprehensive(models, db, uid, password, data, company
         # Priority order for matching:
         # 1. Email exact match (most reliable for customers)
         # 2. Phone exact match
-        # 3. Email + Name combination (exact)
-        # 4. Fuzzy name matching (similarity > 85%)
-        # 5. Exact name match (fallback)
+        # 3. Fuzzy name matching (similarity > 85%)
+        # 4. Exact name match (fallback)
         
         # 1. Check by email exact match
         if input_email:
-            for customer in existing_customers:
-                customer_email = customer.get('email', '').strip().lower() if customer.get('email') else ''
-                if customer_email and customer_email == input_email:
-                    print(f"Found customer by email match: {customer['name']}")
-                    return customer['id']
+            customer = index.find_by_email(input_email, **lookup)
+            if customer:
+                print(f"Found customer by email match: {customer['name']}")
+                return customer['id']
         
-        # 2. Check by phone exact match
+        # 2. Check by phone exact match (digits only)
         if input_phone:
-            # Normalize phone numbers by removing common separators
-            normalized_input_phone = ''.join(c for c in input_phone if c.isdigit())
-            for customer in existing_customers:
-                customer_phone = customer.get('phone', '').strip() if customer.get('phone') else ''
-                if customer_phone:
-                    normalized_customer_phone = ''.join(c for c in customer_phone if c.isdigit())
-                    if normalized_customer_phone and normalized_customer_phone == normalized_input_phone:
-                        print(f"Found customer by phone match: {customer['name']}")
-                        return customer['id']
-        
-        # 3. Check by email + name combination (both exact)
-        if input_email and input_name:
-            for customer in existing_customers:
-                customer_email = customer.get('email', '').strip().lower() if customer.get('email') else ''
-                customer_name = customer.get('name', '').strip()
-                if (customer_email == input_email and 
-                    customer_name.lower() == input_name.lower()):
-                    print(f"Found customer by email+name combination: {customer['name']}")
-                    return customer['id']
-        
-        # 4. Fuzzy name matching (similarity > 85%)
+            customer = index.find_by_phone(input_phone, **lookup)
+            if customer:
+                print(f"Found customer by phone match: {customer['name']}")
+                return customer['id']
+        
+        # 3. Fuzzy name matching (similarity > 85%)
         if input_name:
-            normalized_input = normalize_string(input_name)
-            best_match = None
-            best_similarity = 0
-            
-            for customer in existing_customers:
-                customer_name = customer.get('name', '').strip()
-                if not customer_name:
-                    continue
-                    
-                normalized_customer = normalize_string(customer_name)
-                
-                # Calculate similarity
-                sim_score = similarity(normalized_input, normalized_customer)
-                
-                # Also check raw similarity without normalization
-                raw_sim_score = similarity(input_name, customer_name)
-                
-                # Take the higher of the two scores
-                final_score = max(sim_score, raw_sim_score)
-                
-                if final_score > best_similarity:
-                    best_similarity = final_score
-                    best_match = customer
-            
-            # If similarity is above threshold (85%), consider it a match
-            if best_similarity > 0.85:
+            best_match, best_similarity = index.find_fuzzy(input_name, **lookup)
+            if best_match:
                 print(f"Found customer by fuzzy match (similarity: {best_similarity:.2%}): {best_match['name']}")
                 return best_match['id']
         
-        # 5. Exact name match (fallback)
+        # 4. Exact name match (fallback)
         if input_name:
-            for customer in existing_customers:
-                customer_name = customer.get('name', '').strip()
-                if customer_name.lower() == input_name.lower():
-                    print(f"Found customer by exact name match: {customer['name']}")
-                    return customer['id']
+            customer = index.find_by_name(input_name, **lookup)
+            if customer:
+                print(f"Found customer by exact name match: {customer['name']}")
+                return customer['id']
         
         return None
         
@@ -303,6 +262,9 @@ def main(data):
                 'error': 'Failed to create customer in Odoo'
             }
         
+        # Keep the shared partner index warm without a reload
+        partner_index.register_created_partner(db, company_id, dict(customer_data, id=customer_id))
+        
         # Get created customer information
         customer_info = get_customer_info(models, db, uid, password, customer_id)
         
@@ -2,6 +2,7 @@ import xmlrpc.client
 from datetime import datetime
 import os
 import time
+import duplicate_detection
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
     try:
@@ -305,30 +306,26 @@ def check_duplicate_invoice(models, db, uid, password, customer_id, invoice_date
         - Invoice data with exists=True if duplicate found
     """
     try:
-        # Build search criteria for the specific company
-        search_domain = [
-            ('move_type', '=', 'out_invoice'),  # Customer invoices only
-            ('partner_id', '=', customer_id),
-            ('invoice_date', '=', invoice_date),
-            ('company_id', '=', company_id),   # Filter by company
-            ('state', '!=', 'cancel'),  # Exclude cancelled invoices
-        ]
-        
-        # Add reference to search criteria if provided
-        if customer_ref:
-            search_domain.append(('ref', '=', customer_ref))
-        
-        # Search for existing invoices
-        existing_invoices = models.execute_kw(
-            db, uid, password,
-            'account.move', 'search_read',
-            [search_domain],
-            {'fields': ['id', 'name', 'amount_total', 'amount_untaxed', 'amount_tax', 'state', 'ref', 'partner_id']}
+        # Look up the (customer, date, amount, ref) fingerprint in the company's
+        # in-memory set of customer invoices instead of searching Odoo per document
+        fingerprints = duplicate_detection.get_fingerprint_set(
+            models, db, uid, password, company_id, 'out_invoice', invoice_date
         )
+        match = fingerprints.find(customer_id, invoice_date, total_amount, customer_ref)
+        
+        if match:
+            existing_invoices = models.execute_kw(
+                db, uid, password,
+                'account.move', 'read',
+                [[match['id']]],
+                {'fields': ['id', 'name', 'amount_total', 'amount_untaxed', 'amount_tax', 'state', 'ref', 'partner_id']}
+            )
+        else:
+            existing_invoices = []
         
         # Check if any invoice matches the total amount (with small tolerance for rounding)
         for invoice in existing_invoices:
-            if abs(float(invoice['amount_total']) - float(total_amount)) < 0.01:
+            if invoice.get('state') != 'cancel' and abs(float(invoice['amount_total']) - float(total_amount)) < 0.01:
                 # Get detailed invoice information including line items
                 line_items = models.execute_kw(
                     db, uid, password,
@@ -744,6 +741,15 @@ def main(data):
         if not invoice_id:
             return {'success': False, 'error': 'Failed to create invoice in Odoo'}
         
+        duplicate_detection.register_created_move(db, company_id, 'out_invoice', {
+            'id': invoice_id,
+            'partner_id': customer_id,
+            'invoice_date': invoice_date,
+            'amount_total': expected_total,
+            'ref': data.get('customer_ref'),
+            'state': 'draft'
+        })
+        
         # Determine VAT treatment type
         accounting_assignment = data.get('accounting_assignment', {})
         additional_entries = accounting_assignment.get('additional_entries', [])
@@ -2,6 +2,7 @@ import xmlrpc.client
 from datetime import datetime
 import os
 import time
+import duplicate_detection
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -506,57 +507,42 @@ def check_duplicate_payroll_entry(models, db, uid, password, transaction_date, c
         - Entry data with exists=True if duplicate found
     """
     try:
-        # Build search criteria
-        search_domain = [
-            ('move_type', '=', 'entry'),
-            ('company_id', '=', company_id),
-            ('date', '=', transaction_date),
-            ('state', '!=', 'cancel'),
-        ]
-        
-        # Add journal filter if provided
-        if journal_id:
-            search_domain.append(('journal_id', '=', journal_id))
-        
-        # Search for existing entries
-        existing_entries = models.execute_kw(
-            db, uid, password,
-            'account.move', 'search_read',
-            [search_domain],
-            {'fields': ['id', 'name', 'date', 'state', 'ref', 'journal_id']}
+        # Entries on the same date (and journal) come from the company's
+        # in-memory fingerprint set instead of a per-document Odoo search
+        fingerprints = duplicate_detection.get_fingerprint_set(
+            models, db, uid, password, company_id, 'entry', transaction_date
         )
         
-        # Check if any entry matches payroll pattern
-        for entry in existing_entries:
+        payroll_keywords = ['payroll', 'salary', 'salaries', 'wages']
+        if period:
+            payroll_keywords.append(period.lower())
+        
+        def is_payroll(entry):
             ref = entry.get('ref', '').lower() if entry.get('ref') else ''
+            return any(keyword in ref for keyword in payroll_keywords)
+        
+        entry = next((e for e in fingerprints.find_on_date(transaction_date, journal_id) if is_payroll(e)), None)
+        
+        if entry is not None:
+            # Get line items
+            line_items = models.execute_kw(
+                db, uid, password,
+                'account.move.line', 'search_read',
+                [[('move_id', '=', entry['id'])]], 
+                {'fields': ['id', 'name', 'debit', 'credit', 'account_id']}
+            )
             
-            # Check if it's a payroll entry
-            payroll_keywords = ['payroll', 'salary', 'salaries', 'wages']
-            if period:
-                payroll_keywords.append(period.lower())
-            
-            is_payroll = any(keyword in ref for keyword in payroll_keywords)
-            
-            if is_payroll:
-                # Get line items
-                line_items = models.execute_kw(
-                    db, uid, password,
-                    'account.move.line', 'search_read',
-                    [[('move_id', '=', entry['id'])]], 
-                    {'fields': ['id', 'name', 'debit', 'credit', 'account_id']}
-                )
-                
-                return {
-                    'success': True,
-                    'exists': True,
-                    'entry_id': entry['id'],
-                    'entry_number': entry['name'],
-                    'date': entry['date'],
-                    'state': entry['state'],
-                    'ref': entry.get('ref'),
-                    'line_items': line_items,
-                    'message': 'Payroll entry for this period already exists - no duplicate created'
-                }
+            return {
+                'success': True,
+                'exists': True,
+                'entry_id': entry['id'],
+                'entry_number': entry['name'],
+                'date': entry['date'],
+                'state': entry['state'],
+                'ref': entry.get('ref'),
+                'line_items': line_items,
+                'message': 'Payroll entry for this period already exists - no duplicate created'
+            }
         
         return None
         
@@ -894,6 +880,15 @@ def main(data):
                 'error': 'Failed to create payroll journal entry in Odoo'
             }
         
+        duplicate_detection.register_created_move(db, company_id, 'entry', {
+            'id': move_id,
+            'date': transaction_date,
+            'amount_total': total_debits,
+            'ref': ref,
+            'journal_id': journal_id,
+            'state': 'draft'
+        })
+        
         # POST THE JOURNAL ENTRY
         try:
             post_result = models.execute_kw(
@@ -2,6 +2,7 @@ import xmlrpc.client
 from datetime import datetime
 import os
 import time
+import duplicate_detection
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -421,30 +422,26 @@ def check_duplicate_bill(models, db, uid, password, vendor_id, invoice_date, tot
         - Bill data with exists=True if duplicate found
     """
     try:
-        # Build search criteria for the specific company
-        search_domain = [
-            ('move_type', '=', 'in_invoice'),  # Vendor bills only
-            ('partner_id', '=', vendor_id),
-            ('invoice_date', '=', invoice_date),
-            ('company_id', '=', company_id),  # Filter by company
-            ('state', '!=', 'cancel'),  # Exclude cancelled bills
-        ]
-        
-        # Add reference to search criteria if provided
-        if vendor_ref:
-            search_domain.append(('ref', '=', vendor_ref))
-        
-        # Search for existing bills
-        existing_bills = models.execute_kw(
-            db, uid, password,
-            'account.move', 'search_read',
-            [search_domain],
-            {'fields': ['id', 'name', 'amount_total', 'amount_untaxed', 'amount_tax', 'state', 'ref', 'partner_id']}
+        # Look up the (vendor, date, amount, ref) fingerprint in the company's
+        # in-memory set of vendor bills instead of searching Odoo per document
+        fingerprints = duplicate_detection.get_fingerprint_set(
+            models, db, uid, password, company_id, 'in_invoice', invoice_date
         )
+        match = fingerprints.find(vendor_id, invoice_date, total_amount, vendor_ref)
+        
+        if match:
+            existing_bills = models.execute_kw(
+                db, uid, password,
+                'account.move', 'read',
+                [[match['id']]],
+                {'fields': ['id', 'name', 'amount_total', 'amount_untaxed', 'amount_tax', 'state', 'ref', 'partner_id']}
+            )
+        else:
+            existing_bills = []
         
         # Check if any bill matches the total amount (with small tolerance for rounding)
         for bill in existing_bills:
-            if abs(float(bill['amount_total']) - float(total_amount)) < 0.01:
+            if bill.get('state') != 'cancel' and abs(float(bill['amount_total']) - float(total_amount)) < 0.01:
                 # Get detailed bill information including line items
                 line_items = models.execute_kw(
                     db, uid, password,
@@ -905,6 +902,15 @@ def main(data):
                 'error': 'Failed to create bill in Odoo'
             }
         
+        duplicate_detection.register_created_move(db, company_id, 'in_invoice', {
+            'id': bill_id,
+            'partner_id': vendor_id,
+            'invoice_date': invoice_date,
+            'amount_total': expected_total,
+            'ref': data.get('vendor_ref'),
+            'state': 'draft'
+        })
+        
         # CRITICAL FIX: For non-VAT companies WITHOUT tax_name, manually fix the accounts payable line
         # This prevents Odoo from using the wrong receivable account (1150)
         # Only do this if we used additional_entries (i.e., no tax_name was provided)
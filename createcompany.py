@@ -2,6 +2,8 @@ import xmlrpc.client
 import os
 import time
 import json # Import json for pretty printing
+import company_provisioning
+import company_template
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -198,57 +200,75 @@ def main(data):
 
         print(f"Company created successfully with ID: {company_id}")
 
-        chart_result = ensure_chart_of_accounts(models, db, uid, password, company_id, country_code)
-        print(f"Chart of accounts installation initiated: {chart_result.get('message', 'In progress')}")
-
-        print("Waiting for Chart of Accounts installation to complete...")
-        chart_ready = wait_for_chart_of_accounts(models, db, uid, password, company_id, max_wait_time=120)
-        
-        if not chart_ready['success'] and 'company_id' in str(chart_ready.get('message', '')):
-            print("Falling back to simplified chart checking method...")
-            chart_ready = wait_for_chart_of_accounts_simple(models, db, uid, password, company_id)
-        
-        if not chart_ready['success']:
-            print(f"Warning: {chart_ready['message']}")
-        else:
-            print("Chart of Accounts is ready!")
-
-        # ===== MOVED: Wait extra time for CoA to create journals =====
-        print("Waiting for Chart of Accounts journals to be created...")
-        time.sleep(10)
-
-        # ===== MOVED: Disable aliases AFTER CoA creates journals =====
-        disable_result = disable_all_journal_aliases(models, db, uid, password, company_id)
-        if disable_result['success']:
-            print(f"Disabled aliases on {disable_result['count']} journals")
-        else:
-            print(f"Warning: Could not disable journal aliases: {disable_result.get('error')}")
-
-        custom_accounts_result = create_custom_accounts(models, db, uid, password, company_id)
-        if custom_accounts_result['success']:
-            print(f"Successfully created {len(custom_accounts_result['accounts'])} custom accounts")
-        else:
-            print(f"Custom accounts creation issue: {custom_accounts_result.get('error', 'Unknown error')}")
-
-        journals_result = create_essential_journals(models, db, uid, password, company_id, currency_id)
-        if journals_result['success']:
-            print(f"Successfully created {len(journals_result['journals'])} journals")
-            if journals_result.get('existing_count', 0) > 0:
-                print(f"Found {journals_result['existing_count']} existing journals")
-        else:
-            print(f"Journal creation issue: {journals_result.get('error', 'Unknown error')}")
-
-        # Configure taxes based on VAT registration status
-        # Wait for taxes to be created by chart of accounts
+        # Provision the company as a dependency graph: steps that only need the
+        # Chart of Accounts (custom accounts, tax wait) run alongside the journal
+        # steps, and tax grid tags are resolved while the chart installs
         is_vat_registered = data.get('is_vat_registered', 'no')
-        print(f"\nWaiting for taxes to be created before configuration...")
         print(f"VAT registration status: {is_vat_registered}")
         
-        tax_ready = wait_for_taxes_to_exist(models, db, uid, password, company_id, max_wait_time=60)
+        def install_chart_step(step_models, results):
+            chart_result = ensure_chart_of_accounts(step_models, db, uid, password, company_id, country_code)
+            print(f"Chart of accounts installation initiated: {chart_result.get('message', 'In progress')}")
+            
+            print("Waiting for Chart of Accounts installation to complete...")
+            chart_ready = wait_for_chart_of_accounts(step_models, db, uid, password, company_id, max_wait_time=120)
+            
+            if not chart_ready['success'] and 'company_id' in str(chart_ready.get('message', '')):
+                print("Falling back to simplified chart checking method...")
+                chart_ready = wait_for_chart_of_accounts_simple(step_models, db, uid, password, company_id)
+            
+            if not chart_ready['success']:
+                print(f"Warning: {chart_ready['message']}")
+            else:
+                print("Chart of Accounts is ready!")
+            return chart_ready
+        
+        def chart_journals_step(step_models, results):
+            print("Waiting for Chart of Accounts journals to be created...")
+            return wait_for_chart_journals(step_models, db, uid, password, company_id)
+        
+        def journal_aliases_step(step_models, results):
+            # Disable aliases AFTER CoA creates journals
+            disable_result = disable_all_journal_aliases(step_models, db, uid, password, company_id)
+            if disable_result['success']:
+                print(f"Disabled aliases on {disable_result['count']} journals")
+            else:
+                print(f"Warning: Could not disable journal aliases: {disable_result.get('error')}")
+            return disable_result
         
-        if tax_ready['success']:
-            print(f"Taxes are ready! Found {tax_ready['tax_count']} taxes")
-            tax_config_result = configure_taxes_for_company(models, db, uid, password, company_id, is_vat_registered)
+        def custom_accounts_step(step_models, results):
+            custom_accounts_result = create_custom_accounts(step_models, db, uid, password, company_id)
+            if custom_accounts_result['success']:
+                print(f"Successfully created {len(custom_accounts_result['accounts'])} custom accounts")
+            else:
+                print(f"Custom accounts creation issue: {custom_accounts_result.get('error', 'Unknown error')}")
+            return custom_accounts_result
+        
+        def essential_journals_step(step_models, results):
+            journals_result = create_essential_journals(step_models, db, uid, password, company_id, currency_id)
+            if journals_result['success']:
+                print(f"Successfully created {len(journals_result['journals'])} journals")
+                if journals_result.get('existing_count', 0) > 0:
+                    print(f"Found {journals_result['existing_count']} existing journals")
+            else:
+                print(f"Journal creation issue: {journals_result.get('error', 'Unknown error')}")
+            return journals_result
+        
+        def taxes_ready_step(step_models, results):
+            print(f"\nWaiting for taxes to be created before configuration...")
+            tax_ready = wait_for_taxes_to_exist(step_models, db, uid, password, company_id, max_wait_time=60)
+            if tax_ready['success']:
+                print(f"Taxes are ready! Found {tax_ready['tax_count']} taxes")
+            else:
+                print(f"Warning: Taxes not ready yet - {tax_ready['message']}")
+            return tax_ready
+        
+        def tax_configuration_step(step_models, results):
+            tax_ready = results['taxes_ready']
+            if not tax_ready.get('success'):
+                return {'success': False, 'error': tax_ready.get('message', tax_ready.get('error'))}
+            
+            tax_config_result = configure_taxes_for_company(step_models, db, uid, password, company_id, is_vat_registered)
             if tax_config_result['success']:
                 print(f"Tax configuration completed successfully")
                 for update in tax_config_result.get('updates', []):
@@ -258,10 +278,80 @@ def main(data):
                         print(f"  ✗ {update.get('error', 'Update failed')}")
             else:
                 print(f"Tax configuration warning: {tax_config_result.get('error')}")
-        else:
-            print(f"Warning: Taxes not ready yet - {tax_ready['message']}")
-            tax_config_result = {'success': False, 'error': tax_ready['message']}
-
+            return tax_config_result
+        
+        def template_step(step_models, results):
+            return company_template.provision_from_template(
+                step_models, db, uid, password, company_id, template, currency_id
+            )
+        
+        def template_tax_configuration_step(step_models, results):
+            # The template carries the reference company's reverse charge setup;
+            # this only adjusts what depends on the new company's VAT status
+            return configure_taxes_for_company(step_models, db, uid, password, company_id, is_vat_registered)
+        
+        def connect():
+            return xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/object')
+        
+        # Clone from a pre-built template when one is available, skipping the
+        # chart of accounts install and the waits that come with it
+        template = None
+        if data.get('use_template', True):
+            template = company_template.load_template()
+        
+        step_results = None
+        if template:
+            print(f"Provisioning company {company_id} from template {template.get('checksum', '')[:12]}")
+            pipeline = company_provisioning.ProvisioningPipeline(connect=connect)
+            pipeline.add_step('tax_grid_tags', lambda step_models, results: preload_tax_grid_tags(step_models, db, uid, password, company_id))
+            pipeline.add_step('template', template_step, required=True)
+            pipeline.add_step('journal_aliases', journal_aliases_step, depends_on=['template'])
+            pipeline.add_step('tax_configuration', template_tax_configuration_step,
+                              depends_on=['template', 'tax_grid_tags'])
+            
+            step_results, provisioning_timings = pipeline.run()
+            template_result = step_results['template']
+            
+            if template_result.get('success'):
+                chart_ready = {'success': True, 'message': 'Chart of accounts provisioned from company template'}
+                custom_accounts_result = {'success': True, 'accounts': []}
+                journals_result = {
+                    'success': True,
+                    'journals': template_result.get('journals', []),
+                    'existing_count': len(template['journals']) - template_result.get('journals_created', 0)
+                }
+                tax_config_result = step_results['tax_configuration']
+            elif template_result.get('rolled_back'):
+                print(f"Template provisioning failed and was rolled back, falling back to chart installation: {template_result.get('error')}")
+                step_results = None
+            else:
+                # A chart installed on top of a half-cloned one would leave duplicate accounts and taxes
+                return {
+                    'success': False,
+                    'company_id': company_id,
+                    'error': f"Template provisioning failed and could not be rolled back: {template_result.get('error')}",
+                    'provisioning_timings': provisioning_timings
+                }
+        
+        if step_results is None:
+            pipeline = company_provisioning.ProvisioningPipeline(connect=connect)
+            pipeline.add_step('tax_grid_tags', lambda step_models, results: preload_tax_grid_tags(step_models, db, uid, password, company_id))
+            pipeline.add_step('chart_of_accounts', install_chart_step)
+            pipeline.add_step('chart_journals', chart_journals_step, depends_on=['chart_of_accounts'])
+            pipeline.add_step('journal_aliases', journal_aliases_step, depends_on=['chart_journals'])
+            pipeline.add_step('custom_accounts', custom_accounts_step, depends_on=['chart_of_accounts'])
+            pipeline.add_step('essential_journals', essential_journals_step, depends_on=['chart_journals'])
+            pipeline.add_step('taxes_ready', taxes_ready_step, depends_on=['chart_of_accounts'])
+            pipeline.add_step('tax_configuration', tax_configuration_step,
+                              depends_on=['taxes_ready', 'custom_accounts', 'tax_grid_tags'])
+            
+            step_results, provisioning_timings = pipeline.run()
+            
+            chart_ready = step_results['chart_of_accounts']
+            custom_accounts_result = step_results['custom_accounts']
+            journals_result = step_results['essential_journals']
+            tax_config_result = step_results['tax_configuration']
+        
         safe_read_fields = [
             'name', 'email', 'phone', 'website', 'vat', 'company_registry',
             'currency_id', 'country_id', 'street', 'city', 'zip'
@@ -286,7 +376,9 @@ def main(data):
         if data.get('currency_code') != currency_code:
             response['currency_default_applied'] = f'Used default currency: {currency_code}'
         
-        response['chart_of_accounts_status'] = chart_ready['message']
+        response['chart_of_accounts_status'] = chart_ready.get('message', chart_ready.get('error'))
+        response['provisioning_timings'] = provisioning_timings
+        response['provisioning_mode'] = 'template' if 'template' in step_results else 'chart_install'
         
         if custom_accounts_result['success']:
             response['custom_accounts_created'] = custom_accounts_result['accounts']
@@ -347,82 +439,70 @@ def wait_for_taxes_to_exist(models, db, uid, password, company_id, max_wait_time
     """
     Wait for taxes to be created by the chart of accounts installation
     Checks for the existence of key taxes like 19%, 19% S, and 19% RC
+    
+    Polls with adaptive backoff (check_interval is the longest gap between
+    checks) and reads tax names once per check instead of a count plus one
+    search per required tax.
     """
-    start_time = time.time()
     required_taxes = ['19%', '19% S', '19% RC']
     min_tax_count = 10  # Should have at least 10 taxes when chart is installed
+    state = {'tax_count': 0, 'found_taxes': {}}
     
     print(f"Waiting for taxes to be created (max {max_wait_time} seconds)...")
     
-    while time.time() - start_time < max_wait_time:
-        try:
-            # Count total taxes for this company
-            tax_count = models.execute_kw(
-                db, uid, password,
-                'account.tax', 'search_count',
-                [[('company_id', '=', company_id)]]
-            )
-            
-            print(f"Found {tax_count} taxes for company {company_id}")
-            
-            if tax_count >= min_tax_count:
-                # Check if our required taxes exist
-                found_taxes = {}
-                for tax_name in required_taxes:
-                    tax_ids = models.execute_kw(
-                        db, uid, password,
-                        'account.tax', 'search',
-                        [[('name', '=', tax_name), ('company_id', '=', company_id)]],
-                        {'limit': 5}
-                    )
-                    found_taxes[tax_name] = len(tax_ids)
-                    print(f"  - Tax '{tax_name}': found {len(tax_ids)} instances")
-                
-                # Check if all required taxes exist
-                all_found = all(count > 0 for count in found_taxes.values())
-                
-                if all_found:
-                    elapsed_time = int(time.time() - start_time)
-                    return {
-                        'success': True,
-                        'message': f'Taxes ready with {tax_count} total taxes (took {elapsed_time}s)',
-                        'tax_count': tax_count,
-                        'required_taxes_found': found_taxes
-                    }
-                else:
-                    missing = [name for name, count in found_taxes.items() if count == 0]
-                    print(f"  Still waiting for taxes: {missing}")
-            
-            time.sleep(check_interval)
-            
-        except Exception as e:
-            print(f"Error checking taxes: {str(e)}")
-            time.sleep(check_interval)
-    
-    # Timeout reached
-    elapsed_time = int(time.time() - start_time)
-    try:
-        final_tax_count = models.execute_kw(
+    def taxes_ready():
+        taxes = models.execute_kw(
             db, uid, password,
-            'account.tax', 'search_count',
-            [[('company_id', '=', company_id)]]
+            'account.tax', 'search_read',
+            [[('company_id', '=', company_id)]],
+            {'fields': ['name']}
         )
-    except:
-        final_tax_count = 0
+        tax_names = [tax['name'] for tax in taxes]
+        state['tax_count'] = len(tax_names)
+        state['found_taxes'] = {name: tax_names.count(name) for name in required_taxes}
+        print(f"Found {state['tax_count']} taxes for company {company_id}")
+        
+        if state['tax_count'] < min_tax_count:
+            return False
+        
+        missing = [name for name, count in state['found_taxes'].items() if count == 0]
+        if missing:
+            print(f"  Still waiting for taxes: {missing}")
+            return False
+        return True
+    
+    ready, elapsed, attempts = company_provisioning.poll_until(
+        taxes_ready, max_wait_time=max_wait_time, max_interval=check_interval, label='taxes'
+    )
+    elapsed_time = int(elapsed)
+    
+    if ready:
+        return {
+            'success': True,
+            'message': f'Taxes ready with {state["tax_count"]} total taxes (took {elapsed_time}s)',
+            'tax_count': state['tax_count'],
+            'required_taxes_found': state['found_taxes'],
+            'poll_attempts': attempts
+        }
+    
+    # Timeout reached
+    final_tax_count = state['tax_count']
     
     if final_tax_count > 0:
         return {
             'success': True,
             'message': f'Taxes partially ready with {final_tax_count} taxes after {elapsed_time}s (proceeding anyway)',
             'tax_count': final_tax_count,
-            'timeout_reached': True
+            'timeout_reached': True,
+            'poll_attempts': attempts
         }
     else:
         return {
             'success': False,
             'message': f'Taxes not created after {elapsed_time}s - manual setup may be required',
             'tax_count': 0,
-            'timeout_reached': True
+            'timeout_reached': True,
+            'poll_attempts': attempts
         }
 
 
@@ -581,7 +661,21 @@ def disable_all_journal_aliases(models, db, uid, password, company_id):
                 'message': 'No journals found for this company'
             }
         
-        # Update each journal to remove/disable alias
+        # Disable all aliases with one write, falling back to one journal at a time
+        try:
+            models.execute_kw(
+                db, uid, password,
+                'account.journal', 'write',
+                [journals, {'alias_id': False}]
+            )
+            return {
+                'success': True,
+                'count': len(journals),
+                'message': f'Disabled aliases on {len(journals)} journals'
+            }
+        except Exception as e:
+            print(f"Bulk alias update failed, updating journals one by one: {str(e)}")
+        
         updated_count = 0
         for journal_id in journals:
             try:
@@ -612,9 +706,14 @@ def disable_all_journal_aliases(models, db, uid, password, company_id):
 def wait_for_chart_of_accounts(models, db, uid, password, company_id, max_wait_time=120, check_interval=5):
     """
     Wait for Chart of Accounts to be installed by checking if accounts exist
+    
+    Polls with adaptive backoff (check_interval is the longest gap between
+    checks); each check is a single search_read giving both the account
+    count and the account types present.
     """
-    start_time = time.time()
     min_accounts_required = 10
+    essential_account_types = ['asset_receivable', 'liability_payable', 'income', 'expense']
+    state = {'account_count': 0}
     
     print(f"Waiting for Chart of Accounts installation (max {max_wait_time} seconds)...")
     
@@ -630,102 +729,94 @@ def wait_for_chart_of_accounts(models, db, uid, password, company_id, max_wait_t
         print(f"Could not check account fields: {e}")
         has_company_id = False
     
-    while time.time() - start_time < max_wait_time:
-        try:
-            if has_company_id:
-                account_count = models.execute_kw(
-                    db, uid, password,
-                    'account.account', 'search_count',
-                    [[('company_id', '=', company_id)]]
-                )
-            else:
-                all_accounts = models.execute_kw(
-                    db, uid, password,
-                    'account.account', 'search_count',
-                    [[]]
-                )
-                
-                if all_accounts > min_accounts_required:
-                    account_count = all_accounts
-                    print(f"Found {all_accounts} total accounts (company filtering not available)")
-                else:
-                    account_count = 0
-            
-            print(f"Found {account_count} accounts")
-            
-            if account_count >= min_accounts_required:
-                try:
-                    if has_company_id:
-                        essential_account_types = ['asset_receivable', 'liability_payable', 'income', 'expense']
-                        accounts_with_types = models.execute_kw(
-                            db, uid, password,
-                            'account.account', 'search_read',
-                            [[('company_id', '=', company_id), ('account_type', 'in', essential_account_types)]],
-                            {'fields': ['id', 'account_type'], 'limit': len(essential_account_types)}
-                        )
-                        
-                        found_types = set(acc['account_type'] for acc in accounts_with_types)
-                        missing_types = set(essential_account_types) - found_types
-                        
-                        if missing_types:
-                            print(f"Waiting for essential account types: {missing_types}")
-                            time.sleep(check_interval)
-                            continue
-                    
-                    elapsed_time = int(time.time() - start_time)
-                    return {
-                        'success': True,
-                        'message': f'Chart of Accounts ready with {account_count} accounts (took {elapsed_time}s)',
-                        'accounts_count': account_count
-                    }
-                    
-                except Exception as type_check_error:
-                    print(f"Could not check account types: {type_check_error}")
-                    elapsed_time = int(time.time() - start_time)
-                    return {
-                        'success': True,
-                        'message': f'Chart of Accounts ready with {account_count} accounts (took {elapsed_time}s)',
-                        'accounts_count': account_count
-                    }
-            
-            time.sleep(check_interval)
-            
-        except Exception as e:
-            print(f"Error checking accounts: {str(e)}")
-            time.sleep(check_interval)
-    
-    elapsed_time = int(time.time() - start_time)
-    try:
+    def chart_ready():
         if has_company_id:
-            final_account_count = models.execute_kw(
+            accounts = models.execute_kw(
                 db, uid, password,
-                'account.account', 'search_count',
-                [[('company_id', '=', company_id)]]
+                'account.account', 'search_read',
+                [[('company_id', '=', company_id)]],
+                {'fields': ['account_type']}
             )
-        else:
-            final_account_count = models.execute_kw(
-                db, uid, password,
-                'account.account', 'search_count',
-                [[]]
-            )
-    except:
-        final_account_count = 0
+            state['account_count'] = len(accounts)
+            print(f"Found {state['account_count']} accounts")
+            
+            if state['account_count'] < min_accounts_required:
+                return False
+            
+            found_types = set(acc['account_type'] for acc in accounts)
+            missing_types = set(essential_account_types) - found_types
+            if missing_types:
+                print(f"Waiting for essential account types: {missing_types}")
+                return False
+            return True
+        
+        all_accounts = models.execute_kw(
+            db, uid, password,
+            'account.account', 'search_count',
+            [[]]
+        )
+        if all_accounts > min_accounts_required:
+            print(f"Found {all_accounts} total accounts (company filtering not available)")
+            state['account_count'] = all_accounts
+            return True
+        state['account_count'] = 0
+        return False
+    
+    ready, elapsed, attempts = company_provisioning.poll_until(
+        chart_ready, max_wait_time=max_wait_time, max_interval=check_interval, label='chart of accounts'
+    )
+    elapsed_time = int(elapsed)
+    
+    if ready:
+        return {
+            'success': True,
+            'message': f'Chart of Accounts ready with {state["account_count"]} accounts (took {elapsed_time}s)',
+            'accounts_count': state['account_count'],
+            'poll_attempts': attempts
+        }
+    
+    final_account_count = state['account_count']
     
     if final_account_count > 0:
         return {
             'success': True,
             'message': f'Chart of Accounts partially ready with {final_account_count} accounts after {elapsed_time}s (may still be installing)',
             'accounts_count': final_account_count,
-            'timeout_reached': True
+            'timeout_reached': True,
+            'poll_attempts': attempts
         }
     else:
         return {
             'success': False,
             'message': f'Chart of Accounts not ready after {elapsed_time}s - manual setup may be required',
             'accounts_count': 0,
-            'timeout_reached': True
+            'timeout_reached': True,
+            'poll_attempts': attempts
         }
 
+def wait_for_chart_journals(models, db, uid, password, company_id, max_wait_time=30, check_interval=3):
+    """
+    Wait for the sales and purchase journals the Chart of Accounts creates,
+    replacing the old fixed 10 second sleep
+    """
+    def journals_ready():
+        journal_types = models.execute_kw(
+            db, uid, password,
+            'account.journal', 'search_read',
+            [[('company_id', '=', company_id), ('type', 'in', ['sale', 'purchase'])]],
+            {'fields': ['type']}
+        )
+        return {journal['type'] for journal in journal_types} >= {'sale', 'purchase'}
+    
+    ready, elapsed, attempts = company_provisioning.poll_until(
+        journals_ready, max_wait_time=max_wait_time, max_interval=check_interval, label='chart journals'
+    )
+    return {
+        'success': bool(ready),
+        'message': f'Chart journals {"ready" if ready else "not ready"} after {int(elapsed)}s',
+        'poll_attempts': attempts
+    }
+
 def create_essential_journals(models, db, uid, password, company_id, currency_id=None):
     """
     Create essential journals for a new company
@@ -977,10 +1068,25 @@ def find_or_create_component_tax_with_grid(models, db, uid, password, company_id
         print(f"  ❌ Failed: {str(e)}")
         return {'success': False, 'error': str(e)}
 
+# Tax grid tags are shared by every company, so lookups are cached per database
+_tax_grid_tag_cache = {}
+
+def preload_tax_grid_tags(models, db, uid, password, company_id, grid_codes=('+4', '+6', '+7', '-1')):
+    """
+    Resolve the tax grid tags used by tax configuration ahead of time so the
+    tax steps do not look them up once per repartition line
+    """
+    tags = {grid_code: get_tax_grid_tag_ids(models, db, uid, password, company_id, grid_code) for grid_code in grid_codes}
+    return {'success': True, 'tags': tags}
+
 def get_tax_grid_tag_ids(models, db, uid, password, company_id, grid_code):
     """
     Get tax report tag IDs for a specific grid code (e.g., '+6', '+7', '-1', '+4')
     """
+    cache_key = (db, grid_code)
+    if cache_key in _tax_grid_tag_cache:
+        return list(_tax_grid_tag_cache[cache_key])
+    
     try:
         # Search for account report tags with the specific code
         tag_ids = models.execute_kw(
@@ -992,6 +1098,7 @@ def get_tax_grid_tag_ids(models, db, uid, password, company_id, grid_code):
         
         if tag_ids:
             print(f"    Found tax grid tag for {grid_code}: {tag_ids[0]}")
+            _tax_grid_tag_cache[cache_key] = list(tag_ids)
             return tag_ids
         else:
             print(f"    ⚠️  No tax grid tag found for {grid_code}")
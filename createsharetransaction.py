@@ -2,6 +2,7 @@ import xmlrpc.client
 from datetime import datetime
 import os
 import time
+import duplicate_detection
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -284,33 +285,26 @@ def check_duplicate_share_transaction(models, db, uid, password, partner_id, tra
         - Transaction data with exists=True if duplicate found
     """
     try:
-        # Build search criteria for the specific company
-        search_domain = [
-            ('move_type', '=', 'entry'),  # Journal entries
-            ('company_id', '=', company_id),   # Filter by company
-            ('date', '=', transaction_date),
-            ('state', '!=', 'cancel'),  # Exclude cancelled entries
-        ]
-        
-        # Add partner if provided (partner might be optional for share capital)
-        if partner_id:
-            search_domain.append(('partner_id', '=', partner_id))
-        
-        # Add reference to search criteria if provided
-        if customer_ref:
-            search_domain.append(('ref', '=', customer_ref))
-        
-        # Search for existing transactions
-        existing_transactions = models.execute_kw(
-            db, uid, password,
-            'account.move', 'search_read',
-            [search_domain],
-            {'fields': ['id', 'name', 'amount_total', 'state', 'ref', 'partner_id', 'date']}
+        # Look up the (partner, date, amount, ref) fingerprint in the company's
+        # in-memory set of journal entries; partner is optional for share capital
+        fingerprints = duplicate_detection.get_fingerprint_set(
+            models, db, uid, password, company_id, 'entry', transaction_date
         )
+        match = fingerprints.find(partner_id, transaction_date, total_amount, customer_ref)
+        
+        if match:
+            existing_transactions = models.execute_kw(
+                db, uid, password,
+                'account.move', 'read',
+                [[match['id']]],
+                {'fields': ['id', 'name', 'amount_total', 'state', 'ref', 'partner_id', 'date']}
+            )
+        else:
+            existing_transactions = []
         
         # Check if any transaction matches the total amount (with small tolerance for rounding)
         for transaction in existing_transactions:
-            if abs(float(transaction.get('amount_total', 0)) - float(total_amount)) < 0.01:
+            if transaction.get('state') != 'cancel' and abs(float(transaction.get('amount_total', 0)) - float(total_amount)) < 0.01:
                 # Get detailed transaction information including line items
                 line_items = models.execute_kw(
                     db, uid, password,
@@ -707,6 +701,16 @@ def main(data):
                 'error': 'Failed to create share capital transaction in Odoo'
             }
         
+        duplicate_detection.register_created_move(db, company_id, 'entry', {
+            'id': move_id,
+            'partner_id': partner_id,
+            'date': transaction_date,
+            'amount_total': expected_total,
+            'ref': move_data.get('ref'),
+            'journal_id': journal_id,
+            'state': 'draft'
+        })
+        
         # POST THE JOURNAL ENTRY - Move from draft to posted state
         try:
             models.execute_kw(
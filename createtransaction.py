@@ -3,6 +3,8 @@ import xmlrpc.client
 from datetime import datetime
 import hashlib
 import time
+import account_code_allocator
+import partner_index
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -628,14 +630,35 @@ def create_new_account_with_verification(models, db, uid, password, account_name
             'force_company': context.get('allowed_company_ids', [1])[0] if context.get('allowed_company_ids') else 1
         })
         
-        new_account_id = models.execute_kw(
-            db, uid, password,
-            'account.account', 'create',
-            [account_data], 
-            {'context': create_context}
+        allocator = account_code_allocator.get_allocator(
+            db, account_code_allocator.company_id_from_context(context)
         )
         
+        new_account_id = None
+        max_conflict_retries = 3
+        for conflict_attempt in range(max_conflict_retries):
+            try:
+                new_account_id = models.execute_kw(
+                    db, uid, password,
+                    'account.account', 'create',
+                    [account_data], 
+                    {'context': create_context}
+                )
+                allocator.confirm(account_code)
+                break
+            except xmlrpc.client.Fault as create_error:
+                if not account_code_allocator.is_uniqueness_conflict(create_error) or conflict_attempt == max_conflict_retries - 1:
+                    allocator.release(account_code)
+                    raise
+                
+                # Another worker took this code, resync from Odoo and pick the next free one
+                print(f"⚠️  Account code {account_code} already in use, resyncing codes from Odoo...")
+                allocator.resync(models, db, uid, password, context, conflicting_code=account_code)
+                account_code = generate_unique_account_code(models, db, uid, password, account_name, account_type, context)
+                account_data['code'] = account_code
+        
         if not new_account_id:
+            allocator.release(account_code)
             print(f"❌ Failed to create account: {account_name}")
             return None
         
@@ -824,31 +847,19 @@ def generate_unique_account_code(models, db, uid, password, account_name, accoun
         # Pad to ensure 4 digits
         numeric_suffix = numeric_suffix.zfill(4)
         
-        # Combine base code with suffix
-        proposed_code = f"{base_code}{numeric_suffix}"
+        # Reserve the next free code from the company's in-memory code set
+        allocator = account_code_allocator.get_allocator(
+            db, account_code_allocator.company_id_from_context(context)
+        )
+        allocator.ensure_loaded(models, db, uid, password, context)
         
-        # Check if code already exists and find a unique one
-        attempt = 0
-        while attempt < 100:  # Prevent infinite loop
-            existing_accounts = models.execute_kw(
-                db, uid, password,
-                'account.account', 'search',
-                [[('code', '=', proposed_code)]], 
-                {'limit': 1, 'context': context}
-            )
-            
-            if not existing_accounts:
-                print(f"✅ Generated unique account code: {proposed_code}")
-                return proposed_code
-            
-            # Code exists, try with incremented suffix
-            attempt += 1
-            incremented_suffix = str(int(numeric_suffix) + attempt).zfill(4)
-            proposed_code = f"{base_code}{incremented_suffix}"
+        proposed_code = allocator.allocate(base_code, numeric_suffix)
+        if proposed_code:
+            print(f"✅ Generated unique account code: {proposed_code}")
+            return proposed_code
         
-        # If all attempts failed, use timestamp-based code
-        timestamp_suffix = str(int(datetime.now().timestamp()))[-4:]
-        proposed_code = f"{base_code}{timestamp_suffix}"
+        # Every 4-digit suffix for this prefix is taken, widen the suffix
+        proposed_code = allocator.allocate(base_code, numeric_suffix, width=5)
         
         print(f"✅ Generated fallback account code: {proposed_code}")
         return proposed_code
@@ -893,52 +904,22 @@ def find_or_create_partner(models, db, uid, password, partner_name, context):
             # Not an integer, continue with name search
             pass
         
-        # Search for existing partner by exact name match
-        partner_ids = models.execute_kw(
-            db, uid, password,
-            'res.partner', 'search',
-            [[('name', '=', partner_name)]], 
-            {'limit': 1, 'context': context}
+        # Exact and partial name matches come from the shared partner index
+        index = partner_index.get_partner_index(
+            models, db, uid, password, account_code_allocator.company_id_from_context(context)
         )
         
-        if partner_ids:
-            partner_data = models.execute_kw(
-                db, uid, password,
-                'res.partner', 'read',
-                [partner_ids, ['id', 'name', 'email', 'phone', 'is_company', 'vat']], 
-                {'context': context}
-            )
-            
-            partner = partner_data[0]
+        # Search for existing partner by exact name match
+        partner = index.find_by_name(partner_name)
+        if partner:
             print(f"✅ Found existing partner: {partner['name']} (ID: {partner['id']})")
-            return {
-                'id': partner['id'],
-                'name': partner['name'],
-                'email': partner.get('email'),
-                'phone': partner.get('phone'),
-                'is_company': partner.get('is_company'),
-                'vat': partner.get('vat'),
-                'created': False
-            }
-        
-        # Try partial match (case insensitive)
-        partner_ids = models.execute_kw(
-            db, uid, password,
-            'res.partner', 'search',
-            [[('name', 'ilike', partner_name)]], 
-            {'limit': 1, 'context': context}
-        )
+        else:
+            # Try partial match (case insensitive)
+            partner = index.find_by_substring(partner_name)
+            if partner:
+                print(f"✅ Found partner by partial match: {partner['name']} (ID: {partner['id']})")
         
-        if partner_ids:
-            partner_data = models.execute_kw(
-                db, uid, password,
-                'res.partner', 'read',
-                [partner_ids, ['id', 'name', 'email', 'phone', 'is_company', 'vat']], 
-                {'context': context}
-            )
-            
-            partner = partner_data[0]
-            print(f"✅ Found partner by partial match: {partner['name']} (ID: {partner['id']})")
+        if partner:
             return {
                 'id': partner['id'],
                 'name': partner['name'],
@@ -972,6 +953,10 @@ def find_or_create_partner(models, db, uid, password, partner_name, context):
         
         if new_partner_id:
             print(f"✅ Created new partner: {partner_name} (ID: {new_partner_id})")
+            partner_index.register_created_partner(
+                db, account_code_allocator.company_id_from_context(context),
+                dict(partner_data, id=new_partner_id)
+            )
             return {
                 'id': new_partner_id,
                 'name': partner_name,
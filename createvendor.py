@@ -3,6 +3,7 @@ import logging
 from typing import Dict, Optional, Union
 import os
 from difflib import SequenceMatcher
+import partner_index
 
 # Load .env only in development (when .env file exists)
 if os.path.exists('.env'):
@@ -61,13 +62,13 @@ def check_vendor_exists_comprehensive(models, db, uid, password, data, company_i
     """
     Comprehensive check if vendor already exists using multiple criteria including fuzzy matching
     Returns vendor_id if found, None otherwise
+    
+    Lookups go through the shared per-company partner index, so only the
+    trigram candidates are scored instead of every vendor of the company.
     """
     try:
-        # First, get all existing vendors for the company
-        existing_vendors = get_vendors_for_company(models, db, uid, password, company_id)
-        
-        if not existing_vendors:
-            return None
+        index = partner_index.get_partner_index(models, db, uid, password, company_id)
+        lookup = {'role': 'vendor', 'strict_company': bool(company_id)}
         
         input_name = data.get('name', '').strip()
         input_email = data.get('email', '').strip().lower() if data.get('email') else None
@@ -76,73 +77,36 @@ def check_vendor_exists_comprehensive(models, db, uid, password, data, company_i
         # Priority order for matching:
         # 1. VAT number (exact match - most reliable)
         # 2. Email exact match
-        # 3. Email + Name combination (exact)
-        # 4. Fuzzy name matching (similarity > 85%)
-        # 5. Exact name match (fallback)
+        # 3. Fuzzy name matching (similarity > 85%)
+        # 4. Exact name match (fallback)
         
         # 1. Check by VAT if provided (exact match)
         if input_vat:
-            for vendor in existing_vendors:
-                if vendor.get('vat') and vendor['vat'].strip().lower() == input_vat.lower():
-                    print(f"Found vendor by VAT match: {vendor['name']}")
-                    return vendor['id']
+            vendor = index.find_by_vat(input_vat, **lookup)
+            if vendor:
+                print(f"Found vendor by VAT match: {vendor['name']}")
+                return vendor['id']
         
         # 2. Check by email exact match
         if input_email:
-            for vendor in existing_vendors:
-                vendor_email = vendor.get('email', '').strip().lower() if vendor.get('email') else ''
-                if vendor_email and vendor_email == input_email:
-                    print(f"Found vendor by email match: {vendor['name']}")
-                    return vendor['id']
-        
-        # 3. Check by email + name combination (both exact)
-        if input_email and input_name:
-            for vendor in existing_vendors:
-                vendor_email = vendor.get('email', '').strip().lower() if vendor.get('email') else ''
-                vendor_name = vendor.get('name', '').strip()
-                if (vendor_email == input_email and 
-                    vendor_name.lower() == input_name.lower()):
-                    print(f"Found vendor by email+name combination: {vendor['name']}")
-                    return vendor['id']
-        
-        # 4. Fuzzy name matching (similarity > 85%)
+            vendor = index.find_by_email(input_email, **lookup)
+            if vendor:
+                print(f"Found vendor by email match: {vendor['name']}")
+                return vendor['id']
+        
+        # 3. Fuzzy name matching (similarity > 85%)
         if input_name:
-            normalized_input = normalize_string(input_name)
-            best_match = None
-            best_similarity = 0
-            
-            for vendor in existing_vendors:
-                vendor_name = vendor.get('name', '').strip()
-                if not vendor_name:
-                    continue
-                    
-                normalized_vendor = normalize_string(vendor_name)
-                
-                # Calculate similarity
-                sim_score = similarity(normalized_input, normalized_vendor)
-                
-                # Also check raw similarity without normalization
-                raw_sim_score = similarity(input_name, vendor_name)
-                
-                # Take the higher of the two scores
-                final_score = max(sim_score, raw_sim_score)
-                
-                if final_score > best_similarity:
-                    best_similarity = final_score
-                    best_match = vendor
-            
-            # If similarity is above threshold (85%), consider it a match
-            if best_similarity > 0.85:
+            best_match, best_similarity = index.find_fuzzy(input_name, **lookup)
+            if best_match:
                 print(f"Found vendor by fuzzy match (similarity: {best_similarity:.2%}): {best_match['name']}")
                 return best_match['id']
         
-        # 5. Exact name match (fallback)
+        # 4. Exact name match (fallback)
         if input_name:
-            for vendor in existing_vendors:
-                vendor_name = vendor.get('name', '').strip()
-                if vendor_name.lower() == input_name.lower():
-                    print(f"Found vendor by exact name match: {vendor['name']}")
-                    return vendor['id']
+            vendor = index.find_by_name(input_name, **lookup)
+            if vendor:
+                print(f"Found vendor by exact name match: {vendor['name']}")
+                return vendor['id']
         
         return None
         
@@ -271,6 +235,19 @@ def main(data):
                 'error': 'Failed to create vendor in Odoo'
             }
         
+        # Keep the shared partner index warm without a reload
+        partner_index.register_created_partner(db, company_id, {
+            'id': vendor_id,
+            'name': data['name'],
+            'email': data.get('email') if is_valid_value(data.get('email')) else None,
+            'vat': data.get('vat') if is_valid_value(data.get('vat')) else None,
+            'phone': data.get('phone') if is_valid_value(data.get('phone')) else None,
+            'is_company': True,
+            'supplier_rank': 1,
+            'customer_rank': 0,
+            'company_id': company_id
+        })
+        
         # Get created vendor information
         vendor_info = get_vendor_info(models, db, uid, password, vendor_id)
         
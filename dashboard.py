@@ -1,15 +1,17 @@
 # dashboard.py
-import boto3
+import aws_clients
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 from decimal import Decimal
 import os
+import batch_files
+import dashboard_counters
 
 # Configuration
 AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
 
 # DynamoDB setup
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
 batches_table = dynamodb.Table('batch_processing')
 users_table = dynamodb.Table('users')
 
@@ -30,53 +32,12 @@ def convert_decimal(obj):
 def get_dashboard_metrics(username, company_name=None):
     """Get dashboard metrics for a specific user by username"""
     try:
-        # IMPORTANT: Filter by username (each username is unique per user/company)
-        # The batch_processing table does NOT have business_company_id field
-        filter_expression = 'username = :username'
-        expression_values = {':username': username}
-        
-        # Add company_name filter if provided for extra safety
-        if company_name:
-            filter_expression += ' AND company_name = :company_name'
-            expression_values[':company_name'] = company_name
-        
-        response = batches_table.scan(
-            FilterExpression=filter_expression,
-            ExpressionAttributeValues=expression_values
-        )
+        # Counters are maintained on write (see dashboard_counters), so this
+        # is a single GetItem regardless of how many batches the user has
+        stats = dashboard_counters.get_or_build_user_stats(username, company_name)
         
-        batches = convert_decimal(response.get('Items', []))
-        
-        # Calculate metrics from batch data
-        total_documents = 0
-        completed_documents = 0
-        failed_documents = 0
-        pending_items = 0
-        total_batches = len(batches)
-        
-        for batch in batches:
-            # Use batch-level counters if available
-            batch_total = batch.get('total_documents', 0)
-            batch_completed = batch.get('completed_documents', 0)
-            batch_failed = batch.get('failed_documents', 0)
-            
-            if batch_total > 0:
-                total_documents += batch_total
-                completed_documents += batch_completed
-                failed_documents += batch_failed
-            else:
-                # Fallback: count from files array
-                files = batch.get('files', [])
-                total_documents += len(files)
-                
-                for file in files:
-                    status = file.get('status', 'uploaded')
-                    if status == 'complete':
-                        completed_documents += 1
-                    elif status == 'error':
-                        failed_documents += 1
-                    elif status in ['uploaded', 'processing', 'pending']:
-                        pending_items += 1
+        total_documents = stats.get('total_documents', 0)
+        completed_documents = stats.get('completed_documents', 0)
         
         # Calculate compliance status (percentage of completed documents)
         compliance_status = "0%"
@@ -92,9 +53,9 @@ def get_dashboard_metrics(username, company_name=None):
             "data": {
                 "documents_processed": completed_documents,
                 "total_documents": total_documents,
-                "documents_failed": failed_documents,
-                "pending_items": pending_items,
-                "total_batches": total_batches,
+                "documents_failed": stats.get('failed_documents', 0),
+                "pending_items": max(stats.get('pending_documents', 0), 0),
+                "total_batches": stats.get('total_batches', 0),
                 "monthly_revenue": monthly_revenue,
                 "compliance_status": compliance_status
             }
@@ -116,56 +77,15 @@ def get_dashboard_metrics(username, company_name=None):
 def get_recent_documents(username, company_name=None, limit=10):
     """Get recent documents for a specific user by username"""
     try:
-        # IMPORTANT: Filter by username (each username is unique per user/company)
-        # The batch_processing table does NOT have business_company_id field
-        filter_expression = 'username = :username'
-        expression_values = {':username': username}
-        
-        # Add company_name filter if provided for extra safety
-        if company_name:
-            filter_expression += ' AND company_name = :company_name'
-            expression_values[':company_name'] = company_name
-        
-        response = batches_table.scan(
-            FilterExpression=filter_expression,
-            ExpressionAttributeValues=expression_values
-        )
-        
-        batches = convert_decimal(response.get('Items', []))
-        
-        # Extract all files from batches
-        all_documents = []
-        for batch in batches:
-            batch_id = batch.get('batch_id')
-            batch_created_at = batch.get('created_at', '')
-            batch_stage = batch.get('processing_stage', 'uploaded')
-            company_name = batch.get('company_name', '')
-            
-            files = batch.get('files', [])
-            for file in files:
-                all_documents.append({
-                    'batch_id': batch_id,
-                    'filename': file.get('filename', 'Unknown'),
-                    'document_type': file.get('document_type', 'unknown'),
-                    'status': file.get('status', 'uploaded'),
-                    'file_size': file.get('size', 0),
-                    'content_type': file.get('content_type', 'application/pdf'),
-                    'processed_at': file.get('processed_at') or batch_created_at,
-                    'uploaded_at': batch_created_at,
-                    'batch_stage': batch_stage,
-                    'company_name': company_name
-                })
-        
-        # Sort by processed_at or uploaded_at (most recent first)
-        all_documents.sort(key=lambda x: x.get('processed_at', x.get('uploaded_at', '')), reverse=True)
+        stats = dashboard_counters.get_or_build_user_stats(username, company_name)
         
-        # Limit results
-        recent_documents = all_documents[:limit]
+        # The stats item keeps the most recent documents, newest first
+        recent_documents = stats.get('recent_documents', [])[:limit]
         
         return {
             "success": True,
             "documents": recent_documents,
-            "total_count": len(all_documents)
+            "total_count": stats.get('total_documents', 0)
         }
         
     except ClientError as e:
@@ -208,7 +128,7 @@ def get_compliance_items(username, company_name=None):
             batch_stage = batch.get('processing_stage', 'uploaded')
             batch_created = batch.get('created_at', '')
             
-            files = batch.get('files', [])
+            files = batch_files.files_as_list(batch.get('files'))
             
             for file in files:
                 status = file.get('status', 'uploaded')
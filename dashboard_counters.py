@@ -0,0 +1,399 @@
+import aws_clients
+from datetime import datetime
+from botocore.exceptions import ClientError
+from decimal import Decimal
+import json
+import os
+import time
+import batch_files
+
+# Configuration
+AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
+
+# DynamoDB setup
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
+batches_table = dynamodb.Table('batch_processing')
+stats_table = dynamodb.Table(os.getenv('DASHBOARD_STATS_TABLE', 'user_dashboard_stats'))
+
+# Most recent documents kept on the stats item
+RECENT_DOCUMENTS_LIMIT = 25
+MAX_WRITE_ATTEMPTS = 5
+
+# A stats item still marked as building after this long was abandoned
+BUILD_TIMEOUT_SECONDS = 300
+
+COUNTER_FIELDS = ['total_documents', 'completed_documents', 'failed_documents', 'pending_documents', 'total_batches']
+
+
+def convert_decimal(obj):
+    """Convert DynamoDB Decimal objects to regular Python numbers"""
+    if isinstance(obj, dict):
+        return {k: convert_decimal(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_decimal(v) for v in obj]
+    elif isinstance(obj, Decimal):
+        if obj % 1 == 0:
+            return int(obj)
+        else:
+            return float(obj)
+    else:
+        return obj
+
+
+def document_entry(batch, file_item):
+    """Shape of a document in the recent-documents ring"""
+    batch_created_at = batch.get('created_at', '')
+    return {
+        'batch_id': batch.get('batch_id'),
+        'file_id': file_item.get('file_id'),
+        'filename': file_item.get('filename', 'Unknown'),
+        'document_type': file_item.get('document_type', 'unknown'),
+        'status': file_item.get('status', 'uploaded'),
+        'file_size': file_item.get('size', 0),
+        'content_type': file_item.get('content_type', 'application/pdf'),
+        'processed_at': file_item.get('processed_at') or batch_created_at,
+        'uploaded_at': batch_created_at,
+        'batch_stage': batch.get('processing_stage', 'uploaded'),
+        'company_name': batch.get('company_name', '')
+    }
+
+
+def _merge_recent(existing, updates):
+    """Upsert documents by (batch_id, file_id/filename) and keep the newest"""
+    def key(doc):
+        return (doc.get('batch_id'), doc.get('file_id') or doc.get('filename'))
+
+    merged = {key(doc): doc for doc in existing}
+    for doc in updates:
+        merged[key(doc)] = dict(merged.get(key(doc), {}), **doc)
+
+    documents = sorted(
+        merged.values(),
+        key=lambda doc: doc.get('processed_at') or doc.get('uploaded_at') or '',
+        reverse=True
+    )
+    return documents[:RECENT_DOCUMENTS_LIMIT]
+
+
+def apply_changes(username, company_name=None, deltas=None, recent_updates=None):
+    """
+    Atomically add counter deltas and upsert recent documents for a user.
+
+    Counters are changed with ADD so concurrent writers never lose an
+    increment. The recent-documents ring is rewritten under an optimistic
+    version check and retried on conflict. Failures are logged and
+    swallowed; the source of truth stays in batch_processing and
+    rebuild_user_stats can always recompute the item.
+
+    Users without a stats item are skipped: the first dashboard read
+    builds the item from batch_processing, which already includes this
+    change, so history from before the item existed is never lost.
+    """
+    if not username:
+        return False
+
+    deltas = {field: int(value) for field, value in (deltas or {}).items() if value}
+    recent_updates = recent_updates or []
+
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        try:
+            expression_names = {}
+            expression_values = {':updated_at': datetime.utcnow().isoformat()}
+            set_parts = ['updated_at = :updated_at']
+            add_parts = []
+
+            if company_name:
+                set_parts.append('company_name = if_not_exists(company_name, :company_name)')
+                expression_values[':company_name'] = company_name
+
+            for field, value in deltas.items():
+                add_parts.append(f'#{field} :{field}')
+                expression_names[f'#{field}'] = field
+                expression_values[f':{field}'] = value
+
+            condition = 'attribute_exists(username)'
+
+            if recent_updates:
+                current = stats_table.get_item(
+                    Key={'username': username},
+                    ProjectionExpression='recent_documents, recent_version'
+                ).get('Item')
+                if current is None:
+                    return False
+                version = int(current.get('recent_version', 0))
+
+                set_parts.append('recent_documents = :recent')
+                add_parts.append('recent_version :one')
+                expression_values[':recent'] = _merge_recent(current.get('recent_documents', []), recent_updates)
+                expression_values[':one'] = 1
+
+                condition += ' AND recent_version = :version'
+                expression_values[':version'] = version
+
+            update_expression = 'SET ' + ', '.join(set_parts)
+            if add_parts:
+                update_expression += ' ADD ' + ', '.join(add_parts)
+
+            kwargs = {
+                'Key': {'username': username},
+                'UpdateExpression': update_expression,
+                'ConditionExpression': condition,
+                'ExpressionAttributeValues': expression_values
+            }
+            if expression_names:
+                kwargs['ExpressionAttributeNames'] = expression_names
+
+            stats_table.update_item(**kwargs)
+            return True
+
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                if not recent_updates:
+                    # Deltas only fail their condition when there is no item yet
+                    return False
+                continue
+            print(f"⚠️  Could not update dashboard counters for {username}: {e}")
+            return False
+        except Exception as e:
+            print(f"⚠️  Could not update dashboard counters for {username}: {e}")
+            return False
+
+    print(f"⚠️  Gave up updating dashboard counters for {username} after {MAX_WRITE_ATTEMPTS} conflicts")
+    return False
+
+
+def record_batch_created(batch_data):
+    """Count a new batch and its files"""
+    files = batch_data.get('files', [])
+    return apply_changes(
+        batch_data.get('username'),
+        batch_data.get('company_name'),
+        deltas={
+            'total_batches': 1,
+            'total_documents': len(files),
+            'pending_documents': len(files)
+        },
+        recent_updates=[document_entry(batch_data, file_item) for file_item in files]
+    )
+
+
+def record_batch_progress(batch_item, completed_documents=None, failed_documents=None, recent_updates=None):
+    """
+    Apply the change between a batch's stored counters and its new values.
+
+    batch_item is the batch as it was before the update; documents that
+    become completed or failed leave the pending count.
+    """
+    completed_delta = 0
+    failed_delta = 0
+    if completed_documents is not None:
+        completed_delta = int(completed_documents) - int(batch_item.get('completed_documents', 0) or 0)
+    if failed_documents is not None:
+        failed_delta = int(failed_documents) - int(batch_item.get('failed_documents', 0) or 0)
+
+    return apply_changes(
+        batch_item.get('username'),
+        batch_item.get('company_name'),
+        deltas={
+            'completed_documents': completed_delta,
+            'failed_documents': failed_delta,
+            'pending_documents': -(completed_delta + failed_delta)
+        },
+        recent_updates=recent_updates
+    )
+
+
+def record_file_transition(batch_item, old_status, new_status, recent_updates=None):
+    """
+    Apply one file's status change: +/-1 completed when it becomes or stops
+    being 'complete', +/-1 failed likewise for 'error'.
+
+    Unlike record_batch_progress this doesn't depend on the batch counters
+    read before the update, so concurrent updates to different files of
+    the same batch each count once.
+    """
+    completed_delta = 0
+    failed_delta = 0
+    if old_status != new_status:
+        completed_delta = (new_status == 'complete') - (old_status == 'complete')
+        failed_delta = (new_status == 'error') - (old_status == 'error')
+
+    return apply_changes(
+        batch_item.get('username'),
+        batch_item.get('company_name'),
+        deltas={
+            'completed_documents': completed_delta,
+            'failed_documents': failed_delta,
+            'pending_documents': -(completed_delta + failed_delta)
+        },
+        recent_updates=recent_updates
+    )
+
+
+def get_user_stats(username):
+    """Single GetItem for the materialized stats. Returns None if not built yet."""
+    item = stats_table.get_item(Key={'username': username}).get('Item')
+    return convert_decimal(item) if item else None
+
+
+def _scan_user_batches(username, company_name=None):
+    filter_expression = 'username = :username'
+    expression_values = {':username': username}
+    if company_name:
+        filter_expression += ' AND company_name = :company_name'
+        expression_values[':company_name'] = company_name
+
+    kwargs = {'FilterExpression': filter_expression, 'ExpressionAttributeValues': expression_values}
+    batches = []
+    while True:
+        response = batches_table.scan(**kwargs)
+        batches.extend(convert_decimal(response.get('Items', [])))
+        if 'LastEvaluatedKey' not in response:
+            return batches
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def compute_user_stats(username, company_name=None):
+    """Recompute the stats item from every batch of the user (paginated scan)"""
+    stats = {field: 0 for field in COUNTER_FIELDS}
+    recent = []
+
+    batches = _scan_user_batches(username, company_name)
+    stats['total_batches'] = len(batches)
+
+    for batch in batches:
+        files = batch_files.files_as_list(batch.get('files'))
+        batch_total = batch.get('total_documents', 0) or len(files)
+        batch_completed = batch.get('completed_documents', 0)
+        batch_failed = batch.get('failed_documents', 0)
+
+        stats['total_documents'] += batch_total
+        stats['completed_documents'] += batch_completed
+        stats['failed_documents'] += batch_failed
+        stats['pending_documents'] += max(batch_total - batch_completed - batch_failed, 0)
+
+        recent = _merge_recent(recent, [document_entry(batch, file_item) for file_item in files])
+
+    stats['recent_documents'] = recent
+    return stats
+
+
+def _claim_stats_item(username, company_name=None):
+    """
+    Create an empty stats item marked as building. Returns False if the
+    user already has one.
+    """
+    item = {field: 0 for field in COUNTER_FIELDS}
+    item.update(
+        username=username,
+        recent_documents=[],
+        recent_version=0,
+        building_since=int(time.time()),
+        updated_at=datetime.utcnow().isoformat()
+    )
+    if company_name:
+        item['company_name'] = company_name
+
+    try:
+        stats_table.put_item(Item=item, ConditionExpression='attribute_not_exists(username)')
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+
+def rebuild_user_stats(username, company_name=None):
+    """
+    Build the stats item from batch_processing (backfill).
+
+    The item is claimed empty first, so counter changes that arrive while
+    the batches are scanned are ADDed to it by apply_changes instead of
+    being dropped; the scanned totals are then added on top of them. A
+    change to a batch the scan had not reached yet is counted twice, which
+    the next rebuild repairs. Readers get freshly computed stats while
+    the item is being built.
+    """
+    if not _claim_stats_item(username, company_name):
+        stats = get_user_stats(username)
+        if stats is None or stats.get('building_since'):
+            return compute_user_stats(username, company_name)
+        return stats
+
+    stats = compute_user_stats(username, company_name)
+    scanned_recent = stats.pop('recent_documents')
+
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        current = stats_table.get_item(
+            Key={'username': username},
+            ProjectionExpression='recent_documents, recent_version'
+        ).get('Item') or {}
+        version = int(current.get('recent_version', 0))
+
+        expression_names = {}
+        expression_values = {
+            ':recent': _merge_recent(scanned_recent, current.get('recent_documents', [])),
+            ':version': version,
+            ':one': 1,
+            ':updated_at': datetime.utcnow().isoformat()
+        }
+        add_parts = ['recent_version :one']
+        for field, value in stats.items():
+            if value:
+                add_parts.append(f'#{field} :{field}')
+                expression_names[f'#{field}'] = field
+                expression_values[f':{field}'] = value
+
+        kwargs = {
+            'Key': {'username': username},
+            'UpdateExpression': 'SET recent_documents = :recent, updated_at = :updated_at'
+                                ' REMOVE building_since ADD ' + ', '.join(add_parts),
+            'ConditionExpression': 'recent_version = :version',
+            'ExpressionAttributeValues': json.loads(json.dumps(expression_values, default=str), parse_float=Decimal)
+        }
+        if expression_names:
+            kwargs['ExpressionAttributeNames'] = expression_names
+
+        try:
+            stats_table.update_item(**kwargs)
+            break
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+    else:
+        print(f"⚠️  Gave up storing rebuilt dashboard stats for {username} after {MAX_WRITE_ATTEMPTS} conflicts")
+        return dict(stats, recent_documents=scanned_recent)
+
+    print(f"✅ Rebuilt dashboard stats for {username}: {stats['total_batches']} batches")
+    return get_user_stats(username)
+
+
+def _abandon_stale_build(username, stats):
+    """Drop a build marker left behind by a request that died mid-build"""
+    if time.time() - int(stats['building_since']) < BUILD_TIMEOUT_SECONDS:
+        return False
+    try:
+        stats_table.delete_item(
+            Key={'username': username},
+            ConditionExpression='building_since = :since',
+            ExpressionAttributeValues={':since': stats['building_since']}
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+    return True
+
+
+def get_or_build_user_stats(username, company_name=None):
+    """Materialized stats for a user, building them on first access"""
+    stats = get_user_stats(username)
+    if stats is not None and stats.get('building_since'):
+        if not _abandon_stale_build(username, stats):
+            return compute_user_stats(username, company_name)
+        stats = None
+    if stats is None:
+        return rebuild_user_stats(username, company_name)
+    if company_name and stats.get('company_name') and stats['company_name'] != company_name:
+        # Counters are per user; a mismatched company filter can't use them
+        return compute_user_stats(username, company_name)
+    return stats
@@ -0,0 +1,320 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+MOVE_FIELDS = ['id', 'name', 'partner_id', 'date', 'invoice_date', 'amount_total', 'ref', 'state', 'journal_id']
+
+# Invoices and bills are keyed on invoice_date, journal entries on the accounting date
+DATE_FIELDS = {
+    'in_invoice': 'invoice_date',
+    'out_invoice': 'invoice_date',
+    'in_refund': 'invoice_date',
+    'out_refund': 'invoice_date',
+    'entry': 'date',
+}
+
+DEFAULT_WINDOW_DAYS = 45
+
+
+def to_cents(amount):
+    try:
+        return int(round(float(amount) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _many2one_id(value):
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value or None
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class MoveFingerprintSet:
+    """
+    Compact fingerprints of account.move records for one company/move type.
+
+    Each non-cancelled move is reduced to (partner, date, amount in cents,
+    ref). Moves are loaded for a date window in a single search_read and
+    duplicate checks become dict lookups. The set is kept consistent by
+    registering moves this process creates and by pulling moves written
+    by other workers since the last sync. Single checks accept a sync up
+    to refresh_seconds old; check_batch syncs once at the start of every
+    batch, so a batch sees everything written before it began.
+    """
+
+    def __init__(self, company_id, move_type, refresh_seconds=15, full_reload_seconds=900):
+        self.company_id = company_id
+        self.move_type = move_type
+        self.date_field = DATE_FIELDS.get(move_type, 'date')
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.moves = {}
+        self.by_fingerprint = defaultdict(set)
+        self.by_date_amount = defaultdict(set)
+        self.by_date = defaultdict(set)
+        self.window = None
+        self.loaded_at = None
+        self.synced_at = None
+        self.last_sync_marker = None
+
+    # ---- loading -------------------------------------------------------
+
+    def _domain(self, date_from, date_to):
+        return [
+            ('move_type', '=', self.move_type),
+            ('company_id', '=', self.company_id),
+            (self.date_field, '>=', date_from.strftime('%Y-%m-%d')),
+            (self.date_field, '<=', date_to.strftime('%Y-%m-%d')),
+        ]
+
+    def covers(self, date_from, date_to):
+        return self.window is not None and self.window[0] <= date_from and date_to <= self.window[1]
+
+    def load(self, models, db, uid, password, date_from, date_to):
+        """Load every non-cancelled move of the window in one query"""
+        if self.window is not None and self.loaded_at and time.time() - self.loaded_at < self.full_reload_seconds:
+            # Grow the window instead of dropping what is already loaded
+            date_from = min(date_from, self.window[0])
+            date_to = max(date_to, self.window[1])
+
+        sync_marker = (datetime.utcnow() - timedelta(seconds=5)).strftime('%Y-%m-%d %H:%M:%S')
+        moves = models.execute_kw(
+            db, uid, password,
+            'account.move', 'search_read',
+            [self._domain(date_from, date_to) + [('state', '!=', 'cancel')]],
+            {'fields': MOVE_FIELDS}
+        )
+
+        with self._lock:
+            self._reset()
+            for move in moves:
+                self._index(move)
+            now = time.time()
+            self.window = (date_from, date_to)
+            self.loaded_at = now
+            self.synced_at = now
+            self.last_sync_marker = sync_marker
+
+        print(f"✅ Loaded {len(moves)} {self.move_type} fingerprints for company {self.company_id} "
+              f"({date_from} to {date_to})")
+        return len(moves)
+
+    def refresh(self, models, db, uid, password):
+        """Re-index moves written since the last sync, including cancellations"""
+        sync_marker = (datetime.utcnow() - timedelta(seconds=5)).strftime('%Y-%m-%d %H:%M:%S')
+        changed = models.execute_kw(
+            db, uid, password,
+            'account.move', 'search_read',
+            [self._domain(*self.window) + [('write_date', '>=', self.last_sync_marker)]],
+            {'fields': MOVE_FIELDS}
+        )
+
+        with self._lock:
+            for move in changed:
+                self._index(move)
+            self.synced_at = time.time()
+            self.last_sync_marker = sync_marker
+
+        return len(changed)
+
+    def ensure_window(self, models, db, uid, password, date_from, date_to, max_age=None):
+        """Load or refresh so the window is covered and synced within max_age seconds"""
+        max_age = self.refresh_seconds if max_age is None else max_age
+        now = time.time()
+        if not self.covers(date_from, date_to) or now - self.loaded_at > self.full_reload_seconds:
+            self.load(models, db, uid, password, date_from, date_to)
+        elif now - self.synced_at >= max_age:
+            try:
+                self.refresh(models, db, uid, password)
+            except Exception as e:
+                print(f"⚠️  Fingerprint refresh failed, reloading: {e}")
+                self.load(models, db, uid, password, date_from, date_to)
+
+    # ---- maintenance ---------------------------------------------------
+
+    def _unindex(self, move_id):
+        old = self.moves.pop(move_id, None)
+        if not old:
+            return
+        for mapping, key in [
+            (self.by_fingerprint, (old['partner_id'], old['date'], old['cents'])),
+            (self.by_date_amount, (old['date'], old['cents'])),
+            (self.by_date, old['date']),
+        ]:
+            bucket = mapping.get(key)
+            if bucket is not None:
+                bucket.discard(move_id)
+                if not bucket:
+                    del mapping[key]
+
+    def _index(self, move):
+        move_id = move.get('id')
+        if not move_id:
+            return
+        self._unindex(move_id)
+        if move.get('state') == 'cancel':
+            return
+
+        date_value = move.get(self.date_field) or move.get('date')
+        if not date_value:
+            return
+
+        record = {
+            'id': move_id,
+            'name': move.get('name'),
+            'partner_id': _many2one_id(move.get('partner_id')),
+            'date': str(date_value)[:10],
+            'cents': to_cents(move.get('amount_total')),
+            'amount_total': move.get('amount_total'),
+            'ref': move.get('ref') or None,
+            'state': move.get('state'),
+            'journal_id': _many2one_id(move.get('journal_id')),
+        }
+        self.moves[move_id] = record
+        self.by_fingerprint[(record['partner_id'], record['date'], record['cents'])].add(move_id)
+        self.by_date_amount[(record['date'], record['cents'])].add(move_id)
+        self.by_date[record['date']].add(move_id)
+
+    def register(self, move):
+        """Record a move this process just created"""
+        with self._lock:
+            self._index(move)
+
+    # ---- lookups -------------------------------------------------------
+
+    def find(self, partner_id, date, amount, ref=None):
+        """
+        Return the first existing move with the same fingerprint.
+
+        partner_id None matches any partner, ref None matches any ref, and
+        amounts match within one cent like the per-document Odoo checks.
+        """
+        date = str(date)[:10]
+        cents = to_cents(amount)
+        with self._lock:
+            for candidate_cents in (cents, cents - 1, cents + 1):
+                if partner_id:
+                    ids = self.by_fingerprint.get((partner_id, date, candidate_cents), ())
+                else:
+                    ids = self.by_date_amount.get((date, candidate_cents), ())
+                for move_id in sorted(ids):
+                    move = self.moves[move_id]
+                    if abs(float(move['amount_total'] or 0) - float(amount)) >= 0.01:
+                        continue
+                    if ref and move['ref'] != ref:
+                        continue
+                    return dict(move)
+        return None
+
+    def find_on_date(self, date, journal_id=None):
+        """All moves on a date, optionally limited to one journal"""
+        date = str(date)[:10]
+        with self._lock:
+            return [
+                dict(self.moves[move_id]) for move_id in sorted(self.by_date.get(date, ()))
+                if not journal_id or self.moves[move_id]['journal_id'] == journal_id
+            ]
+
+
+_sets = {}
+_sets_lock = threading.Lock()
+
+
+def get_fingerprint_set(models, db, uid, password, company_id, move_type, date_from, date_to=None, max_age=None):
+    """
+    Return the warm fingerprint set for a company/move type, loaded for at
+    least the given date range (defaults to +/- DEFAULT_WINDOW_DAYS) and
+    synced within max_age seconds (defaults to the set's refresh_seconds).
+    """
+    start = _parse_date(date_from)
+    end = _parse_date(date_to) if date_to else start
+    start -= timedelta(days=DEFAULT_WINDOW_DAYS)
+    end += timedelta(days=DEFAULT_WINDOW_DAYS)
+
+    key = (db, company_id, move_type)
+    with _sets_lock:
+        fingerprints = _sets.get(key)
+        if fingerprints is None:
+            fingerprints = MoveFingerprintSet(company_id, move_type)
+            _sets[key] = fingerprints
+
+    fingerprints.ensure_window(models, db, uid, password, start, end, max_age)
+    return fingerprints
+
+
+def register_created_move(db, company_id, move_type, move):
+    """Add a created move to the loaded fingerprint set, if there is one"""
+    with _sets_lock:
+        fingerprints = _sets.get((db, company_id, move_type))
+    if fingerprints is not None:
+        fingerprints.register(move)
+
+
+def check_batch(models, db, uid, password, company_id, move_type, documents):
+    """
+    Check a whole batch of documents for duplicates.
+
+    The set is synced once for the batch (a write_date refresh, or a load
+    if the window is not covered yet) and every document is then answered
+    from memory. Each document is a dict with partner_id, date, amount and
+    optional ref. Returns one result per document, in order. Documents that
+    repeat an earlier document of the same batch are reported as batch
+    duplicates.
+    """
+    dated = [doc for doc in documents if doc.get('date')]
+    if not dated:
+        return [{'index': i, 'is_duplicate': False} for i in range(len(documents))]
+
+    dates = [_parse_date(doc['date']) for doc in dated]
+    fingerprints = get_fingerprint_set(models, db, uid, password, company_id, move_type,
+                                       min(dates), max(dates), max_age=0)
+
+    results = []
+    seen_in_batch = {}
+    for i, doc in enumerate(documents):
+        if not doc.get('date'):
+            results.append({'index': i, 'is_duplicate': False, 'error': 'date is required'})
+            continue
+
+        existing = fingerprints.find(doc.get('partner_id'), doc['date'], doc.get('amount', 0), doc.get('ref'))
+        if existing:
+            results.append({
+                'index': i,
+                'is_duplicate': True,
+                'existing_move_id': existing['id'],
+                'existing_move_name': existing['name'],
+                'existing_ref': existing['ref']
+            })
+            continue
+
+        batch_key = (doc.get('partner_id'), str(doc['date'])[:10], to_cents(doc.get('amount', 0)), doc.get('ref'))
+        if batch_key in seen_in_batch:
+            results.append({
+                'index': i,
+                'is_duplicate': True,
+                'duplicate_of_batch_index': seen_in_batch[batch_key]
+            })
+            continue
+
+        seen_in_batch[batch_key] = i
+        results.append({'index': i, 'is_duplicate': False})
+
+    return results
+
+
+def invalidate(db=None, company_id=None):
+    with _sets_lock:
+        for key in list(_sets):
+            if (db is None or key[0] == db) and (company_id is None or key[1] == company_id):
+                del _sets[key]
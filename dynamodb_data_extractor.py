@@ -1,8 +1,7 @@
-import boto3
+import aws_clients
 import os
 from decimal import Decimal
 from datetime import datetime
-from boto3.dynamodb.conditions import Key, Attr
 
 def convert_dynamodb_types(obj):
     """
@@ -82,19 +81,8 @@ def is_dynamodb_json_format(item):
 def initialize_dynamodb_client():
     """Initialize DynamoDB client with environment variables"""
     try:
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            dynamodb = boto3.resource(
-                'dynamodb',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            dynamodb = boto3.resource('dynamodb', region_name=aws_region)
+        dynamodb = aws_clients.resource('dynamodb', region_name=aws_region)
         
         return dynamodb
     except Exception as e:
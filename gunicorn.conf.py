@@ -0,0 +1,97 @@
+# Production serving for app:app
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Most of the request time is spent waiting on Anthropic, Odoo and AWS, so
+# each worker process runs many threads (gthread) or greenlets (gevent).
+# Long document-processing routes are additionally capped per worker by
+# route_pools so they can't take every slot from fast reads.
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# gthread (default) or gevent; gevent needs `pip install gevent`
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# In-process state is per worker: the login throttle allows up to
+# workers x its configured rate (see login_throttle.py)
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+# Modules that refuse per-process state under several workers (e.g. local
+# matching checkpoints) read the worker count from here
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '200'))
+
+# LLM routes can legitimately run for minutes; timeout is the heartbeat limit
+# after which a stuck worker is killed, graceful_timeout the drain on restart
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers now and then to cap memory growth (Selenium, PDF parsing)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# Preloading imports the app once in the master and shares its memory with
+# the forked workers; pair it with EAGER_IMPORTS=true
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Every worker has its own registry browser pool, so up to
+# workers x BROWSER_POOL_SIZE Chromes can exist. Default to one per worker
+# here rather than the standalone default of two.
+os.environ.setdefault('BROWSER_POOL_SIZE', '1')
+
+# Pre-launching happens in a single worker (the first to claim the flag);
+# the others launch their browser on first use. Chrome must not be started
+# in the master and inherited by forks.
+_prewarm_browsers = os.environ.pop('BROWSER_POOL_PREWARM', 'false').lower() == 'true'
+_browsers_prewarmed = multiprocessing.Value('b', 0)
+
+
+# Workers dump their request/Odoo/Anthropic metrics here and /metrics sums
+# the files (see metrics.py). Set before the app is imported so preload_app
+# sees it too; files from a previous run are cleared on start.
+if not os.getenv('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='metrics-')
+
+
+def post_fork(server, worker):
+    if not _prewarm_browsers:
+        return
+    with _browsers_prewarmed.get_lock():
+        if _browsers_prewarmed.value:
+            return
+        _browsers_prewarmed.value = 1
+    import validatecompany
+    validatecompany.warm_browser_pool()
+
+
+def on_starting(server):
+    # `-w` on the command line overrides the workers setting above
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+    print(f"🚀 Starting {workers} {worker_class} workers"
+          f" ({threads if worker_class == 'gthread' else worker_connections} concurrent requests,"
+          f" up to {os.environ['BROWSER_POOL_SIZE']} registry browsers each)")
+
+
+def worker_exit(server, worker):
+    import metrics
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    # Runs in the master: an exception here would take the arbiter down
+    try:
+        import metrics
+        metrics.mark_process_dead(worker.pid)
+    except Exception as e:
+        print(f"⚠️  Could not keep metrics of worker {worker.pid}: {e}")
@@ -0,0 +1,122 @@
+"""
+Lazy imports for the feature modules used by app.py.
+
+`upload = lazy_import('upload')` binds a placeholder that imports the real
+module on first attribute access, so a worker only pays for (and holds in
+memory) the modules its requests actually use: the Selenium stack, the
+anthropic SDK, matchingworkflow's prompts and their AWS clients load
+when the first route that needs them is hit.
+
+Every load is timed; import_report() returns the numbers for the admin
+endpoint and startup log. Set EAGER_IMPORTS=true to load everything up
+front instead (e.g. when forking workers from a preloaded master).
+"""
+import importlib
+import os
+import resource
+import sys
+import threading
+import time
+
+EAGER_IMPORTS = os.getenv('EAGER_IMPORTS', 'false').lower() == 'true'
+
+PROCESS_STARTED_AT = time.time()
+
+_registry = {}
+_timings = {}
+_load_hooks = []
+_lock = threading.Lock()
+
+
+class LazyModule:
+    def __init__(self, name, optional=False):
+        self.__dict__['_name'] = name
+        self.__dict__['_optional'] = optional
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is not None:
+            return module
+
+        name = self.__dict__['_name']
+        already_loaded = name in sys.modules
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(name)
+        except ImportError as e:
+            if self.__dict__['_optional']:
+                print(f"Warning: Could not import {name}: {e}")
+            raise
+        elapsed = time.perf_counter() - started
+
+        with _lock:
+            if name not in _timings:
+                _timings[name] = {
+                    'module': name,
+                    'seconds': round(elapsed, 4),
+                    'loaded_at': round(time.time() - PROCESS_STARTED_AT, 3),
+                    'already_imported': already_loaded
+                }
+        if not already_loaded:
+            print(f"📦 Loaded {name} in {elapsed * 1000:.0f} ms")
+        for hook in list(_load_hooks):
+            hook(name, module)
+
+        self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name, optional=False):
+    """Placeholder for module `name`; the real import happens on first use"""
+    with _lock:
+        if name not in _registry:
+            _registry[name] = LazyModule(name, optional)
+        return _registry[name]
+
+
+def on_load(hook):
+    """Call hook(name, module) after each module is imported for the first time"""
+    _load_hooks.append(hook)
+
+
+def load_all():
+    """Import every registered module now; returns the names that failed"""
+    failed = []
+    for name, module in list(_registry.items()):
+        try:
+            module._load()
+        except ImportError:
+            failed.append(name)
+    return failed
+
+
+def _rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def import_report():
+    """Which feature modules are loaded, how long each took, and peak RSS"""
+    with _lock:
+        timings = sorted(_timings.values(), key=lambda t: t['seconds'], reverse=True)
+        pending = sorted(name for name, module in _registry.items() if module.__dict__['_module'] is None)
+    return {
+        'uptime_seconds': round(time.time() - PROCESS_STARTED_AT, 1),
+        'registered': len(_registry),
+        'loaded': timings,
+        'not_loaded': pending,
+        'total_import_seconds': round(sum(t['seconds'] for t in timings), 3),
+        'peak_rss_mb': _rss_mb()
+    }
@@ -0,0 +1,170 @@
+"""
+Record/replay for Anthropic Messages.create calls.
+
+With LLM_CASSETTE_MODE set, every messages.create made by matchingworkflow's
+AgentExecutor and by the process_* extractors goes through a cassette
+store in LLM_CASSETTE_DIR. Each request is hashed (model, system prompt,
+messages, sampling parameters) and stored with its response:
+
+- off (default): calls go straight to the API
+- record: always call the API, then store the response
+- replay: answer only from the cassettes, never touching the network.
+  A request with no cassette raises CassetteMiss.
+- auto: replay when a cassette exists, otherwise call and record
+
+Replaying a recorded matching run gives the same responses in the same
+order, including the higher-temperature retries, so the Python side
+(filtering, validation, state tracking) can be profiled and
+regression-tested offline at full speed.
+
+Cassettes contain the prompts, and with them company financial data.
+Keep the directory local. Base64 document bodies are stored as a hash
+only.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', 'off').lower()
+LLM_CASSETTE_DIR = os.getenv('LLM_CASSETTE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_cassettes'))
+
+MODES = ('off', 'record', 'replay', 'auto')
+
+# Transport-only arguments that don't change what the model is asked
+IGNORED_ARGUMENTS = {'extra_headers', 'extra_query', 'extra_body', 'timeout', 'metadata'}
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'recorded': 0}
+
+
+class CassetteMiss(Exception):
+    """Replay mode found no cassette for a request"""
+
+
+def _plain(value):
+    """JSON-safe copy of SDK arguments (TypedDicts, pydantic params, iterables)"""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, 'model_dump'):
+        return _plain(value.model_dump())
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _without_documents(value):
+    """Replace base64 document/image bodies with their hash for storage"""
+    if isinstance(value, dict):
+        if value.get('type') == 'base64' and isinstance(value.get('data'), str):
+            digest = hashlib.sha256(value['data'].encode()).hexdigest()
+            return dict(value, data=f'sha256:{digest}')
+        return {k: _without_documents(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_without_documents(v) for v in value]
+    return value
+
+
+def request_key(kwargs):
+    """Stable hash of a messages.create request"""
+    request = {k: _plain(v) for k, v in kwargs.items() if k not in IGNORED_ARGUMENTS}
+    encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest(), request
+
+
+def cassette_path(key):
+    return os.path.join(LLM_CASSETTE_DIR, key[:2], f'{key}.json')
+
+
+def load(key):
+    try:
+        with open(cassette_path(key), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save(key, request, response, elapsed):
+    path = cassette_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cassette = {
+        'key': key,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'original_seconds': round(elapsed, 3),
+        'request': _without_documents(request),
+        'response': response.model_dump(mode='json')
+    }
+    # Write-then-rename so concurrent workers never read half a cassette
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(cassette, f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+
+
+def stats():
+    """Cassette hits, misses and recordings in this process"""
+    with _lock:
+        return dict(_stats, mode=LLM_CASSETTE_MODE, directory=LLM_CASSETTE_DIR)
+
+
+def _wrap_messages_create(create):
+    from anthropic.types import Message
+
+    def cassette_create(self, *args, **kwargs):
+        if LLM_CASSETTE_MODE == 'off' or args or kwargs.get('stream'):
+            return create(self, *args, **kwargs)
+
+        key, request = request_key(kwargs)
+        if LLM_CASSETTE_MODE in ('replay', 'auto'):
+            cassette = load(key)
+            if cassette is not None:
+                _count('hits')
+                return Message.model_validate(cassette['response'])
+            _count('misses')
+            if LLM_CASSETTE_MODE == 'replay':
+                print(f"❌ No LLM cassette for request {key[:12]} in {LLM_CASSETTE_DIR}")
+                raise CassetteMiss(f'No cassette recorded for request {key}')
+
+        started = time.perf_counter()
+        response = create(self, *args, **kwargs)
+        save(key, request, response, time.perf_counter() - started)
+        _count('recorded')
+        return response
+
+    cassette_create.cassette_original = create
+    return cassette_create
+
+
+def instrument_anthropic():
+    """Route Messages.create through the cassette store once the SDK is imported"""
+    module = sys.modules.get('anthropic.resources.messages')
+    if module is None:
+        return False
+    messages = getattr(module, 'Messages', None)
+    if messages is None or hasattr(messages.create, 'cassette_original'):
+        return messages is not None
+    messages.create = _wrap_messages_create(messages.create)
+    print(f"📼 LLM cassettes in {LLM_CASSETTE_MODE} mode ({LLM_CASSETTE_DIR})")
+    return True
+
+
+def install():
+    """Enable the configured cassette mode; a no-op when LLM_CASSETTE_MODE is off"""
+    import lazy_modules
+
+    if LLM_CASSETTE_MODE not in MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(MODES)}, got {LLM_CASSETTE_MODE!r}")
+    if LLM_CASSETTE_MODE == 'off':
+        return
+    # Feature modules (and with them the SDK) are imported on first use
+    if not instrument_anthropic():
+        lazy_modules.on_load(lambda name, module: instrument_anthropic())
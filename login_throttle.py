@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+# Buckets live in each worker process and gunicorn spreads requests over
+# the workers, so the effective limits are up to WEB_CONCURRENCY times the
+# values below. Size them per worker with that in mind.
+
+# Per-username: a short burst, then one attempt every 20 seconds
+USERNAME_BURST = float(os.getenv('LOGIN_USERNAME_BURST', '5'))
+USERNAME_REFILL_PER_SECOND = float(os.getenv('LOGIN_USERNAME_REFILL_PER_SECOND', '0.05'))
+
+# Per-IP: allows for offices behind one NAT
+IP_BURST = float(os.getenv('LOGIN_IP_BURST', '20'))
+IP_REFILL_PER_SECOND = float(os.getenv('LOGIN_IP_REFILL_PER_SECOND', '0.5'))
+
+MAX_BUCKETS = 50000
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def retry_after(self, now):
+        """Seconds until one token is available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.refill_per_second
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class LoginThrottle:
+    """
+    In-process token buckets keyed by username and by client IP.
+
+    The IP is request.remote_addr as corrected by ProxyFix in app.py, never
+    the raw X-Forwarded-For header, which the client controls.
+
+    An attempt needs a token from both buckets; nothing is consumed when
+    either is empty, so a throttled client doesn't dig itself deeper.
+    Successful logins refill the username bucket.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usernames = {}
+        self._ips = {}
+
+    def _bucket(self, buckets, key, capacity, refill, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= MAX_BUCKETS:
+                for stale in [k for k, b in buckets.items() if b.is_full(now)]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(capacity, refill)
+        return bucket
+
+    def attempt(self, username, ip):
+        """Return 0 if the attempt may proceed, otherwise seconds to wait"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = [
+                self._bucket(self._usernames, (username or '').lower(), USERNAME_BURST, USERNAME_REFILL_PER_SECOND, now),
+                self._bucket(self._ips, ip or 'unknown', IP_BURST, IP_REFILL_PER_SECOND, now),
+            ]
+            wait = max(bucket.retry_after(now) for bucket in buckets)
+            if wait > 0:
+                return wait
+            for bucket in buckets:
+                bucket.take(now)
+            return 0
+
+    def succeeded(self, username):
+        with self._lock:
+            self._usernames.pop((username or '').lower(), None)
+
+
+login_throttle = LoginThrottle()
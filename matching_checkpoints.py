@@ -0,0 +1,391 @@
+"""
+Checkpoints for resumable matching runs.
+
+orchestrate_matching keeps its progress in memory, so a worker that died
+in Step 6 of 9 used to pay for Steps 1-5 again. With checkpoints on,
+every run gets a run_id and its progress is written to the store as it
+goes:
+
+- input.json: the request, written once when the run starts
+- checkpoint.json: status, finished steps, the MatchingState registries
+  and matches so far; rewritten at step boundaries only
+- agents/<key>.json: one object per successful agent call, keyed by a
+  hash of its prompt and written as soon as the call returns, so the
+  cost of a save doesn't grow with the number of calls made so far
+
+Resuming a run (matchingworkflow.resume_matching, or posting the same
+run_id again) re-runs the workflow on the stored input. Posting a run_id
+again with a different request raises RunInputMismatch (HTTP 409)
+instead of resuming or answering with the other request's results.
+Agent calls whose results are already stored are answered from them, so
+the run picks up after the last finished batch without paying for the
+earlier ones. The Python steps in between are deterministic and cheap,
+and simply run again. A completed run returns its stored results.
+
+MATCHING_CHECKPOINT_STORE picks the store:
+- s3 (default when MATCHING_CHECKPOINT_BUCKET is set): that bucket under
+  MATCHING_CHECKPOINT_PREFIX, so a run survives restarts and redeploys
+  and can be resumed from any worker. Use a bucket of its own rather
+  than the company documents bucket; on first use each process makes
+  sure the bucket has a lifecycle rule expiring the prefix after
+  MATCHING_CHECKPOINT_TTL_DAYS
+- local: MATCHING_CHECKPOINT_DIR on this machine, for development and
+  single-process runs; refused when WEB_CONCURRENCY is above 1, since
+  the next request may land on a worker that can't see the files
+- off (default without a bucket): no checkpoints
+
+Writes never raise: a run whose checkpoint can't be saved just isn't
+resumable. Checkpoints hold the same company financial data as the
+request.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+MATCHING_CHECKPOINT_BUCKET = os.getenv('MATCHING_CHECKPOINT_BUCKET')
+MATCHING_CHECKPOINT_STORE = os.getenv('MATCHING_CHECKPOINT_STORE', 's3' if MATCHING_CHECKPOINT_BUCKET else 'off').lower()
+MATCHING_CHECKPOINT_DIR = os.getenv('MATCHING_CHECKPOINT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'matching_checkpoints'))
+MATCHING_CHECKPOINT_PREFIX = os.getenv('MATCHING_CHECKPOINT_PREFIX', 'matching_checkpoints/')
+
+# Checkpoints older than this are removed: locally when a new run starts,
+# on S3 by the bucket lifecycle rule
+MATCHING_CHECKPOINT_TTL_DAYS = int(os.getenv('MATCHING_CHECKPOINT_TTL_DAYS', '7'))
+MATCHING_CHECKPOINT_TTL_SECONDS = MATCHING_CHECKPOINT_TTL_DAYS * 24 * 3600
+
+LIFECYCLE_RULE_ID = 'matching-checkpoints-expiry'
+
+STORES = ('off', 'local', 's3')
+
+# Run ids end up in paths and object keys
+_RUN_ID_CHARS = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_')
+
+
+class RunInputMismatch(ValueError):
+    """A run_id was posted again with a different request"""
+
+
+class InvalidRunId(ValueError):
+    """A posted run_id can't be used as a checkpoint name"""
+
+
+def enabled():
+    if MATCHING_CHECKPOINT_STORE not in STORES:
+        raise ValueError(f"MATCHING_CHECKPOINT_STORE must be one of {', '.join(STORES)}, got {MATCHING_CHECKPOINT_STORE!r}")
+    if MATCHING_CHECKPOINT_STORE == 's3' and not MATCHING_CHECKPOINT_BUCKET:
+        raise ValueError("MATCHING_CHECKPOINT_STORE=s3 needs MATCHING_CHECKPOINT_BUCKET")
+    if MATCHING_CHECKPOINT_STORE == 'local' and int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+        raise ValueError("MATCHING_CHECKPOINT_STORE=local can't be shared by several workers; use s3 (or off)")
+    return MATCHING_CHECKPOINT_STORE != 'off'
+
+
+def new_run_id():
+    return f"run_{time.strftime('%Y%m%d%H%M%S', time.gmtime())}_{uuid.uuid4().hex[:12]}"
+
+
+def valid_run_id(run_id):
+    return isinstance(run_id, str) and 0 < len(run_id) <= 100 and set(run_id) <= _RUN_ID_CHARS
+
+
+def input_hash(input_data):
+    """Stable hash of a run's request (its run_id excluded)"""
+    if isinstance(input_data, dict):
+        input_data = {k: v for k, v in input_data.items() if k != 'run_id'}
+    encoded = json.dumps(input_data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def agent_key(agent_name, model, system_prompt, user_message):
+    """Stable hash identifying one agent call"""
+    encoded = json.dumps([agent_name, model, system_prompt, user_message], ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+# =============================================================================
+# Storage
+# =============================================================================
+
+def _local_path(run_id, name):
+    return os.path.join(MATCHING_CHECKPOINT_DIR, run_id, name)
+
+
+def _s3_key(run_id, name):
+    return f'{MATCHING_CHECKPOINT_PREFIX}{run_id}/{name}'
+
+
+_lifecycle_checked = False
+_lifecycle_lock = threading.Lock()
+
+
+def ensure_lifecycle_rule():
+    """
+    Make sure the checkpoint bucket expires MATCHING_CHECKPOINT_PREFIX after
+    MATCHING_CHECKPOINT_TTL_DAYS, adding a rule next to any existing ones.
+    Checked once per process; a failure (e.g. no s3:PutLifecycleConfiguration)
+    is only logged, and the rule then has to be set up by hand.
+    """
+    global _lifecycle_checked
+    if MATCHING_CHECKPOINT_STORE != 's3' or _lifecycle_checked:
+        return
+    with _lifecycle_lock:
+        if _lifecycle_checked:
+            return
+        _lifecycle_checked = True
+
+        import aws_clients
+        from botocore.exceptions import ClientError
+
+        s3 = aws_clients.client('s3')
+        try:
+            try:
+                rules = s3.get_bucket_lifecycle_configuration(Bucket=MATCHING_CHECKPOINT_BUCKET)['Rules']
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'NoSuchLifecycleConfiguration':
+                    raise
+                rules = []
+            if any(rule.get('ID') == LIFECYCLE_RULE_ID for rule in rules):
+                return
+            rules.append({
+                'ID': LIFECYCLE_RULE_ID,
+                'Filter': {'Prefix': MATCHING_CHECKPOINT_PREFIX},
+                'Status': 'Enabled',
+                'Expiration': {'Days': MATCHING_CHECKPOINT_TTL_DAYS},
+            })
+            s3.put_bucket_lifecycle_configuration(Bucket=MATCHING_CHECKPOINT_BUCKET,
+                                                  LifecycleConfiguration={'Rules': rules})
+            print(f"✅ Matching checkpoints in s3://{MATCHING_CHECKPOINT_BUCKET}/{MATCHING_CHECKPOINT_PREFIX} "
+                  f"now expire after {MATCHING_CHECKPOINT_TTL_DAYS} days")
+        except Exception as e:
+            print(f"⚠️  Could not set the matching checkpoint lifecycle rule on {MATCHING_CHECKPOINT_BUCKET}: {e}")
+
+
+def _read(run_id, name):
+    if MATCHING_CHECKPOINT_STORE == 's3':
+        import aws_clients
+        from botocore.exceptions import ClientError
+
+        try:
+            body = aws_clients.client('s3').get_object(Bucket=MATCHING_CHECKPOINT_BUCKET, Key=_s3_key(run_id, name))['Body']
+            return json.loads(body.read())
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    try:
+        with open(_local_path(run_id, name), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write(run_id, name, data):
+    encoded = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, default=str)
+    if MATCHING_CHECKPOINT_STORE == 's3':
+        import aws_clients
+
+        aws_clients.client('s3').put_object(Bucket=MATCHING_CHECKPOINT_BUCKET, Key=_s3_key(run_id, name),
+                                            Body=encoded.encode(), ContentType='application/json')
+        return
+
+    path = _local_path(run_id, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write-then-rename so a crash mid-write leaves the previous checkpoint intact
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(encoded)
+    os.replace(temporary, path)
+
+
+def _list(run_id, folder):
+    """Names of the .json objects in a run's folder, without the extension"""
+    if MATCHING_CHECKPOINT_STORE == 's3':
+        import aws_clients
+
+        prefix = _s3_key(run_id, f'{folder}/')
+        names = set()
+        paginator = aws_clients.client('s3').get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=MATCHING_CHECKPOINT_BUCKET, Prefix=prefix):
+            for item in page.get('Contents', []):
+                name = item['Key'][len(prefix):]
+                if name.endswith('.json'):
+                    names.add(name[:-len('.json')])
+        return names
+
+    try:
+        return {name[:-len('.json')] for name in os.listdir(_local_path(run_id, folder)) if name.endswith('.json')}
+    except FileNotFoundError:
+        return set()
+
+
+def prune():
+    """Remove local checkpoints past their TTL (S3 uses the lifecycle rule)"""
+    if MATCHING_CHECKPOINT_STORE != 'local' or not os.path.isdir(MATCHING_CHECKPOINT_DIR):
+        return
+    cutoff = time.time() - MATCHING_CHECKPOINT_TTL_SECONDS
+    for run_id in os.listdir(MATCHING_CHECKPOINT_DIR):
+        run_dir = os.path.join(MATCHING_CHECKPOINT_DIR, run_id)
+        try:
+            if os.path.getmtime(run_dir) >= cutoff:
+                continue
+            shutil.rmtree(run_dir)
+        except OSError:
+            continue
+
+
+def load_input(run_id):
+    """The request a run was started with, or None"""
+    if not enabled() or not valid_run_id(run_id):
+        return None
+    return _read(run_id, 'input.json')
+
+
+def load(run_id):
+    """A run's checkpoint, or None"""
+    if not enabled() or not valid_run_id(run_id):
+        return None
+    return _read(run_id, 'checkpoint.json')
+
+
+# =============================================================================
+# Run checkpoints
+# =============================================================================
+
+def _copy(value):
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class RunCheckpoint:
+    """
+    Progress of one matching run. Agent results are saved one object per
+    call; checkpoint.json is saved at step boundaries by the workflow
+    thread.
+    """
+
+    def __init__(self, run_id, data=None, input_hash=None, stored_agent_keys=()):
+        self.run_id = run_id
+        self.resumed = data is not None
+        self.data = data or {
+            'run_id': run_id,
+            'input_hash': input_hash,
+            'status': 'running',
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'completed_steps': [],
+            'state': {},
+            'results': None,
+            'error': None
+        }
+        self.restored = 0
+        # Results recorded by this process, and keys saved by an earlier attempt
+        self._agent_results = {}
+        self._stored_agent_keys = set(stored_agent_keys)
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        return self.data.get('status')
+
+    @property
+    def results(self):
+        return self.data.get('results')
+
+    def agent_result(self, key):
+        """A stored successful agent result, or None"""
+        with self._lock:
+            result = self._agent_results.get(key)
+            stored = result is None and key in self._stored_agent_keys
+        if stored:
+            try:
+                result = _read(self.run_id, f'agents/{key}.json')
+            except Exception as e:
+                print(f"⚠️  Matching checkpoint read failed for {self.run_id}: {e}")
+        if result is None:
+            return None
+        with self._lock:
+            self._agent_results.setdefault(key, result)
+            self.restored += 1
+        # The workflow annotates matches in place; hand out a copy
+        return _copy(result)
+
+    def record_agent_result(self, key, result):
+        encoded = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            self._agent_results[key] = json.loads(encoded)
+        try:
+            _write(self.run_id, f'agents/{key}.json', encoded)
+        except Exception as e:
+            print(f"⚠️  Matching checkpoint write failed for {self.run_id}: {e}")
+
+    def record_step(self, step, state):
+        with self._lock:
+            if step not in self.data['completed_steps']:
+                self.data['completed_steps'].append(step)
+            self.data['state'] = state
+        self.save()
+
+    def complete(self, results):
+        with self._lock:
+            self.data.update(status='completed', results=results, error=None)
+        self.save()
+
+    def fail(self, error):
+        with self._lock:
+            self.data.update(status='failed', error=str(error))
+        self.save()
+
+    def save(self):
+        with self._lock:
+            self.data['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            encoded = json.dumps(self.data, ensure_ascii=False, default=str)
+        try:
+            _write(self.run_id, 'checkpoint.json', encoded)
+        except Exception as e:
+            print(f"⚠️  Matching checkpoint write failed for {self.run_id}: {e}")
+
+
+def start_run(input_data, run_id=None):
+    """
+    Checkpoint for a new run, or the existing one when run_id was already
+    started with the same input. Returns None when checkpoints are off,
+    raises InvalidRunId for a malformed run_id and RunInputMismatch when
+    run_id belongs to a different request.
+    """
+    if not enabled():
+        return None
+    if run_id is not None and not valid_run_id(run_id):
+        raise InvalidRunId('run_id may only contain letters, digits, "-" and "_" (max 100 characters)')
+
+    request_hash = input_hash(input_data)
+    if run_id is not None:
+        try:
+            existing = load(run_id)
+        except Exception as e:
+            print(f"⚠️  Matching checkpoint read failed for {run_id}: {e}")
+            existing = None
+        if existing is not None:
+            if existing.get('input_hash') not in (None, request_hash):
+                raise RunInputMismatch(f'Run {run_id} was started with a different request')
+            if existing.get('status') == 'completed':
+                return RunCheckpoint(run_id, existing)
+            existing.update(status='running', error=None)
+            try:
+                stored_agent_keys = _list(run_id, 'agents')
+            except Exception as e:
+                print(f"⚠️  Matching checkpoint read failed for {run_id}: {e}")
+                stored_agent_keys = set()
+            print(f"♻️  Resuming matching run {run_id} after steps {existing.get('completed_steps')} "
+                  f"with {len(stored_agent_keys)} stored agent results")
+            return RunCheckpoint(run_id, existing, stored_agent_keys=stored_agent_keys)
+
+    prune()
+    ensure_lifecycle_rule()
+    checkpoint = RunCheckpoint(run_id or new_run_id(), input_hash=request_hash)
+    try:
+        _write(checkpoint.run_id, 'input.json', input_data)
+    except Exception as e:
+        print(f"⚠️  Matching checkpoint write failed for {checkpoint.run_id}: {e}")
+    checkpoint.save()
+    return checkpoint
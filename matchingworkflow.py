@@ -39,6 +39,7 @@ TOLERANCE LEVELS:
 - PERCENTAGE: 2% of amount - for larger transactions
 """
 
+import bisect
 import json
 import os
 import re
@@ -49,11 +50,19 @@ from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
 from dataclasses import dataclass, field
 from enum import Enum
 import traceback
+from collections import defaultdict
+from difflib import SequenceMatcher
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 from anthropic import Anthropic
 
+import llm_cassettes
+import matching_checkpoints
+import metrics
+import structured_output
+from structured_output import array, boolean, integer, number, obj, string
+
 # =============================================================================
 # LOGGING CONFIGURATION
 # =============================================================================
@@ -81,9 +90,15 @@ class MatchingConfig:
     percentage_tolerance: Decimal = Decimal("0.02")  # 2% for large transactions
     
     # Processing settings
-    batch_size: int = 5  # Transactions per LLM call (prevents context explosion)
+    batch_size: int = 5  # Transactions per LLM call when adaptive batching is off
+    adaptive_batching: bool = True  # Pack batches by estimated tokens instead of batch_size
+    max_batch_size: int = 20  # Upper bound on transactions per adaptive batch
+    batch_prompt_token_budget: int = 24000  # Estimated prompt tokens per call (system + batch)
+    output_tokens_per_txn: int = 350  # Expected response tokens per transaction (raised as observed)
     max_candidates_per_txn: int = 15  # Max documents to consider per transaction
     max_documents_per_type: int = 50  # Max documents per type in context
+    split_payment_window_days: int = 30  # Max days between the transactions of a split payment
+    max_split_partners_per_txn: int = 10  # Other unmatched transactions sent with each combination-match transaction
     
     # Date ranges (days)
     exact_match_date_range: int = 30
@@ -95,10 +110,18 @@ class MatchingConfig:
     base_temperature: float = 0.0
     retry_temperature_increment: float = 0.15
     
+    # Duplicate detection (Step 2)
+    local_duplicate_detection: bool = True  # Detect duplicates in Python instead of one LLM call over every transaction
+    duplicate_window_days: int = 1  # Max days between the two entries of a duplicate
+    duplicate_similarity_threshold: float = 0.85  # Partner/description similarity that settles a cross-day pair
+    duplicate_llm_tiebreak: bool = True  # Ask the LLM about near-duplicates; otherwise they are only reported
+    
     # Validation settings
     reject_hallucinated_ids: bool = True  # CRITICAL: Must be True in production
     require_currency_match: bool = True
     max_combination_size: int = 5
+    rule_based_review: bool = True  # Validate/score clear-cut matches in Python, send only borderline ones to the LLM
+    borderline_score_margin: float = 3.0  # Scores this close to a level boundary count as borderline
     
     # Model settings
     model: str = "claude-sonnet-4-20250514"
@@ -359,22 +382,38 @@ class MatchingState:
         """Check if transaction is marked as duplicate."""
         return str(transaction_id) in self.duplicate_transaction_ids
     
-    def rollback_match(self, match: Dict):
-        """Rollback a rejected match."""
+    def rollback_match(self, match: Dict, kept_transaction_ids: Set[str] = frozenset(),
+                       kept_document_ids: Set[Tuple[str, str]] = frozenset()):
+        """
+        Rollback a rejected match.
+        
+        Ids also claimed by a match that was kept (a rejected duplicate claim)
+        stay marked; kept_document_ids holds (registry key, id) pairs.
+        """
         # Unmark transaction(s)
-        if txn_id := match.get('transaction_id'):
-            self.matched_transaction_ids.discard(str(txn_id))
-        for txn_id in match.get('transaction_ids', []):
-            self.matched_transaction_ids.discard(str(txn_id))
+        for txn_id in _match_transaction_ids(match):
+            if txn_id not in kept_transaction_ids:
+                self.matched_transaction_ids.discard(txn_id)
         
         # Unmark document(s)
         doc_type = match.get('document_type', 'bill')
         doc_type_key = self._normalize_doc_type(doc_type)
         
-        if doc_id := match.get('document_id'):
-            self.matched_document_ids[doc_type_key].discard(str(doc_id))
-        for doc_id in match.get('document_ids', []):
-            self.matched_document_ids[doc_type_key].discard(str(doc_id))
+        for doc_id in _match_document_ids(match):
+            if (doc_type_key, doc_id) not in kept_document_ids:
+                self.matched_document_ids[doc_type_key].discard(doc_id)
+    
+    def to_dict(self) -> Dict:
+        """JSON-safe snapshot for run checkpoints."""
+        return {
+            "matched_document_ids": {k: sorted(v) for k, v in self.matched_document_ids.items()},
+            "matched_transaction_ids": sorted(self.matched_transaction_ids),
+            "duplicate_transaction_ids": sorted(self.duplicate_transaction_ids),
+            "current_step": self.current_step,
+            "completed_steps": list(self.completed_steps),
+            "all_matches": self.all_matches,
+            "rejected_matches": self.rejected_matches
+        }
     
     def _normalize_doc_type(self, doc_type: str) -> str:
         """Normalize document type to registry key."""
@@ -887,9 +926,15 @@ def enrich_transaction_python(txn: Dict) -> Dict:
     is_suspense = False
     is_internal_transfer = False
     
+    accounts_in_txn = [item.get("account", "").lower() for item in line_items]
+    has_credit_card = any("credit card" in acc for acc in accounts_in_txn)
+    has_bank = any("bank" in acc for acc in accounts_in_txn)
+    
     # 1. SUSPENSE (highest priority)
+    # A bank/credit card transfer has no other account, so its "Unknown" placeholder doesn't count
     suspense_keywords = ["suspense", "unknown", "unidentified", "pending"]
-    if any(kw in account_name.lower() for kw in suspense_keywords):
+    placeholder_account = account_name == "Unknown" and has_credit_card and has_bank
+    if not placeholder_account and any(kw in account_name.lower() for kw in suspense_keywords):
         category = "suspense"
         is_suspense = True
     elif any(kw in partner_name.lower() for kw in suspense_keywords):
@@ -898,10 +943,6 @@ def enrich_transaction_python(txn: Dict) -> Dict:
     
     # 2. INTERNAL_TRANSFER
     if not is_suspense:
-        accounts_in_txn = [item.get("account", "").lower() for item in line_items]
-        has_credit_card = any("credit card" in acc for acc in accounts_in_txn)
-        has_bank = any("bank" in acc for acc in accounts_in_txn)
-        
         if has_credit_card and has_bank:
             category = "internal_transfer"
             is_internal_transfer = True
@@ -963,6 +1004,284 @@ def enrich_document_python(doc: Dict, doc_type: str) -> Dict:
 
 
 
+# =============================================================================
+# LOCAL DUPLICATE DETECTION (Step 2 without the LLM)
+# =============================================================================
+
+def _duplicate_text(txn: Dict) -> str:
+    return f"{txn.get('normalized_partner') or normalize_text(txn.get('partner_name', ''))} {normalize_text(txn.get('description', ''))}".strip()
+
+
+def text_similarity(a: str, b: str) -> float:
+    """0-1 similarity of two normalized strings."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def detect_duplicates_python(transactions: List[Dict], config: MatchingConfig = DEFAULT_CONFIG) -> Dict:
+    """
+    Find duplicate transactions without the LLM.
+    
+    Transactions are grouped by (amount in cents, currency) and sorted by
+    date, so each one is only compared with its group's entries inside
+    duplicate_window_days - O(n log n) overall. As in
+    DUPLICATE_DETECTION_PROMPT, two internal transfers on the same date (or
+    with similar partner/description) are duplicates and the later one in
+    the list is kept. Cross-day transfers with different text, and other
+    same-amount transactions with similar text, are near-duplicates: they
+    need a tiebreak and are never deleted on the rules alone.
+    
+    Returns:
+        DuplicateDetection-shaped dict plus near_duplicate_pairs
+    """
+    groups = defaultdict(list)
+    for position, txn in enumerate(transactions):
+        try:
+            txn_date = datetime.strptime(str(txn.get("date"))[:10], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        cents = int((to_decimal(txn.get("amount", 0)) * 100).to_integral_value(ROUND_HALF_UP))
+        groups[(cents, txn.get("currency", "EUR"))].append((txn_date, position, txn, _duplicate_text(txn)))
+    
+    def classify(earlier, later) -> Optional[str]:
+        similar = text_similarity(earlier[3], later[3]) >= config.duplicate_similarity_threshold
+        if earlier[2].get("is_internal_transfer") and later[2].get("is_internal_transfer"):
+            return "duplicate" if earlier[0] == later[0] or similar else "near"
+        return "near" if similar else None
+    
+    duplicate_pairs, near_pairs = [], []
+    for entries in groups.values():
+        if len(entries) < 2:
+            continue
+        entries.sort(key=lambda e: (e[0], e[1]))
+        pending = []  # Earlier, still unpaired entries inside the window
+        for entry in entries:
+            pending = [e for e in pending if (entry[0] - e[0]).days <= config.duplicate_window_days]
+            candidates = [(kind, e) for e in pending if (kind := classify(e, entry))]
+            if not candidates:
+                pending.append(entry)
+                continue
+            
+            # Prefer a certain duplicate, then the closest date, then list order
+            kind, other = min(candidates, key=lambda c: (c[0] != "duplicate", entry[0] - c[1][0], c[1][1]))
+            pending.remove(other)
+            
+            # Keep the SECOND one (later in the list), as the agent did
+            first, second = sorted([other, entry], key=lambda e: e[1])
+            days = abs((entry[0] - other[0]).days)
+            pair = {
+                "transaction_1": str(first[2].get("transaction_id")),
+                "transaction_2": str(second[2].get("transaction_id")),
+                "keep": str(second[2].get("transaction_id")),
+                "mark_for_deletion": str(first[2].get("transaction_id")),
+                "odoo_id_to_delete": first[2].get("odoo_id"),
+                "reason": ("Internal transfer duplicate - " if first[2].get("is_internal_transfer") else "Possible duplicate - ")
+                          + ("same date and amount" if not days else f"same amount, {days} day(s) apart"),
+                "confidence": "HIGH" if kind == "duplicate" else "MEDIUM",
+                "similarity": round(text_similarity(first[3], second[3]), 2)
+            }
+            (duplicate_pairs if kind == "duplicate" else near_pairs).append(pair)
+    
+    marked = {p["mark_for_deletion"] for p in duplicate_pairs}
+    non_duplicates = [str(t.get("transaction_id")) for t in transactions if str(t.get("transaction_id")) not in marked]
+    return {
+        "duplicate_pairs": duplicate_pairs,
+        "near_duplicate_pairs": near_pairs,
+        "non_duplicate_transaction_ids": non_duplicates,
+        "summary": {
+            "duplicates_found": len(duplicate_pairs),
+            "near_duplicates": len(near_pairs),
+            "total_transactions": len(transactions),
+            "non_duplicates": len(non_duplicates)
+        }
+    }
+
+
+# =============================================================================
+# RULE-BASED REVIEW (Steps 8-9 without the LLM for clear-cut matches)
+# =============================================================================
+
+# Score boundaries and recommendations, as in CONFIDENCE_SCORING_PROMPT
+CONFIDENCE_THRESHOLDS = [
+    (95.0, ConfidenceLevel.HIGH, "AUTO_RECONCILE"),
+    (75.0, ConfidenceLevel.MEDIUM, "REVIEW"),
+    (0.0, ConfidenceLevel.LOW, "MANUAL"),
+]
+
+
+def _match_transaction_ids(match: Dict) -> List[str]:
+    if tid := match.get("transaction_id"):
+        return [str(tid)]
+    return [str(t) for t in match.get("transaction_ids", [])]
+
+
+def _match_document_ids(match: Dict) -> List[str]:
+    if did := match.get("document_id"):
+        return [str(did)]
+    return [str(d) for d in match.get("document_ids", [])]
+
+
+def _match_key(match: Dict) -> Tuple[str, ...]:
+    """Identify a match by its transaction(s), as the review agents do."""
+    return tuple(sorted(_match_transaction_ids(match)))
+
+
+def partner_match_score(txn: Dict, docs: List[Dict]) -> Tuple[str, int]:
+    """Partner agreement between a transaction and its documents: (exact|substring|fuzzy|none, 0-100)."""
+    txn_partner = txn.get("normalized_partner") or normalize_text(txn.get("partner_name", ""))
+    txn_description = normalize_text(txn.get("description", ""))
+    
+    scores = []
+    for doc in docs:
+        doc_partner = doc.get("normalized_partner") or normalize_text(doc.get("partner_name", ""))
+        if not doc_partner:
+            scores.append(("none", 0))
+        elif txn_partner == doc_partner:
+            scores.append(("exact", 100))
+        elif txn_partner and (txn_partner in doc_partner or doc_partner in txn_partner) or doc_partner in txn_description:
+            scores.append(("substring", 85))
+        elif txn_partner and SequenceMatcher(None, txn_partner, doc_partner).ratio() >= 0.6:
+            scores.append(("fuzzy", 70))
+        else:
+            scores.append(("none", 0))
+    
+    # A combination is only as good as its weakest document
+    return min(scores, key=lambda s: s[1]) if scores else ("none", 0)
+
+
+def _date_score(days: int, combination: bool = False) -> int:
+    bands = [(7, 100), (14, 90), (30, 80), (60, 70)] if combination else [(7, 100), (30, 90), (60, 80), (180, 70)]
+    return next((score for limit, score in bands if days <= limit), 50)
+
+
+def confidence_from_score(score: float) -> Tuple[str, str]:
+    """(confidence_level, recommendation) for a 0-100 score."""
+    for threshold, level, recommendation in CONFIDENCE_THRESHOLDS:
+        if score >= threshold:
+            return level.value, recommendation
+    return ConfidenceLevel.LOW.value, "MANUAL"
+
+
+def score_match_python(
+    match: Dict,
+    txn_lookup: Dict[str, Dict],
+    doc_lookup: Dict[str, Dict],
+    config: MatchingConfig = DEFAULT_CONFIG
+) -> Dict:
+    """
+    Deterministic confidence score for a validated match, using the weights of
+    CONFIDENCE_SCORING_PROMPT (amount, currency, partner, date, context/size).
+    
+    Returns confidence_level, confidence_score, recommendation, the factor
+    breakdown and whether the match is borderline (worth an LLM second opinion).
+    """
+    txns = [txn_lookup[t] for t in _match_transaction_ids(match) if t in txn_lookup]
+    docs = [doc_lookup[d] for d in _match_document_ids(match) if d in doc_lookup]
+    if not txns or not docs:
+        return {"confidence_level": "LOW", "confidence_score": 50.0, "recommendation": "MANUAL",
+                "factors": {}, "borderline": True}
+    
+    is_combination = len(txns) > 1 or len(docs) > 1
+    match_type = str(match.get("match_type", ""))
+    
+    difference = abs(sum_amounts([t.get("amount", 0) for t in txns]) - sum_amounts([d.get("amount", 0) for d in docs]))
+    day_gaps = [calculate_date_difference(t.get("date"), d.get("date")) for t in txns for d in docs]
+    days = max(day_gaps)
+    partner_kind, partner_score = partner_match_score(txns[0], docs)
+    
+    if is_combination:
+        amount_score = 100 if difference <= Decimal("0.01") else 90 if difference <= config.rounding_tolerance else 80
+        size_score = {2: 100, 3: 90, 4: 85}.get(len(txns) + len(docs) - 1, 80)
+        date_score = _date_score(days, combination=True)
+        score = amount_score * 0.4 + 100 * 0.1 + date_score * 0.3 + size_score * 0.2
+        
+        # Combinations start at MEDIUM and only reach HIGH when perfect
+        perfect = difference == 0 and days <= 14 and partner_kind == "exact"
+        base = 85.0 if len(txns) > 1 else 80.0
+        score = max(score, 95.0) if perfect else min(score, base)
+        factors = {"amount": amount_score, "date": date_score, "size": size_score, "partner": partner_kind}
+    else:
+        amount_score = 100 if difference == 0 else 90 if difference <= config.rounding_tolerance else 80
+        date_score = _date_score(days)
+        score = amount_score * 0.3 + 100 * 0.1 + partner_score * 0.3 + date_score * 0.2 + 100 * 0.1
+        factors = {"amount": amount_score, "date": date_score, "partner": partner_kind}
+    
+    # Generic partner wildcards are capped at MEDIUM (see validate_exact_matches)
+    ceiling = 94.0 if match.get("is_generic_wildcard") else 100.0
+    score = round(min(score, ceiling), 1)
+    level, recommendation = confidence_from_score(score)
+    
+    near_boundary = any(abs(score - threshold) < config.borderline_score_margin
+                        for threshold, _, _ in CONFIDENCE_THRESHOLDS if 0 < threshold <= ceiling)
+    if match.get("is_generic_wildcard"):
+        # Wildcards ignore the partner but must land within 7 days
+        judgement_call = days > 7
+    else:
+        judgement_call = match_type.startswith("suspense") or (not is_combination and partner_kind in ("fuzzy", "none"))
+    
+    return {
+        "confidence_level": level,
+        "confidence_score": score,
+        "recommendation": recommendation,
+        "factors": {**factors, "amount_difference": format_decimal(difference), "date_diff_days": days},
+        "borderline": bool(near_boundary or judgement_call)
+    }
+
+
+def review_matches_python(
+    matches: List[Dict],
+    transactions: List[Dict],
+    documents: Dict,
+    config: MatchingConfig = DEFAULT_CONFIG
+) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """
+    Final Python-side validation across all accepted matches.
+    
+    Re-runs integrity checks on anything not yet python_validated and rejects
+    transactions or documents claimed by more than one match. Matches that
+    needed a tolerance, are fuzzy or come from suspense resolution are
+    returned as borderline for the Validation Agent.
+    
+    Returns:
+        Tuple of (clear_matches, borderline_matches, rejected_matches)
+    """
+    clear, borderline, rejected = [], [], []
+    used_txns, used_docs = set(), set()
+    
+    for match in matches:
+        if match.get("python_validated") is not True:
+            validate = validate_combination_matches if match.get("document_ids") or match.get("transaction_ids") else validate_exact_matches
+            valid, invalid = validate([match], transactions, documents, config)
+            if invalid:
+                rejected.extend(invalid)
+                continue
+        
+        txn_ids = set(_match_transaction_ids(match))
+        doc_ids = set(_match_document_ids(match))
+        if txn_ids & used_txns or doc_ids & used_docs:
+            logger.warning(f"REJECTING match: transaction or document already matched ({sorted(txn_ids)})")
+            match["rejection_reason"] = RejectionReason.DUPLICATE_MATCH.value
+            rejected.append(match)
+            continue
+        used_txns |= txn_ids
+        used_docs |= doc_ids
+        
+        difference = to_decimal((match.get("validation_metadata") or {}).get("difference", 0))
+        match_type = str(match.get("match_type", ""))
+        needs_review = (
+            not config.rule_based_review
+            or difference > 0
+            or match_type == "fuzzy"
+            or match_type.startswith("suspense")
+        )
+        (borderline if needs_review else clear).append(match)
+    
+    return clear, borderline, rejected
+
+
 # =============================================================================
 # AGENT PROMPTS (Optimized for batched processing)
 # =============================================================================
@@ -2346,7 +2665,7 @@ Step 2: Find candidate combinations
 
   FOR SPLIT (N→1):
     a) Find documents with amount > transaction amount
-    b) Find other unmatched transactions
+    b) Take the other unmatched transactions from the item's split_partners
     c) Try combinations that sum to document amount
     d) Validate dates and currency
 
@@ -3295,6 +3614,91 @@ Ensure every match you create has:
 Return only valid matches with strong justification. It is better to leave a transaction unmatched than to create a questionable match."""
 
 
+# =============================================================================
+# AGENT OUTPUT SCHEMAS (structured tool-use output)
+# =============================================================================
+
+MATCH_SCHEMA = obj({
+    "transaction_id": string(),
+    "transaction_ids": array(string()),
+    "document_type": string(nullable=True),
+    "document_id": string(nullable=True),
+    "document_ids": array(string()),
+    "match_type": string(),
+    "has_bank_fee": boolean(),
+    "match_details": obj(),
+    "confidence": string(),
+    "confidence_score": number(nullable=True)
+}, required=["match_type", "confidence"])
+
+MATCH_RESULT_SCHEMA = obj({
+    "matched": array(MATCH_SCHEMA),
+    "unmatched_transaction_ids": array(string())
+}, required=["matched", "unmatched_transaction_ids"])
+
+AGENT_OUTPUT_SCHEMAS = {
+    "DuplicateDetection": obj({
+        "duplicate_pairs": array(obj({
+            "transaction_1": string(),
+            "transaction_2": string(),
+            "keep": string(),
+            "mark_for_deletion": string(),
+            "odoo_id_to_delete": integer(nullable=True),
+            "reason": string(),
+            "confidence": string()
+        }, required=["transaction_1", "transaction_2", "keep", "mark_for_deletion"])),
+        "non_duplicate_transaction_ids": array(string()),
+        "summary": obj()
+    }, required=["duplicate_pairs", "non_duplicate_transaction_ids"]),
+    "ExactMatch": MATCH_RESULT_SCHEMA,
+    "PartnerResolution": MATCH_RESULT_SCHEMA,
+    "CombinationMatch": MATCH_RESULT_SCHEMA,
+    "SuspenseResolution": MATCH_RESULT_SCHEMA,
+    "ContextAnalysis": obj({
+        "context_analysis": array(obj({
+            "transaction_id": string(),
+            "business_context": string(),
+            "date_range_days": integer(),
+            "reasoning": string()
+        }, required=["transaction_id", "date_range_days"]))
+    }, required=["context_analysis"]),
+    "Validation": obj({
+        "validated_matches": array(obj({
+            "transaction_id": string(),
+            "document_id": string(nullable=True),
+            "match_type": string(),
+            "validation_passed": boolean(),
+            "validation_checks": obj()
+        })),
+        "rejected_matches": array(obj({
+            "transaction_id": string(),
+            "document_id": string(nullable=True),
+            "rejection_reason": string(),
+            "will_be_rolled_back": boolean(),
+            "validation_checks": obj()
+        }, required=["rejection_reason"])),
+        "summary": obj()
+    }, required=["validated_matches", "rejected_matches"]),
+    "ConfidenceScoring": obj({
+        "scored_matches": array(obj({
+            "transaction_id": string(),
+            "transaction_ids": array(string()),
+            "document_id": string(nullable=True),
+            "document_ids": array(string()),
+            "confidence_level": string(),
+            "confidence_score": number(),
+            "recommendation": string()
+        }, required=["confidence_level", "confidence_score", "recommendation"]))
+    }, required=["scored_matches"])
+}
+
+# messages.create kwargs per agent, e.g. tool "exact_match_result" for ExactMatch
+AGENT_OUTPUT_TOOLS = {
+    agent: structured_output.output_tool(re.sub(r'(?<!^)(?=[A-Z])', '_', agent).lower() + "_result", schema)
+    for agent, schema in AGENT_OUTPUT_SCHEMAS.items()
+}
+
+
 # =============================================================================
 # AGENT EXECUTOR (Enhanced with batching)
 # =============================================================================
@@ -3303,11 +3707,14 @@ class AgentExecutor:
     """Executes LLM agents with retry logic, batching support, and validation."""
     
     def __init__(self, config=None):
+        # Standalone runs don't go through app.py, so enable cassettes here too
+        llm_cassettes.install()
         self.client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
         self.config = config
         self.total_input_tokens = 0
         self.total_output_tokens = 0
         self.api_calls = 0
+        self.checkpoint = None  # matching_checkpoints.RunCheckpoint of a resumable run
     
     def execute(
         self,
@@ -3316,28 +3723,47 @@ class AgentExecutor:
         user_message: str
     ) -> Dict:
         """Execute an agent with retry, temperature jitter, and validation."""
+        checkpoint_key = None
+        if self.checkpoint is not None:
+            checkpoint_key = matching_checkpoints.agent_key(agent_name, self.config.model, system_prompt, user_message)
+            if (stored := self.checkpoint.agent_result(checkpoint_key)) is not None:
+                logger.info(f"[{agent_name}] ✓ Restored from checkpoint")
+                return stored
+        
         for attempt in range(self.config.max_retries):
             try:
                 temperature = self.config.base_temperature + (attempt * self.config.retry_temperature_increment)
                 
                 logger.debug(f"[{agent_name}] Attempt {attempt + 1}/{self.config.max_retries}")
                 
-                response = self.client.messages.create(
-                    model=self.config.model,
-                    max_tokens=self.config.max_tokens,
-                    temperature=temperature,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_message}]
-                )
+                output_tool = AGENT_OUTPUT_TOOLS.get(agent_name, {})
+                
+                with metrics.agent(agent_name, attempt):
+                    response = self.client.messages.create(
+                        model=self.config.model,
+                        max_tokens=self.config.max_tokens,
+                        temperature=temperature,
+                        system=system_prompt,
+                        messages=[{"role": "user", "content": user_message}],
+                        **output_tool
+                    )
                 
                 self.total_input_tokens += response.usage.input_tokens
                 self.total_output_tokens += response.usage.output_tokens
                 self.api_calls += 1
                 
-                # Extract text
-                result_text = "".join(
-                    block.text for block in response.content if block.type == "text"
-                )
+                # Structured output arrives already parsed; free text is only a fallback
+                result_json = None
+                if output_tool and response.stop_reason != "max_tokens":
+                    result_json = structured_output.tool_output(response, output_tool["tool_choice"]["name"])
+                result_text = structured_output.response_text(response)
+                if result_json is None:
+                    result_json = self._extract_json(result_text)
+                
+                # A truncated response won't fit on retry either - let the caller split the batch
+                if response.stop_reason == "max_tokens" and not result_json:
+                    logger.warning(f"[{agent_name}] Response truncated at max_tokens ({response.usage.output_tokens} tokens)")
+                    return {"success": False, "error": "Response truncated at max_tokens", "truncated": True}
                 
                 # ✅ NEW: Log raw response for debugging
                 logger.debug(f"[{agent_name}] Raw response length: {len(result_text)} chars")
@@ -3346,12 +3772,14 @@ class AgentExecutor:
                 elif len(result_text) < 2000:
                     logger.debug(f"[{agent_name}] Raw response preview: {result_text[:500]}...")
                 
-                # Extract JSON
-                if result_json := self._extract_json(result_text):
+                if result_json:
                     # ✅ NEW: Validate response structure
                     if self._validate_agent_response(agent_name, result_json):
                         logger.info(f"[{agent_name}] ✓ Success")
-                        return {"success": True, "result": result_json}
+                        result = {"success": True, "result": result_json, "output_tokens": response.usage.output_tokens}
+                        if checkpoint_key:
+                            self.checkpoint.record_agent_result(checkpoint_key, result)
+                        return result
                     else:
                         logger.warning(f"[{agent_name}] Response validation failed, retrying...")
                         # ✅ NEW: Log what was wrong
@@ -3364,10 +3792,11 @@ class AgentExecutor:
                 if attempt == self.config.max_retries - 1:
                     return {"success": False, "error": str(e)}
         
-        return {"success": False, "error": "Max retries exceeded"}
+        # Every attempt answered, but never with valid JSON of the expected shape
+        return {"success": False, "error": "Max retries exceeded", "invalid_response": True}
     
     def _extract_json(self, text: str) -> Optional[Dict]:
-        """Robust JSON extraction with multiple strategies."""
+        """Robust JSON extraction with multiple strategies (for agents answering in text)."""
         # Strategy 1: ```json blocks
         if match := re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL):
             try:
@@ -3479,9 +3908,120 @@ class AgentExecutor:
             "api_calls": self.api_calls,
             "total_input_tokens": self.total_input_tokens,
             "total_output_tokens": self.total_output_tokens,
-            "total_tokens": self.total_input_tokens + self.total_output_tokens
+            "total_tokens": self.total_input_tokens + self.total_output_tokens,
+            "restored_from_checkpoint": self.checkpoint.restored if self.checkpoint else 0
         }
 
+# =============================================================================
+# ADAPTIVE BATCHING
+# =============================================================================
+
+# Rough chars-per-token for the minified JSON we send; errs towards overestimating
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(data: Any) -> int:
+    """Cheap prompt-size estimate for a string or JSON-serialisable payload."""
+    text = data if isinstance(data, str) else safe_json_dumps(data)
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+class AdaptiveBatcher:
+    """
+    Packs transactions into LLM batches by estimated size rather than a fixed count.
+    
+    A batch grows until its prompt would exceed batch_prompt_token_budget or its
+    expected answer (output_tokens_per_txn each) would no longer fit comfortably
+    in max_tokens. When a batch comes back truncated or fails validation, split()
+    halves it, requeues it and lowers the cap for the rest of the run; other
+    failures are not the batch's size and are left to the caller.
+    
+    build_item(txn) returns the per-transaction payload. Items are rebuilt for
+    each batch unless cache_items is set, so they can reflect state updated by
+    earlier batches (e.g. documents already matched).
+    """
+    
+    OUTPUT_HEADROOM = 0.75  # Share of max_tokens the expected answer may use
+    
+    def __init__(
+        self,
+        transactions: List[Dict],
+        build_item,
+        config: MatchingConfig = DEFAULT_CONFIG,
+        fixed_tokens: int = 0,
+        cache_items: bool = True
+    ):
+        self.queue = list(transactions)
+        self.build_item = build_item
+        self.config = config
+        self.fixed_tokens = fixed_tokens
+        self.cache_items = cache_items
+        self.cap = config.max_batch_size if config.adaptive_batching else config.batch_size
+        self.output_tokens_per_txn = config.output_tokens_per_txn
+        self.batches_sent = 0
+        self._items = {}
+    
+    def _item(self, txn: Dict) -> Tuple[Dict, int]:
+        key = id(txn)
+        if self.cache_items and key in self._items:
+            return self._items[key]
+        item = self.build_item(txn)
+        built = (item, estimate_tokens(item))
+        if self.cache_items:
+            self._items[key] = built
+        return built
+    
+    def next_batch(self) -> Optional[Tuple[List[Dict], List[Dict], int]]:
+        """Next (transactions, items, estimated_prompt_tokens), or None when done."""
+        if not self.queue:
+            return None
+        
+        output_budget = self.config.max_tokens * self.OUTPUT_HEADROOM
+        batch, items, tokens = [], [], self.fixed_tokens
+        for txn in self.queue[:self.cap]:
+            item, size = self._item(txn)
+            if batch and self.config.adaptive_batching and (
+                tokens + size > self.config.batch_prompt_token_budget
+                or (len(batch) + 1) * self.output_tokens_per_txn > output_budget
+            ):
+                break
+            batch.append(txn)
+            items.append(item)
+            tokens += size
+        
+        del self.queue[:len(batch)]
+        self.batches_sent += 1
+        if tokens > self.config.batch_prompt_token_budget:
+            logger.warning(f"Single transaction exceeds the prompt budget (~{tokens} tokens)")
+        return batch, items, tokens
+    
+    def split(self, batch: List[Dict], result: Dict) -> bool:
+        """
+        Requeue a truncated or invalid batch in halves. False when it can't be
+        split any further or the failure has nothing to do with its size
+        (API or network errors), so the caller handles it as it is.
+        """
+        if not (result.get("truncated") or result.get("invalid_response")):
+            logger.warning(f"  Batch of {len(batch)} failed: {result.get('error')}")
+            return False
+        if len(batch) <= 1:
+            return False
+        self.cap = max(1, len(batch) // 2)
+        self.queue[:0] = batch
+        reason = "truncated" if result.get("truncated") else "failed validation"
+        logger.warning(f"  Batch of {len(batch)} {reason}, retrying in batches of {self.cap}")
+        return True
+    
+    def observe(self, batch: List[Dict], result: Dict):
+        """Raise the expected output size per transaction from a successful response."""
+        if output_tokens := result.get("output_tokens"):
+            self.output_tokens_per_txn = max(self.output_tokens_per_txn, output_tokens // len(batch) + 1)
+    
+    @property
+    def remaining(self) -> int:
+        return len(self.queue)
+
+
 # =============================================================================
 # BATCHED AGENT FUNCTIONS (FIX: Context explosion prevention)
 # =============================================================================
@@ -3586,7 +4126,49 @@ def run_data_enrichment(executor: AgentExecutor, input_data: Dict) -> Dict:
         logger.error(f"Enrichment error: {e}")
         return {"success": False, "error": str(e)}
 
-def run_duplicate_detection(executor: AgentExecutor, transactions: List[Dict]) -> Dict:
+def run_duplicate_detection(
+    executor: AgentExecutor,
+    transactions: List[Dict],
+    config: MatchingConfig = DEFAULT_CONFIG
+) -> Dict:
+    """
+    Run Duplicate Detection.
+    
+    With local_duplicate_detection the pairs come from detect_duplicates_python
+    and the agent only sees the transactions of near-duplicate pairs; a pair
+    counts only if the agent returns it too.
+    """
+    if not config.local_duplicate_detection:
+        return run_duplicate_detection_agent(executor, transactions)
+    
+    local = detect_duplicates_python(transactions, config)
+    near_pairs = local.pop("near_duplicate_pairs")
+    if near_pairs and config.duplicate_llm_tiebreak:
+        near_ids = {p["transaction_1"] for p in near_pairs} | {p["transaction_2"] for p in near_pairs}
+        tiebreak = run_duplicate_detection_agent(
+            executor, [t for t in transactions if str(t.get("transaction_id")) in near_ids]
+        )
+        if tiebreak["success"]:
+            confirmed = {frozenset((str(p.get("transaction_1")), str(p.get("transaction_2"))))
+                         for p in tiebreak["result"].get("duplicate_pairs", [])}
+            for pair in near_pairs:
+                if frozenset((pair["transaction_1"], pair["transaction_2"])) in confirmed:
+                    local["duplicate_pairs"].append(pair)
+                else:
+                    local.setdefault("near_duplicate_pairs", []).append(pair)
+        else:
+            local["near_duplicate_pairs"] = near_pairs
+    elif near_pairs:
+        local["near_duplicate_pairs"] = near_pairs
+    
+    marked = {p["mark_for_deletion"] for p in local["duplicate_pairs"]}
+    local["non_duplicate_transaction_ids"] = [i for i in local["non_duplicate_transaction_ids"] if i not in marked]
+    local["summary"]["duplicates_found"] = len(local["duplicate_pairs"])
+    local["summary"]["non_duplicates"] = len(local["non_duplicate_transaction_ids"])
+    return {"success": True, "result": local}
+
+
+def run_duplicate_detection_agent(executor: AgentExecutor, transactions: List[Dict]) -> Dict:
     """Run Duplicate Detection Agent."""
     minified = [minify_transaction(t) for t in transactions]
     
@@ -3611,40 +4193,38 @@ def run_exact_match_batched(
     """
     all_matched = []
     all_unmatched_ids = []
-    batch_size = config.batch_size
     
     # ADDED: Track matched documents across batches
     matched_doc_ids = {k: set() for k in ['bill', 'invoice', 'credit_note', 'payroll', 'share']}
     
-    logger.info(f"Processing {len(transactions)} transactions in batches of {batch_size}")
-    
-    for i in range(0, len(transactions), batch_size):
-        batch = transactions[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(transactions) + batch_size - 1) // batch_size
+    def build_item(txn):
+        filtered = filter_candidate_documents(txn, documents, config)
         
-        logger.info(f"  Batch {batch_num}/{total_batches}: {len(batch)} transactions")
+        # ADDED: REMOVE ALREADY MATCHED DOCUMENTS FROM CANDIDATES
+        filtered_available = {}
+        for doc_type, docs_list in filtered.items():
+            doc_type_key = doc_type.rstrip('s') if doc_type.endswith('s') else doc_type
+            filtered_available[doc_type] = [
+                doc for doc in docs_list
+                if str(doc.get(f"{doc_type_key}_id") or doc.get("id")) not in matched_doc_ids.get(doc_type_key, set())
+            ]
         
-        # Prepare batch data - FILTER OUT ALREADY MATCHED DOCUMENTS
-        batch_data = []
-        for txn in batch:
-            filtered = filter_candidate_documents(txn, documents, config)
-            
-            # ADDED: REMOVE ALREADY MATCHED DOCUMENTS FROM CANDIDATES
-            filtered_available = {}
-            for doc_type, docs_list in filtered.items():
-                doc_type_key = doc_type.rstrip('s') if doc_type.endswith('s') else doc_type
-                filtered_available[doc_type] = [
-                    doc for doc in docs_list
-                    if str(doc.get(f"{doc_type_key}_id") or doc.get("id")) not in matched_doc_ids.get(doc_type_key, set())
-                ]
-            
-            minified_docs = minify_documents_dict(filtered_available, config.max_candidates_per_txn)
-            
-            batch_data.append({
-                "transaction": minify_transaction(txn),
-                "candidates": minified_docs
-            })
+        return {
+            "transaction": minify_transaction(txn),
+            "candidates": minify_documents_dict(filtered_available, config.max_candidates_per_txn)
+        }
+    
+    # Candidates shrink as documents get matched, so items are rebuilt per batch
+    batcher = AdaptiveBatcher(transactions, build_item, config,
+                              fixed_tokens=estimate_tokens(EXACT_MATCH_PROMPT), cache_items=False)
+    
+    logger.info(f"Processing {len(transactions)} transactions in adaptive batches (max {batcher.cap})")
+    
+    while next_batch := batcher.next_batch():
+        batch, batch_data, tokens = next_batch
+        batch_num = batcher.batches_sent
+        
+        logger.info(f"  Batch {batch_num}: {len(batch)} transactions (~{tokens} tokens, {batcher.remaining} remaining)")
         
         user_message = f"""Match these {len(batch)} transactions:
 
@@ -3655,6 +4235,7 @@ Return matches and unmatched IDs."""
         result = executor.execute("ExactMatch", EXACT_MATCH_PROMPT, user_message)
         
         if result["success"]:
+            batcher.observe(batch, result)
             batch_matches = result["result"].get("matched", [])
             all_matched.extend(batch_matches)
             all_unmatched_ids.extend(result["result"].get("unmatched_transaction_ids", []))
@@ -3669,7 +4250,7 @@ Return matches and unmatched IDs."""
                 if doc_id := match.get("document_id"):
                     matched_doc_ids[doc_type_key].add(str(doc_id))
                     logger.debug(f"  Marked {doc_type}:{doc_id} as matched in batch {batch_num}")
-        else:
+        elif not batcher.split(batch, result):
             # On failure, mark all batch transactions as unmatched
             all_unmatched_ids.extend([str(t.get("transaction_id")) for t in batch])
     
@@ -3709,24 +4290,21 @@ def run_partner_resolution_batched(
     
     all_matched = []
     all_unmatched_ids = []
-    batch_size = config.batch_size
     
-    for i in range(0, len(transactions), batch_size):
-        batch = transactions[i:i + batch_size]
-        
-        batch_data = []
-        for txn in batch:
-            txn_id = txn.get("transaction_id")
-            date_range = ctx_lookup.get(txn_id, config.fuzzy_match_date_range)
-            
-            filtered = filter_candidate_documents(txn, documents, config, date_range, for_combination = True)
-            minified_docs = minify_documents_dict(filtered, config.max_candidates_per_txn)
-            
-            batch_data.append({
-                "transaction": minify_transaction(txn),
-                "date_range_days": date_range,
-                "candidates": minified_docs
-            })
+    def build_item(txn):
+        date_range = ctx_lookup.get(txn.get("transaction_id"), config.fuzzy_match_date_range)
+        filtered = filter_candidate_documents(txn, documents, config, date_range, for_combination = True)
+        return {
+            "transaction": minify_transaction(txn),
+            "date_range_days": date_range,
+            "candidates": minify_documents_dict(filtered, config.max_candidates_per_txn)
+        }
+    
+    batcher = AdaptiveBatcher(transactions, build_item, config, fixed_tokens=estimate_tokens(PARTNER_RESOLUTION_PROMPT))
+    
+    while next_batch := batcher.next_batch():
+        batch, batch_data, tokens = next_batch
+        logger.info(f"  Batch {batcher.batches_sent}: {len(batch)} transactions (~{tokens} tokens)")
         
         user_message = f"""Match {len(batch)} transactions with fuzzy partner matching:
 
@@ -3735,9 +4313,10 @@ def run_partner_resolution_batched(
         result = executor.execute("PartnerResolution", PARTNER_RESOLUTION_PROMPT, user_message)
         
         if result["success"]:
+            batcher.observe(batch, result)
             all_matched.extend(result["result"].get("matched", []))
             all_unmatched_ids.extend(result["result"].get("unmatched_transaction_ids", []))
-        else:
+        elif not batcher.split(batch, result):
             all_unmatched_ids.extend([str(t.get("transaction_id")) for t in batch])
     
     return {
@@ -3764,41 +4343,72 @@ def run_combination_match_batched(
     
     all_matched = []
     all_unmatched_ids = []
-    batch_size = config.batch_size
     
-    for i in range(0, len(transactions), batch_size):
-        batch = transactions[i:i + batch_size]
-        
-        batch_data = []
-        for txn in batch:
-            txn_id = txn.get("transaction_id")
-            date_range = ctx_lookup.get(txn_id, config.fuzzy_match_date_range)
-            
-            filtered = filter_candidate_documents(txn, documents, config, date_range, for_combination = True)
-            minified_docs = minify_documents_dict(filtered, config.max_candidates_per_txn * 2)
-            
-            batch_data.append({
-                "transaction": minify_transaction(txn),
-                "candidates": minified_docs
-            })
+    txn_dates = {}
+    for txn in transactions:
+        try:
+            txn_dates[id(txn)] = datetime.strptime(str(txn.get("date"))[:10], "%Y-%m-%d")
+        except ValueError:
+            continue
+    by_date = sorted((t for t in transactions if id(t) in txn_dates), key=lambda t: txn_dates[id(t)])
+    dates = [txn_dates[id(t)] for t in by_date]
+    
+    def split_partners(txn, candidates):
+        """
+        Other unmatched transactions that could pay the same document as txn:
+        same direction and currency, within split_payment_window_days and
+        smaller than the largest candidate document, nearest dates first.
+        """
+        txn_date = txn_dates.get(id(txn))
+        txn_amount = to_decimal(txn.get("amount", 0))
+        largest = max((abs(to_decimal(doc.get("amount", 0))) for docs in candidates.values() for doc in docs), default=Decimal("0"))
+        if not txn_date or txn_amount == 0 or largest <= abs(txn_amount):
+            return []
         
-        # Also include all unmatched for split detection
-        all_txns_mini = [minify_transaction(t) for t in transactions]
+        window = timedelta(days=config.split_payment_window_days)
+        low, high = bisect.bisect_left(dates, txn_date - window), bisect.bisect_right(dates, txn_date + window)
+        partners = [
+            other for other in by_date[low:high]
+            if other is not txn
+            and (to_decimal(other.get("amount", 0)) > 0) == (txn_amount > 0)
+            and other.get("currency", "EUR") == txn.get("currency", "EUR")
+            and 0 < abs(to_decimal(other.get("amount", 0))) < largest
+        ]
+        partners.sort(key=lambda other: abs((txn_dates[id(other)] - txn_date).days))
+        return [minify_transaction(other) for other in partners[:config.max_split_partners_per_txn]]
+    
+    def build_item(txn):
+        date_range = ctx_lookup.get(txn.get("transaction_id"), config.fuzzy_match_date_range)
+        filtered = filter_candidate_documents(txn, documents, config, date_range, for_combination = True)
+        # Split detection only needs the unmatched transactions near this one,
+        # so they are part of the item and sized with it
+        return {
+            "transaction": minify_transaction(txn),
+            "candidates": minify_documents_dict(filtered, config.max_candidates_per_txn * 2),
+            "split_partners": split_partners(txn, filtered)
+        }
+    
+    batcher = AdaptiveBatcher(transactions, build_item, config,
+                              fixed_tokens=estimate_tokens(COMBINATION_MATCH_PROMPT))
+    
+    while next_batch := batcher.next_batch():
+        batch, batch_data, tokens = next_batch
+        logger.info(f"  Batch {batcher.batches_sent}: {len(batch)} transactions (~{tokens} tokens)")
         
-        user_message = f"""Find combination matches for {len(batch)} transactions:
+        user_message = f"""Find combination matches for {len(batch)} transactions.
+Each item lists its candidate documents and, under split_partners, the other
+unmatched transactions that could share a split payment with it.
 
 BATCH:
-{safe_json_dumps(batch_data)}
-
-ALL UNMATCHED (for split detection):
-{safe_json_dumps(all_txns_mini)}"""
+{safe_json_dumps(batch_data)}"""
 
         result = executor.execute("CombinationMatch", COMBINATION_MATCH_PROMPT, user_message)
         
         if result["success"]:
+            batcher.observe(batch, result)
             all_matched.extend(result["result"].get("matched", []))
             all_unmatched_ids.extend(result["result"].get("unmatched_transaction_ids", []))
-        else:
+        elif not batcher.split(batch, result):
             all_unmatched_ids.extend([str(t.get("transaction_id")) for t in batch])
     
     return {
@@ -3884,7 +4494,6 @@ def run_suspense_resolution(
     
     all_matched = []
     all_unmatched_ids = []
-    batch_size = config.batch_size
     
     logger.info(f"Processing {len(suspense_transactions)} suspense transactions with partner-agnostic matching")
     
@@ -3914,64 +4523,65 @@ def run_suspense_resolution(
     logger.info(f"  TOTAL: {total_docs} documents available")
     logger.info("=" * 70)
     
-    for i in range(0, len(suspense_transactions), batch_size):
-        batch = suspense_transactions[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(suspense_transactions) + batch_size - 1) // batch_size
+    def build_item(txn):
+        txn_id = txn.get('transaction_id')
+        txn_amount = txn.get('amount')
+        txn_date = txn.get('date')
         
-        logger.info(f"\nProcessing batch {batch_num}/{total_batches}: {len(batch)} suspense transactions")
+        # Use WIDE date range for suspense (max_date_range = 365 days)
+        filtered = filter_suspense_candidates(
+            txn, 
+            documents, 
+            config, 
+            date_range_days=config.max_date_range
+        )
         
-        batch_data = []
-        for txn in batch:
-            txn_id = txn.get('transaction_id')
-            txn_amount = txn.get('amount')
-            txn_date = txn.get('date')
-            
-            # Use WIDE date range for suspense (max_date_range = 365 days)
-            filtered = filter_suspense_candidates(
-                txn, 
-                documents, 
-                config, 
-                date_range_days=config.max_date_range
-            )
-            
-            # LOG: What candidates survived filtering for THIS transaction
-            total_candidates = sum(len(docs) for docs in filtered.values())
-            logger.info(f"\n  Transaction {txn_id} (amount={txn_amount}, date={txn_date}):")
-            logger.info(f"    Candidates after filtering: {total_candidates} documents")
-            
-            for doc_type, docs in filtered.items():
-                if docs:
-                    logger.info(f"      {doc_type}: {len(docs)} candidates")
-                    for doc in docs[:5]:  # Show first 5
-                        doc_id_field = f"{doc_type.rstrip('s')}_id"
-                        doc_id = doc.get(doc_id_field) or doc.get("id")
-                        doc_amount = doc.get('amount')
-                        doc_date = doc.get('date')
-                        amount_diff = abs(to_decimal(txn_amount) - to_decimal(doc_amount))
-                        
-                        # Calculate date difference
-                        try:
-                            date_diff = calculate_date_difference(txn_date, doc_date)
-                        except:
-                            date_diff = "N/A"
-                        
-                        logger.info(f"        • {doc_id}: amount={doc_amount} (diff={format_decimal(amount_diff)}), "
-                                   f"date={doc_date} (diff={date_diff} days)")
+        # LOG: What candidates survived filtering for THIS transaction
+        total_candidates = sum(len(docs) for docs in filtered.values())
+        logger.info(f"\n  Transaction {txn_id} (amount={txn_amount}, date={txn_date}):")
+        logger.info(f"    Candidates after filtering: {total_candidates} documents")
+        
+        for doc_type, docs in filtered.items():
+            if docs:
+                logger.info(f"      {doc_type}: {len(docs)} candidates")
+                for doc in docs[:5]:  # Show first 5
+                    doc_id_field = f"{doc_type.rstrip('s')}_id"
+                    doc_id = doc.get(doc_id_field) or doc.get("id")
+                    doc_amount = doc.get('amount')
+                    doc_date = doc.get('date')
+                    amount_diff = abs(to_decimal(txn_amount) - to_decimal(doc_amount))
                     
-                    if len(docs) > 5:
-                        logger.info(f"        ... and {len(docs) - 5} more")
-            
-            if total_candidates == 0:
-                logger.warning(f"    ⚠️  NO CANDIDATES found for transaction {txn_id}! Check filtering logic.")
-            
-            minified_docs = minify_documents_dict(filtered, config.max_candidates_per_txn * 2)
-            
-            batch_data.append({
-                "transaction": minify_transaction(txn),
-                "candidates": minified_docs,
-                "note": "SUSPENSE - ignore partner names"
-            })
+                    # Calculate date difference
+                    try:
+                        date_diff = calculate_date_difference(txn_date, doc_date)
+                    except:
+                        date_diff = "N/A"
+                    
+                    logger.info(f"        • {doc_id}: amount={doc_amount} (diff={format_decimal(amount_diff)}), "
+                               f"date={doc_date} (diff={date_diff} days)")
+                
+                if len(docs) > 5:
+                    logger.info(f"        ... and {len(docs) - 5} more")
+        
+        if total_candidates == 0:
+            logger.warning(f"    ⚠️  NO CANDIDATES found for transaction {txn_id}! Check filtering logic.")
+        
+        minified_docs = minify_documents_dict(filtered, config.max_candidates_per_txn * 2)
+        
+        return {
+            "transaction": minify_transaction(txn),
+            "candidates": minified_docs,
+            "note": "SUSPENSE - ignore partner names"
+        }
+    
+    batcher = AdaptiveBatcher(suspense_transactions, build_item, config,
+                              fixed_tokens=estimate_tokens(SUSPENSE_MATCH_PROMPT))
+    
+    while next_batch := batcher.next_batch():
+        batch, batch_data, tokens = next_batch
+        batch_num = batcher.batches_sent
+        
+        logger.info(f"\nProcessing batch {batch_num}: {len(batch)} suspense transactions (~{tokens} tokens, {batcher.remaining} remaining)")
         
         logger.info(f"\n  Sending batch {batch_num} to LLM for matching...")
         
@@ -4001,9 +4611,10 @@ CRITICAL: Partner names are placeholders - match ONLY on amount, date, and conte
                                    f"{match.get('document_id')} "
                                    f"(confidence: {match.get('confidence', 'N/A')})")
             
+            batcher.observe(batch, result)
             all_matched.extend(matched_in_batch)
             all_unmatched_ids.extend(unmatched_in_batch)
-        else:
+        elif not batcher.split(batch, result):
             logger.error(f"  ✗ Batch {batch_num} FAILED: {result.get('error', 'Unknown error')}")
             all_unmatched_ids.extend([str(t.get("transaction_id")) for t in batch])
     
@@ -4044,24 +4655,54 @@ def run_confidence_scoring(executor: AgentExecutor, matches: List[Dict]) -> Dict
 
 def orchestrate_matching(
     input_data: Dict,
-    config: MatchingConfig = DEFAULT_CONFIG
+    config: MatchingConfig = DEFAULT_CONFIG,
+    run_id: Optional[str] = None
 ) -> Dict:
     """
     Main orchestrator - coordinates all agents with batched processing.
+    
+    Progress is checkpointed under run_id (a new one when not given, see
+    matching_checkpoints); passing the run_id of an unfinished run resumes
+    it after its last finished agent call. A run_id that was started with
+    a different request is refused with conflict set, a malformed run_id
+    with invalid_request set.
     """
     logger.info("=" * 70)
     logger.info("TRANSACTION MATCHING WORKFLOW V7 - START")
     logger.info("=" * 70)
     
+    try:
+        checkpoint = matching_checkpoints.start_run(input_data, run_id)
+    except matching_checkpoints.RunInputMismatch as e:
+        logger.error(str(e))
+        return {"run_id": run_id, "success": False, "conflict": True, "error": str(e)}
+    except matching_checkpoints.InvalidRunId as e:
+        logger.error(str(e))
+        return {"run_id": run_id, "success": False, "invalid_request": True, "error": str(e)}
+    if checkpoint and checkpoint.status == "completed":
+        logger.info(f"Run {checkpoint.run_id} already completed, returning its results")
+        return checkpoint.results
+    
     executor = AgentExecutor(config)
+    executor.checkpoint = checkpoint
     state = MatchingState()
     
+    def complete_step(step: int, matches: Optional[List[Dict]] = None):
+        state.completed_steps.append(step)
+        results["summary"]["workflow_steps_completed"].append(step)
+        if matches is not None:
+            state.all_matches = matches
+        if checkpoint:
+            checkpoint.record_step(step, state.to_dict())
+    
     results = {
+        "run_id": checkpoint.run_id if checkpoint else None,
         "success": False,
         "workflow_completed": False,
         "matched_transactions": [],
         "unmatched_transactions": [],
         "duplicate_transactions": [],
+        "possible_duplicates": [],
         "errors": [],
         "summary": {
             "total_transactions": 0,
@@ -4090,7 +4731,8 @@ def orchestrate_matching(
         total_txns = len(company_data.get("bank_transactions", []))
         results["summary"]["total_transactions"] = total_txns
         
-        logger.info(f"Processing {total_txns} transactions (batch_size={config.batch_size})")
+        logger.info(f"Processing {total_txns} transactions (adaptive_batching={config.adaptive_batching}, "
+                    f"max_batch_size={config.max_batch_size}, batch_size={config.batch_size})")
         
         # =====================================================================
         # STEP 1: Data Enrichment
@@ -4100,6 +4742,8 @@ def orchestrate_matching(
         
         if not enrich_result["success"]:
             results["errors"].append({"step": 1, "error": enrich_result.get("error")})
+            if checkpoint:
+                checkpoint.fail(enrich_result.get("error"))
             return results
         
         enriched = enrich_result["result"]
@@ -4118,20 +4762,22 @@ def orchestrate_matching(
             "shares": enriched.get("enriched_shares", [])
         }
         
-        state.completed_steps.append(1)
-        results["summary"]["workflow_steps_completed"].append(1)
+        complete_step(1)
         logger.info(f"✓ Enriched {len(enriched_txns)} transactions")
         
         # =====================================================================
         # STEP 2: Duplicate Detection
         # =====================================================================
         logger.info("\n[STEP 2/9] Duplicate Detection")
-        dup_result = run_duplicate_detection(executor, enriched_txns)
+        dup_result = run_duplicate_detection(executor, enriched_txns, config)
         
         if dup_result["success"]:
             dup_data = dup_result["result"]
             dup_pairs = dup_data.get("duplicate_pairs", [])
             
+            # Unconfirmed near-duplicates stay in matching, flagged for review
+            results["possible_duplicates"] = dup_data.get("near_duplicate_pairs", [])
+            
             # Mark duplicates
             for pair in dup_pairs:
                 dup_id = str(pair.get("mark_for_deletion"))
@@ -4156,9 +4802,9 @@ def orchestrate_matching(
             non_dup_txns = enriched_txns
         
         results["summary"]["available_for_matching"] = len(non_dup_txns)
-        state.completed_steps.append(2)
-        results["summary"]["workflow_steps_completed"].append(2)
-        logger.info(f"✓ Found {results['summary']['duplicates_found']} duplicates, {len(non_dup_txns)} available")
+        complete_step(2)
+        logger.info(f"✓ Found {results['summary']['duplicates_found']} duplicates, {len(non_dup_txns)} available"
+                    f" ({len(results['possible_duplicates'])} possible duplicates left for review)")
         
         # =====================================================================
         # STEP 3: Exact Match (BATCHED)
@@ -4200,8 +4846,7 @@ def orchestrate_matching(
             unmatched_after_exact = non_dup_txns
         
         all_matches = exact_matches.copy()
-        state.completed_steps.append(3)
-        results["summary"]["workflow_steps_completed"].append(3)
+        complete_step(3, all_matches)
         logger.info(f"✓ Exact: {len(exact_matches)} matched, {len(unmatched_after_exact)} unmatched")
         
         # =====================================================================
@@ -4216,8 +4861,7 @@ def orchestrate_matching(
             logger.info("\n[STEP 4/9] Context Analysis")
             ctx_result = run_context_analysis(executor, unmatched_after_exact)
             context_analysis = ctx_result["result"] if ctx_result["success"] else {"context_analysis": []}
-            state.completed_steps.append(4)
-            results["summary"]["workflow_steps_completed"].append(4)
+            complete_step(4, all_matches)
             
             # STEP 5: Partner Resolution (BATCHED)
             logger.info("\n[STEP 5/9] Partner Resolution (Batched)")
@@ -4257,8 +4901,7 @@ def orchestrate_matching(
                 fuzzy_matches = []
                 unmatched_after_partner = unmatched_after_exact
             
-            state.completed_steps.append(5)
-            results["summary"]["workflow_steps_completed"].append(5)
+            complete_step(5, all_matches)
             logger.info(f"✓ Fuzzy: {len(fuzzy_matches)} matched")
             
             # IMPORTANT: Ensure unmatched_after_partner is always defined
@@ -4310,14 +4953,12 @@ def orchestrate_matching(
                     # Combination matching failed - keep all as unmatched
                     final_unmatched = unmatched_after_partner
                 
-                state.completed_steps.append(6)
-                results["summary"]["workflow_steps_completed"].append(6)
+                complete_step(6, all_matches)
                 logger.info(f"✓ Combination: {batch_ct} batch, {split_ct} split")
             else:
                 # No transactions left for combination matching
                 final_unmatched = []
-                state.completed_steps.append(6)
-                results["summary"]["workflow_steps_completed"].append(6)
+                complete_step(6, all_matches)
                 logger.info(f"✓ Combination: 0 batch, 0 split (all matched in previous steps)")
         else:
             # Match rate >= 80%, skip fuzzy matching entirely
@@ -4440,115 +5081,106 @@ def orchestrate_matching(
         else:
             logger.info("✓ No unmatched suspense transactions")
 
-        state.completed_steps.append(7)
-        results["summary"]["workflow_steps_completed"].append(7)
+        complete_step(7, all_matches)
         
         # =====================================================================
         # STEP 8: Validation
         # =====================================================================
         logger.info("\n[STEP 8/9] Final Validation")
-        val_result = run_validation(executor, all_matches)
+        clear, borderline, rejected = review_matches_python(all_matches, non_dup_txns, all_docs, config)
+        logger.info(f"  Rule-based review: {len(clear)} clear, {len(borderline)} borderline, {len(rejected)} rejected")
+        
+        # Only borderline matches need the Validation Agent's judgement
+        if borderline:
+            val_result = run_validation(executor, borderline)
+            if val_result["success"]:
+                rejected_keys = {_match_key(r) for r in val_result["result"].get("rejected_matches", [])}
+                rejected.extend(m for m in borderline if _match_key(m) in rejected_keys)
+                borderline = [m for m in borderline if _match_key(m) not in rejected_keys]
+        
+        # Keep the original match order
+        rejected_ids = {id(m) for m in rejected}
+        validated = [m for m in all_matches if id(m) not in rejected_ids]
         
-        if val_result["success"]:
-            validated = val_result["result"].get("validated_matches", all_matches)
-            rejected = val_result["result"].get("rejected_matches", [])
+        # Rollback rejected. A DUPLICATE_MATCH rejection claimed ids that a
+        # kept match holds: those stay matched and don't return to unmatched
+        kept_txn_ids = {tid for m in validated for tid in _match_transaction_ids(m)}
+        kept_doc_ids = {
+            (state._normalize_doc_type(m.get("document_type", "bill")), did)
+            for m in validated for did in _match_document_ids(m)
+        }
+        state.rejected_matches.extend(rejected)
+        for rej in rejected:
+            state.rollback_match(rej, kept_txn_ids, kept_doc_ids)
             
-            # Rollback rejected
-            for rej in rejected:
-                state.rollback_match(rej)
-                
-                # Handle single transaction rejections
-                if tid := rej.get("transaction_id"):
-                    txn = next((t for t in non_dup_txns if str(t.get("transaction_id")) == str(tid)), None)
-                    if txn and txn not in final_unmatched:
-                        final_unmatched.append(txn)
-                
-                # Handle combination transaction rejections (split payments: N→1)
-                for tid in rej.get("transaction_ids", []):
-                    txn = next((t for t in non_dup_txns if str(t.get("transaction_id")) == str(tid)), None)
-                    if txn and txn not in final_unmatched:
-                        final_unmatched.append(txn)
-        else:
-            validated = all_matches
+            # Handle single and combination transaction rejections (split payments: N→1)
+            for tid in _match_transaction_ids(rej):
+                if tid in kept_txn_ids:
+                    continue
+                txn = next((t for t in non_dup_txns if str(t.get("transaction_id")) == tid), None)
+                if txn and txn not in final_unmatched:
+                    final_unmatched.append(txn)
         
-        state.completed_steps.append(8)
-        results["summary"]["workflow_steps_completed"].append(8)
+        complete_step(8, validated)
         logger.info(f"✓ Validated: {len(validated)}")
         
         # =====================================================================
         # STEP 9: Confidence Scoring
         # =====================================================================
         logger.info("\n[STEP 9/9] Confidence Scoring")
-        score_result = run_confidence_scoring(executor, validated)
+        txn_lookup, doc_lookup = build_lookup_tables(non_dup_txns, all_docs)
+        borderline_keys = {_match_key(m) for m in borderline}
+        to_llm = []
+        for match in validated:
+            scoring = score_match_python(match, txn_lookup, doc_lookup, config)
+            match["confidence_level"] = scoring["confidence_level"]
+            match["confidence_score"] = scoring["confidence_score"]
+            match["recommendation"] = scoring["recommendation"]
+            match["confidence_factors"] = scoring["factors"]
+            match["confidence_source"] = "rules"
+            if not config.rule_based_review or scoring["borderline"] or _match_key(match) in borderline_keys:
+                to_llm.append(match)
+        
+        logger.info(f"  Scored {len(validated) - len(to_llm)} matches by rule, {len(to_llm)} sent to the scoring agent")
+        score_result = run_confidence_scoring(executor, to_llm) if to_llm else {"success": False}
 
         if score_result["success"]:
-            scored = score_result["result"].get("scored_matches", validated)
-            
-            # DEBUG: Log what the LLM returned
-            logger.info(f"Confidence scoring returned {len(scored)} scored matches")
-            for s in scored:
-                if s.get("transaction_ids"):
-                    logger.info(f"  Scored combination: {s.get('transaction_ids')} → confidence={s.get('confidence_level')}")
+            scored = {_match_key(s): s for s in score_result["result"].get("scored_matches", [])}
             
             # Merge scores back - handle BOTH single and combination matches
             merge_failures = []
-            for match in validated:
-                # Find the corresponding scored match
-                scored_match = None
-                match_key = None
-                
-                # Try matching by transaction_id (single matches, batch payments)
-                if tid := match.get("transaction_id"):
-                    match_key = f"transaction_id={tid}"
-                    scored_match = next(
-                        (s for s in scored if s.get("transaction_id") == tid),
-                        None
-                    )
-                
-                # Try matching by transaction_ids (split payments)
-                if not scored_match and (tids := match.get("transaction_ids")):
-                    match_key = f"transaction_ids={tids}"
-                    # Convert to sets of strings for comparison
-                    tids_set = set(str(t) for t in tids)
-                    scored_match = next(
-                        (s for s in scored 
-                        if set(str(t) for t in s.get("transaction_ids", [])) == tids_set),
-                        None
-                    )
-                
-                # Merge the confidence fields if found
+            for match in to_llm:
+                scored_match = scored.get(_match_key(match))
                 if scored_match:
-                    match["confidence_level"] = scored_match.get("confidence_level", "LOW")
-                    match["confidence_score"] = scored_match.get("confidence_score", 50.0)
-                    match["recommendation"] = scored_match.get("recommendation", "MANUAL")
-                    logger.debug(f"  Merged confidence for {match_key}")
+                    match["confidence_level"] = scored_match.get("confidence_level", match["confidence_level"])
+                    match["confidence_score"] = scored_match.get("confidence_score", match["confidence_score"])
+                    match["recommendation"] = scored_match.get("recommendation", match["recommendation"])
+                    match["confidence_source"] = "agent"
                 else:
-                    # Track failures
-                    merge_failures.append({
-                        "match_type": match.get("match_type"),
-                        "key": match_key,
-                        "has_tid": bool(match.get("transaction_id")),
-                        "has_tids": bool(match.get("transaction_ids"))
-                    })
-                    # Set defaults for unscored matches
-                    match["confidence_level"] = "LOW"
-                    match["confidence_score"] = 50.0
-                    match["recommendation"] = "MANUAL"
+                    merge_failures.append({"match_type": match.get("match_type"), "key": _match_key(match)})
+                    # Keep the rule score, but never auto-reconcile a match the agent was asked about
+                    if match["recommendation"] == "AUTO_RECONCILE":
+                        match["confidence_level"] = ConfidenceLevel.MEDIUM.value
+                        match["recommendation"] = "REVIEW"
             
             # Log merge failures
             if merge_failures:
                 logger.warning(f"Failed to merge confidence for {len(merge_failures)} matches:")
                 for f in merge_failures:
                     logger.warning(f"  {f}")
-            
-            # Count levels
-            for m in validated:
-                level = m.get("confidence_level", "LOW")
-                if level in results["summary"]["confidence_breakdown"]:
-                    results["summary"]["confidence_breakdown"][level] += 1
-
-        state.completed_steps.append(9)
-        results["summary"]["workflow_steps_completed"].append(9)
+        else:
+            for match in to_llm:
+                if match["recommendation"] == "AUTO_RECONCILE":
+                    match["confidence_level"] = ConfidenceLevel.MEDIUM.value
+                    match["recommendation"] = "REVIEW"
+        
+        # Count levels
+        for m in validated:
+            level = m.get("confidence_level", "LOW")
+            if level in results["summary"]["confidence_breakdown"]:
+                results["summary"]["confidence_breakdown"][level] += 1
+
+        complete_step(9, validated)
         
         # =====================================================================
         # FINAL RESULTS
@@ -4577,12 +5209,16 @@ def orchestrate_matching(
         logger.info(f"API calls: {executor.api_calls} | Tokens: {executor.total_input_tokens + executor.total_output_tokens}")
         logger.info("=" * 70)
         
+        if checkpoint:
+            checkpoint.complete(results)
         return results
         
     except Exception as e:
         logger.error(f"CRITICAL ERROR: {e}")
         logger.error(traceback.format_exc())
         results["errors"].append({"error": str(e), "traceback": traceback.format_exc()})
+        if checkpoint:
+            checkpoint.fail(e)
         return results
 
 
@@ -4657,8 +5293,17 @@ def normalize_input_format(input_data: Any) -> Dict:
 # =============================================================================
 
 def main(data: Dict, config: Optional[MatchingConfig] = None) -> Dict:
-    """Main entry point."""
-    return orchestrate_matching(data, config or DEFAULT_CONFIG)
+    """Main entry point. A run_id in the request resumes (or names) a checkpointed run."""
+    run_id = data.get("run_id") if isinstance(data, dict) else None
+    return orchestrate_matching(data, config or DEFAULT_CONFIG, run_id=run_id)
+
+
+def resume_matching(run_id: str, config: Optional[MatchingConfig] = None) -> Dict:
+    """Continue a checkpointed run on its stored input from the last finished agent call."""
+    input_data = matching_checkpoints.load_input(run_id)
+    if input_data is None:
+        return {"success": False, "error": f"No checkpoint found for run {run_id}"}
+    return orchestrate_matching(input_data, config or DEFAULT_CONFIG, run_id=run_id)
 
 
 def health_check() -> Dict:
@@ -4674,6 +5319,8 @@ def health_check() -> Dict:
         ],
         "config": {
             "batch_size": DEFAULT_CONFIG.batch_size,
+            "adaptive_batching": DEFAULT_CONFIG.adaptive_batching,
+            "batch_prompt_token_budget": DEFAULT_CONFIG.batch_prompt_token_budget,
             "bank_fee_tolerance": str(DEFAULT_CONFIG.bank_fee_tolerance),
             "reject_hallucinated_ids": DEFAULT_CONFIG.reject_hallucinated_ids
         }
@@ -0,0 +1,507 @@
+"""
+Process-wide latency, call-count and token metrics.
+
+Four sources feed the registry:
+
+- Flask routes: init_app() times every request by its URL rule.
+- Odoo: install() wraps xmlrpc.client.ServerProxy so every execute_kw is
+  recorded per model/method, whichever module made the call.
+- DynamoDB: instrument_boto3_session() hooks the shared aws_clients
+  session's events. It asks DynamoDB for consumed capacity and times
+  every operation per table.
+- Anthropic: Messages.create is wrapped the moment the SDK is first
+  imported. Calls are labelled with the agent name set through
+  `with metrics.agent(name)`, or else with the calling module.
+
+/metrics renders everything in the Prometheus text format. Under
+gunicorn (METRICS_DIR set, see gunicorn.conf.py) every worker dumps its
+values to METRICS_DIR/<pid>.json every METRICS_FLUSH_SECONDS, the master
+folds the files of exited workers into dead.json, and /metrics sums all
+of them, so whichever worker answers the scrape reports totals for the
+whole server. Without METRICS_DIR the numbers are this process's own.
+
+The endpoint needs `Authorization: Bearer $METRICS_TOKEN` and is
+disabled while METRICS_TOKEN is unset. When timing headers are on
+(METRICS_TIMING_HEADERS=true, or an `X-Debug-Timing: 1` request header)
+responses also carry a Server-Timing header with the request's per-stage
+totals.
+"""
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import xmlrpc.client
+
+METRICS_TIMING_HEADERS = os.getenv('METRICS_TIMING_HEADERS', 'false').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_request = threading.local()
+_agent = threading.local()
+# Bumped on every update so the flusher only writes when something changed
+_version = 0
+_flushed_version = 0
+_flusher_pid = None
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        global _version
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            _version += 1
+
+    @staticmethod
+    def combine(total, value):
+        return value if total is None else total + value
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._values = {}
+
+    def observe(self, value, **labels):
+        global _version
+        key = _label_key(labels)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][index] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+            _version += 1
+
+    @staticmethod
+    def combine(total, value):
+        if total is None:
+            return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+        total['sum'] += value['sum']
+        total['count'] += value['count']
+        return total
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, entry in sorted(values.items()):
+            for bound, count in zip(self.buckets, entry['buckets']):
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", bound)])} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {entry["count"]}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {round(entry["sum"], 6)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {entry["count"]}')
+        return lines
+
+
+http_request_duration = Histogram('http_request_duration_seconds', 'Request latency by route')
+odoo_rpc_duration = Histogram('odoo_rpc_duration_seconds', 'Odoo XML-RPC call latency by model and method')
+odoo_rpc_errors = Counter('odoo_rpc_errors_total', 'Odoo XML-RPC calls that raised')
+dynamodb_duration = Histogram('dynamodb_operation_duration_seconds', 'DynamoDB operation latency by table')
+dynamodb_capacity = Counter('dynamodb_consumed_capacity_units_total', 'DynamoDB capacity units consumed')
+dynamodb_errors = Counter('dynamodb_errors_total', 'DynamoDB operations that raised')
+anthropic_duration = Histogram('anthropic_request_duration_seconds', 'Anthropic messages.create latency by agent')
+anthropic_tokens = Counter('anthropic_tokens_total', 'Anthropic tokens by agent and type')
+anthropic_retries = Counter('anthropic_retries_total', 'Agent calls that were retries of an earlier attempt')
+anthropic_errors = Counter('anthropic_errors_total', 'Anthropic calls that raised')
+
+REGISTRY = [
+    http_request_duration,
+    odoo_rpc_duration, odoo_rpc_errors,
+    dynamodb_duration, dynamodb_capacity, dynamodb_errors,
+    anthropic_duration, anthropic_tokens, anthropic_retries, anthropic_errors,
+]
+
+
+# =============================================================================
+# Cross-worker aggregation (METRICS_DIR)
+# =============================================================================
+
+def snapshot():
+    """This process's values as JSON-safe data, with the update version they reflect"""
+    with _lock:
+        data = {
+            metric.name: [[[list(pair) for pair in key], value] for key, value in metric._values.items()]
+            for metric in REGISTRY
+        }
+        return data, _version
+
+
+def _merge(totals, data):
+    for metric in REGISTRY:
+        merged = totals[metric.name]
+        for key, value in data.get(metric.name, []):
+            key = tuple(tuple(pair) for pair in key)
+            merged[key] = metric.combine(merged.get(key), value)
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextlib.contextmanager
+def _dir_lock():
+    """Serialise readers with the master folding an exited worker into dead.json"""
+    with open(os.path.join(METRICS_DIR, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def flush():
+    """Write this worker's values to METRICS_DIR/<pid>.json if they changed"""
+    global _flushed_version
+    if not METRICS_DIR:
+        return
+    data, version = snapshot()
+    if version == _flushed_version:
+        return
+    _write_json(os.path.join(METRICS_DIR, f'{os.getpid()}.json'), data)
+    _flushed_version = version
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️  Metrics flush failed: {e}")
+
+
+def _start_flusher():
+    """Start the periodic flush once per worker process (threads don't survive fork)"""
+    global _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def mark_process_dead(pid):
+    """
+    Fold an exited worker's values into dead.json so its counts survive
+    worker recycling. Called from the gunicorn master's child_exit hook.
+    """
+    if not METRICS_DIR:
+        return
+    path = os.path.join(METRICS_DIR, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    dead_path = os.path.join(METRICS_DIR, 'dead.json')
+    with _dir_lock():
+        totals = {metric.name: {} for metric in REGISTRY}
+        _merge(totals, _read_json(dead_path))
+        _merge(totals, _read_json(path))
+        _write_json(dead_path, {
+            name: [[[list(pair) for pair in key], value] for key, value in values.items()]
+            for name, values in totals.items()
+        })
+        os.remove(path)
+
+
+def _reset_after_fork():
+    # Values recorded in the master (preload_app) belong to no worker
+    global _lock, _version, _flushed_version
+    _lock = threading.Lock()
+    _version = _flushed_version = 0
+    for metric in REGISTRY:
+        metric._values = {}
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# =============================================================================
+# Per-request stage totals (Server-Timing)
+# =============================================================================
+
+def _add_stage(stage, seconds):
+    stages = getattr(_request, 'stages', None)
+    if stages is None:
+        return
+    count, total = stages.get(stage, (0, 0.0))
+    stages[stage] = (count + 1, total + seconds)
+
+
+def request_stages():
+    """{stage: (calls, seconds)} recorded so far on this thread's request"""
+    return dict(getattr(_request, 'stages', None) or {})
+
+
+# =============================================================================
+# Odoo XML-RPC
+# =============================================================================
+
+_original_request = xmlrpc.client.ServerProxy._ServerProxy__request
+
+
+def _instrumented_request(self, methodname, params):
+    if methodname == 'execute_kw' and len(params) >= 5:
+        model, method = params[3], params[4]
+    else:
+        model, method = 'common', methodname
+
+    started = time.perf_counter()
+    try:
+        return _original_request(self, methodname, params)
+    except Exception:
+        odoo_rpc_errors.inc(model=model, method=method)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        odoo_rpc_duration.observe(elapsed, model=model, method=method)
+        _add_stage('odoo', elapsed)
+
+
+# =============================================================================
+# DynamoDB (botocore events on the shared aws_clients session)
+# =============================================================================
+
+CAPACITY_OPERATIONS = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'
+}
+
+
+def _dynamodb_before(params, model, context, **kwargs):
+    if model.name in CAPACITY_OPERATIONS and 'ReturnConsumedCapacity' not in params:
+        params['ReturnConsumedCapacity'] = 'TOTAL'
+    context['metrics_started'] = time.perf_counter()
+    context['metrics_table'] = params.get('TableName', '-')
+
+
+def _dynamodb_after(parsed, model, context, **kwargs):
+    started = context.get('metrics_started')
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    table = context.get('metrics_table', '-')
+    dynamodb_duration.observe(elapsed, operation=model.name, table=table)
+    _add_stage('dynamodb', elapsed)
+
+    consumed = parsed.get('ConsumedCapacity') if isinstance(parsed, dict) else None
+    for capacity in consumed if isinstance(consumed, list) else [consumed] if consumed else []:
+        dynamodb_capacity.inc(capacity.get('CapacityUnits', 0), operation=model.name,
+                              table=capacity.get('TableName', table))
+
+
+def _dynamodb_error(model, context, **kwargs):
+    dynamodb_errors.inc(operation=model.name, table=context.get('metrics_table', '-'))
+
+
+def instrument_boto3_session(session):
+    """Register DynamoDB timing/capacity hooks; call before any client is created"""
+    session.events.register('before-parameter-build.dynamodb', _dynamodb_before)
+    session.events.register('after-call.dynamodb', _dynamodb_after)
+    session.events.register('after-call-error.dynamodb', _dynamodb_error)
+
+
+# =============================================================================
+# Anthropic
+# =============================================================================
+
+@contextlib.contextmanager
+def agent(name, attempt=0):
+    """Label Anthropic calls made inside the block with an agent name"""
+    previous = getattr(_agent, 'name', None), getattr(_agent, 'attempt', 0)
+    _agent.name, _agent.attempt = name, attempt
+    if attempt:
+        anthropic_retries.inc(agent=name)
+    try:
+        yield
+    finally:
+        _agent.name, _agent.attempt = previous
+
+
+def _record_usage(agent_name, model, usage):
+    for token_type in ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'):
+        value = getattr(usage, token_type, None)
+        if value:
+            anthropic_tokens.inc(value, agent=agent_name, model=model, type=token_type.replace('_input_tokens', '').replace('_tokens', ''))
+
+
+# Modules that wrap Messages.create around this wrapper; the calling module
+# is the first frame outside them
+WRAPPER_MODULES = {__name__, 'llm_cassettes'}
+
+
+def _calling_module():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__') in WRAPPER_MODULES:
+        frame = frame.f_back
+    return frame.f_globals.get('__name__', 'unknown') if frame is not None else 'unknown'
+
+
+def _wrap_messages_create(create):
+    def instrumented_create(self, *args, **kwargs):
+        agent_name = getattr(_agent, 'name', None) or _calling_module()
+        model = kwargs.get('model', 'unknown')
+        started = time.perf_counter()
+        try:
+            response = create(self, *args, **kwargs)
+        except Exception:
+            anthropic_errors.inc(agent=agent_name, model=model)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            anthropic_duration.observe(elapsed, agent=agent_name, model=model)
+            _add_stage('anthropic', elapsed)
+        if getattr(response, 'usage', None) is not None:
+            _record_usage(agent_name, model, response.usage)
+        return response
+
+    instrumented_create.metrics_original = create
+    return instrumented_create
+
+
+def instrument_anthropic():
+    """Wrap Messages.create once the anthropic SDK has been imported"""
+    module = sys.modules.get('anthropic.resources.messages')
+    if module is None:
+        return False
+    messages = getattr(module, 'Messages', None)
+    if messages is None or hasattr(messages.create, 'metrics_original'):
+        return messages is not None
+    messages.create = _wrap_messages_create(messages.create)
+    return True
+
+
+# =============================================================================
+# Flask
+# =============================================================================
+
+def _before_request():
+    _start_flusher()
+    _request.stages = {}
+    _request.started = time.perf_counter()
+
+
+def _after_request(response):
+    from flask import request
+
+    started = getattr(_request, 'started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_request_duration.observe(elapsed, route=route, method=request.method, status=response.status_code)
+
+    if METRICS_TIMING_HEADERS or request.headers.get('X-Debug-Timing') == '1':
+        parts = [
+            f'{stage};dur={total * 1000:.1f};desc="{count} calls"'
+            for stage, (count, total) in sorted(request_stages().items())
+        ]
+        parts.append(f'total;dur={elapsed * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(parts)
+
+    _request.stages = None
+    _request.started = None
+    return response
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    totals = {metric.name: {} for metric in REGISTRY}
+    if METRICS_DIR:
+        flush()
+        with _dir_lock():
+            paths = [path for path in glob.glob(os.path.join(METRICS_DIR, '*.json'))
+                     if os.path.basename(path) != 'dead.json']
+            _merge(totals, _read_json(os.path.join(METRICS_DIR, 'dead.json')))
+            for path in paths:
+                _merge(totals, _read_json(path))
+        workers = len(paths)
+    else:
+        _merge(totals, snapshot()[0])
+        workers = 1
+
+    lines = [
+        '# HELP worker_processes Live worker processes whose metrics are included',
+        '# TYPE worker_processes gauge',
+        f'worker_processes {workers}',
+    ]
+    for metric in REGISTRY:
+        lines.extend(metric.render(totals[metric.name]))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_endpoint():
+    from flask import Response, request
+
+    # Route names, table names and volumes are not for the public
+    if not METRICS_TOKEN:
+        return Response('Metrics are disabled: set METRICS_TOKEN\n', status=403, mimetype='text/plain')
+    if request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def install():
+    """Instrument Odoo XML-RPC and (once imported) the anthropic SDK"""
+    import lazy_modules
+
+    xmlrpc.client.ServerProxy._ServerProxy__request = _instrumented_request
+    # Feature modules (and with them the SDK) are imported on first use
+    if not instrument_anthropic():
+        lazy_modules.on_load(lambda name, module: instrument_anthropic())
+
+
+def init_app(app):
+    """Time every request and expose GET /metrics"""
+    install()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import request, jsonify, g
 from auth import verify_jwt
+import user_cache
 
 def jwt_required(f):
     """Decorator to require valid JWT token"""
@@ -20,8 +21,8 @@ def jwt_required(f):
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         
-        # Verify token
-        verification = verify_jwt(token)
+        # Verify token (decoded payloads are cached until they expire)
+        verification = user_cache.verify_token(token, verify_jwt)
         
         if not verification['valid']:
             return jsonify({'error': verification['error']}), 401
@@ -0,0 +1,417 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+PARTNER_FIELDS = [
+    'id', 'name', 'email', 'vat', 'phone', 'is_company',
+    'supplier_rank', 'customer_rank', 'company_id', 'active'
+]
+
+COMPANY_SUFFIXES = [' inc', ' inc.', ' ltd', ' ltd.', ' llc', ' corp', ' corp.', ' co.', ' co', ' limited']
+
+
+def normalize_name(s):
+    """Normalize a partner name the same way createvendor/createCustomer do"""
+    if not s:
+        return ""
+    s = s.lower().strip()
+    for suffix in COMPANY_SUFFIXES:
+        if s.endswith(suffix):
+            s = s[:-len(suffix)].strip()
+    s = ''.join(c for c in s if c.isalnum() or c.isspace())
+    return ' '.join(s.split())
+
+
+def normalize_email(email):
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def normalize_vat(vat):
+    if not isinstance(vat, str):
+        return None
+    vat = ''.join(c for c in vat if c.isalnum()).lower()
+    return vat or None
+
+
+def normalize_phone(phone):
+    if not isinstance(phone, str):
+        return None
+    digits = ''.join(c for c in phone if c.isdigit())
+    return digits or None
+
+
+def trigrams(text):
+    """Character trigrams of a normalized name, padded so short names still index"""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, a.lower().strip(), b.lower().strip()).ratio()
+
+
+class PartnerIndex:
+    """
+    In-memory index of res.partner records visible to one company.
+
+    Exact lookups on VAT, email, phone and name are dict hits. Fuzzy name
+    lookups use an inverted character-trigram index to pick a handful of
+    candidates, and only those are scored with SequenceMatcher, so the
+    cost of a lookup no longer grows with the number of partners.
+
+    The index is loaded once, refreshed incrementally from write_date, and
+    updated in place when this process creates a partner.
+    """
+
+    def __init__(self, company_id, refresh_seconds=60, full_reload_seconds=1800):
+        self.company_id = company_id
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.partners = {}
+        self.by_vat = defaultdict(set)
+        self.by_email = defaultdict(set)
+        self.by_phone = defaultdict(set)
+        self.by_name = defaultdict(set)
+        self.by_normalized_name = defaultdict(set)
+        self.trigram_postings = defaultdict(set)
+        self.partner_trigrams = {}
+        self.loaded_at = None
+        self.synced_at = None
+        self.last_sync_marker = None
+
+    # ---- loading -------------------------------------------------------
+
+    def _domain(self):
+        if self.company_id:
+            return ['|', ('company_id', '=', self.company_id), ('company_id', '=', False)]
+        return []
+
+    def load(self, models, db, uid, password):
+        """Full load of every partner visible to the company in one query"""
+        sync_marker = (datetime.utcnow() - timedelta(seconds=5)).strftime('%Y-%m-%d %H:%M:%S')
+        partners = models.execute_kw(
+            db, uid, password,
+            'res.partner', 'search_read',
+            [self._domain()],
+            {'fields': PARTNER_FIELDS}
+        )
+
+        with self._lock:
+            self._reset()
+            for partner in partners:
+                self._index(partner)
+            now = time.time()
+            self.loaded_at = now
+            self.synced_at = now
+            self.last_sync_marker = sync_marker
+
+        print(f"✅ Partner index loaded: {len(partners)} partners for company {self.company_id}")
+        return len(partners)
+
+    def refresh(self, models, db, uid, password):
+        """
+        Pull partners written since the last sync and re-index them.
+
+        Archived partners are included so a partner archived since the last
+        sync is dropped from the index instead of lingering until the next
+        full reload.
+        """
+        sync_marker = (datetime.utcnow() - timedelta(seconds=5)).strftime('%Y-%m-%d %H:%M:%S')
+        domain = self._domain() + [
+            ('write_date', '>=', self.last_sync_marker),
+            ('active', 'in', [True, False]),
+        ]
+        changed = models.execute_kw(
+            db, uid, password,
+            'res.partner', 'search_read',
+            [domain],
+            {'fields': PARTNER_FIELDS}
+        )
+
+        with self._lock:
+            for partner in changed:
+                if partner.get('active', True):
+                    self._index(partner)
+                else:
+                    self._unindex(partner.get('id'))
+            self.synced_at = time.time()
+            self.last_sync_marker = sync_marker
+
+        return len(changed)
+
+    def ensure_fresh(self, models, db, uid, password):
+        now = time.time()
+        if self.loaded_at is None or now - self.loaded_at > self.full_reload_seconds:
+            self.load(models, db, uid, password)
+        elif now - self.synced_at > self.refresh_seconds:
+            try:
+                self.refresh(models, db, uid, password)
+            except Exception as e:
+                print(f"⚠️  Partner index refresh failed, reloading: {e}")
+                self.load(models, db, uid, password)
+
+    # ---- maintenance ---------------------------------------------------
+
+    def _unindex(self, partner_id):
+        old = self.partners.pop(partner_id, None)
+        if not old:
+            return
+        for key, mapping in [
+            (normalize_vat(old.get('vat')), self.by_vat),
+            (normalize_email(old.get('email')), self.by_email),
+            (normalize_phone(old.get('phone')), self.by_phone),
+            ((old.get('name') or '').strip().lower() or None, self.by_name),
+            (normalize_name(old.get('name')) or None, self.by_normalized_name),
+        ]:
+            if key and key in mapping:
+                mapping[key].discard(partner_id)
+                if not mapping[key]:
+                    del mapping[key]
+        for gram in self.partner_trigrams.pop(partner_id, ()):
+            postings = self.trigram_postings.get(gram)
+            if postings is not None:
+                postings.discard(partner_id)
+                if not postings:
+                    del self.trigram_postings[gram]
+
+    def _index(self, partner):
+        partner_id = partner.get('id')
+        if not partner_id:
+            return
+        self._unindex(partner_id)
+
+        company = partner.get('company_id')
+        record = {
+            'id': partner_id,
+            'name': partner.get('name') or '',
+            'email': partner.get('email') or None,
+            'vat': partner.get('vat') or None,
+            'phone': partner.get('phone') or None,
+            'is_company': bool(partner.get('is_company')),
+            'supplier_rank': partner.get('supplier_rank') or 0,
+            'customer_rank': partner.get('customer_rank') or 0,
+            'company_id': company[0] if isinstance(company, (list, tuple)) else (company or None),
+        }
+        self.partners[partner_id] = record
+
+        vat = normalize_vat(record['vat'])
+        if vat:
+            self.by_vat[vat].add(partner_id)
+        email = normalize_email(record['email'])
+        if email:
+            self.by_email[email].add(partner_id)
+        phone = normalize_phone(record['phone'])
+        if phone:
+            self.by_phone[phone].add(partner_id)
+
+        raw_name = record['name'].strip().lower()
+        if raw_name:
+            self.by_name[raw_name].add(partner_id)
+        normalized = normalize_name(record['name'])
+        if normalized:
+            self.by_normalized_name[normalized].add(partner_id)
+            grams = trigrams(normalized)
+            self.partner_trigrams[partner_id] = grams
+            for gram in grams:
+                self.trigram_postings[gram].add(partner_id)
+
+    def add(self, partner):
+        """Index a partner this process just created"""
+        with self._lock:
+            self._index(partner)
+
+    def remove(self, partner_id):
+        with self._lock:
+            self._unindex(partner_id)
+
+    # ---- lookups -------------------------------------------------------
+
+    def _accepts(self, partner_id, role, strict_company):
+        partner = self.partners.get(partner_id)
+        if not partner:
+            return False
+        if strict_company and self.company_id and partner['company_id'] != self.company_id:
+            return False
+        if role == 'vendor':
+            return partner['is_company'] and partner['supplier_rank'] > 0
+        if role == 'customer':
+            return partner['customer_rank'] > 0
+        return True
+
+    def _first(self, ids, role, strict_company):
+        for partner_id in sorted(ids):
+            if self._accepts(partner_id, role, strict_company):
+                return self.partners[partner_id]
+        return None
+
+    def find_by_vat(self, vat, role=None, strict_company=False):
+        key = normalize_vat(vat)
+        with self._lock:
+            return self._first(self.by_vat.get(key, ()), role, strict_company) if key else None
+
+    def find_by_email(self, email, role=None, strict_company=False):
+        key = normalize_email(email)
+        with self._lock:
+            return self._first(self.by_email.get(key, ()), role, strict_company) if key else None
+
+    def find_by_phone(self, phone, role=None, strict_company=False):
+        key = normalize_phone(phone)
+        with self._lock:
+            return self._first(self.by_phone.get(key, ()), role, strict_company) if key else None
+
+    def find_by_name(self, name, role=None, strict_company=False):
+        """Case-insensitive exact name match (Odoo's =ilike without wildcards)"""
+        key = (name or '').strip().lower()
+        with self._lock:
+            return self._first(self.by_name.get(key, ()), role, strict_company) if key else None
+
+    def find_by_substring(self, name, role=None, strict_company=False):
+        """
+        Approximate Odoo's `name ilike` using trigram candidates.
+
+        Every trigram of the query must appear in a partner whose name
+        contains it, so candidates come from intersecting postings.
+        """
+        needle = (name or '').strip().lower()
+        normalized = normalize_name(name)
+        if not needle or not normalized:
+            return None
+        grams = {g for g in trigrams(normalized) if not g.startswith(' ') and not g.endswith(' ')}
+
+        with self._lock:
+            if grams:
+                postings = sorted((self.trigram_postings.get(g, set()) for g in grams), key=len)
+                candidates = set(postings[0])
+                for posting in postings[1:]:
+                    candidates &= posting
+                    if not candidates:
+                        break
+            else:
+                candidates = set(self.partners)
+
+            for partner_id in sorted(candidates):
+                partner = self.partners[partner_id]
+                if needle in partner['name'].lower() and self._accepts(partner_id, role, strict_company):
+                    return partner
+        return None
+
+    def fuzzy_candidates(self, name, role=None, strict_company=False, limit=10, min_overlap=0.5):
+        """
+        Return the partners whose names share the most trigrams with `name`.
+
+        Uses prefix filtering: a partner sharing at least `min_overlap` of
+        the query trigrams must contain one of the rarest
+        (len - required + 1) of them, so only those postings are scanned.
+        """
+        normalized = normalize_name(name)
+        grams = trigrams(normalized)
+        if not grams:
+            return []
+
+        required = max(1, int(len(grams) * min_overlap))
+
+        with self._lock:
+            ordered = sorted(grams, key=lambda g: len(self.trigram_postings.get(g, ())))
+            prefix = ordered[:len(ordered) - required + 1]
+
+            candidate_ids = set()
+            for gram in prefix:
+                candidate_ids.update(self.trigram_postings.get(gram, ()))
+
+            scored = []
+            for partner_id in candidate_ids:
+                if not self._accepts(partner_id, role, strict_company):
+                    continue
+                partner_grams = self.partner_trigrams.get(partner_id, set())
+                overlap = len(grams & partner_grams)
+                if overlap < required:
+                    continue
+                dice = 2.0 * overlap / (len(grams) + len(partner_grams))
+                scored.append((dice, partner_id))
+
+            scored.sort(reverse=True)
+            return [self.partners[partner_id] for _, partner_id in scored[:limit]]
+
+    def find_fuzzy(self, name, role=None, strict_company=False, threshold=0.85):
+        """
+        Best fuzzy match above the threshold, scored like the old full scan
+        (max of normalized and raw SequenceMatcher ratios) but only over
+        trigram candidates.
+        """
+        if not name or not name.strip():
+            return None, 0
+        normalized_input = normalize_name(name)
+
+        best_match = None
+        best_similarity = 0
+        for partner in self.fuzzy_candidates(name, role, strict_company):
+            partner_name = partner['name'].strip()
+            if not partner_name:
+                continue
+            score = max(
+                similarity(normalized_input, normalize_name(partner_name)),
+                similarity(name, partner_name)
+            )
+            if score > best_similarity:
+                best_similarity = score
+                best_match = partner
+
+        if best_similarity > threshold:
+            return best_match, best_similarity
+        return None, best_similarity
+
+    def __len__(self):
+        return len(self.partners)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_partner_index(models, db, uid, password, company_id=None):
+    """
+    Return the warm partner index for a database/company pair, loading or
+    refreshing it from Odoo when needed.
+    """
+    key = (db, company_id or None)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = PartnerIndex(company_id or None)
+            _indexes[key] = index
+
+    index.ensure_fresh(models, db, uid, password)
+    return index
+
+
+def register_created_partner(db, company_id, partner):
+    """
+    Add a freshly created partner to every loaded index that can see it:
+    the owning company's index and the company-agnostic one.
+    """
+    with _indexes_lock:
+        targets = [
+            index for (index_db, index_company), index in _indexes.items()
+            if index_db == db and index_company in (None, company_id or None)
+        ]
+        if not partner.get('company_id'):
+            targets = [index for (index_db, _), index in _indexes.items() if index_db == db]
+
+    for index in targets:
+        index.add(partner)
+
+
+def invalidate(db=None, company_id=None):
+    """Drop cached indexes so the next lookup reloads from Odoo"""
+    with _indexes_lock:
+        for key in list(_indexes):
+            if (db is None or key[0] == db) and (company_id is None or key[1] == company_id):
+                del _indexes[key]
@@ -0,0 +1,91 @@
+import bcrypt
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# bcrypt cost factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+# A couple of dedicated processes keep bcrypt off the Flask worker threads
+PASSWORD_POOL_WORKERS = int(os.getenv('PASSWORD_POOL_WORKERS', '2'))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv('PASSWORD_POOL_MAX_PENDING', '16'))
+PASSWORD_POOL_TIMEOUT = float(os.getenv('PASSWORD_POOL_TIMEOUT', '10'))
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_POOL_MAX_PENDING)
+
+
+class PasswordPoolBusy(Exception):
+    """Too many hash/verify jobs are already queued"""
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_POOL_WORKERS)
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _run(func, *args):
+    """
+    Run func in the password process pool.
+
+    At most PASSWORD_POOL_MAX_PENDING jobs may be queued or running; past
+    that PasswordPoolBusy is raised immediately instead of letting a login
+    storm tie up request threads waiting in line.
+    """
+    if not _pending.acquire(blocking=False):
+        raise PasswordPoolBusy('Password verification is busy, please retry')
+    try:
+        try:
+            return _get_executor().submit(func, *args).result(timeout=PASSWORD_POOL_TIMEOUT)
+        except BrokenProcessPool:
+            # A worker died (OOM, killed); start a fresh pool and retry once
+            print("⚠️  Password pool broken, restarting")
+            _reset_executor()
+            return _get_executor().submit(func, *args).result(timeout=PASSWORD_POOL_TIMEOUT)
+        except FutureTimeoutError:
+            raise PasswordPoolBusy('Password verification timed out, please retry')
+    finally:
+        _pending.release()
+
+
+def hash_password(password, rounds=None):
+    """Hash a password with bcrypt at the configured cost"""
+    return _run(_hashpw, password, rounds or BCRYPT_ROUNDS)
+
+
+def verify_password(password, hashed):
+    """Verify a password against its bcrypt hash"""
+    return _run(_checkpw, password, hashed)
+
+
+def hash_rounds(hashed):
+    """Cost factor of a bcrypt hash ($2b$12$...), or None if unreadable"""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    return hash_rounds(hashed) != BCRYPT_ROUNDS
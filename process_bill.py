@@ -1,19 +1,17 @@
-import boto3
+import aws_clients
+import company_contexts
 import base64
 import anthropic
+import structured_output
+from structured_output import array, boolean, number, obj, string
 import os
 import json
 import re
 from odoo_accounting_logic import main as get_accounting_logic
 
-# AWS DynamoDB configuration
-AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-users_table = dynamodb.Table('users')
-
 def get_company_context(company_name):
     """
-    Fetch comprehensive company details from DynamoDB users table
+    Fetch comprehensive company details (shared, TTL-cached company context)
     
     Args:
         company_name (str): Company name to lookup
@@ -21,111 +19,7 @@ def get_company_context(company_name):
     Returns:
         dict: Company context or None if not found
     """
-    try:
-        # Scan table to find matching company (case-sensitive exact match)
-        response = users_table.scan(
-            FilterExpression='company_name = :name',
-            ExpressionAttributeValues={':name': company_name}
-        )
-        
-        if response.get('Items'):
-            company_data = response['Items'][0]
-            
-            # Extract basic company information
-            context = {
-                'company_name': company_data.get('company_name', ''),
-                'is_vat_registered': company_data.get('is_vat_registered', 'unknown'),
-                'primary_industry': company_data.get('primary_industry', ''),
-                'business_description': company_data.get('business_description', ''),
-                'business_model': company_data.get('business_model', ''),
-                'main_products': company_data.get('main_products', ''),
-                'business_address': company_data.get('business_address', ''),
-                'registration_no': company_data.get('registration_no', ''),
-                'vat_no': company_data.get('vat_no', ''),
-                'tax_registration_no': company_data.get('tax_registration_no', ''),
-                'trading_name': company_data.get('trading_name', '')
-            }
-            
-            # Extract tax information
-            tax_info = company_data.get('tax_information', {})
-            context['tax_information'] = {
-                'reverse_charge': tax_info.get('reverse_charge', []),
-                'reverse_charge_other': tax_info.get('reverse_charge_other', ''),
-                'vat_exemptions': tax_info.get('vat_exemptions', ''),
-                'vat_period_category': tax_info.get('vat_period_category', ''),
-                'vat_rates': tax_info.get('vat_rates', [])
-            }
-            
-            # Extract payroll information
-            payroll_info = company_data.get('payroll_information', {})
-            context['payroll_information'] = {
-                'num_employees': payroll_info.get('num_employees', 0),
-                'payroll_frequency': payroll_info.get('payroll_frequency', ''),
-                'social_insurance': payroll_info.get('social_insurance', ''),
-                'uses_ghs': payroll_info.get('uses_ghs', False)
-            }
-            
-            # Extract business operations
-            business_ops = company_data.get('business_operations', {})
-            context['business_operations'] = {
-                'international': business_ops.get('international', False),
-                'inventory_management': business_ops.get('inventory_management', ''),
-                'multi_location': business_ops.get('multi_location', False),
-                'seasonal_business': business_ops.get('seasonal_business', False),
-                'peak_seasons': business_ops.get('peak_seasons', '')
-            }
-            
-            # Extract special circumstances
-            special_circumstances = company_data.get('special_circumstances', {})
-            context['special_circumstances'] = {}
-            
-            # Construction circumstances
-            construction = special_circumstances.get('construction', {})
-            if construction.get('enabled', False):
-                context['special_circumstances']['construction'] = {
-                    'enabled': True,
-                    'project_duration': construction.get('project_duration', '')
-                }
-            
-            # Retail/E-commerce circumstances
-            retail_ecommerce = special_circumstances.get('retail_ecommerce', {})
-            if retail_ecommerce.get('enabled', False):
-                context['special_circumstances']['retail_ecommerce'] = {
-                    'enabled': True,
-                    'platform_type': retail_ecommerce.get('platform_type', '')
-                }
-            
-            # Banking information
-            banking_info = company_data.get('banking_information', {})
-            context['banking_information'] = {
-                'primary_bank': banking_info.get('primary_bank', ''),
-                'primary_currency': banking_info.get('primary_currency', ''),
-                'multi_currency': banking_info.get('multi_currency', False),
-                'currencies_list': banking_info.get('currencies_list', [])
-            }
-            
-            # Extract metadata
-            metadata = company_data.get('metadata', {})
-            context['metadata'] = {
-                'rep_name': metadata.get('rep_name', ''),
-                'rep_email': metadata.get('rep_email', ''),
-                'vat_no': metadata.get('vat_no', '')
-            }
-            
-            print(f"✅ Company context loaded for: {company_name}")
-            print(f"  VAT Registered: {context['is_vat_registered']}")
-            print(f"  Industry: {context['primary_industry']}")
-            print(f"  Reverse Charge Categories: {context['tax_information']['reverse_charge']}")
-            print(f"  Special Circumstances: {list(context['special_circumstances'].keys())}")
-            
-            return context
-        else:
-            print(f"⚠️  No company context found for: {company_name}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ Error fetching company context: {e}")
-        return None
+    return company_contexts.get_company_context(company_name)
 
 def get_property_capitalization_rules():
     """Returns IAS 40 property capitalization rules for prompt"""
@@ -900,10 +794,10 @@ def get_bill_processing_prompt(company_name, company_context=None):
     bill_logic = get_accounting_logic("bill")
     
     # Get VAT instructions based on company context
-    vat_instructions = get_vat_instructions(company_context)
+    vat_instructions = company_contexts.rendered_section(company_context, get_vat_instructions)
     
     # Get company context section
-    company_context_section = get_company_context_section(company_context)
+    company_context_section = company_contexts.rendered_section(company_context, get_company_context_section)
 
     date_extraction_rules = get_date_extraction_rules()
     
@@ -1774,6 +1668,54 @@ def validate_bill_data(bills, company_context=None):
     
     return validation_results
 
+# Structured output: Claude returns the bills through this tool instead of free-text JSON
+BILL_LINE_ITEM_SCHEMA = obj({
+    "description": string(),
+    "quantity": number(),
+    "price_unit": number(),
+    "line_total": number(),
+    "tax_rate": number(),
+    "tax_name": string(),
+    "account_code": string(),
+    "account_name": string(),
+    "tax_grid": string()
+}, required=["description", "quantity", "price_unit", "account_code", "tax_name"])
+
+BILL_SCHEMA = obj({
+    "bill_index": number(),
+    "page_range": string(),
+    "document_classification": obj(),
+    "company_validation": obj(),
+    "company_data": obj(),
+    "vendor_data": obj({
+        "name": string(),
+        "country_code": string(),
+        "invoice_date": string(nullable=True),
+        "due_date": string(nullable=True),
+        "vendor_ref": string(),
+        "payment_reference": string(),
+        "description": string(),
+        "subtotal": number(),
+        "tax_amount": number(),
+        "total_amount": number(),
+        "currency_code": string(),
+        "line_items": array(BILL_LINE_ITEM_SCHEMA)
+    }, required=["name", "invoice_date", "total_amount", "line_items"]),
+    "accounting_assignment": obj({
+        "requires_reverse_charge": boolean(),
+        "additional_entries": array(obj())
+    }),
+    "extraction_confidence": obj(),
+    "missing_fields": array(string()),
+    "mathematical_validation": obj()
+}, required=["vendor_data", "accounting_assignment"])
+
+BILL_EXTRACTION_TOOL = structured_output.output_tool("bill_extraction", obj({
+    "success": boolean(),
+    "total_bills": number(),
+    "bills": array(BILL_SCHEMA)
+}, required=["bills"]), "Return every bill found in the document.")
+
 def process_bills_with_claude(pdf_content, company_name, company_context=None):
     """Process PDF document with Claude for bill splitting and extraction"""
     try:
@@ -2002,21 +1944,25 @@ Respond only with valid JSON objects. Never include explanatory text, analysis,
                         }
                     ]
                 }
-            ]
+            ],
+            **BILL_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "bill_extraction")
+        response_text = structured_output.response_text(message).strip()
         
         # Log token usage for monitoring
         print(f"Token usage - Input: {message.usage.input_tokens}, Output: {message.usage.output_tokens}")
         
         # Debug: Log first 200 characters of response to identify issues
-        print(f"Response preview: {response_text[:200]}...")
+        if parsed is None:
+            print(f"Response preview: {response_text[:200]}...")
         
         return {
             "success": True,
             "raw_response": response_text,
+            "parsed": parsed,
             "token_usage": {
                 "input_tokens": message.usage.input_tokens,
                 "output_tokens": message.usage.output_tokens
@@ -2036,19 +1982,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -2182,9 +2117,44 @@ def ensure_bill_structure(bill):
     
     return merge_with_defaults(bill, default_bill)
 
+def structure_bill_result(result):
+    """Validate a parsed bill response and fill every bill out to the complete structure"""
+    # Validate basic structure
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    
+    # Ensure top-level structure
+    if "success" not in result:
+        result["success"] = True
+    if "total_bills" not in result:
+        result["total_bills"] = 0
+    if "bills" not in result:
+        result["bills"] = []
+    
+    # Ensure each bill has complete structure
+    validated_bills = []
+    for i, bill in enumerate(result["bills"]):
+        validated_bill = ensure_bill_structure(bill)
+        # Ensure bill_index is set correctly
+        validated_bill["bill_index"] = i + 1
+        validated_bills.append(validated_bill)
+    
+    result["bills"] = validated_bills
+    result["total_bills"] = len(validated_bills)
+    
+    print(f"Successfully parsed and validated response with {len(result['bills'])} bills")
+    return {
+        "success": True,
+        "result": result
+    }
+
 def parse_bill_response(raw_response):
-    """Parse the raw response into structured bill data with improved error handling"""
+    """Parse the raw response (or already-parsed structured output) into structured bill data with improved error handling"""
     try:
+        # Structured tool output needs no cleaning or JSON repair
+        if isinstance(raw_response, dict):
+            return structure_bill_result(raw_response)
+        
         # Clean the response
         cleaned_response = raw_response.strip()
         
@@ -2217,36 +2187,7 @@ def parse_bill_response(raw_response):
         
         # Parse JSON response
         try:
-            result = json.loads(cleaned_response)
-            
-            # Validate basic structure
-            if not isinstance(result, dict):
-                raise ValueError("Response is not a JSON object")
-            
-            # Ensure top-level structure
-            if "success" not in result:
-                result["success"] = True
-            if "total_bills" not in result:
-                result["total_bills"] = 0
-            if "bills" not in result:
-                result["bills"] = []
-            
-            # Ensure each bill has complete structure
-            validated_bills = []
-            for i, bill in enumerate(result["bills"]):
-                validated_bill = ensure_bill_structure(bill)
-                # Ensure bill_index is set correctly
-                validated_bill["bill_index"] = i + 1
-                validated_bills.append(validated_bill)
-            
-            result["bills"] = validated_bills
-            result["total_bills"] = len(validated_bills)
-            
-            print(f"Successfully parsed and validated response with {len(result['bills'])} bills")
-            return {
-                "success": True,
-                "result": result
-            }
+            return structure_bill_result(json.loads(cleaned_response))
             
         except json.JSONDecodeError as e:
             # Provide more detailed error information
@@ -2323,7 +2264,7 @@ def main(data):
             }
         
         # Parse the structured response with validation
-        parse_result = parse_bill_response(claude_result["raw_response"])
+        parse_result = parse_bill_response(claude_result["parsed"] if claude_result["parsed"] is not None else claude_result["raw_response"])
         
         if not parse_result["success"]:
             return {
@@ -1,6 +1,8 @@
-import boto3
+import aws_clients
 import base64
 import anthropic
+import structured_output
+from structured_output import array, boolean, number, obj, string
 import os
 import json
 import re
@@ -656,6 +658,53 @@ def validate_invoice_data(invoices):
     
     return validation_results
 
+# Structured output: Claude returns the invoices through this tool instead of free-text JSON
+INVOICE_LINE_ITEM_SCHEMA = obj({
+    "description": string(),
+    "quantity": number(),
+    "price_unit": number(),
+    "line_total": number(),
+    "tax_rate": number(),
+    "tax_name": string(),
+    "account_code": string(),
+    "account_name": string(),
+    "tax_grid": string()
+}, required=["description", "quantity", "price_unit", "account_code", "tax_name"])
+
+INVOICE_SCHEMA = obj({
+    "invoice_index": number(),
+    "page_range": string(),
+    "document_classification": obj(),
+    "company_validation": obj(),
+    "company_data": obj(),
+    "customer_data": obj({
+        "name": string(),
+        "country_code": string(),
+        "invoice_date": string(nullable=True),
+        "due_date": string(nullable=True),
+        "invoice_ref": string(),
+        "payment_reference": string(),
+        "description": string(),
+        "subtotal": number(),
+        "tax_amount": number(),
+        "total_amount": number(),
+        "currency_code": string(),
+        "line_items": array(INVOICE_LINE_ITEM_SCHEMA)
+    }, required=["name", "invoice_date", "total_amount", "line_items"]),
+    "accounting_assignment": obj({
+        "requires_reverse_charge": boolean(),
+        "additional_entries": array(obj())
+    }),
+    "extraction_confidence": obj(),
+    "missing_fields": array(string())
+}, required=["customer_data", "accounting_assignment"])
+
+INVOICE_EXTRACTION_TOOL = structured_output.output_tool("invoice_extraction", obj({
+    "success": boolean(),
+    "total_invoices": number(),
+    "invoices": array(INVOICE_SCHEMA)
+}, required=["invoices"]), "Return every invoice found in the document.")
+
 def process_invoices_with_claude(pdf_content, company_name):
     """Process PDF document with Claude for invoice splitting and extraction"""
     try:
@@ -784,21 +833,25 @@ Respond only with valid JSON objects. Never include explanatory text, analysis,
                         }
                     ]
                 }
-            ]
+            ],
+            **INVOICE_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "invoice_extraction")
+        response_text = structured_output.response_text(message).strip()
         
         # Log token usage for monitoring
         print(f"Token usage - Input: {message.usage.input_tokens}, Output: {message.usage.output_tokens}")
         
         # Debug: Log first 200 characters of response to identify issues
-        print(f"Response preview: {response_text[:200]}...")
+        if parsed is None:
+            print(f"Response preview: {response_text[:200]}...")
         
         return {
             "success": True,
             "raw_response": response_text,
+            "parsed": parsed,
             "token_usage": {
                 "input_tokens": message.usage.input_tokens,
                 "output_tokens": message.usage.output_tokens
@@ -818,19 +871,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -933,9 +975,44 @@ def ensure_invoice_structure(invoice):
     
     return merge_with_defaults(invoice, default_invoice)
 
+def structure_invoice_result(result):
+    """Validate a parsed invoice response and fill it out to the complete structure"""
+    # Validate basic structure
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    
+    # Ensure top-level structure
+    if "success" not in result:
+        result["success"] = True
+    if "total_invoices" not in result:
+        result["total_invoices"] = 0
+    if "invoices" not in result:
+        result["invoices"] = []
+    
+    # Ensure each invoice has complete structure
+    validated_invoices = []
+    for i, invoice in enumerate(result["invoices"]):
+        validated_invoice = ensure_invoice_structure(invoice)
+        # Ensure invoice_index is set correctly
+        validated_invoice["invoice_index"] = i + 1
+        validated_invoices.append(validated_invoice)
+    
+    result["invoices"] = validated_invoices
+    result["total_invoices"] = len(validated_invoices)
+    
+    print(f"Successfully parsed and validated response with {len(result['invoices'])} invoices")
+    return {
+        "success": True,
+        "result": result
+    }
+
 def parse_invoice_response(raw_response):
-    """Parse the raw response into structured invoice data with improved error handling"""
+    """Parse the raw response (or already-parsed structured output) into structured invoice data with improved error handling"""
     try:
+        # Structured tool output needs no cleaning or JSON repair
+        if isinstance(raw_response, dict):
+            return structure_invoice_result(raw_response)
+        
         # Clean the response
         cleaned_response = raw_response.strip()
         
@@ -968,36 +1045,7 @@ def parse_invoice_response(raw_response):
         
         # Parse JSON response
         try:
-            result = json.loads(cleaned_response)
-            
-            # Validate basic structure
-            if not isinstance(result, dict):
-                raise ValueError("Response is not a JSON object")
-            
-            # Ensure top-level structure
-            if "success" not in result:
-                result["success"] = True
-            if "total_invoices" not in result:
-                result["total_invoices"] = 0
-            if "invoices" not in result:
-                result["invoices"] = []
-            
-            # Ensure each invoice has complete structure
-            validated_invoices = []
-            for i, invoice in enumerate(result["invoices"]):
-                validated_invoice = ensure_invoice_structure(invoice)
-                # Ensure invoice_index is set correctly
-                validated_invoice["invoice_index"] = i + 1
-                validated_invoices.append(validated_invoice)
-            
-            result["invoices"] = validated_invoices
-            result["total_invoices"] = len(validated_invoices)
-            
-            print(f"Successfully parsed and validated response with {len(result['invoices'])} invoices")
-            return {
-                "success": True,
-                "result": result
-            }
+            return structure_invoice_result(json.loads(cleaned_response))
             
         except json.JSONDecodeError as e:
             # Provide more detailed error information
@@ -1065,7 +1113,7 @@ def main(data):
             }
         
         # Parse the structured response with validation
-        parse_result = parse_invoice_response(claude_result["raw_response"])
+        parse_result = parse_invoice_response(claude_result["parsed"] if claude_result["parsed"] is not None else claude_result["raw_response"])
         
         if not parse_result["success"]:
             return {
@@ -1,18 +1,16 @@
-import boto3
+import aws_clients
+import company_contexts
 import base64
 import anthropic
+import structured_output
+from structured_output import array, boolean, number, obj, string
 import os
 import json
 from decimal import Decimal
 
-# AWS DynamoDB configuration
-AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-users_table = dynamodb.Table('users')
-
 def get_company_context(company_name):
     """
-    Fetch comprehensive company details from DynamoDB users table
+    Fetch comprehensive company details (shared, TTL-cached company context)
     
     Args:
         company_name (str): Company name to lookup
@@ -20,58 +18,7 @@ def get_company_context(company_name):
     Returns:
         dict: Company context or None if not found
     """
-    try:
-        # Scan table to find matching company (case-sensitive exact match)
-        response = users_table.scan(
-            FilterExpression='company_name = :name',
-            ExpressionAttributeValues={':name': company_name}
-        )
-        
-        if response.get('Items'):
-            company_data = response['Items'][0]
-            
-            # Extract basic company information
-            context = {
-                'company_name': company_data.get('company_name', ''),
-                'is_vat_registered': company_data.get('is_vat_registered', 'unknown'),
-                'primary_industry': company_data.get('primary_industry', ''),
-                'business_description': company_data.get('business_description', ''),
-                'business_model': company_data.get('business_model', ''),
-                'business_address': company_data.get('business_address', ''),
-                'registration_no': company_data.get('registration_no', ''),
-                'vat_no': company_data.get('vat_no', ''),
-                'trading_name': company_data.get('trading_name', '')
-            }
-            
-            # Extract payroll information
-            payroll_info = company_data.get('payroll_information', {})
-            context['payroll_information'] = {
-                'num_employees': payroll_info.get('num_employees', 0),
-                'payroll_frequency': payroll_info.get('payroll_frequency', ''),
-                'social_insurance': payroll_info.get('social_insurance', ''),
-                'uses_ghs': payroll_info.get('uses_ghs', False)
-            }
-            
-            # Extract banking information
-            banking_info = company_data.get('banking_information', {})
-            context['banking_information'] = {
-                'primary_currency': banking_info.get('primary_currency', ''),
-                'multi_currency': banking_info.get('multi_currency', False)
-            }
-            
-            print(f"✅ Company context loaded for: {company_name}")
-            print(f"  Number of Employees: {context['payroll_information']['num_employees']}")
-            print(f"  Payroll Frequency: {context['payroll_information']['payroll_frequency']}")
-            print(f"  Social Insurance: {context['payroll_information']['social_insurance']}")
-            
-            return context
-        else:
-            print(f"⚠️  No company context found for: {company_name}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ Error fetching company context: {e}")
-        return None
+    return company_contexts.get_company_context(company_name)
 
 def get_company_context_section(company_context):
     """Generate company context section for prompt"""
@@ -125,7 +72,7 @@ def get_payroll_processing_prompt(company_name, company_context=None):
     """Create comprehensive payroll processing prompt for journal entry extraction with Cyprus-specific handling"""
     
     # Get company context section
-    company_context_section = get_company_context_section(company_context)
+    company_context_section = company_contexts.rendered_section(company_context, get_company_context_section)
     
     return f"""You are an advanced payroll document processing AI specialized in Cyprus payroll accounting. Your task is to analyze a payroll document and extract structured data for creating a consolidated payroll journal entry in Odoo.
 
@@ -807,6 +754,36 @@ def validate_payroll_data(payroll_data, company_context=None):
     
     return validation_results
 
+# Structured output: Claude returns the payroll through this tool instead of free-text JSON
+PAYROLL_SCHEMA = obj({
+    "success": boolean(),
+    "payroll_data": obj({
+        "period": string(),
+        "month": string(),
+        "year": string(),
+        "pay_date": string(nullable=True),
+        "num_employees": number(),
+        "currency_code": string(),
+        "description": string(),
+        "total_gross_wages": number(),
+        "total_net_wages": number(),
+        "total_deductions": number(),
+        "total_employer_contributions": number(),
+        "journal_entry_lines": array(obj({
+            "account_code": string(),
+            "account_name": string(),
+            "description": string(),
+            "debit_amount": number(),
+            "credit_amount": number()
+        }, required=["account_code", "debit_amount", "credit_amount"]))
+    }, required=["period", "journal_entry_lines"]),
+    "company_validation": obj(),
+    "extraction_confidence": obj(),
+    "missing_fields": array(string())
+}, required=["payroll_data"])
+
+PAYROLL_EXTRACTION_TOOL = structured_output.output_tool("payroll_extraction", PAYROLL_SCHEMA, "Return the payroll journal extracted from the document.")
+
 def process_payroll_with_claude(pdf_content, company_name, company_context=None):
     """Process payroll document with Claude for data extraction"""
     try:
@@ -891,19 +868,23 @@ Respond ONLY with valid JSON. No explanatory text, analysis, or commentary. Incl
                         }
                     ]
                 }
-            ]
+            ],
+            **PAYROLL_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "payroll_extraction")
+        response_text = structured_output.response_text(message).strip()
         
         # Log token usage
         print(f"Token usage - Input: {message.usage.input_tokens}, Output: {message.usage.output_tokens}")
-        print(f"Response preview: {response_text[:200]}...")
+        if parsed is None:
+            print(f"Response preview: {response_text[:200]}...")
         
         return {
             "success": True,
             "raw_response": response_text,
+            "parsed": parsed,
             "token_usage": {
                 "input_tokens": message.usage.input_tokens,
                 "output_tokens": message.usage.output_tokens
@@ -923,19 +904,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -1005,9 +975,46 @@ def ensure_payroll_structure(payroll_data):
     
     return merge_with_defaults(payroll_data, default_structure)
 
+def structure_payroll_result(result):
+    """Validate a parsed payroll response and fill it out to the complete structure"""
+    # Validate basic structure
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    
+    # Ensure complete structure
+    validated_result = ensure_payroll_structure(result)
+    
+    # Calculate validation summary
+    journal_lines = validated_result.get("payroll_data", {}).get("journal_entry_lines", [])
+    total_debits = sum(line.get("debit_amount", 0) for line in journal_lines)
+    total_credits = sum(line.get("credit_amount", 0) for line in journal_lines)
+    balance_difference = abs(total_debits - total_credits)
+    
+    validated_result["validation_summary"] = {
+        "debits_equal_credits": balance_difference < 0.01,
+        "total_debits": total_debits,
+        "total_credits": total_credits,
+        "balance_difference": balance_difference
+    }
+    
+    print(f"Successfully parsed payroll response")
+    print(f"  Period: {validated_result['payroll_data'].get('period', 'Unknown')}")
+    print(f"  Employees: {validated_result['payroll_data'].get('num_employees', 0)}")
+    print(f"  Total Debits: {total_debits:.2f}, Total Credits: {total_credits:.2f}")
+    print(f"  Balanced: {validated_result['validation_summary']['debits_equal_credits']}")
+    
+    return {
+        "success": True,
+        "result": validated_result
+    }
+
 def parse_payroll_response(raw_response):
-    """Parse the raw response into structured payroll data with error handling"""
+    """Parse the raw response (or already-parsed structured output) into structured payroll data with error handling"""
     try:
+        # Structured tool output needs no cleaning or JSON repair
+        if isinstance(raw_response, dict):
+            return structure_payroll_result(raw_response)
+        
         # Clean the response
         cleaned_response = raw_response.strip()
         
@@ -1038,38 +1045,7 @@ def parse_payroll_response(raw_response):
         
         # Parse JSON response
         try:
-            result = json.loads(cleaned_response)
-            
-            # Validate basic structure
-            if not isinstance(result, dict):
-                raise ValueError("Response is not a JSON object")
-            
-            # Ensure complete structure
-            validated_result = ensure_payroll_structure(result)
-            
-            # Calculate validation summary
-            journal_lines = validated_result.get("payroll_data", {}).get("journal_entry_lines", [])
-            total_debits = sum(line.get("debit_amount", 0) for line in journal_lines)
-            total_credits = sum(line.get("credit_amount", 0) for line in journal_lines)
-            balance_difference = abs(total_debits - total_credits)
-            
-            validated_result["validation_summary"] = {
-                "debits_equal_credits": balance_difference < 0.01,
-                "total_debits": total_debits,
-                "total_credits": total_credits,
-                "balance_difference": balance_difference
-            }
-            
-            print(f"Successfully parsed payroll response")
-            print(f"  Period: {validated_result['payroll_data'].get('period', 'Unknown')}")
-            print(f"  Employees: {validated_result['payroll_data'].get('num_employees', 0)}")
-            print(f"  Total Debits: {total_debits:.2f}, Total Credits: {total_credits:.2f}")
-            print(f"  Balanced: {validated_result['validation_summary']['debits_equal_credits']}")
-            
-            return {
-                "success": True,
-                "result": validated_result
-            }
+            return structure_payroll_result(json.loads(cleaned_response))
             
         except json.JSONDecodeError as e:
             error_position = getattr(e, 'pos', 0)
@@ -1144,7 +1120,7 @@ def main(data):
             }
         
         # Parse the structured response
-        parse_result = parse_payroll_response(claude_result["raw_response"])
+        parse_result = parse_payroll_response(claude_result["parsed"] if claude_result["parsed"] is not None else claude_result["raw_response"])
         
         if not parse_result["success"]:
             return {
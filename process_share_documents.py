@@ -1,6 +1,8 @@
-import boto3
+import aws_clients
 import base64
 import anthropic
+import structured_output
+from structured_output import array, boolean, number, obj, string
 import os
 import json
 import re
@@ -409,19 +411,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -431,6 +422,51 @@ def download_from_s3(s3_key, bucket_name=None):
     except Exception as e:
         raise Exception(f"Error downloading from S3: {str(e)}")
 
+# Structured output: Claude returns the share transactions through this tool instead of free-text JSON
+SHARE_DETAIL_SCHEMA = obj({
+    "share_type": string(),
+    "number_of_shares": number(),
+    "nominal_value_per_share": number(),
+    "total_value": number(),
+    "description": string(),
+    "account_code": string(),
+    "account_name": string()
+}, required=["share_type", "number_of_shares", "total_value"])
+
+SHARE_TRANSACTION_SCHEMA = obj({
+    "transaction_index": number(),
+    "page_range": string(),
+    "document_classification": obj(),
+    "company_validation": obj(),
+    "company_data": obj(),
+    "partner_data": obj({
+        "name": string(),
+        "country_code": string(),
+        "transaction_date": string(nullable=True),
+        "due_date": string(nullable=True),
+        "transaction_ref": string(),
+        "payment_reference": string(),
+        "description": string(),
+        "subtotal": number(),
+        "tax_amount": number(),
+        "total_amount": number(),
+        "currency_code": string(),
+        "share_details": array(SHARE_DETAIL_SCHEMA)
+    }, required=["name", "transaction_date", "total_amount", "share_details"]),
+    "accounting_assignment": obj({
+        "requires_reverse_charge": boolean(),
+        "additional_entries": array(obj())
+    }),
+    "extraction_confidence": obj(),
+    "missing_fields": array(string())
+}, required=["partner_data", "accounting_assignment"])
+
+SHARE_EXTRACTION_TOOL = structured_output.output_tool("share_extraction", obj({
+    "success": boolean(),
+    "total_transactions": number(),
+    "transactions": array(SHARE_TRANSACTION_SCHEMA)
+}, required=["transactions"]), "Return every share capital transaction found in the document.")
+
 def process_share_documents_with_claude(pdf_content, company_name):
     """Process PDF document with Claude for share transaction splitting and extraction"""
     try:
@@ -522,21 +558,25 @@ Respond only with valid JSON objects. Never include explanatory text, analysis,
                         }
                     ]
                 }
-            ]
+            ],
+            **SHARE_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "share_extraction")
+        response_text = structured_output.response_text(message).strip()
         
         # Log token usage for monitoring
         print(f"Token usage - Input: {message.usage.input_tokens}, Output: {message.usage.output_tokens}")
         
         # Debug: Log first 200 characters of response to identify issues
-        print(f"Response preview: {response_text[:200]}...")
+        if parsed is None:
+            print(f"Response preview: {response_text[:200]}...")
         
         return {
             "success": True,
             "raw_response": response_text,
+            "parsed": parsed,
             "token_usage": {
                 "input_tokens": message.usage.input_tokens,
                 "output_tokens": message.usage.output_tokens
@@ -642,9 +682,44 @@ def ensure_transaction_structure(transaction):
     
     return merge_with_defaults(transaction, default_transaction)
 
+def structure_share_result(result):
+    """Validate a parsed share response and fill it out to the complete structure"""
+    # Validate basic structure
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    
+    # Ensure top-level structure
+    if "success" not in result:
+        result["success"] = True
+    if "total_transactions" not in result:
+        result["total_transactions"] = 0
+    if "transactions" not in result:
+        result["transactions"] = []
+    
+    # Ensure each transaction has complete structure
+    validated_transactions = []
+    for i, transaction in enumerate(result["transactions"]):
+        validated_transaction = ensure_transaction_structure(transaction)
+        # Ensure transaction_index is set correctly
+        validated_transaction["transaction_index"] = i + 1
+        validated_transactions.append(validated_transaction)
+    
+    result["transactions"] = validated_transactions
+    result["total_transactions"] = len(validated_transactions)
+    
+    print(f"Successfully parsed and validated response with {len(result['transactions'])} transactions")
+    return {
+        "success": True,
+        "result": result
+    }
+
 def parse_share_response(raw_response):
-    """Parse the raw response into structured share transaction data with improved error handling"""
+    """Parse the raw response (or already-parsed structured output) into structured share transaction data with improved error handling"""
     try:
+        # Structured tool output needs no cleaning or JSON repair
+        if isinstance(raw_response, dict):
+            return structure_share_result(raw_response)
+        
         # Clean the response
         cleaned_response = raw_response.strip()
         
@@ -677,36 +752,7 @@ def parse_share_response(raw_response):
         
         # Parse JSON response
         try:
-            result = json.loads(cleaned_response)
-            
-            # Validate basic structure
-            if not isinstance(result, dict):
-                raise ValueError("Response is not a JSON object")
-            
-            # Ensure top-level structure
-            if "success" not in result:
-                result["success"] = True
-            if "total_transactions" not in result:
-                result["total_transactions"] = 0
-            if "transactions" not in result:
-                result["transactions"] = []
-            
-            # Ensure each transaction has complete structure
-            validated_transactions = []
-            for i, transaction in enumerate(result["transactions"]):
-                validated_transaction = ensure_transaction_structure(transaction)
-                # Ensure transaction_index is set correctly
-                validated_transaction["transaction_index"] = i + 1
-                validated_transactions.append(validated_transaction)
-            
-            result["transactions"] = validated_transactions
-            result["total_transactions"] = len(validated_transactions)
-            
-            print(f"Successfully parsed and validated response with {len(result['transactions'])} transactions")
-            return {
-                "success": True,
-                "result": result
-            }
+            return structure_share_result(json.loads(cleaned_response))
             
         except json.JSONDecodeError as e:
             # Provide more detailed error information
@@ -774,7 +820,7 @@ def main(data):
             }
         
         # Parse the structured response with validation
-        parse_result = parse_share_response(claude_result["raw_response"])
+        parse_result = parse_share_response(claude_result["parsed"] if claude_result["parsed"] is not None else claude_result["raw_response"])
         
         if not parse_result["success"]:
             return {
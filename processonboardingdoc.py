@@ -1,7 +1,9 @@
 import os
-import boto3
+import aws_clients
 import base64
 import anthropic
+import structured_output
+from structured_output import obj, string
 import json
 import re
 
@@ -270,19 +272,8 @@ def download_document_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -292,6 +283,22 @@ def download_document_from_s3(s3_key, bucket_name=None):
     except Exception as e:
         raise Exception(f"Error downloading from S3: {str(e)}")
 
+# Structured output: Claude returns the company details through this tool instead of free-text JSON
+COMPANY_EXTRACTION_TOOL = structured_output.output_tool("company_extraction", obj({
+    "name": string(),
+    "email": string(nullable=True),
+    "phone": string(nullable=True),
+    "website": string(nullable=True),
+    "vat": string(nullable=True),
+    "company_registry": string(nullable=True),
+    "street": string(nullable=True),
+    "city": string(nullable=True),
+    "zip": string(nullable=True),
+    "state": string(nullable=True),
+    "country_code": string(),
+    "currency_code": string()
+}, required=["name", "country_code", "currency_code"]), "Return the company details found in the documents.")
+
 def process_company_document_extraction(document_content):
     """Process onboarding document with Claude for company information extraction"""
     try:
@@ -332,18 +339,21 @@ def process_company_document_extraction(document_content):
                         }
                     ]
                 }
-            ]
+            ],
+            **COMPANY_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "company_extraction")
+        response_text = structured_output.response_text(message).strip()
         
-        # Log the raw response for debugging (first 500 chars)
-        print(f"Raw Claude response (first 500 chars): {response_text[:500]}...")
+        if parsed is None:
+            # Log the raw response for debugging (first 500 chars)
+            print(f"Raw Claude response (first 500 chars): {response_text[:500]}...")
         
         # Extract and parse JSON
         try:
-            extracted_json = extract_company_json_from_response(response_text)
+            extracted_json = parsed if parsed is not None else extract_company_json_from_response(response_text)
             
             # Validate the JSON structure
             validate_company_json(extracted_json)
@@ -432,7 +442,6 @@ def process_onboarding_document(data):
             "error": f"Internal processing error: {str(e)}"
         }
 import os
-import boto3
 import base64
 import anthropic
 import json
@@ -578,19 +587,8 @@ def download_document_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -675,25 +673,31 @@ def process_multiple_company_documents_extraction(documents):
                     "role": "user",
                     "content": content_array
                 }
-            ]
+            ],
+            **COMPANY_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "company_extraction")
+        response_text = structured_output.response_text(message).strip()
         
-        # Log the raw response for debugging (first 500 chars)
-        print(f"Raw Claude response (first 500 chars): {response_text[:500]}...")
+        if parsed is None:
+            # Log the raw response for debugging (first 500 chars)
+            print(f"Raw Claude response (first 500 chars): {response_text[:500]}...")
         
         # Try to parse as JSON directly
         try:
-            # Look for JSON in the response (could be wrapped in code blocks or plain)
-            json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
+            if parsed is not None:
+                extracted_json = parsed
             else:
-                json_str = response_text
-            
-            extracted_json = json.loads(json_str)
+                # Look for JSON in the response (could be wrapped in code blocks or plain)
+                json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
+                if json_match:
+                    json_str = json_match.group(1)
+                else:
+                    json_str = response_text
+                
+                extracted_json = json.loads(json_str)
             
             # Set defaults if missing
             if 'country_code' not in extracted_json or not extracted_json['country_code']:
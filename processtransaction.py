@@ -1,18 +1,16 @@
-import boto3
+import aws_clients
+import company_contexts
 import base64
 import anthropic
+import structured_output
+from structured_output import array, boolean, number, obj, string
 import os
 import json
 import re
 
-# AWS DynamoDB configuration
-AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-users_table = dynamodb.Table('users')
-
 def get_company_context(company_name):
     """
-    Fetch comprehensive company details from DynamoDB users table
+    Fetch comprehensive company details (shared, TTL-cached company context)
     
     Args:
         company_name (str): Company name to lookup
@@ -20,112 +18,7 @@ def get_company_context(company_name):
     Returns:
         dict: Company context or None if not found
     """
-    try:
-        # Scan table to find matching company (case-sensitive exact match)
-        response = users_table.scan(
-            FilterExpression='company_name = :name',
-            ExpressionAttributeValues={':name': company_name}
-        )
-        
-        if response.get('Items'):
-            company_data = response['Items'][0]
-            
-            # Extract basic company information
-            context = {
-                'company_name': company_data.get('company_name', ''),
-                'is_vat_registered': company_data.get('is_vat_registered', 'unknown'),
-                'primary_industry': company_data.get('primary_industry', ''),
-                'business_description': company_data.get('business_description', ''),
-                'business_model': company_data.get('business_model', ''),
-                'main_products': company_data.get('main_products', ''),
-                'business_address': company_data.get('business_address', ''),
-                'registration_no': company_data.get('registration_no', ''),
-                'vat_no': company_data.get('vat_no', ''),
-                'tax_registration_no': company_data.get('tax_registration_no', ''),
-                'trading_name': company_data.get('trading_name', '')
-            }
-            
-            # Extract tax information
-            tax_info = company_data.get('tax_information', {})
-            context['tax_information'] = {
-                'reverse_charge': tax_info.get('reverse_charge', []),
-                'reverse_charge_other': tax_info.get('reverse_charge_other', ''),
-                'vat_exemptions': tax_info.get('vat_exemptions', ''),
-                'vat_period_category': tax_info.get('vat_period_category', ''),
-                'vat_rates': tax_info.get('vat_rates', [])
-            }
-            
-            # Extract payroll information
-            payroll_info = company_data.get('payroll_information', {})
-            context['payroll_information'] = {
-                'num_employees': payroll_info.get('num_employees', 0),
-                'payroll_frequency': payroll_info.get('payroll_frequency', ''),
-                'social_insurance': payroll_info.get('social_insurance', ''),
-                'uses_ghs': payroll_info.get('uses_ghs', False)
-            }
-            
-            # Extract business operations
-            business_ops = company_data.get('business_operations', {})
-            context['business_operations'] = {
-                'international': business_ops.get('international', False),
-                'inventory_management': business_ops.get('inventory_management', ''),
-                'multi_location': business_ops.get('multi_location', False),
-                'seasonal_business': business_ops.get('seasonal_business', False),
-                'peak_seasons': business_ops.get('peak_seasons', '')
-            }
-            
-            # Extract special circumstances
-            special_circumstances = company_data.get('special_circumstances', {})
-            context['special_circumstances'] = {}
-            
-            # Construction circumstances
-            construction = special_circumstances.get('construction', {})
-            if construction.get('enabled', False):
-                context['special_circumstances']['construction'] = {
-                    'enabled': True,
-                    'project_duration': construction.get('project_duration', '')
-                }
-            
-            # Retail/E-commerce circumstances
-            retail_ecommerce = special_circumstances.get('retail_ecommerce', {})
-            if retail_ecommerce.get('enabled', False):
-                context['special_circumstances']['retail_ecommerce'] = {
-                    'enabled': True,
-                    'platform_type': retail_ecommerce.get('platform_type', '')
-                }
-            
-            # Banking information
-            banking_info = company_data.get('banking_information', {})
-            context['banking_information'] = {
-                'primary_bank': banking_info.get('primary_bank', ''),
-                'primary_currency': banking_info.get('primary_currency', ''),
-                'multi_currency': banking_info.get('multi_currency', False),
-                'currencies_list': banking_info.get('currencies_list', [])
-            }
-            
-            # Extract metadata
-            metadata = company_data.get('metadata', {})
-            context['metadata'] = {
-                'rep_name': metadata.get('rep_name', ''),
-                'rep_email': metadata.get('rep_email', ''),
-                'vat_no': metadata.get('vat_no', '')
-            }
-            
-            print(f"✅ Company context loaded for: {company_name}")
-            print(f"   VAT Registered: {context['is_vat_registered']}")
-            print(f"   Industry: {context['primary_industry']}")
-            print(f"   Number of Employees: {context['payroll_information']['num_employees']}")
-            print(f"   Payroll Frequency: {context['payroll_information']['payroll_frequency']}")
-            print(f"   Primary Bank: {context['banking_information']['primary_bank']}")
-            
-            return context
-        else:
-            print(f"⚠️  No company context found for: {company_name}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ Error fetching company context: {e}")
-        return None
+    return company_contexts.get_company_context(company_name)
 
 def get_company_context_section(company_context):
     """Generate company context section for prompt"""
@@ -321,7 +214,7 @@ def get_bank_statement_extraction_prompt(company_id, company_context=None):
     """Create bank statement transaction extraction prompt with company context"""
     
     # Get company context section
-    company_context_section = get_company_context_section(company_context)
+    company_context_section = company_contexts.rendered_section(company_context, get_company_context_section)
     
     # Get primary bank name for partner assignment
     primary_bank = "Bank of Cyprus"  # default
@@ -909,19 +802,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -931,6 +813,34 @@ def download_from_s3(s3_key, bucket_name=None):
     except Exception as e:
         raise Exception(f"Error downloading from S3: {str(e)}")
 
+# Structured output: Claude returns the transactions through this tool instead of a free-text JSON array
+BANK_TRANSACTION_SCHEMA = obj({
+    "company_id": {"type": ["string", "integer"]},
+    "date": string(),
+    "ref": string(),
+    "narration": string(),
+    "partner": string(),
+    "accounting_assignment": obj({
+        "debit_account": string(),
+        "debit_account_name": string(),
+        "credit_account": string(),
+        "credit_account_name": string(),
+        "transaction_type": string(),
+        "requires_vat": boolean(),
+        "additional_entries": array(obj())
+    }, required=["debit_account", "credit_account"]),
+    "line_items": array(obj({
+        "name": string(),
+        "debit": number(),
+        "credit": number(),
+        "partner": string()
+    }, required=["name", "debit", "credit"]))
+}, required=["date", "ref", "partner", "accounting_assignment", "line_items"])
+
+BANK_STATEMENT_EXTRACTION_TOOL = structured_output.output_tool("bank_statement_extraction", obj({
+    "transactions": array(BANK_TRANSACTION_SCHEMA)
+}, required=["transactions"]), "Return every transaction on the statement, in order, as the transactions array.")
+
 def process_bank_statement_extraction(pdf_content, company_id, company_context=None):
     """Process bank statement with Claude for transaction extraction with accounting assignment and company context"""
     try:
@@ -1090,18 +1000,24 @@ OUTPUT REQUIREMENTS:
                         }
                     ]
                 }
-            ]
+            ],
+            **BANK_STATEMENT_EXTRACTION_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "bank_statement_extraction")
+        response_text = structured_output.response_text(message).strip()
         
-        # Log the raw response for debugging (first 500 chars)
-        print(f"Raw Claude response (first 500 chars): {response_text[:500]}...")
+        if parsed is None:
+            # Log the raw response for debugging (first 500 chars)
+            print(f"Raw Claude response (first 500 chars): {response_text[:500]}...")
         
         # Extract and parse JSON
         try:
-            extracted_json = extract_json_from_response(response_text)
+            if parsed is not None:
+                extracted_json = parsed.get("transactions", [])
+            else:
+                extracted_json = extract_json_from_response(response_text)
             
             # Ensure each transaction has complete structure
             validated_transactions = []
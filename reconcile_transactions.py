@@ -2,6 +2,7 @@ import os
 import xmlrpc.client
 import json
 from typing import Dict, List, Any, Tuple, Optional
+import partner_index
 
 # Comprehensive logging
 DEBUG_LOG = []
@@ -1031,10 +1032,12 @@ def find_or_create_partner(
     db: str,
     uid: int,
     password: str,
-    partner_name: str
+    partner_name: str,
+    company_id: Optional[int] = None
 ) -> Optional[int]:
     """
     Find existing partner or create new one with error handling
+    Name lookups are served from the shared partner index
     """
     try:
         if not partner_name or not isinstance(partner_name, str):
@@ -1045,17 +1048,13 @@ def find_or_create_partner(
         if not partner_name:
             return 1
         
-        # Search for existing partner
+        # Search for existing partner (case-insensitive exact name)
         try:
-            partners = models.execute_kw(
-                db, uid, password,
-                'res.partner', 'search_read',
-                [[('name', '=ilike', partner_name)]],
-                {'fields': ['id', 'name'], 'limit': 1}
-            )
+            index = partner_index.get_partner_index(models, db, uid, password, company_id)
+            partner = index.find_by_name(partner_name)
             
-            if partners and len(partners) > 0:
-                return safe_int(safe_get(partners, 0, 'id', default=1), default=1)
+            if partner:
+                return safe_int(partner.get('id'), default=1)
         except Exception as search_err:
             log_debug(f"Error searching for partner: {str(search_err)}")
         
@@ -1071,6 +1070,13 @@ def find_or_create_partner(
                 }]
             )
             
+            partner_index.register_created_partner(db, company_id, {
+                'id': partner_id,
+                'name': partner_name,
+                'customer_rank': 1,
+                'supplier_rank': 1
+            })
+            
             return safe_int(partner_id, default=1)
         except Exception as create_err:
             log_debug(f"Error creating partner: {str(create_err)}")
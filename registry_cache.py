@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+
+import aws_clients
+from botocore.exceptions import BotoCoreError, ClientError
+
+# DynamoDB setup
+AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
+cache_table = dynamodb.Table(os.getenv('REGISTRY_CACHE_TABLE', 'registry_cache'))
+
+# Registry entries change rarely (new directors, renames); translations never
+REGISTRY_TTL_SECONDS = int(os.getenv('REGISTRY_CACHE_TTL', str(7 * 24 * 3600)))
+TRANSLATION_TTL_SECONDS = int(os.getenv('TRANSLATION_CACHE_TTL', str(180 * 24 * 3600)))
+
+# Process-local copies so hot keys skip DynamoDB too
+_memory = {}
+_memory_lock = threading.Lock()
+MEMORY_MAX_ENTRIES = 5000
+
+
+def _cache_key(namespace, key):
+    normalized = ' '.join(str(key).split()).upper()
+    if len(normalized) > 200:
+        normalized = hashlib.sha256(normalized.encode()).hexdigest()
+    return f"{namespace}#{normalized}"
+
+
+def get(namespace, key):
+    """Return the cached value or None when missing/expired. Never raises."""
+    cache_key = _cache_key(namespace, key)
+    now = time.time()
+
+    with _memory_lock:
+        entry = _memory.get(cache_key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+    try:
+        item = cache_table.get_item(Key={'cache_key': cache_key}).get('Item')
+    except (ClientError, BotoCoreError) as e:
+        print(f"⚠️  Registry cache read failed for {cache_key}: {e}")
+        return None
+
+    # DynamoDB TTL deletion is lazy, so expired items can still be returned
+    if not item or int(item.get('expires_at', 0)) <= now:
+        return None
+
+    value = json.loads(item['value'])
+    _remember(cache_key, value, int(item['expires_at']))
+    return value
+
+
+def put(namespace, key, value, ttl_seconds):
+    """Store a JSON-serialisable value for ttl_seconds. Never raises."""
+    cache_key = _cache_key(namespace, key)
+    expires_at = int(time.time() + ttl_seconds)
+    _remember(cache_key, value, expires_at)
+
+    try:
+        cache_table.put_item(Item={
+            'cache_key': cache_key,
+            'namespace': namespace,
+            'value': json.dumps(value, ensure_ascii=False, default=str),
+            'expires_at': expires_at
+        })
+    except (ClientError, BotoCoreError) as e:
+        print(f"⚠️  Registry cache write failed for {cache_key}: {e}")
+
+
+def invalidate(namespace, key):
+    cache_key = _cache_key(namespace, key)
+    with _memory_lock:
+        _memory.pop(cache_key, None)
+    try:
+        cache_table.delete_item(Key={'cache_key': cache_key})
+    except (ClientError, BotoCoreError) as e:
+        print(f"⚠️  Registry cache delete failed for {cache_key}: {e}")
+
+
+def _remember(cache_key, value, expires_at):
+    with _memory_lock:
+        if len(_memory) >= MEMORY_MAX_ENTRIES:
+            now = time.time()
+            for stale_key in [k for k, (exp, _) in _memory.items() if exp <= now]:
+                del _memory[stale_key]
+            if len(_memory) >= MEMORY_MAX_ENTRIES:
+                _memory.pop(next(iter(_memory)))
+        _memory[cache_key] = (expires_at, value)
+
+
+# ============================================================================
+# GREEK TO LATIN TRANSLITERATION (ELOT 743)
+# ============================================================================
+
+GREEK_DIGRAPHS = {
+    'ΟΥ': 'OU', 'ΑΙ': 'AI', 'ΕΙ': 'EI', 'ΟΙ': 'OI', 'ΥΙ': 'YI',
+    'ΓΓ': 'NG', 'ΓΚ': 'GK', 'ΓΞ': 'NX', 'ΓΧ': 'NCH',
+    'ΜΠ': 'MP', 'ΝΤ': 'NT', 'ΤΣ': 'TS', 'ΤΖ': 'TZ',
+}
+
+GREEK_LETTERS = {
+    'Α': 'A', 'Β': 'V', 'Γ': 'G', 'Δ': 'D', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'I', 'Θ': 'TH',
+    'Ι': 'I', 'Κ': 'K', 'Λ': 'L', 'Μ': 'M', 'Ν': 'N', 'Ξ': 'X', 'Ο': 'O', 'Π': 'P',
+    'Ρ': 'R', 'Σ': 'S', 'Τ': 'T', 'Υ': 'Y', 'Φ': 'F', 'Χ': 'CH', 'Ψ': 'PS', 'Ω': 'O',
+}
+
+# αυ/ευ/ηυ read as av/ev/iv before vowels and voiced consonants, af/ef/if otherwise
+VOICED_FOLLOWERS = set('ΑΕΗΙΟΥΩΒΓΔΖΛΜΝΡ')
+U_DIPHTHONGS = {'Α': 'A', 'Ε': 'E', 'Η': 'I'}
+
+
+def contains_greek(text):
+    return any('Ͱ' <= char <= 'Ͽ' or 'ἀ' <= char <= '῿' for char in text or '')
+
+
+def transliterate_greek(text):
+    """
+    Deterministic Greek to Latin transliteration, upper-cased.
+
+    Follows ELOT 743 closely enough to match how Cypriot names are written
+    in passports and registry filings (e.g. ΚΥΡΑΝΙΔΗΣ -> KYRANIDIS).
+    Non-Greek characters pass through unchanged.
+    """
+    if not text:
+        return ''
+
+    # Strip tonos/dialytika and fold final sigma
+    decomposed = unicodedata.normalize('NFD', text.upper())
+    plain = ''.join(char for char in decomposed if unicodedata.category(char) != 'Mn').replace('ς', 'Σ')
+
+    result = []
+    i = 0
+    while i < len(plain):
+        char = plain[i]
+        pair = plain[i:i + 2]
+        following = plain[i + 2] if i + 2 < len(plain) else ''
+
+        if char in U_DIPHTHONGS and i + 1 < len(plain) and plain[i + 1] == 'Υ':
+            result.append(U_DIPHTHONGS[char] + ('V' if following in VOICED_FOLLOWERS else 'F'))
+            i += 2
+            continue
+
+        if pair in ('ΜΠ', 'ΝΤ'):
+            # Word-initial μπ/ντ sound as b/d
+            at_word_start = i == 0 or not plain[i - 1].isalpha()
+            result.append(('B' if pair == 'ΜΠ' else 'D') if at_word_start else GREEK_DIGRAPHS[pair])
+            i += 2
+            continue
+
+        if pair in GREEK_DIGRAPHS:
+            result.append(GREEK_DIGRAPHS[pair])
+            i += 2
+            continue
+
+        result.append(GREEK_LETTERS.get(char, char))
+        i += 1
+
+    return ''.join(result)
@@ -0,0 +1,225 @@
+import os
+import re
+import threading
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://efiling.drcor.mcit.gov.cy/DrcorPublic/"
+SEARCH_FORM_PATH = "SearchForm.aspx?sc=0&lang=en"
+
+SEARCH_NUMBER_FIELD = "ctl00$cphMyMasterCentral$ucSearch$txtNumber"
+SEARCH_NAME_FIELD = "ctl00$cphMyMasterCentral$ucSearch$txtName"
+SEARCH_BUTTON_TARGET = "ctl00$cphMyMasterCentral$ucSearch$lbtnSearch"
+SEARCH_CONTROL_PREFIX = "ctl00$cphMyMasterCentral$ucSearch$"
+MESSAGE_ELEMENT_ID = "ctl00_cphMyMasterCentral_lblMessage"
+
+DIRECTORS_KEYWORDS = ['directors', 'διευθυντές', 'director', 'διευθυντής', 'board', 'officers']
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+POSTBACK_PATTERN = re.compile(r"__doPostBack\(\s*['\"]([^'\"]*)['\"]\s*,\s*['\"]([^'\"]*)['\"]\s*\)")
+
+
+class RegistryHttpError(Exception):
+    """The registry pages did not look like the form we know how to replay"""
+
+
+def extract_form_fields(html_content):
+    """
+    Collect the fields the browser would post back for the main form.
+
+    Hidden ASP.NET state (__VIEWSTATE, __EVENTVALIDATION, ...) and every
+    other named input/select keeps its current value. Returns (action, fields).
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    form = soup.find('form')
+    if form is None:
+        raise RegistryHttpError('No form found on registry page')
+
+    fields = {}
+    for element in form.find_all('input'):
+        name = element.get('name')
+        if not name:
+            continue
+        input_type = (element.get('type') or 'text').lower()
+        if input_type in ('submit', 'button', 'image', 'file'):
+            continue
+        if input_type in ('checkbox', 'radio') and not element.has_attr('checked'):
+            continue
+        fields[name] = element.get('value', '')
+
+    for element in form.find_all('select'):
+        name = element.get('name')
+        if not name:
+            continue
+        selected = element.find('option', selected=True) or element.find('option')
+        fields[name] = selected.get('value', selected.get_text(strip=True)) if selected else ''
+
+    if '__VIEWSTATE' not in fields:
+        raise RegistryHttpError('Registry form has no __VIEWSTATE')
+
+    return form.get('action') or '', fields
+
+
+def parse_postback(value):
+    """Return (event_target, event_argument) from a __doPostBack(...) call, or None"""
+    match = POSTBACK_PATTERN.search(value or '')
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
+
+def _element_action(element):
+    """A postback or a plain link reachable from an element or its children"""
+    for candidate in [element] + element.find_all(['a', 'input', 'span', 'td']):
+        for attribute in ('href', 'onclick'):
+            value = candidate.get(attribute) or ''
+            postback = parse_postback(value)
+            if postback:
+                return {'postback': postback}
+            if attribute == 'href' and value and not value.startswith(('javascript:', '#')):
+                return {'href': value}
+    return None
+
+
+def find_first_result_action(html_content):
+    """Locate what the browser would click to open the first search result"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for selector in ["tr.basket", "tr[class*='basket']", ".CompanyDetails a", "table tr td a"]:
+        for element in soup.select(selector):
+            action = _element_action(element)
+            # The search form's own controls also sit in table cells
+            if action and not action.get('postback', ('',))[0].startswith(SEARCH_CONTROL_PREFIX):
+                return action
+    return None
+
+
+def find_directors_action(html_content):
+    """Locate the tab/link that shows the directors of a company"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for element in soup.find_all(['a', 'input', 'span', 'div', 'li', 'td']):
+        haystack = ' '.join([
+            element.get_text(' ', strip=True),
+            element.get('id') or '',
+            ' '.join(element.get('class') or []),
+            element.get('onclick') or '',
+            element.get('href') or '',
+        ]).lower()
+        if not any(keyword in haystack for keyword in DIRECTORS_KEYWORDS):
+            continue
+        action = _element_action(element)
+        if action:
+            return action
+    return None
+
+
+def registry_message(html_content):
+    """Text of the registry's own message label (e.g. no companies found), or ''"""
+    element = BeautifulSoup(html_content, 'html.parser').find(id=MESSAGE_ELEMENT_ID)
+    return element.get_text(' ', strip=True) if element else ''
+
+
+def page_mentions_directors(html_content):
+    lowered = html_content.lower()
+    return 'directors' in lowered or 'διευθυντές' in lowered
+
+
+class RegistryHttpClient:
+    """
+    Replays the eFiling ASP.NET search form over plain HTTP.
+
+    Each step fetches a page, carries the form state forward and posts the
+    same postback the browser would have triggered. Sessions are kept per
+    thread so connections and the registry's session cookie are reused
+    across validations.
+    """
+
+    def __init__(self, base_url=None, timeout=15, pool_size=4):
+        self.base_url = base_url or os.getenv('REGISTRY_BASE_URL', DEFAULT_BASE_URL)
+        if not self.base_url.endswith('/'):
+            self.base_url += '/'
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    @property
+    def search_url(self):
+        return urljoin(self.base_url, SEARCH_FORM_PATH)
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': 'en'})
+            self._local.session = session
+        return session
+
+    def _get(self, url):
+        response = self._session().get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text, response.url
+
+    def _postback(self, html_content, page_url, event_target, event_argument='', extra_fields=None):
+        action, fields = extract_form_fields(html_content)
+        fields.update(extra_fields or {})
+        fields['__EVENTTARGET'] = event_target
+        fields['__EVENTARGUMENT'] = event_argument
+        response = self._session().post(urljoin(page_url, action), data=fields, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text, response.url
+
+    def _follow(self, html_content, page_url, action):
+        if 'postback' in action:
+            return self._postback(html_content, page_url, *action['postback'])
+        return self._get(urljoin(page_url, action['href']))
+
+    def search(self, reg_number, company_name):
+        """
+        Submit the search form. Returns (html, url) of the results page.
+
+        Raises RegistryHttpError when the response is neither a results list
+        nor a registry message.
+        """
+        form_html, form_url = self._get(self.search_url)
+        results_html, results_url = self._postback(form_html, form_url, SEARCH_BUTTON_TARGET, extra_fields={
+            SEARCH_NUMBER_FIELD: reg_number or '',
+            SEARCH_NAME_FIELD: company_name or '',
+        })
+        # Anything but a results row or the registry's own message (an error
+        # page, the form again after a rejected postback) is left to the browser
+        if not find_first_result_action(results_html) and not registry_message(results_html):
+            raise RegistryHttpError('Unrecognised search results page')
+        return results_html, results_url
+
+    def open_first_result(self, results_html, results_url):
+        action = find_first_result_action(results_html)
+        if not action:
+            raise RegistryHttpError('Could not find a result to open')
+        return self._follow(results_html, results_url, action)
+
+    def open_directors(self, details_html, details_url):
+        """Return (html, url) of the directors view, following the tab if needed"""
+        action = find_directors_action(details_html)
+        if not action:
+            if page_mentions_directors(details_html):
+                return details_html, details_url
+            raise RegistryHttpError('Could not find the directors tab')
+        return self._follow(details_html, details_url, action)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_registry_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RegistryHttpClient()
+        return _client
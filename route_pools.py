@@ -0,0 +1,158 @@
+"""
+Admission control for long-running routes.
+
+Every gunicorn worker serves all routes from one set of threads (or
+greenlets). Without a limit, a burst of document-processing requests,
+each waiting tens of seconds on Anthropic or Odoo, takes every slot and
+logins and dashboard reads queue behind them. Each route class below
+gets its own bounded pool of in-flight requests. A request that can't
+get a slot within the class's queue timeout receives a 503 with
+Retry-After instead of hanging. Routes outside any class (CRUD, reads,
+auth) are never limited.
+"""
+import os
+import threading
+import time
+from flask import g, jsonify, make_response, request
+
+# Path prefixes per route class; /health sub-routes are never limited
+ROUTE_CLASSES = {
+    'llm': [
+        '/api/classify-document',
+        '/api/split-document',
+        '/api/process_transaction',
+        '/api/process-bill',
+        '/api/process-invoice',
+        '/api/process-share-document',
+        '/api/process-payroll-document',
+        '/api/process/onboarding_doc/',
+        '/api/matching_workflow',
+        '/api/matching-workflow',
+        '/api/reconcile-transactions',
+        '/api/extract-dynamodb-data',
+    ],
+    'slow': [
+        '/api/company/validate',
+        '/api/create/company',
+        '/api/reports/download/',
+    ],
+}
+
+# (method, path prefix, path suffix) for routes that share a prefix with
+# fast reads, such as approving a company next to the admin GET routes
+ROUTE_ENDPOINTS = {
+    'slow': [
+        ('PUT', '/api/admin/companies/', '/approve'),
+    ],
+}
+
+DEFAULT_LIMITS = {'llm': 4, 'slow': 4}
+DEFAULT_QUEUE_TIMEOUTS = {'llm': 30, 'slow': 15}
+
+
+class RoutePool:
+    def __init__(self, name, limit, queue_timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+            else:
+                self.rejected += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'queue_timeout': self.queue_timeout,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+
+def _env_number(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+pools = {
+    name: RoutePool(
+        name,
+        _env_number(f'{name.upper()}_ROUTE_CONCURRENCY', DEFAULT_LIMITS[name]),
+        _env_number(f'{name.upper()}_ROUTE_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUTS[name])
+    )
+    for name in ROUTE_CLASSES
+}
+
+
+def pool_for_path(path, method=None):
+    """Route pool responsible for a request, or None for unlimited routes"""
+    if path.endswith('/health'):
+        return None
+    for name, prefixes in ROUTE_CLASSES.items():
+        if any(path.startswith(prefix) for prefix in prefixes):
+            return pools[name]
+    for name, endpoints in ROUTE_ENDPOINTS.items():
+        for endpoint_method, prefix, suffix in endpoints:
+            if method == endpoint_method and path.startswith(prefix) and path.endswith(suffix):
+                return pools[name]
+    return None
+
+
+def _admit():
+    if request.method == 'OPTIONS':
+        return None
+    pool = pool_for_path(request.path, request.method)
+    if pool is None:
+        return None
+
+    started = time.time()
+    if not pool.acquire():
+        print(f"⚠️  {pool.name} routes saturated, rejected {request.path}")
+        response = make_response(jsonify({
+            "success": False,
+            "error": "Server is busy processing other documents, please retry shortly"
+        }), 503)
+        response.headers['Retry-After'] = str(max(1, pool.queue_timeout // 2))
+        return response
+
+    g._route_pool = pool
+    g._route_pool_wait = time.time() - started
+    return None
+
+
+def _release(exc=None):
+    pool = g.pop('_route_pool', None)
+    if pool is not None:
+        pool.release()
+
+
+def init_app(app):
+    """Install admission control on a Flask app"""
+    app.before_request(_admit)
+    app.teardown_request(_release)
+
+
+def stats():
+    return {name: pool.stats() for name, pool in pools.items()}
@@ -1,6 +1,8 @@
-import boto3
+import aws_clients
 import base64
 import anthropic
+import structured_output
+from structured_output import array, integer, obj, string
 import os
 import json
 import re
@@ -94,19 +96,8 @@ def download_from_s3(s3_key, bucket_name=None):
             bucket_name = os.getenv('S3_BUCKET_NAME', 'company-documents-2025')
         
         # Initialize S3 client
-        aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         aws_region = os.getenv('AWS_REGION', 'eu-north-1')
-        
-        if aws_access_key and aws_secret_key:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key,
-                region_name=aws_region
-            )
-        else:
-            s3_client = boto3.client('s3', region_name=aws_region)
+        s3_client = aws_clients.client('s3', region_name=aws_region)
         
         print(f"Downloading from bucket: {bucket_name}, key: {s3_key}")
         
@@ -116,6 +107,15 @@ def download_from_s3(s3_key, bucket_name=None):
     except Exception as e:
         raise Exception(f"Error downloading from S3: {str(e)}")
 
+# Structured output: Claude returns the split invoices through this tool instead of JSON lines
+SPLIT_INVOICES_TOOL = structured_output.output_tool("split_invoices", obj({
+    "invoices": array(obj({
+        "invoice_index": integer(),
+        "page_range": string(),
+        "raw_text": string()
+    }, required=["invoice_index", "page_range", "raw_text"]))
+}, required=["invoices"]), "Return each separate invoice in the document with its pages and text.")
+
 def process_document_splitting(pdf_content):
     """Process document with Claude for splitting into individual invoices"""
     try:
@@ -153,18 +153,20 @@ def process_document_splitting(pdf_content):
                         }
                     ]
                 }
-            ]
+            ],
+            **SPLIT_INVOICES_TOOL
         )
         
-        # Extract response
-        response_text = message.content[0].text.strip()
+        # Extract response - structured output arrives parsed, text only if the tool was skipped
+        parsed = structured_output.tool_output(message, "split_invoices")
+        response_text = structured_output.response_text(message).strip()
         
         # Log token usage for monitoring
         print(f"Token usage - Input: {message.usage.input_tokens}, Output: {message.usage.output_tokens}")
         
         return {
             "success": True,
-            "split_result": response_text,
+            "split_result": parsed if parsed is not None else response_text,
             "token_usage": {
                 "input_tokens": message.usage.input_tokens,
                 "output_tokens": message.usage.output_tokens
@@ -178,65 +180,72 @@ def process_document_splitting(pdf_content):
         }
 
 def parse_split_invoices(raw_response):
-    """Parse the raw response into individual invoice objects with robust handling"""
+    """Parse the raw response (or already-parsed structured output) into individual invoice objects with robust handling"""
     try:
         invoices = []
         
-        # Clean the response and remove excessive whitespace
-        cleaned_response = raw_response.strip()
-        
-        # Try parsing as line-separated JSON objects first (expected format)
-        lines = cleaned_response.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line and line.startswith('{') and line.endswith('}'):
+        if isinstance(raw_response, dict):
+            # Structured tool output is already split into objects
+            for invoice_data in raw_response.get("invoices", []):
+                if all(field in invoice_data for field in ['invoice_index', 'page_range', 'raw_text']):
+                    invoice_data['raw_text'] = re.sub(r'\n{5,}', '\n\n', invoice_data['raw_text']).strip()
+                    invoices.append(invoice_data)
+        else:
+            # Clean the response and remove excessive whitespace
+            cleaned_response = raw_response.strip()
+            
+            # Try parsing as line-separated JSON objects first (expected format)
+            lines = cleaned_response.split('\n')
+            
+            for line in lines:
+                line = line.strip()
+                if line and line.startswith('{') and line.endswith('}'):
+                    try:
+                        invoice_data = json.loads(line)
+                        # Validate required fields
+                        if all(field in invoice_data for field in ['invoice_index', 'page_range', 'raw_text']):
+                            # Clean up excessive newlines in raw_text
+                            if 'raw_text' in invoice_data:
+                                raw_text = invoice_data['raw_text']
+                                # Replace excessive newlines but preserve document structure
+                                cleaned_text = re.sub(r'\n{5,}', '\n\n', raw_text)
+                                cleaned_text = cleaned_text.strip()
+                                invoice_data['raw_text'] = cleaned_text
+                            invoices.append(invoice_data)
+                    except json.JSONDecodeError:
+                        continue
+            
+            # If no line-separated objects found, try parsing as single JSON object
+            if not invoices:
                 try:
-                    invoice_data = json.loads(line)
-                    # Validate required fields
-                    if all(field in invoice_data for field in ['invoice_index', 'page_range', 'raw_text']):
-                        # Clean up excessive newlines in raw_text
-                        if 'raw_text' in invoice_data:
-                            raw_text = invoice_data['raw_text']
-                            # Replace excessive newlines but preserve document structure
-                            cleaned_text = re.sub(r'\n{5,}', '\n\n', raw_text)
-                            cleaned_text = cleaned_text.strip()
-                            invoice_data['raw_text'] = cleaned_text
-                        invoices.append(invoice_data)
+                    single_object = json.loads(cleaned_response)
+                    if isinstance(single_object, dict) and 'invoice_index' in single_object:
+                        invoices.append(single_object)
+                    elif isinstance(single_object, list):
+                        invoices = single_object
                 except json.JSONDecodeError:
-                    continue
-        
-        # If no line-separated objects found, try parsing as single JSON object
-        if not invoices:
-            try:
-                single_object = json.loads(cleaned_response)
-                if isinstance(single_object, dict) and 'invoice_index' in single_object:
-                    invoices.append(single_object)
-                elif isinstance(single_object, list):
-                    invoices = single_object
-            except json.JSONDecodeError:
-                pass
-        
-        # If still no invoices, try parsing concatenated JSON objects
-        if not invoices and '}{' in cleaned_response:
-            parts = cleaned_response.split('}{')
-            for i, part in enumerate(parts):
-                try:
-                    if i == 0:
-                        json_str = part + '}'
-                    elif i == len(parts) - 1:
-                        json_str = '{' + part
-                    else:
-                        json_str = '{' + part + '}'
+                    pass
+            
+            # If still no invoices, try parsing concatenated JSON objects
+            if not invoices and '}{' in cleaned_response:
+                parts = cleaned_response.split('}{')
+                for i, part in enumerate(parts):
+                    try:
+                        if i == 0:
+                            json_str = part + '}'
+                        elif i == len(parts) - 1:
+                            json_str = '{' + part
+                        else:
+                            json_str = '{' + part + '}'
                     
-                    json_str = json_str.strip()
-                    invoice_data = json.loads(json_str)
+                        json_str = json_str.strip()
+                        invoice_data = json.loads(json_str)
                     
-                    # Validate required fields
-                    if all(field in invoice_data for field in ['invoice_index', 'page_range', 'raw_text']):
-                        invoices.append(invoice_data)
-                except json.JSONDecodeError:
-                    continue
+                        # Validate required fields
+                        if all(field in invoice_data for field in ['invoice_index', 'page_range', 'raw_text']):
+                            invoices.append(invoice_data)
+                    except json.JSONDecodeError:
+                        continue
         
         print(f"Successfully parsed {len(invoices)} invoices from response")
         
@@ -0,0 +1,76 @@
+"""
+Structured output for Anthropic calls via forced tool use.
+
+Rather than asking for JSON in free text and repairing whatever comes
+back, callers pass output_tool(name, schema) into messages.create. The
+model then has to answer by "calling" that tool, and its answer arrives
+as the tool_use block's input, already parsed. tool_output() returns
+that dict.
+
+A response cut off at max_tokens carries an incomplete tool input, so
+tool_output() treats it as a failure. Callers fall back to their text
+parsers only when the model answers without the tool.
+
+Schemas are kept permissive on purpose. They pin down the top-level
+shape and the fields code reads, and the modules' own structure checks
+still fill in defaults. Each module keeps its schemas next to its
+prompts.
+"""
+
+
+def string(nullable=False):
+    return {'type': ['string', 'null']} if nullable else {'type': 'string'}
+
+
+def number(nullable=False):
+    return {'type': ['number', 'null']} if nullable else {'type': 'number'}
+
+
+def integer(nullable=False):
+    return {'type': ['integer', 'null']} if nullable else {'type': 'integer'}
+
+
+def boolean():
+    return {'type': 'boolean'}
+
+
+def array(items=None):
+    return {'type': 'array', 'items': items if items is not None else {}}
+
+
+def obj(properties=None, required=()):
+    """Object schema; extra properties are allowed unless listed"""
+    schema = {'type': 'object', 'properties': properties or {}}
+    if required:
+        schema['required'] = list(required)
+    return schema
+
+
+def output_tool(name, schema, description=None):
+    """messages.create kwargs forcing the response through a single tool"""
+    return {
+        'tools': [{
+            'name': name,
+            'description': description or f'Return the {name.replace("_", " ")} result.',
+            'input_schema': schema
+        }],
+        'tool_choice': {'type': 'tool', 'name': name}
+    }
+
+
+def tool_output(message, name):
+    """
+    The tool input from a response as a dict, or None when the model answered
+    in text instead. Raises ValueError for a response truncated at max_tokens.
+    """
+    for block in message.content:
+        if getattr(block, 'type', None) == 'tool_use' and block.name == name:
+            if message.stop_reason == 'max_tokens':
+                raise ValueError(f'{name} output truncated at max_tokens ({message.usage.output_tokens} tokens)')
+            return block.input if isinstance(block.input, dict) else None
+    return None
+
+
+def response_text(message):
+    """Concatenated text blocks, for the free-text fallback"""
+    return ''.join(block.text for block in message.content if getattr(block, 'type', None) == 'text')
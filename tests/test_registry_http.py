@@ -0,0 +1,131 @@
+"""
+Replays the eFiling search against recorded ASP.NET pages.
+
+The fake session serves the fixture the registry returned for each
+request and records what was posted, so the tests check both sides of
+every postback: the form state carried forward and the page that came
+back.
+"""
+import os
+
+import pytest
+
+import registry_http
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'registry')
+BASE_URL = 'https://efiling.example.test/DrcorPublic/'
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, text, url):
+        self.text = text
+        self.url = url
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Serves one fixture per (method, path, __EVENTTARGET)"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+
+    def _respond(self, method, url, data=None):
+        target = (data or {}).get('__EVENTTARGET')
+        self.calls.append({'method': method, 'url': url, 'data': data})
+        path = url[len(BASE_URL):]
+        return FakeResponse(fixture(self.routes[(method, path, target)]), url)
+
+    def get(self, url, timeout=None):
+        return self._respond('GET', url)
+
+    def post(self, url, data=None, timeout=None):
+        return self._respond('POST', url, data)
+
+
+def make_client(routes):
+    client = registry_http.RegistryHttpClient(base_url=BASE_URL)
+    session = FakeSession(routes)
+    client._session = lambda: session
+    return client, session
+
+
+SEARCH_PATH = 'SearchForm.aspx?sc=0&lang=en'
+DETAILS_PATH = 'ShowSearchResults.aspx?sc=0&lang=en'
+
+
+def test_search_replays_form_postback():
+    client, session = make_client({
+        ('GET', SEARCH_PATH, None): 'search_form.html',
+        ('POST', SEARCH_PATH, registry_http.SEARCH_BUTTON_TARGET): 'search_results.html',
+    })
+
+    results_html, results_url = client.search('123456', 'Example Trading')
+
+    assert 'HE123456' in results_html
+    assert results_url == BASE_URL + SEARCH_PATH
+    posted = session.calls[1]['data']
+    assert posted['__VIEWSTATE'].startswith('/wEPDwUKMTE2NjQ4MzU5Mw9kFgJmD2QWAgIDD2QWAgIFD2QWAgIBD2QWAgIBD2QWBGYP')
+    assert posted['__EVENTVALIDATION'] == '/wEdAAeJ3nK2vQy8m5xq0Kc8i6Z1o0yVd3rQ4w=='
+    assert posted['__VIEWSTATEGENERATOR'] == '5E4B8C0A'
+    assert posted['__EVENTARGUMENT'] == ''
+    assert posted[registry_http.SEARCH_NUMBER_FIELD] == '123456'
+    assert posted[registry_http.SEARCH_NAME_FIELD] == 'Example Trading'
+    # Selected option is posted, the unticked checkbox is not
+    assert posted['ctl00$cphMyMasterCentral$ucSearch$ddlType'] == 'C'
+    assert 'ctl00$cphMyMasterCentral$ucSearch$chkExact' not in posted
+
+
+def test_full_lookup_follows_result_and_directors_tab():
+    client, session = make_client({
+        ('GET', SEARCH_PATH, None): 'search_form.html',
+        ('POST', SEARCH_PATH, registry_http.SEARCH_BUTTON_TARGET): 'search_results.html',
+        ('POST', SEARCH_PATH, 'ctl00$cphMyMasterCentral$GridView1'): 'company_details.html',
+        ('POST', DETAILS_PATH, 'ctl00$cphMyMasterCentral$lbtnOfficials'): 'company_directors.html',
+    })
+
+    results_html, results_url = client.search('123456', 'Example Trading')
+    details_html, details_url = client.open_first_result(results_html, results_url)
+    directors_html, _ = client.open_directors(details_html, details_url)
+
+    assert 'ANDREAS GEORGIOU' in directors_html
+    select_result, open_tab = session.calls[2]['data'], session.calls[3]['data']
+    assert select_result['__EVENTARGUMENT'] == 'Select$0'
+    # Each postback carries the state of the page it was made from
+    assert select_result['__EVENTVALIDATION'] == '/wEdAAqR3sFJb4W6cYq9lZ2Xb9d1Tn0yVd3rQ4w=='
+    assert open_tab['__VIEWSTATEGENERATOR'] == '8A1C3F2E'
+    assert session.calls[3]['url'] == BASE_URL + DETAILS_PATH
+
+
+def test_no_results_message_is_returned():
+    client, _ = make_client({
+        ('GET', SEARCH_PATH, None): 'search_form.html',
+        ('POST', SEARCH_PATH, registry_http.SEARCH_BUTTON_TARGET): 'search_no_results.html',
+    })
+
+    results_html, _ = client.search('999999', 'No Such Company')
+
+    assert registry_http.registry_message(results_html) == 'No records found matching the search criteria'
+
+
+@pytest.mark.parametrize('response_fixture', ['server_error.html', 'search_form.html'])
+def test_unparseable_results_page_raises(response_fixture):
+    client, _ = make_client({
+        ('GET', SEARCH_PATH, None): 'search_form.html',
+        ('POST', SEARCH_PATH, registry_http.SEARCH_BUTTON_TARGET): response_fixture,
+    })
+
+    with pytest.raises(registry_http.RegistryHttpError):
+        client.search('123456', 'Example Trading')
+
+
+def test_error_page_is_not_a_form():
+    with pytest.raises(registry_http.RegistryHttpError):
+        registry_http.extract_form_fields(fixture('server_error.html'))
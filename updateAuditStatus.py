@@ -4,6 +4,48 @@ import os
 import random
 import xmlrpc.client
 
+def get_odoo_connection():
+    """Authenticated (models, db, uid, password) for the configured Odoo instance"""
+    url = os.getenv("ODOO_URL")
+    db = os.getenv("ODOO_DB")
+    username = os.getenv("ODOO_USERNAME")
+    password = os.getenv("ODOO_API_KEY")
+
+    if not all([url, db, username, password]):
+        raise ValueError("Missing Odoo connection configuration")
+
+    common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
+    models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
+    uid = common.authenticate(db, username, password, {})
+
+    if not uid:
+        raise ValueError("Authentication with Odoo failed")
+
+    return models, db, uid, password
+
+
+def _write_in_groups(models, db, uid, password, model, groups):
+    """
+    Write {values_key: (ids, values)} with one multi-id write per group.
+
+    If a group write fails, its ids are retried one by one so a single bad
+    record doesn't fail the rest. Returns {id: error or None}.
+    """
+    outcome = {}
+    for ids, values in groups.values():
+        try:
+            models.execute_kw(db, uid, password, model, 'write', [ids, values])
+            outcome.update({record_id: None for record_id in ids})
+        except xmlrpc.client.Fault:
+            for record_id in ids:
+                try:
+                    models.execute_kw(db, uid, password, model, 'write', [[record_id], values])
+                    outcome[record_id] = None
+                except xmlrpc.client.Fault as fault:
+                    outcome[record_id] = f"XML-RPC Fault: {fault.faultString}"
+    return outcome
+
+
 def update_audit_status_in_odoo(transaction_id, new_status):
     """
     Updates the custom 'Audit Status' field on a journal entry (account.move) in Odoo.
@@ -56,6 +98,216 @@ def update_audit_status_in_odoo(transaction_id, new_status):
         return False, {"error": f"Unexpected error: {str(e)}"}
 
 
+def update_audit_status_bulk(updates):
+    """
+    Update the audit status of many journal entries in one go.
+
+    updates is a list of {"transaction_id", "audit_status"}. Entries are
+    grouped by target status and every group is written with a single
+    multi-id write. Returns one result per update, in order.
+    """
+    results = [None] * len(updates)
+    latest = {}  # move id -> (status, index of the last update for it)
+
+    for index, item in enumerate(updates):
+        transaction_id = item.get("transaction_id")
+        audit_status = item.get("audit_status")
+
+        if not transaction_id or not audit_status:
+            results[index] = {"success": False, "error": "Missing transaction_id or audit_status", "data": item}
+            continue
+
+        try:
+            move_id = int(transaction_id)
+        except (TypeError, ValueError):
+            results[index] = {"transaction_id": transaction_id, "audit_status": audit_status,
+                              "error": f"Invalid transaction_id: {transaction_id}"}
+            continue
+
+        latest[move_id] = (audit_status, index)
+
+    pending = [index for index, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    try:
+        models, db, uid, password = get_odoo_connection()
+
+        existing = set(models.execute_kw(
+            db, uid, password,
+            'account.move', 'search',
+            [[('id', 'in', list(latest))]]
+        ))
+
+        groups = {}
+        for move_id, (audit_status, _) in latest.items():
+            if move_id in existing:
+                groups.setdefault(audit_status, ([], {'x_studio_audit_status': audit_status}))[0].append(move_id)
+
+        outcome = _write_in_groups(models, db, uid, password, 'account.move', groups)
+
+    except Exception as e:
+        error = str(e) if isinstance(e, ValueError) else f"Unexpected error: {str(e)}"
+        for index in pending:
+            results[index] = {"transaction_id": updates[index]["transaction_id"],
+                              "audit_status": updates[index]["audit_status"], "error": error}
+        return results
+
+    for index in pending:
+        item = updates[index]
+        move_id = int(item["transaction_id"])
+        final_status, final_index = latest[move_id]
+        result = {"transaction_id": move_id, "audit_status": item["audit_status"]}
+
+        if move_id not in existing:
+            result["error"] = f"Journal entry {move_id} not found"
+        elif outcome.get(move_id):
+            result["error"] = outcome[move_id]
+        else:
+            result.update({
+                "success": True,
+                "new_status": final_status,
+                "message": f"Audit status updated to '{final_status}'"
+            })
+            if final_index != index:
+                result["message"] = f"Superseded by a later update to '{final_status}' in the same request"
+        results[index] = result
+
+    print(f"✅ Bulk audit status: {len(outcome)} entries in {len(groups)} write(s)")
+    return results
+
+
+def _paid_result(data, journal_entry, company_name):
+    """Result shape of mark_entry_as_paid for an entry that was marked as paid"""
+    return {
+        "success": True,
+        "entry_name": journal_entry['name'],
+        "ref_field": journal_entry.get('ref', 'None'),
+        "amount": journal_entry['amount_total'],
+        "description": data.get('description', 'No description provided'),
+        "partner": data.get('partner', 'Unknown'),
+        "date": data['date'],
+        "account_name": data['account_name'],
+        "company": company_name,
+        "previous_payment_state": journal_entry.get('payment_state', 'unknown'),
+        "new_payment_state": 'paid',
+        "message": f"Journal entry '{journal_entry['name']}' marked as paid"
+    }
+
+
+def _find_company(models, db, uid, password, company_name, companies_cache):
+    if company_name not in companies_cache:
+        companies = models.execute_kw(
+            db, uid, password,
+            'res.company', 'search_read',
+            [[('name', 'ilike', company_name)]],
+            {'fields': ['id', 'name'], 'limit': 1}
+        )
+        companies_cache[company_name] = companies[0] if companies else None
+    return companies_cache[company_name]
+
+
+def mark_entries_as_paid_bulk(entries):
+    """
+    Bulk mark_entry_as_paid.
+
+    Connects once, resolves each company once, finds the entries of a
+    company with one `ref in [...]` search and marks every entry found
+    with a single write. References that don't match exactly fall back to
+    the single-entry `ref ilike` lookup. Returns one result per entry, in
+    the same shape as mark_entry_as_paid.
+    """
+    results = [None] * len(entries)
+
+    try:
+        models, db, uid, password = get_odoo_connection()
+    except Exception as e:
+        return [{"error": str(e)} for _ in entries]
+
+    entry_fields = ['id', 'name', 'amount_total', 'state', 'payment_state', 'ref']
+    companies_cache = {}
+    by_company = {}
+    entry_company = {}
+
+    for index, data in enumerate(entries):
+        try:
+            for field in ('reference', 'amount', 'company_name', 'date', 'account_name'):
+                if field not in data:
+                    raise KeyError(field)
+            company = _find_company(models, db, uid, password, data['company_name'], companies_cache)
+            if not company:
+                results[index] = {"error": f"Company '{data['company_name']}' not found"}
+                continue
+            try:
+                amount = float(data['amount'])
+            except (ValueError, TypeError):
+                results[index] = {"error": f"Invalid amount: {data['amount']}"}
+                continue
+            by_company.setdefault(company['id'], []).append((index, data['reference'], amount))
+            entry_company[index] = company['id']
+        except xmlrpc.client.Fault as fault:
+            results[index] = {"error": f"XML-RPC Fault: {fault.faultString}"}
+        except Exception as e:
+            results[index] = {"error": f"Unexpected error: {str(e)}"}
+
+    company_names = {company['id']: company['name'] for company in companies_cache.values() if company}
+    found = {}  # entry index -> journal entry
+
+    for company_id, items in by_company.items():
+        try:
+            moves_by_ref = {}
+            for move in models.execute_kw(
+                db, uid, password,
+                'account.move', 'search_read',
+                [[('ref', 'in', sorted({reference for _, reference, _ in items})), ('company_id', '=', company_id)]],
+                {'fields': entry_fields}
+            ):
+                moves_by_ref.setdefault(move['ref'], []).append(move)
+
+            for index, reference, amount in items:
+                move = next((m for m in moves_by_ref.get(reference, []) if abs(m['amount_total'] - amount) < 0.01), None)
+                if move is None:
+                    # Partial reference: same lookup as mark_entry_as_paid
+                    moves = models.execute_kw(
+                        db, uid, password,
+                        'account.move', 'search_read',
+                        [[('ref', 'ilike', reference), ('amount_total', '=', amount), ('company_id', '=', company_id)]],
+                        {'fields': entry_fields, 'limit': 1}
+                    )
+                    move = moves[0] if moves else None
+
+                if move is None:
+                    results[index] = {
+                        "error": f"No journal entry found with reference '{reference}', amount {amount}, and company '{company_names[company_id]}'"
+                    }
+                elif move.get('state') == 'draft':
+                    results[index] = {
+                        "error": f"Journal entry {move['name']} is in draft state. Please post it first before marking as paid."
+                    }
+                else:
+                    found[index] = move
+
+        except xmlrpc.client.Fault as fault:
+            for index, _, _ in items:
+                results[index] = results[index] or {"error": f"XML-RPC Fault: {fault.faultString}"}
+        except Exception as e:
+            for index, _, _ in items:
+                results[index] = results[index] or {"error": f"Unexpected error: {str(e)}"}
+
+    move_ids = sorted({move['id'] for move in found.values()})
+    outcome = _write_in_groups(models, db, uid, password, 'account.move',
+                               {'paid': (move_ids, {'payment_state': 'paid'})}) if move_ids else {}
+
+    for index, move in found.items():
+        if outcome.get(move['id']):
+            results[index] = {"error": outcome[move['id']]}
+        else:
+            results[index] = _paid_result(entries[index], move, company_names[entry_company[index]])
+
+    print(f"✅ Bulk mark as paid: {len(move_ids)} of {len(entries)} entries in one write")
+    return results
+
+
 def mark_entry_as_paid(data):
     """
     Finds a journal entry by reference, amount, and company name, then marks it as paid.
@@ -309,6 +561,111 @@ def handle_bank_suspense_transaction(data):
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
     
 
+def handle_bank_suspense_transactions_bulk(entries):
+    """
+    Bulk handle_bank_suspense_transaction.
+
+    Connects once and, per company, looks up the Bank Suspense Account
+    once, resolves all references with one `ref in [...]` search and reads
+    every matched entry's move lines in one query. Only entries not yet
+    using the suspense account are updated. Returns one result per entry,
+    in the same shape as handle_bank_suspense_transaction.
+    """
+    results = [None] * len(entries)
+
+    try:
+        models, db, uid, password = get_odoo_connection()
+    except Exception as e:
+        return [{"success": False, "error": str(e)} for _ in entries]
+
+    companies_cache = {}
+    by_company = {}
+
+    for index, data in enumerate(entries):
+        try:
+            for field in ('amount', 'reference', 'date', 'account_name'):
+                if field not in data:
+                    raise KeyError(field)
+            if not data.get('company_name'):
+                results[index] = {"success": False, "error": "Company name is required"}
+                continue
+            company = _find_company(models, db, uid, password, data['company_name'], companies_cache)
+            if not company:
+                results[index] = {"success": False, "error": f"Company '{data['company_name']}' not found"}
+                continue
+            by_company.setdefault(company['id'], []).append(index)
+        except xmlrpc.client.Fault as fault:
+            results[index] = {"success": False, "error": f"XML-RPC Fault: {fault.faultString}"}
+        except Exception as e:
+            results[index] = {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+    company_names = {company['id']: company['name'] for company in companies_cache.values() if company}
+
+    for company_id, indexes in by_company.items():
+        suspense_account = find_or_create_bank_suspense_account(
+            models, db, uid, password, company_id, company_names[company_id]
+        )
+        if not suspense_account['success']:
+            for index in indexes:
+                results[index] = suspense_account
+            continue
+
+        lookups = []
+        for index in indexes:
+            try:
+                lookups.append((entries[index]['reference'], float(entries[index]['amount'])))
+            except (ValueError, TypeError):
+                lookups.append((entries[index]['reference'], None))
+
+        valid = [(index, lookup) for index, lookup in zip(indexes, lookups) if lookup[1] is not None]
+        for index, lookup in zip(indexes, lookups):
+            if lookup[1] is None:
+                results[index] = {"success": False, "error": f"Invalid amount: {entries[index]['amount']}"}
+
+        journal_entries = find_journal_entries_by_references(
+            models, db, uid, password, [lookup for _, lookup in valid], company_id
+        )
+
+        for (index, (reference, amount)), journal_entry in zip(valid, journal_entries):
+            data = entries[index]
+            if not journal_entry['success']:
+                results[index] = journal_entry
+                continue
+
+            move_lines = journal_entry['move_lines']
+            is_using_suspense = any(
+                line.get('account_id') and line['account_id'][0] == suspense_account['account_id']
+                for line in move_lines
+            )
+
+            if not is_using_suspense:
+                suspense_result = mark_as_suspense_transaction(
+                    models, db, uid, password, journal_entry['move_id'],
+                    suspense_account['account_id'], amount, company_id
+                )
+                if not suspense_result['success']:
+                    results[index] = suspense_result
+                    continue
+
+            partner_name = next(
+                (line['partner_id'][1] for line in move_lines if line.get('partner_id')),
+                "Unknown"
+            )
+
+            results[index] = {
+                "amount": data['amount'],
+                "description": data.get('description', ""),
+                "reference": reference,
+                "partner": data.get('partner', partner_name),
+                "company": company_names[company_id],
+                "date": data['date'],
+                "account_name": data['account_name']
+            }
+
+    print(f"✅ Bulk suspense handling: {len(entries)} entries across {len(by_company)} companies")
+    return results
+
+
 def find_or_create_bank_suspense_account(models, db, uid, password, company_id, company_name):
     """
     Find existing 'Bank Suspense Account' or create it if it doesn't exist
@@ -502,32 +859,7 @@ def find_journal_entry_by_reference_and_amount(models, db, uid, password, refere
                     "error": f"No journal entry found with reference: {reference} in company ID: {company_id}"
                 }
 
-        # Find the move that matches the amount (or closest match)
-        matching_move = None
-        for move in journal_moves:
-            # Prefer moves from the correct company
-            if move.get('company_id') and move['company_id'][0] == company_id:
-                if abs(move.get('amount_total', 0) - amount) < 0.01:
-                    matching_move = move
-                    break
-        
-        # If no exact company + amount match, try any move with matching amount
-        if not matching_move:
-            for move in journal_moves:
-                if abs(move.get('amount_total', 0) - amount) < 0.01:
-                    matching_move = move
-                    break
-        
-        # If still no match, take the first move from the correct company
-        if not matching_move:
-            for move in journal_moves:
-                if move.get('company_id') and move['company_id'][0] == company_id:
-                    matching_move = move
-                    break
-                    
-        # Last resort: take any move with the reference
-        if not matching_move:
-            matching_move = journal_moves[0]
+        matching_move = pick_matching_move(journal_moves, amount, company_id)
             
         # Get move lines for more details (company-specific)
         move_lines = models.execute_kw(
@@ -549,26 +881,124 @@ def find_journal_entry_by_reference_and_amount(models, db, uid, password, refere
                 {'fields': ['id', 'account_id', 'debit', 'credit', 'name', 'ref', 'company_id']}
             )
 
-        company_info = matching_move.get('company_id', [company_id, 'Unknown'])
-        return {
-            "success": True,
-            "move_id": matching_move['id'],
-            "reference": matching_move['ref'],
-            "amount_total": matching_move.get('amount_total', 0),
-            "state": matching_move.get('state'),
-            "move_type": matching_move.get('move_type'),
-            "date": matching_move.get('date'),
-            "company_id": company_info[0] if isinstance(company_info, list) else company_info,
-            "company_name": company_info[1] if isinstance(company_info, list) and len(company_info) > 1 else 'Unknown',
-            "move_lines": move_lines,
-            "move_lines_count": len(move_lines),
-            "message": f"Found journal entry {matching_move['ref']} with amount {matching_move.get('amount_total', 0)} in company {company_info[1] if isinstance(company_info, list) else 'Unknown'}"
-        }
+        return journal_entry_result(matching_move, move_lines, company_id)
 
     except Exception as e:
         return {"success": False, "error": f"Error finding journal entry: {str(e)}"}
 
 
+def pick_matching_move(journal_moves, amount, company_id):
+    """
+    Choose the move for a reference: same company and amount first, then
+    any company with the amount, then the company's first move, then any.
+    """
+    # Prefer moves from the correct company
+    for move in journal_moves:
+        if move.get('company_id') and move['company_id'][0] == company_id:
+            if abs(move.get('amount_total', 0) - amount) < 0.01:
+                return move
+
+    # If no exact company + amount match, try any move with matching amount
+    for move in journal_moves:
+        if abs(move.get('amount_total', 0) - amount) < 0.01:
+            return move
+
+    # If still no match, take the first move from the correct company
+    for move in journal_moves:
+        if move.get('company_id') and move['company_id'][0] == company_id:
+            return move
+
+    # Last resort: take any move with the reference
+    return journal_moves[0]
+
+
+def journal_entry_result(matching_move, move_lines, company_id):
+    """Result shape of find_journal_entry_by_reference_and_amount"""
+    company_info = matching_move.get('company_id', [company_id, 'Unknown'])
+    return {
+        "success": True,
+        "move_id": matching_move['id'],
+        "reference": matching_move['ref'],
+        "amount_total": matching_move.get('amount_total', 0),
+        "state": matching_move.get('state'),
+        "move_type": matching_move.get('move_type'),
+        "date": matching_move.get('date'),
+        "company_id": company_info[0] if isinstance(company_info, list) else company_info,
+        "company_name": company_info[1] if isinstance(company_info, list) and len(company_info) > 1 else 'Unknown',
+        "move_lines": move_lines,
+        "move_lines_count": len(move_lines),
+        "message": f"Found journal entry {matching_move['ref']} with amount {matching_move.get('amount_total', 0)} in company {company_info[1] if isinstance(company_info, list) else 'Unknown'}"
+    }
+
+
+def find_journal_entries_by_references(models, db, uid, password, lookups, company_id):
+    """
+    Bulk find_journal_entry_by_reference_and_amount.
+
+    lookups is a list of (reference, amount). All references are resolved
+    with one `ref in [...]` search (plus one without the company filter for
+    references not found in the company) and the move lines of every match
+    are read in one query. Returns one result per lookup, in order, shaped
+    like find_journal_entry_by_reference_and_amount's.
+    """
+    try:
+        move_fields = ['id', 'ref', 'amount_total', 'state', 'move_type', 'date', 'company_id']
+        references = sorted({reference for reference, _ in lookups})
+
+        moves_by_ref = {}
+        for move in models.execute_kw(
+            db, uid, password,
+            'account.move', 'search_read',
+            [[('ref', 'in', references), ('company_id', '=', company_id)]],
+            {'fields': move_fields}
+        ):
+            moves_by_ref.setdefault(move['ref'], []).append(move)
+
+        # Try without company filter as fallback
+        missing = [reference for reference in references if reference not in moves_by_ref]
+        if missing:
+            for move in models.execute_kw(
+                db, uid, password,
+                'account.move', 'search_read',
+                [[('ref', 'in', missing)]],
+                {'fields': move_fields}
+            ):
+                moves_by_ref.setdefault(move['ref'], []).append(move)
+
+        matches = []
+        for reference, amount in lookups:
+            journal_moves = moves_by_ref.get(reference)
+            matches.append(pick_matching_move(journal_moves, amount, company_id) if journal_moves else None)
+
+        move_ids = sorted({move['id'] for move in matches if move})
+        lines_by_move = {}
+        if move_ids:
+            for line in models.execute_kw(
+                db, uid, password,
+                'account.move.line', 'search_read',
+                [[('move_id', 'in', move_ids)]],
+                {'fields': ['id', 'move_id', 'account_id', 'debit', 'credit', 'name', 'ref', 'company_id', 'partner_id']}
+            ):
+                lines_by_move.setdefault(line['move_id'][0], []).append(line)
+
+        results = []
+        for (reference, _), move in zip(lookups, matches):
+            if move is None:
+                results.append({
+                    "success": False,
+                    "error": f"No journal entry found with reference: {reference} in company ID: {company_id}"
+                })
+                continue
+            all_lines = lines_by_move.get(move['id'], [])
+            # Company-specific lines first, all lines of the move otherwise
+            company_lines = [line for line in all_lines if line.get('company_id') and line['company_id'][0] == company_id]
+            results.append(journal_entry_result(move, company_lines or all_lines, company_id))
+        return results
+
+    except Exception as e:
+        return [{"success": False, "error": f"Error finding journal entry: {str(e)}"} for _ in lookups]
+
+
 def check_if_already_using_suspense_account(models, db, uid, password, move_id, suspense_account_id, company_id):
     """
     Check if the journal entry already has move lines using the Bank Suspense Account
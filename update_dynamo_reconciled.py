@@ -1,10 +1,10 @@
-import boto3
+import aws_clients
 from botocore.exceptions import ClientError
 
 # ----------------------------------------------------
 # DynamoDB setup
 # ----------------------------------------------------
-dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')
+dynamodb = aws_clients.resource('dynamodb', region_name='eu-north-1')
 
 bills_table = dynamodb.Table('bills')
 invoices_table = dynamodb.Table('invoices')
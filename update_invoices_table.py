@@ -1,10 +1,10 @@
-import boto3
+import aws_clients
 from datetime import datetime
 from botocore.exceptions import ClientError
 from decimal import Decimal
 
 # DynamoDB setup
-dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')
+dynamodb = aws_clients.resource('dynamodb', region_name='eu-north-1')
 invoices_table = dynamodb.Table('invoices')
 
 def convert_to_decimal(obj):
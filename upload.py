@@ -1,15 +1,20 @@
 import requests
 import boto3
+import aws_clients
 from datetime import datetime
 from botocore.exceptions import ClientError
 from decimal import Decimal
 import os
 import uuid
 import json
+import batch_files
+import dashboard_counters
+import user_cache
+import company_contexts
 
 # DynamoDB setup
 AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
 batch_table = dynamodb.Table('batch_processing')
 users_table = dynamodb.Table('users')
 
@@ -102,16 +107,15 @@ def sanitize_for_dynamodb(data):
 def get_financial_profile(username):
     """Retrieve user's financial profile"""
     try:
-        response = users_table.get_item(Key={'username': username})
+        user = user_cache.get_user(username)
         
-        if 'Item' not in response:
+        if user is None:
             return {
                 "exists": False,
                 "upload_ready": False,
                 "is_vat_registered": False
             }
         
-        user = response['Item']
         user = convert_decimal(user)
         
         # Get VAT registration status
@@ -273,14 +277,13 @@ def update_financial_profile(username, data):
     """Update user's financial profile in DynamoDB"""
     try:
         # First get the user's VAT registration status
-        user_response = users_table.get_item(Key={'username': username})
-        if 'Item' not in user_response:
+        user = user_cache.get_user(username)
+        if user is None:
             return {
                 "success": False,
                 "error": "User not found"
             }
-        
-        user = user_response['Item']
+
         is_vat_registered = user.get('is_vat_registered')
         
         # Convert string to boolean if needed
@@ -376,6 +379,8 @@ def update_financial_profile(username, data):
             ExpressionAttributeValues=expression_values,
             ExpressionAttributeNames=expression_names if expression_names else None
         )
+        user_cache.invalidate_user(username)
+        company_contexts.invalidate_company_context(user.get('company_name'))
         
         print(f"Financial profile updated for user: {username}")
         print(f"Stored data structure:")
@@ -407,15 +412,21 @@ def update_financial_profile(username, data):
 def check_upload_ready(username):
     """Check if user has completed financial profile and can upload"""
     try:
-        response = users_table.get_item(Key={'username': username})
+        # Read through, not from user_cache: the profile is often completed
+        # on another worker moments before the upload, and a cached copy
+        # would still say not ready
+        user = users_table.get_item(
+            Key={'username': username},
+            ProjectionExpression='username, upload_ready, tax_information, payroll_information, '
+                                 'banking_information, business_operations'
+        ).get('Item')
         
-        if 'Item' not in response:
+        if user is None:
             return {
                 "upload_ready": False,
                 "missing_fields": ["User not found"]
             }
-        
-        user = response['Item']
+
         upload_ready = user.get('upload_ready', False)
         
         if upload_ready:
@@ -487,7 +498,13 @@ def create_batch(username, company_name, email, files_list):
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        batch_table.put_item(Item=batch_data)
+        # Files are stored keyed by file_id so each one can be updated in place
+        batch_table.put_item(Item=dict(
+            batch_data,
+            files=batch_files.files_to_map(files_data),
+            status_counts=batch_files.status_counts(files_data)
+        ))
+        dashboard_counters.record_batch_created(batch_data)
         
         print(f"Batch created: {batch_id} with {len(files_list)} files")
         
@@ -541,7 +558,7 @@ def get_user_batches(username):
         )
         
         batches = response.get('Items', [])
-        batches = convert_decimal(batches)
+        batches = [batch_files.with_files_as_list(batch) for batch in convert_decimal(batches)]
         
         # Sort by created_at descending (newest first)
         batches.sort(key=lambda x: x.get('created_at', ''), reverse=True)
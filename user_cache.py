@@ -0,0 +1,119 @@
+import aws_clients
+import copy
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+# Configuration
+AWS_REGION = os.getenv('AWS_REGION', 'eu-north-1')
+
+# DynamoDB setup
+dynamodb = aws_clients.resource('dynamodb', region_name=AWS_REGION)
+users_table = dynamodb.Table('users')
+
+# Short TTLs: other workers' profile updates become visible within seconds
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '30'))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '300'))
+MAX_ENTRIES = 10000
+
+_users = {}
+_tokens = {}
+_lock = threading.Lock()
+
+
+def _request_cache():
+    """Per-request dict on flask.g, or None outside a request"""
+    try:
+        from flask import g, has_app_context
+    except ImportError:
+        return None
+    if not has_app_context():
+        return None
+    if not hasattr(g, '_user_cache'):
+        g._user_cache = {}
+    return g._user_cache
+
+
+def _evict(cache):
+    now = time.time()
+    for key in [key for key, (expires_at, _) in cache.items() if expires_at <= now]:
+        del cache[key]
+    while len(cache) >= MAX_ENTRIES:
+        cache.pop(next(iter(cache)))
+
+
+def get_user(username):
+    """
+    Return the users-table item for username, or None if there is none.
+
+    Looks in the current request first, then in a short-TTL process
+    cache, and only then reads DynamoDB. Callers get their own copy and
+    may modify it freely.
+    """
+    if not username:
+        return None
+
+    request_cache = _request_cache()
+    if request_cache is not None and username in request_cache:
+        return copy.deepcopy(request_cache[username])
+
+    now = time.time()
+    with _lock:
+        entry = _users.get(username)
+    if entry and entry[0] > now:
+        user = entry[1]
+    else:
+        user = users_table.get_item(Key={'username': username}).get('Item')
+        with _lock:
+            if len(_users) >= MAX_ENTRIES:
+                _evict(_users)
+            _users[username] = (now + USER_CACHE_TTL, user)
+
+    if request_cache is not None:
+        request_cache[username] = user
+    return copy.deepcopy(user)
+
+
+def invalidate_user(username):
+    """Forget a user's cached profile and tokens after it changed"""
+    with _lock:
+        _users.pop(username, None)
+        for key in [key for key, (_, payload) in _tokens.items() if payload.get('username') == username]:
+            del _tokens[key]
+
+    request_cache = _request_cache()
+    if request_cache is not None:
+        request_cache.pop(username, None)
+
+
+def verify_token(token, verify):
+    """
+    Verify a JWT through `verify` (auth.verify_jwt), caching valid payloads.
+
+    A cached payload is never served past the token's own exp claim, so
+    expiry is enforced exactly as if the token were decoded each time.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+
+    with _lock:
+        entry = _tokens.get(key)
+    if entry and entry[0] > now:
+        return {"valid": True, "payload": dict(entry[1])}
+
+    verification = verify(token)
+    if verification.get('valid'):
+        payload = verification['payload']
+        expires_at = now + TOKEN_CACHE_TTL
+        if payload.get('exp'):
+            exp = payload['exp']
+            exp = exp.timestamp() if isinstance(exp, datetime) else float(exp)
+            expires_at = min(expires_at, exp)
+        with _lock:
+            if len(_tokens) >= MAX_ENTRIES:
+                _evict(_tokens)
+            _tokens[key] = (expires_at, dict(payload))
+
+    return verification
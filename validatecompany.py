@@ -6,7 +6,7 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.keys import Keys
@@ -14,6 +14,10 @@ from selenium.webdriver.common.action_chains import ActionChains
 from bs4 import BeautifulSoup
 import os
 import logging
+import browser_pool
+import registry_cache
+import registry_http
+import requests
 
 # ============================================================================
 # CYPRUS COMPANY REGISTRY - NAME AND REGISTRATION PROCESSING FUNCTIONS
@@ -173,32 +177,41 @@ def translate_text_google(text, target_language='en', source_language='el'):
         target_language (str): Target language code (default: 'en')
         source_language (str): Source language code (default: 'el' for Greek)
     Returns:
-        str: Translated text or original text if translation fails
+        str: Translated text, the local transliteration of Greek text, or the
+        original text if translation fails
     """
+    if not text:
+        return ''
+    
+    # Greek → English only makes sense for text that contains Greek letters;
+    # checking locally replaces googletrans' detection round trip
+    if target_language == 'en' and not registry_cache.contains_greek(text):
+        return text.strip().upper()
+    
+    cache_key = f"{source_language}:{target_language}:{text}"
+    cached = registry_cache.get('translation', cache_key)
+    if cached is not None:
+        print(f"Translation (cached): '{text}' -> '{cached}'")
+        return cached
+    
+    fallback = registry_cache.transliterate_greek(text) if target_language == 'en' else text.strip().upper()
+    
     try:
         from googletrans import Translator
         translator = Translator()
         
-        # Detect language first
-        detection = translator.detect(text)
-        print(f"Detected language: {detection.lang} (confidence: {detection.confidence})")
-        
-        # Only translate if source is different from target
-        if detection.lang != target_language:
-            result = translator.translate(text, src=source_language, dest=target_language)
-            translated = result.text.strip().upper()
-            print(f"Translation: '{text}' -> '{translated}'")
-            return translated
-        else:
-            print(f"Text already in target language: {text}")
-            return text.strip().upper()
+        result = translator.translate(text, src=source_language, dest=target_language)
+        translated = result.text.strip().upper()
+        print(f"Translation: '{text}' -> '{translated}'")
+        registry_cache.put('translation', cache_key, translated, registry_cache.TRANSLATION_TTL_SECONDS)
+        return translated
             
     except ImportError:
         print("googletrans library not installed. Install with: pip install googletrans==4.0.0-rc1")
-        return text.strip().upper()
+        return fallback
     except Exception as e:
         print(f"Translation failed: {e}")
-        return text.strip().upper()
+        return fallback
 
 # ============================================================================
 # HTML PARSING FUNCTIONS
@@ -410,6 +423,39 @@ def parse_directors_data(html_content):
 # ENHANCED DIRECTOR VALIDATION WITH GOOGLE TRANSLATE
 # ============================================================================
 
+def extract_directors_from_text(page_text):
+    """Regex fallback for director names in the visible text of a company page"""
+    # Enhanced director name patterns (both English and Greek)
+    director_patterns = [
+        r'(?:Director|Διευθυντής|Board Member|Μέλος Διοικητικού)\s*:?\s*([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω\s\.]+)',
+        r'([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+\s+[A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+)(?:\s*-\s*(?:Director|Διευθυντής))',
+        r'Name\s*:?\s*([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω\s\.]+)',
+        r'Όνομα\s*:?\s*([Α-Ω][Α-Ωα-ω\s\.]+)',
+        # Look for capitalized names (common format)
+        r'\b([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+\s+[A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+(?:\s+[A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+)?)\b'
+    ]
+
+    potential_directors = set()
+    for pattern in director_patterns:
+        matches = re.findall(pattern, page_text, re.MULTILINE)
+        for match in matches:
+            name = match.strip()
+            # Filter out common false positives
+            exclude_terms = [
+                'Cyprus', 'Company', 'Registration', 'Search', 'Details', 'Information',
+                'Date', 'Status', 'Address', 'Email', 'Phone', 'Website', 'Limited',
+                'Ltd', 'Corporation', 'Corp', 'Public', 'Private'
+            ]
+
+            if (len(name.split()) >= 2 and 
+                len(name) > 5 and 
+                not any(term.lower() in name.lower() for term in exclude_terms) and
+                any(c.isalpha() for c in name)):
+                potential_directors.add(process_director_name(name))
+    
+    return potential_directors
+
+
 def validate_director_with_translation(director_name, directors_list):
     """
     Advanced director validation with Google Translate for Greek/English matching
@@ -450,7 +496,26 @@ def validate_director_with_translation(director_name, directors_list):
             print(f"CASE INSENSITIVE MATCH found: {director}")
             return validation_result
     
-    # Strategy 3: Google Translate each director name to English
+    # Strategy 3: Local Greek → Latin transliteration (no network)
+    for director in directors_list:
+        if not registry_cache.contains_greek(director):
+            continue
+        transliterated = registry_cache.transliterate_greek(director)
+        validation_result["translation_attempts"].append({
+            "original": director,
+            "transliterated": transliterated
+        })
+        if processed_director == transliterated or (
+            len(processed_director.split()) >= 2 and
+            sorted(processed_director.split()) == sorted(transliterated.split())
+        ):
+            validation_result["director_valid"] = True
+            validation_result["matched_name"] = director
+            validation_result["match_method"] = "transliteration_match"
+            print(f"TRANSLITERATION MATCH: '{director}' -> '{transliterated}'")
+            return validation_result
+    
+    # Strategy 4: Google Translate each director name to English
     print("Attempting Google Translate for director names...")
     
     for director in directors_list:
@@ -495,7 +560,7 @@ def validate_director_with_translation(director_name, directors_list):
             print(f"Translation failed for '{director}': {e}")
             continue
     
-    # Strategy 4: Translate search name to Greek and compare
+    # Strategy 5: Translate search name to Greek and compare
     print("Translating search name to Greek...")
     try:
         translated_search_name = translate_text_google(processed_director, target_language='el', source_language='en')
@@ -526,7 +591,7 @@ def validate_director_with_translation(director_name, directors_list):
     except Exception as e:
         print(f"English to Greek translation failed: {e}")
     
-    # Strategy 5: Phonetic/fuzzy matching
+    # Strategy 6: Phonetic/fuzzy matching
     print("Attempting fuzzy matching...")
     try:
         from difflib import SequenceMatcher
@@ -541,10 +606,14 @@ def validate_director_with_translation(director_name, directors_list):
                 best_match_ratio = ratio
                 best_match_director = director
             
-            # Try comparison with translated version if available
+            # Try comparison with translated/transliterated versions if available
             for attempt in validation_result["translation_attempts"]:
-                if attempt["original"] == director and "translated" in attempt:
-                    translated_ratio = SequenceMatcher(None, processed_director, attempt["translated"]).ratio()
+                if attempt["original"] != director:
+                    continue
+                for candidate in (attempt.get("translated"), attempt.get("transliterated")):
+                    if not candidate:
+                        continue
+                    translated_ratio = SequenceMatcher(None, processed_director, candidate).ratio()
                     if translated_ratio > best_match_ratio:
                         best_match_ratio = translated_ratio
                         best_match_director = director
@@ -574,6 +643,30 @@ def validate_director(director_name, directors_list):
 # ENHANCED CHROME TRANSLATE FUNCTIONS
 # ============================================================================
 
+def apply_director_validation(search_response, director_name, directors_result):
+    """Validate the director against the parsed directors and record the outcome"""
+    # Validate director with Google Translate
+    print("Starting enhanced director validation with Google Translate...")
+    director_validation = validate_director_with_translation(director_name, directors_result.get('directors', []))
+    search_response["director_validation"] = director_validation
+    search_response["director_valid"] = director_validation["director_valid"]
+
+    if director_validation["director_valid"]:
+        print(f"Director validation SUCCESSFUL!")
+        print(f"   Method: {director_validation['match_method']}")
+        print(f"   Matched: {director_validation['matched_name']}")
+    else:
+        print(f"Director validation FAILED")
+        print(f"   Search name: {director_validation['processed_director_name']}")
+        print(f"   Found directors: {director_validation['directors_found']}")
+
+        # If no directors found, add helpful error message
+        if not directors_result.get('directors'):
+            search_response["errors"].append("No director information found on the company page")
+        else:
+            search_response["errors"].append(f"Director '{director_name}' not found among listed directors")
+
+
 def enhanced_trigger_translate(driver):
     """
     Enhanced translation trigger with multiple strategies
@@ -612,7 +705,7 @@ def enhanced_trigger_translate(driver):
                     } catch(e) {}
                 }
             """)
-            time.sleep(3)
+            wait_for_page_ready(driver, timeout=3)
             print("JavaScript translation triggers executed")
         except Exception as e:
             print(f"JavaScript translate failed: {e}")
@@ -634,7 +727,7 @@ def enhanced_trigger_translate(driver):
                 for elem in translate_elems:
                     if elem.is_displayed() and elem.is_enabled():
                         elem.click()
-                        time.sleep(2)
+                        wait_for_page_ready(driver, timeout=2)
                         print(f"Translation triggered via {selector}")
                         break
             except Exception as e:
@@ -647,7 +740,7 @@ def enhanced_trigger_translate(driver):
             for option in english_options:
                 if option.is_displayed():
                     option.click()
-                    time.sleep(2)
+                    wait_for_page_ready(driver, timeout=2)
                     print("English selected from translate dropdown")
                     break
         except:
@@ -659,8 +752,8 @@ def enhanced_trigger_translate(driver):
             greek_chars = sum(1 for char in page_text if char in "ΑΒΓΔΕΖΗΘΙΚΛΜΝΞΟΠΡΣΤΥΦΧΨΩαβγδεζηθικλμνξοπρστυφχψω")
             if greek_chars > 10:
                 print(f"Greek text detected ({greek_chars} characters) - Chrome should offer translation")
-                # Add extra delay for Chrome to auto-detect and offer translation
-                time.sleep(5)
+                # Give Chrome a moment to auto-detect and offer translation
+                wait_for_page_ready(driver, timeout=2)
                 
                 # Try to trigger the translate bar
                 driver.execute_script("""
@@ -674,7 +767,7 @@ def enhanced_trigger_translate(driver):
                         }
                     }, 1000);
                 """)
-                time.sleep(3)
+                wait_for_page_ready(driver, timeout=2)
             else:
                 print("No significant Greek text detected")
         except Exception as e:
@@ -684,7 +777,7 @@ def enhanced_trigger_translate(driver):
         try:
             actions = ActionChains(driver)
             actions.key_down(Keys.CONTROL).key_down(Keys.SHIFT).send_keys('t').key_up(Keys.SHIFT).key_up(Keys.CONTROL).perform()
-            time.sleep(2)
+            wait_for_page_ready(driver, timeout=2)
             print("Translation keyboard shortcut attempted")
         except:
             pass
@@ -698,10 +791,11 @@ def enhanced_trigger_translate(driver):
 # MAIN SEARCH FUNCTIONS
 # ============================================================================
 
-def search_cyprus_company_with_selenium(reg_number, company_name, director_name):
-    """
-    Perform the actual Cyprus company registry search with enhanced director validation using Selenium
-    """
+SEARCH_FORM_URL = "https://efiling.drcor.mcit.gov.cy/DrcorPublic/SearchForm.aspx?sc=0&lang=en"
+
+
+def create_chrome_driver():
+    """Launch a headless Chrome configured for the eFiling site"""
     chrome_options = Options()
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
@@ -726,335 +820,444 @@ def search_cyprus_company_with_selenium(reg_number, company_name, director_name)
     # Add user agent to avoid detection
     chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
     
-    driver = webdriver.Chrome(options=chrome_options)
-    
+    return webdriver.Chrome(options=chrome_options)
+
+
+def warm_browser_pool():
+    """Pre-launch the registry browsers so the first validations skip Chrome startup"""
+    return browser_pool.get_browser_pool(create_chrome_driver).warm()
+
+
+def wait_for_page_ready(driver, timeout=10):
+    """Wait for the current document (including ASP.NET postbacks) to finish loading"""
     try:
-        # Navigate to the webpage (English version)
-        print("Navigating to Cyprus eFiling website (English)...")
-        driver.get("https://efiling.drcor.mcit.gov.cy/DrcorPublic/SearchForm.aspx?sc=0&lang=en")
-        
-        # Wait for page to load
-        wait = WebDriverWait(driver, 15)
-        
-        # Fill registration number field
-        print(f"Filling registration number: {reg_number}")
-        reg_number_field = wait.until(
-            EC.presence_of_element_located((By.ID, "ctl00_cphMyMasterCentral_ucSearch_txtNumber"))
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
         )
-        reg_number_field.clear()
-        reg_number_field.send_keys(reg_number)
+    except TimeoutException:
+        print(f"Page still loading after {timeout}s - continuing")
+
+
+def page_mentions_directors(driver):
+    page_source = driver.page_source.lower()
+    return 'directors' in page_source or 'διευθυντές' in page_source
+
+
+def search_cyprus_company_over_http(reg_number, company_name, director_name):
+    """
+    Perform the registry search by replaying the eFiling form postbacks over HTTP
+    
+    Feeds the returned HTML straight into parse_company_data and
+    parse_directors_data. Raises registry_http.RegistryHttpError (or a
+    requests error) when the pages can't be replayed, so the caller can fall
+    back to the browser.
+    """
+    client = registry_http.get_registry_client()
+    
+    print("Searching Cyprus eFiling over HTTP...")
+    results_html, results_url = client.search(reg_number, company_name)
+    company_search_result = parse_company_data(results_html)
+    
+    search_response = {
+        "success": False,
+        "overall_valid": False,
+        "director_valid": False,
+        "company_search": company_search_result,
+        "director_validation": {},
+        "search_url": results_url,
+        "errors": []
+    }
+    
+    if not company_search_result["success"]:
+        search_response["errors"] = company_search_result.get("errors", [])
+        search_response["errors"].append("Company search failed - no valid results found")
+        return search_response
+    
+    search_response["overall_valid"] = True
+    search_response["success"] = True
+    
+    details_html, details_url = client.open_first_result(results_html, results_url)
+    directors_html, _ = client.open_directors(details_html, details_url)
+    
+    directors_result = parse_directors_data(directors_html)
+    if not directors_result.get('directors'):
+        page_text = BeautifulSoup(directors_html, 'html.parser').get_text('\n')
+        potential_directors = extract_directors_from_text(page_text)
+        if potential_directors:
+            directors_result['directors'].extend(list(potential_directors))
+            directors_result['success'] = True
+    
+    if not directors_result.get('directors'):
+        # The browser path can still trigger translation and click through tabs
+        raise registry_http.RegistryHttpError('No directors found in HTTP response')
+    
+    print(f"   Found {len(directors_result['directors'])} directors over HTTP: {directors_result['directors']}")
+    apply_director_validation(search_response, director_name, directors_result)
+    return search_response
+
+
+def search_cyprus_company(reg_number, company_name, director_name):
+    """
+    Search the registry, reusing a cached lookup of the same search
+    
+    Only the registry data (company search and directors list) is cached,
+    keyed on the registration number and company name searched, so a hit
+    stands for the same search; the director check always runs against
+    the name in the current request. Misses search over HTTP first and
+    fall back to the pooled browser.
+    """
+    cache_key = f"{reg_number}#{company_name or ''}"
+    cached = registry_cache.get('registry', cache_key) if reg_number else None
+    if cached:
+        print(f"Using cached registry lookup for {reg_number}")
+        company_found = bool(cached["company_search"].get("success"))
+        result = {
+            "success": company_found,
+            "overall_valid": company_found,
+            "director_valid": False,
+            "company_search": cached["company_search"],
+            "director_validation": {},
+            "search_url": cached.get("search_url"),
+            "errors": [],
+            "search_method": "cache"
+        }
+        apply_director_validation(result, director_name, {"directors": cached["directors"]})
+        return result
+    
+    result = None
+    if os.getenv('REGISTRY_HTTP_ENABLED', 'true').lower() == 'true':
+        started = time.time()
+        try:
+            result = search_cyprus_company_over_http(reg_number, company_name, director_name)
+            result["search_method"] = "http"
+            print(f"HTTP registry search finished in {time.time() - started:.2f}s")
+        except (registry_http.RegistryHttpError, requests.RequestException) as e:
+            print(f"HTTP registry search unavailable ({e}) - falling back to Selenium")
+    
+    if result is None:
+        result = search_cyprus_company_with_selenium(reg_number, company_name, director_name)
+        result["search_method"] = "selenium"
+    
+    # Cache only complete lookups so a failed scrape is retried next time
+    directors = (result.get("director_validation") or {}).get("directors_found")
+    if reg_number and result.get("overall_valid") and directors:
+        registry_cache.put('registry', cache_key, {
+            "company_search": result["company_search"],
+            "directors": directors,
+            "search_url": result.get("search_url")
+        }, registry_cache.REGISTRY_TTL_SECONDS)
+    
+    return result
+
+
+def search_cyprus_company_with_selenium(reg_number, company_name, director_name):
+    """
+    Perform the actual Cyprus company registry search with enhanced director validation using Selenium
+    
+    Uses a browser checked out from the shared pool instead of launching Chrome per call.
+    """
+    try:
+        pool = browser_pool.get_browser_pool(create_chrome_driver)
+        with pool.session() as driver:
+            return search_cyprus_company_in_browser(driver, reg_number, company_name, director_name)
+    except browser_pool.BrowserPoolExhausted as e:
+        return {
+            "success": False,
+            "overall_valid": False,
+            "director_valid": False,
+            "error": f"Registry search is busy: {str(e)}",
+            "errors": [f"Registry search is busy: {str(e)}"]
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "overall_valid": False,
+            "director_valid": False,
+            "error": f"Search failed: {str(e)}",
+            "errors": [f"Critical error: {str(e)}"]
+        }
+
+def search_cyprus_company_in_browser(driver, reg_number, company_name, director_name):
+    """
+    Run the registry search and directors lookup in an already open browser
+    
+    Driver errors are left to propagate so the pool discards the session.
+    """
+    # Navigate to the webpage (English version)
+    print("Navigating to Cyprus eFiling website (English)...")
+    driver.get(SEARCH_FORM_URL)
+    
+    # Wait for page to load
+    wait = WebDriverWait(driver, 15)
+    
+    # Fill registration number field
+    print(f"Filling registration number: {reg_number}")
+    reg_number_field = wait.until(
+        EC.presence_of_element_located((By.ID, "ctl00_cphMyMasterCentral_ucSearch_txtNumber"))
+    )
+    reg_number_field.clear()
+    reg_number_field.send_keys(reg_number)
+    
+    # Fill name field
+    print(f"Filling company name: {company_name}")
+    name_field = driver.find_element(By.ID, "ctl00_cphMyMasterCentral_ucSearch_txtName")
+    name_field.clear()
+    name_field.send_keys(company_name)
+    
+    # Click the Go button
+    print("Clicking search button...")
+    go_button = driver.find_element(By.XPATH, "//*[@id='ctl00_cphMyMasterCentral_ucSearch_lbtnSearch']")
+    go_button.click()
+    
+    # Wait for the postback to replace the form: either a results row,
+    # a registry message or a new URL
+    print("Waiting for search results...")
+    try:
+        wait.until(lambda driver: (
+            driver.current_url != SEARCH_FORM_URL
+            or driver.find_elements(By.CSS_SELECTOR, "tr.basket, tr[class*='basket']")
+            or driver.find_elements(By.CSS_SELECTOR, "#ctl00_cphMyMasterCentral_lblMessage")
+            and driver.find_element(By.CSS_SELECTOR, "#ctl00_cphMyMasterCentral_lblMessage").text.strip()
+        ))
+    except TimeoutException:
+        print("Page didn't change - checking for results on same page...")
+    wait_for_page_ready(driver)
+    
+    # Get the company search results
+    html_response = driver.page_source
+    company_search_result = parse_company_data(html_response)
+    
+    search_response = {
+        "success": False,
+        "overall_valid": False,
+        "director_valid": False,
+        "company_search": company_search_result,
+        "director_validation": {},
+        "search_url": driver.current_url,
+        "errors": []
+    }
+    
+    # Check if company search was successful
+    if not company_search_result["success"]:
+        search_response["errors"] = company_search_result.get("errors", [])
+        search_response["errors"].append("Company search failed - no valid results found")
+        search_response["overall_valid"] = False
+        return search_response
+    
+    # Company found - set overall_valid to True
+    search_response["overall_valid"] = True
+    search_response["success"] = True
+    
+    # Try to click on the first result and navigate to directors page
+    try:
+        print("Company found! Navigating to details page...")
         
-        # Fill name field
-        print(f"Filling company name: {company_name}")
-        name_field = driver.find_element(By.ID, "ctl00_cphMyMasterCentral_ucSearch_txtName")
-        name_field.clear()
-        name_field.send_keys(company_name)
+        # Look for the results table row with multiple fallback selectors
+        result_selectors = [
+            "tr.basket",
+            "tr[class*='basket']", 
+            ".CompanyDetails a",
+            "table tr td a",
+            "tr td:first-child"
+        ]
         
-        # Click the Go button
-        print("Clicking search button...")
-        go_button = driver.find_element(By.XPATH, "//*[@id='ctl00_cphMyMasterCentral_ucSearch_lbtnSearch']")
-        go_button.click()
+        result_clicked = False
+        for selector in result_selectors:
+            try:
+                result_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                if result_elements:
+                    result_element = result_elements[0]  # Click first result
+                    driver.execute_script("arguments[0].click();", result_element)
+                    result_clicked = True
+                    print(f"Clicked search result using selector: {selector}")
+                    break
+            except Exception as e:
+                print(f"Selector {selector} failed: {e}")
+                continue
         
-        # Wait for results to load
-        print("Waiting for search results...")
-        time.sleep(5)
+        if not result_clicked:
+            search_response["errors"].append("Could not click on search results")
+            search_response["director_validation"] = {
+                "error": "Could not access company details page",
+                "director_valid": False
+            }
+            return search_response
         
-        # Wait for the page to change or results to appear
         try:
-            wait.until(lambda driver: driver.current_url != "https://efiling.drcor.mcit.gov.cy/DrcorPublic/SearchForm.aspx?sc=0&lang=en")
+            WebDriverWait(driver, 10).until(EC.staleness_of(result_element))
         except TimeoutException:
-            print("Page didn't change - checking for results on same page...")
+            print("Results row still present - details may have opened in place")
+        wait_for_page_ready(driver)
         
-        # Get the company search results
-        html_response = driver.page_source
-        company_search_result = parse_company_data(html_response)
+        # Enhanced directors tab navigation with page inspection
+        print("Looking for directors tab...")
         
-        search_response = {
-            "success": False,
-            "overall_valid": False,
-            "director_valid": False,
-            "company_search": company_search_result,
-            "director_validation": {},
-            "search_url": driver.current_url,
-            "errors": []
-        }
+        # Get all clickable elements
+        all_links = driver.find_elements(By.TAG_NAME, "a")
+        all_buttons = driver.find_elements(By.TAG_NAME, "button")
+        all_inputs = driver.find_elements(By.CSS_SELECTOR, "input[type='button'], input[type='submit']")
+        all_spans = driver.find_elements(By.TAG_NAME, "span")
+        all_divs = driver.find_elements(By.CSS_SELECTOR, "div[onclick], div[class*='tab'], div[id*='tab']")
         
-        # Check if company search was successful
-        if not company_search_result["success"]:
-            search_response["errors"] = company_search_result.get("errors", [])
-            search_response["errors"].append("Company search failed - no valid results found")
-            search_response["overall_valid"] = False
-            return search_response
+        # Look for directors-related text in all elements
+        directors_keywords = ['directors', 'διευθυντές', 'director', 'διευθυντής', 'board', 'officers']
+        potential_directors_elements = []
         
-        # Company found - set overall_valid to True
-        search_response["overall_valid"] = True
-        search_response["success"] = True
+        all_elements = all_links + all_buttons + all_inputs + all_spans + all_divs
         
-        # Try to click on the first result and navigate to directors page
-        try:
-            print("Company found! Navigating to details page...")
-            
-            # Look for the results table row with multiple fallback selectors
-            result_selectors = [
-                "tr.basket",
-                "tr[class*='basket']", 
-                ".CompanyDetails a",
-                "table tr td a",
-                "tr td:first-child"
-            ]
+        for element in all_elements:
+            try:
+                element_text = element.text.lower().strip()
+                element_id = element.get_attribute('id') or ''
+                element_class = element.get_attribute('class') or ''
+                element_onclick = element.get_attribute('onclick') or ''
+                
+                # Check if element contains directors-related keywords
+                if any(keyword in element_text for keyword in directors_keywords) or \
+                   any(keyword in element_id.lower() for keyword in directors_keywords) or \
+                   any(keyword in element_class.lower() for keyword in directors_keywords) or \
+                   any(keyword in element_onclick.lower() for keyword in directors_keywords):
+                    
+                    potential_directors_elements.append({
+                        'element': element,
+                        'text': element_text,
+                        'id': element_id,
+                        'class': element_class,
+                        'onclick': element_onclick,
+                        'tag': element.tag_name
+                    })
+                    
+            except Exception as e:
+                continue
+        
+        # Try to click on potential directors elements
+        directors_tab_clicked = False
+        
+        if potential_directors_elements:
+            print(f"Found {len(potential_directors_elements)} potential directors elements")
             
-            result_clicked = False
-            for selector in result_selectors:
+            for i, elem_info in enumerate(potential_directors_elements):
                 try:
-                    result_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if result_elements:
-                        result_element = result_elements[0]  # Click first result
-                        driver.execute_script("arguments[0].click();", result_element)
-                        result_clicked = True
-                        print(f"Clicked search result using selector: {selector}")
+                    element = elem_info['element']
+                    print(f"Attempting click #{i+1}: {elem_info['tag']} with text '{elem_info['text'][:30]}...'")
+                    
+                    # Try multiple click methods
+                    click_methods = [
+                        lambda: element.click(),
+                        lambda: driver.execute_script("arguments[0].click();", element),
+                        lambda: driver.execute_script("arguments[0].dispatchEvent(new MouseEvent('click', {bubbles: true}));", element),
+                        lambda: ActionChains(driver).click(element).perform()
+                    ]
+                    
+                    for method_idx, click_method in enumerate(click_methods):
+                        try:
+                            click_method()
+                            wait_for_page_ready(driver, timeout=5)
+                            
+                            # Check if page changed or directors content appeared
+                            if page_mentions_directors(driver):
+                                directors_tab_clicked = True
+                                print(f"Successfully clicked directors element (method {method_idx+1})")
+                                break
+                                
+                        except Exception as e:
+                            continue
+                    
+                    if directors_tab_clicked:
                         break
+                        
                 except Exception as e:
-                    print(f"Selector {selector} failed: {e}")
                     continue
+        
+        # Fallback: Try original selectors
+        if not directors_tab_clicked:
+            print("Trying original directors tab selectors...")
             
-            if not result_clicked:
-                search_response["errors"].append("Could not click on search results")
-                search_response["director_validation"] = {
-                    "error": "Could not access company details page",
-                    "director_valid": False
-                }
-                return search_response
-            
-            time.sleep(3)
-            
-            # Enhanced directors tab navigation with page inspection
-            print("Looking for directors tab...")
-            
-            # Get all clickable elements
-            all_links = driver.find_elements(By.TAG_NAME, "a")
-            all_buttons = driver.find_elements(By.TAG_NAME, "button")
-            all_inputs = driver.find_elements(By.CSS_SELECTOR, "input[type='button'], input[type='submit']")
-            all_spans = driver.find_elements(By.TAG_NAME, "span")
-            all_divs = driver.find_elements(By.CSS_SELECTOR, "div[onclick], div[class*='tab'], div[id*='tab']")
-            
-            # Look for directors-related text in all elements
-            directors_keywords = ['directors', 'διευθυντές', 'director', 'διευθυντής', 'board', 'officers']
-            potential_directors_elements = []
-            
-            all_elements = all_links + all_buttons + all_inputs + all_spans + all_divs
+            director_tab_selectors = [
+                "#ctl00_cphMyMasterCentral_directors",
+                "a[href*='directors']",
+                ".tab-directors",
+                "[id*='directors']",
+                "[class*='directors']",
+                "//a[contains(text(), 'Directors')]",
+                "//a[contains(text(), 'Διευθυντές')]"
+            ]
             
-            for element in all_elements:
+            for selector in director_tab_selectors:
                 try:
-                    element_text = element.text.lower().strip()
-                    element_id = element.get_attribute('id') or ''
-                    element_class = element.get_attribute('class') or ''
-                    element_onclick = element.get_attribute('onclick') or ''
+                    if selector.startswith("//"):
+                        elements = driver.find_elements(By.XPATH, selector)
+                    else:
+                        elements = driver.find_elements(By.CSS_SELECTOR, selector)
                     
-                    # Check if element contains directors-related keywords
-                    if any(keyword in element_text for keyword in directors_keywords) or \
-                       any(keyword in element_id.lower() for keyword in directors_keywords) or \
-                       any(keyword in element_class.lower() for keyword in directors_keywords) or \
-                       any(keyword in element_onclick.lower() for keyword in directors_keywords):
-                        
-                        potential_directors_elements.append({
-                            'element': element,
-                            'text': element_text,
-                            'id': element_id,
-                            'class': element_class,
-                            'onclick': element_onclick,
-                            'tag': element.tag_name
-                        })
-                        
-                except Exception as e:
-                    continue
-            
-            # Try to click on potential directors elements
-            directors_tab_clicked = False
-            
-            if potential_directors_elements:
-                print(f"Found {len(potential_directors_elements)} potential directors elements")
-                
-                for i, elem_info in enumerate(potential_directors_elements):
-                    try:
-                        element = elem_info['element']
-                        print(f"Attempting click #{i+1}: {elem_info['tag']} with text '{elem_info['text'][:30]}...'")
-                        
-                        # Try multiple click methods
-                        click_methods = [
-                            lambda: element.click(),
-                            lambda: driver.execute_script("arguments[0].click();", element),
-                            lambda: driver.execute_script("arguments[0].dispatchEvent(new MouseEvent('click', {bubbles: true}));", element),
-                            lambda: ActionChains(driver).click(element).perform()
-                        ]
-                        
-                        for method_idx, click_method in enumerate(click_methods):
-                            try:
-                                click_method()
-                                time.sleep(2)
-                                
-                                # Check if page changed or directors content appeared
-                                page_source = driver.page_source.lower()
+                    for element in elements:
+                        try:
+                            if element.is_displayed() and element.is_enabled():
+                                driver.execute_script("arguments[0].click();", element)
+                                wait_for_page_ready(driver, timeout=5)
                                 
-                                if 'directors' in page_source or 'διευθυντές' in page_source:
+                                # Check if directors content appeared
+                                if page_mentions_directors(driver):
                                     directors_tab_clicked = True
-                                    print(f"Successfully clicked directors element (method {method_idx+1})")
+                                    print(f"Directors tab clicked using: {selector}")
                                     break
-                                    
-                            except Exception as e:
-                                continue
-                        
-                        if directors_tab_clicked:
-                            break
-                            
-                    except Exception as e:
-                        continue
-            
-            # Fallback: Try original selectors
-            if not directors_tab_clicked:
-                print("Trying original directors tab selectors...")
-                
-                director_tab_selectors = [
-                    "#ctl00_cphMyMasterCentral_directors",
-                    "a[href*='directors']",
-                    ".tab-directors",
-                    "[id*='directors']",
-                    "[class*='directors']",
-                    "//a[contains(text(), 'Directors')]",
-                    "//a[contains(text(), 'Διευθυντές')]"
-                ]
-                
-                for selector in director_tab_selectors:
-                    try:
-                        if selector.startswith("//"):
-                            elements = driver.find_elements(By.XPATH, selector)
-                        else:
-                            elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                        
-                        for element in elements:
-                            try:
-                                if element.is_displayed() and element.is_enabled():
-                                    driver.execute_script("arguments[0].click();", element)
-                                    time.sleep(3)
-                                    
-                                    # Check if directors content appeared
-                                    if 'directors' in driver.page_source.lower() or 'διευθυντές' in driver.page_source.lower():
-                                        directors_tab_clicked = True
-                                        print(f"Directors tab clicked using: {selector}")
-                                        break
-                            except Exception as e:
-                                continue
-                        
-                        if directors_tab_clicked:
-                            break
-                            
-                    except Exception as e:
-                        continue
-            
-            # Check if we're already on directors page or if directors info is visible
-            if not directors_tab_clicked:
-                print("Checking if directors information is already visible...")
-                page_content = driver.page_source.lower()
-                
-                if 'directors' in page_content or 'διευθυντές' in page_content:
-                    print("Directors information appears to be already visible on the page")
-                    directors_tab_clicked = True
-            
-            # Trigger Google Translate
-            if directors_tab_clicked:
-                print("Triggering Google Translate for directors page...")
-                enhanced_trigger_translate(driver)
-                time.sleep(5)
-            
-            # Parse directors page
-            print("Parsing directors information...")
-            directors_html = driver.page_source
-            directors_result = parse_directors_data(directors_html)
-            
-            # Also try to extract directors from page text using regex patterns
-            if not directors_result.get('directors'):
-                print("Attempting regex-based director extraction from page text...")
-                page_text = driver.find_element(By.TAG_NAME, "body").text
-                
-                # Enhanced director name patterns (both English and Greek)
-                director_patterns = [
-                    r'(?:Director|Διευθυντής|Board Member|Μέλος Διοικητικού)\s*:?\s*([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω\s\.]+)',
-                    r'([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+\s+[A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+)(?:\s*-\s*(?:Director|Διευθυντής))',
-                    r'Name\s*:?\s*([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω\s\.]+)',
-                    r'Όνομα\s*:?\s*([Α-Ω][Α-Ωα-ω\s\.]+)',
-                    # Look for capitalized names (common format)
-                    r'\b([A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+\s+[A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+(?:\s+[A-ZΑ-Ω][A-Za-zΑ-Ωα-ω]+)?)\b'
-                ]
-                
-                potential_directors = set()
-                for pattern in director_patterns:
-                    matches = re.findall(pattern, page_text, re.MULTILINE)
-                    for match in matches:
-                        name = match.strip()
-                        # Filter out common false positives
-                        exclude_terms = [
-                            'Cyprus', 'Company', 'Registration', 'Search', 'Details', 'Information',
-                            'Date', 'Status', 'Address', 'Email', 'Phone', 'Website', 'Limited',
-                            'Ltd', 'Corporation', 'Corp', 'Public', 'Private'
-                        ]
+                        except Exception as e:
+                            continue
+                    
+                    if directors_tab_clicked:
+                        break
                         
-                        if (len(name.split()) >= 2 and 
-                            len(name) > 5 and 
-                            not any(term.lower() in name.lower() for term in exclude_terms) and
-                            any(c.isalpha() for c in name)):
-                            potential_directors.add(process_director_name(name))
-                
-                if potential_directors:
-                    print(f"Regex extraction found potential directors: {list(potential_directors)}")
-                    directors_result['directors'].extend(list(potential_directors))
-                    directors_result['success'] = True
-            
-            print(f"Directors parsing result: Success={directors_result.get('success', False)}")
-            print(f"   Found {len(directors_result.get('directors', []))} directors: {directors_result.get('directors', [])}")
+                except Exception as e:
+                    continue
+        
+        # Check if we're already on directors page or if directors info is visible
+        if not directors_tab_clicked:
+            print("Checking if directors information is already visible...")
+            page_content = driver.page_source.lower()
             
-            # Validate director with Google Translate
-            print("Starting enhanced director validation with Google Translate...")
-            director_validation = validate_director_with_translation(director_name, directors_result.get('directors', []))
-            search_response["director_validation"] = director_validation
-            search_response["director_valid"] = director_validation["director_valid"]
+            if 'directors' in page_content or 'διευθυντές' in page_content:
+                print("Directors information appears to be already visible on the page")
+                directors_tab_clicked = True
+        
+        # Trigger Google Translate
+        if directors_tab_clicked:
+            print("Triggering Google Translate for directors page...")
+            enhanced_trigger_translate(driver)
+            wait_for_page_ready(driver)
+        
+        # Parse directors page
+        print("Parsing directors information...")
+        directors_html = driver.page_source
+        directors_result = parse_directors_data(directors_html)
+        
+        # Also try to extract directors from page text using regex patterns
+        if not directors_result.get('directors'):
+            print("Attempting regex-based director extraction from page text...")
+            page_text = driver.find_element(By.TAG_NAME, "body").text
             
-            if director_validation["director_valid"]:
-                print(f"Director validation SUCCESSFUL!")
-                print(f"   Method: {director_validation['match_method']}")
-                print(f"   Matched: {director_validation['matched_name']}")
-            else:
-                print(f"Director validation FAILED")
-                print(f"   Search name: {director_validation['processed_director_name']}")
-                print(f"   Found directors: {director_validation['directors_found']}")
-                
-                # If no directors found, add helpful error message
-                if not directors_result.get('directors'):
-                    search_response["errors"].append("No director information found on the company page")
-                else:
-                    search_response["errors"].append(f"Director '{director_name}' not found among listed directors")
+            potential_directors = extract_directors_from_text(page_text)
             
-        except (TimeoutException, NoSuchElementException) as e:
-            search_response["director_validation"] = {
-                "error": f"Could not access directors page: {str(e)}",
-                "director_valid": False,
-                "directors_found": [],
-                "translation_attempts": []
-            }
-            search_response["errors"].append(f"Directors page navigation failed: {str(e)}")
+            if potential_directors:
+                print(f"Regex extraction found potential directors: {list(potential_directors)}")
+                directors_result['directors'].extend(list(potential_directors))
+                directors_result['success'] = True
         
-        return search_response
+        print(f"Directors parsing result: Success={directors_result.get('success', False)}")
+        print(f"   Found {len(directors_result.get('directors', []))} directors: {directors_result.get('directors', [])}")
         
-    except Exception as e:
-        return {
-            "success": False,
-            "overall_valid": False,
+        apply_director_validation(search_response, director_name, directors_result)
+        
+    except (TimeoutException, NoSuchElementException) as e:
+        search_response["director_validation"] = {
+            "error": f"Could not access directors page: {str(e)}",
             "director_valid": False,
-            "error": f"Search failed: {str(e)}",
-            "errors": [f"Critical error: {str(e)}"]
+            "directors_found": [],
+            "translation_attempts": []
         }
-    finally:
-        # Close the browser
-        print("Closing browser...")
-        driver.quit()
+        search_response["errors"].append(f"Directors page navigation failed: {str(e)}")
+    
+    return search_response
+
 
 def search_cyprus_company_with_director_validation(data):
     """
@@ -1139,7 +1342,7 @@ def search_cyprus_company_with_director_validation(data):
     if perform_search and response['validation']['input_format_valid']:
         try:
             print("Starting Cyprus company search with enhanced director validation...")
-            search_results = search_cyprus_company_with_selenium(
+            search_results = search_cyprus_company(
                 processed_data['processed']['registration'],
                 processed_data['processed']['name'],
                 processed_director